@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.routes import rides, auth
+from app.api.routes import rides, auth, admin, drivers
 
 # API Router with prefix
 api_router = APIRouter(prefix="/api/v1")
@@ -7,6 +7,8 @@ api_router = APIRouter(prefix="/api/v1")
 # Include routes
 api_router.include_router(auth.router, prefix="/auth", tags=["authentication"])
 api_router.include_router(rides.router, prefix="/rides", tags=["rides"])
+api_router.include_router(drivers.router, prefix="/drivers", tags=["drivers"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
 
 # Security check endpoint
 @api_router.get("/health")
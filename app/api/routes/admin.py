@@ -0,0 +1,72 @@
+from collections import Counter
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from typing import List, Optional
+
+from app.core.profiling import Profile, folded, profile_store
+from app.db.models import RideStatus
+from app.services.ride_export import EXPORT_MEDIA_TYPES, RideExportFilter, ride_exporter
+from app.utils.auth import require_admin
+
+router = APIRouter(tags=["admin"], dependencies=[Depends(require_admin)])
+
+def _get_profile(profile_id: str) -> Profile:
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    return profile
+
+@router.get("/profiles/")
+async def list_profiles(route: Optional[str] = Query(None, description="Only profiles of this route template")) -> List[dict]:
+    """Recent request profiles, newest first (requires X-Admin-Token)"""
+    return [profile.summary() for profile in profile_store.list(route)]
+
+@router.get("/profiles/collapsed/", response_class=PlainTextResponse)
+async def download_merged_profile(route: str = Query(..., description="Route template to merge profiles for")):
+    """Stacks of every stored profile of one route, merged into one folded file"""
+    merged = Counter()
+    for profile in profile_store.list(route):
+        merged.update(profile.samples)
+    return PlainTextResponse(
+        folded(merged),
+        headers={"Content-Disposition": 'attachment; filename="profiles.folded"'},
+    )
+
+@router.get("/profiles/{profile_id}/")
+async def get_profile(profile_id: str) -> dict:
+    """Phase breakdown and folded stacks of one profile"""
+    profile = _get_profile(profile_id)
+    return {**profile.summary(), "stacks": profile.collapsed()}
+
+@router.get("/profiles/{profile_id}/collapsed/", response_class=PlainTextResponse)
+async def download_profile(profile_id: str):
+    """Folded stacks of one profile, for flamegraph.pl, speedscope or inferno"""
+    profile = _get_profile(profile_id)
+    return PlainTextResponse(
+        profile.collapsed(),
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile.id}.folded"'},
+    )
+
+@router.get("/rides/export/", response_class=StreamingResponse)
+async def export_rides(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson or csv"),
+    rider_id: Optional[str] = Query(None, description="Only rides of this rider"),
+    driver_id: Optional[str] = Query(None, description="Only rides assigned to this driver"),
+    status_filter: Optional[RideStatus] = Query(None, alias="status", description="Only rides in this status"),
+    created_from: Optional[datetime] = Query(None, description="Only rides created at or after this time"),
+    created_to: Optional[datetime] = Query(None, description="Only rides created before this time"),
+):
+    """Every matching ride, live and archived, oldest first, streamed from a read-only connection"""
+    filters = RideExportFilter(
+        rider_id=rider_id, driver_id=driver_id, status=status_filter,
+        created_from=created_from, created_to=created_to,
+    )
+    return StreamingResponse(
+        ride_exporter.stream(filters, format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="rides.{format}"'},
+    )
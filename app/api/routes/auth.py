@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Depends
-from app.db.models import User
-from app.schemas.auth import UserCreate, UserLogin, UserOut, Token
+from app.utils.user_cache import UserPrincipal
+from app.schemas.auth import UserCreate, UserLogin, UserOut, Token, RefreshRequest
 from app.services.auth import AuthService, get_auth_service
 from app.utils.auth import get_current_user
+from app.core.profiling import ProfiledRoute
 
-router = APIRouter(tags=["authentication"])
+router = APIRouter(tags=["authentication"], route_class=ProfiledRoute)
 
 @router.post("/register", response_model=UserOut, status_code=201)
 async def register_user(
@@ -22,9 +23,25 @@ async def login_user(
     """Authenticate user and return access token"""
     return await auth_service.login_user(credentials)
 
+@router.post("/refresh", response_model=Token)
+async def refresh_token(
+    payload: RefreshRequest,
+    auth_service: AuthService = Depends(get_auth_service)
+):
+    """Exchange a refresh token for a new access token (the refresh token is rotated)"""
+    return await auth_service.refresh_tokens(payload.refresh_token)
+
+@router.post("/logout", status_code=204)
+async def logout(
+    payload: RefreshRequest,
+    auth_service: AuthService = Depends(get_auth_service)
+):
+    """Revoke a refresh token and every token rotated from the same login"""
+    await auth_service.revoke_refresh_token(payload.refresh_token)
+
 @router.get("/me", response_model=UserOut)
 async def get_current_user_info(
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Get current user information"""
     return current_user
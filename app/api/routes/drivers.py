@@ -0,0 +1,112 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from typing import List, Optional
+import logging
+
+from app.core.config import get_settings
+from app.core.profiling import ProfiledRoute
+from app.db.models import UserType
+from app.schemas.drivers import DriverPing, DriverPingBatchResult, Heatmap, NearbyDriver
+from app.services.demand import DemandHeatmap, get_demand_heatmap
+from app.services.driver_locations import DriverLocationStore, driver_locations
+from app.utils.auth import get_current_driver, get_current_user, require_admin
+from app.utils.driver_pings import parse_ping_batch, validate_pings
+from app.utils.user_cache import UserPrincipal
+
+router = APIRouter(tags=["drivers"], route_class=ProfiledRoute)
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+def get_driver_locations() -> DriverLocationStore:
+    """Dependency accessor for the process-wide driver location store"""
+    return driver_locations
+
+@router.post("/location/", status_code=status.HTTP_204_NO_CONTENT)
+async def report_location(
+    payload: DriverPing,
+    current_user: UserPrincipal = Depends(get_current_driver),
+    locations: DriverLocationStore = Depends(get_driver_locations),
+):
+    """
+    Driver reports their position (requires authentication), every few seconds while on duty.
+
+    Positions live in memory and are written to the database periodically.
+    Drivers silent for ``DRIVER_LOCATION_FRESH_SECONDS`` stop counting as nearby.
+    """
+    locations.update(current_user.id, payload.lat, payload.lon, payload.available)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@router.post(
+    "/locations/batch/",
+    response_model=DriverPingBatchResult,
+    dependencies=[Depends(require_admin)],
+)
+async def report_locations(
+    request: Request,
+    locations: DriverLocationStore = Depends(get_driver_locations),
+):
+    """
+    A location gateway forwards many drivers' pings at once (requires X-Admin-Token).
+
+    The body is a JSON array of ``{"driver_id", "lat", "lon", "available"?, "ts"?}``,
+    with ``ts`` in epoch seconds (default: now). Invalid pings are reported
+    by index. Of several pings for one driver, only the newest is kept.
+    """
+    try:
+        records = parse_ping_batch(await request.body())
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    if len(records) > settings.driver_location_batch_max:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.driver_location_batch_max} pings per batch"
+        )
+    batch, errors = validate_pings(records)
+    applied = locations.update_many(batch.driver_ids, batch.lat, batch.lon, batch.available, batch.ts)
+    return DriverPingBatchResult(
+        received=len(records), applied=applied, stale=len(batch.driver_ids) - applied, errors=errors
+    )
+
+@router.get("/nearby/", response_model=List[NearbyDriver], response_model_exclude_none=True)
+async def nearby_drivers(
+    lat: float = Query(..., ge=-90, le=90, description="Latitude to search around"),
+    lon: float = Query(..., ge=-180, le=180, description="Longitude to search around"),
+    radius_km: Optional[float] = Query(
+        None, gt=0, le=settings.available_rides_max_radius_km, description="Search radius in km"
+    ),
+    k: Optional[int] = Query(None, ge=1, le=settings.nearby_drivers_max_k, description="Maximum number of drivers"),
+    current_user: UserPrincipal = Depends(get_current_user),
+    locations: DriverLocationStore = Depends(get_driver_locations),
+):
+    """
+    Idle, recently seen drivers around a point, nearest first (requires authentication).
+
+    Riders only get each driver's distance and ping age; driver ids and
+    exact positions are left out unless the caller is a driver.
+    """
+    if k is None:
+        k = settings.nearby_drivers_default_k
+    reveal = current_user.user_type == UserType.DRIVER
+    now = locations.clock()
+    nearby = []
+    for driver_id, distance_km in locations.nearest_idle(lat, lon, k=k, radius_km=radius_km):
+        position = locations.get(driver_id)
+        driver = NearbyDriver(distance_km=distance_km, age_seconds=now - position.updated_at)
+        if reveal:
+            driver.driver_id, driver.lat, driver.lon = driver_id, position.lat, position.lon
+        nearby.append(driver)
+    return nearby
+
+@router.get("/heatmap/", response_model=Heatmap)
+async def supply_demand_heatmap(
+    current_user: UserPrincipal = Depends(get_current_user),
+    heatmap: DemandHeatmap = Depends(get_demand_heatmap),
+):
+    """
+    Pending rides, recent requests and accepts, idle drivers and surge per grid cell (requires authentication).
+
+    Rebuilt every ``HEATMAP_REFRESH_SECONDS``; between rebuilds every request gets the same bytes.
+    """
+    return Response(heatmap.body(), media_type="application/json")
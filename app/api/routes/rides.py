@@ -1,46 +1,367 @@
-from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 import logging
+import orjson
 
+from app.db.models import RideStatus, UserType
 from app.db.session import get_session
-from app.db.models import User
-from app.schemas.rides import RideCreate, RideOut, RideAccept
+from app.utils.user_cache import UserPrincipal
+from app.schemas.rides import (
+    BulkRideResult, FareEstimate, FareEstimateBatchResult, RideCreate, RideOut, RideAccept, DispatchRequest,
+)
 from app.services.rides import RideService, get_ride_service
-from app.utils.notifications import notify_rider
-from app.utils.auth import get_current_rider, get_current_driver
+from app.services.listing_cache import CachedListing, etag_matches
+from app.services.ride_export import EXPORT_MEDIA_TYPES, RideExportFilter, ride_exporter
+from app.utils.bulk_rides import TRIP_FIELDS, parse_ride_records, validate_ride_columns
+from app.utils.ride_json import dumps_ride, ride_row
+from app.services.dispatch import batch_dispatcher
+from app.services.ride_events import ride_event_bus
+from app.services.ride_offers import OfferScheduler, get_ride_offers
+from app.services.fares import FareEstimator, get_fare_estimator
+from app.services.idempotency import IdempotentRequest, idempotent_request
+from app.utils.auth import get_current_user, get_current_rider, get_current_driver
+from app.core.config import get_settings
+from app.core.profiling import ProfiledRoute
 
-router = APIRouter(tags=["rides"])
+router = APIRouter(tags=["rides"], route_class=ProfiledRoute)
 logger = logging.getLogger(__name__)
+settings = get_settings()
+
+def _ride_json(ride) -> bytes:
+    return dumps_ride(ride_row(ride))
 
 @router.post("/", response_model=RideOut, status_code=status.HTTP_201_CREATED)
 async def create_ride(
     payload: RideCreate,
-    current_user: User = Depends(get_current_rider),
-    ride_service: RideService = Depends(get_ride_service),
+    current_user: UserPrincipal = Depends(get_current_rider),
+    idempotency: IdempotentRequest = Depends(idempotent_request),
+):
+    """
+    Rider creates a ride request (requires authentication).
+
+    Send an ``Idempotency-Key`` header to make retries safe: a retry with
+    the same key gets the original response instead of a second ride.
+    """
+    return await idempotency.respond(
+        lambda session: get_ride_service(session).create_ride(payload, current_user.id),
+        _ride_json, status.HTTP_201_CREATED,
+    )
+
+def _upload_too_large():
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"At most {settings.bulk_rides_max_bytes} bytes per upload"
+    )
+
+async def bulk_upload_body(request: Request, current_user: UserPrincipal = Depends(get_current_rider)) -> bytes:
+    """
+    The body of a bulk upload, refused with 413 once it exceeds
+    ``bulk_rides_max_bytes``: up front from ``Content-Length``, otherwise
+    as soon as the streamed chunks pass the cap.
+    """
+    max_bytes = settings.bulk_rides_max_bytes
+    try:
+        declared = int(request.headers.get("content-length", 0))
+    except ValueError:
+        declared = 0
+    if declared > max_bytes:
+        raise _upload_too_large()
+    chunks, size = [], 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > max_bytes:
+            raise _upload_too_large()
+        chunks.append(chunk)
+    # Cached where Request.body() looks, so idempotent_request reuses it
+    request._body = b"".join(chunks)
+    return request._body
+
+@router.post("/bulk/", response_model=BulkRideResult)
+async def create_rides_bulk(
+    request: Request,
+    current_user: UserPrincipal = Depends(get_current_rider),
+    body: bytes = Depends(bulk_upload_body),
+    idempotency: IdempotentRequest = Depends(idempotent_request),
+):
+    """
+    Rider submits many rides at once (requires authentication).
+
+    The body is a JSON array of ride objects, or NDJSON (one object per line)
+    with ``Content-Type: application/x-ndjson``. Valid rows are inserted and
+    invalid ones reported by index; the upload is not all-or-nothing.
+    """
+    ndjson = request.headers.get("content-type", "").startswith(("application/x-ndjson", "application/jsonl"))
+    try:
+        records, errors = parse_ride_records(body, ndjson)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    if len(records) > settings.bulk_rides_max_rows:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.bulk_rides_max_rows} rides per upload"
+        )
+    return await idempotency.respond(
+        lambda session: get_ride_service(session).create_rides_bulk(records, current_user.id, errors),
+        lambda result: result.model_dump_json().encode(),
+    )
+
+@router.get("/estimate/", response_model=FareEstimate)
+async def estimate_fare(
+    pickup_lat: float = Query(..., ge=-90, le=90, description="Pickup latitude"),
+    pickup_lon: float = Query(..., ge=-180, le=180, description="Pickup longitude"),
+    dropoff_lat: float = Query(..., ge=-90, le=90, description="Dropoff latitude"),
+    dropoff_lon: float = Query(..., ge=-180, le=180, description="Dropoff longitude"),
+    current_user: UserPrincipal = Depends(get_current_user),
+    fares: FareEstimator = Depends(get_fare_estimator),
 ):
-    """Rider creates a ride request (requires authentication)"""
-    return await ride_service.create_ride(payload, current_user.id)
+    """Quote the fare and trip time for a ride, plus the nearest idle driver's pickup ETA (requires authentication)"""
+    return fares.estimate(pickup_lat, pickup_lon, dropoff_lat, dropoff_lon)
+
+@router.post("/estimate/batch/", response_model=FareEstimateBatchResult)
+async def estimate_fares(
+    request: Request,
+    current_user: UserPrincipal = Depends(get_current_user),
+    fares: FareEstimator = Depends(get_fare_estimator),
+):
+    """
+    Quote many trips at once (requires authentication).
+
+    The body is a JSON array (or NDJSON) of ``{"pickup_lat", "pickup_lon",
+    "dropoff_lat", "dropoff_lon"}``. Invalid trips are reported by index
+    like bulk uploads; the rest are quoted in one vectorized pass.
+    """
+    ndjson = request.headers.get("content-type", "").startswith(("application/x-ndjson", "application/jsonl"))
+    try:
+        records, errors = parse_ride_records(await request.body(), ndjson)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    if len(records) > settings.fare_estimate_batch_max:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.fare_estimate_batch_max} trips per batch"
+        )
+    values, valid, column_errors = validate_ride_columns(records, TRIP_FIELDS)
+    estimates: List[Optional[dict]] = [None] * len(records)
+    indices = valid.nonzero()[0]
+    if len(indices):
+        columns = fares.estimate_many(*values[indices].T)
+        for i, (km, minutes, fare, surge) in zip(indices.tolist(), zip(*(column.tolist() for column in columns))):
+            estimates[i] = {
+                "distance_km": km, "duration_minutes": minutes, "fare": fare,
+                "surge_multiplier": surge, "pickup_eta_minutes": None,
+            }
+    result = {
+        "received": len(records),
+        "estimates": estimates,
+        "errors": sorted(errors + column_errors, key=lambda error: error["index"]),
+    }
+    # Plain dicts of floats already match FareEstimateBatchResult, so skip re-validating them
+    return Response(orjson.dumps(result), media_type="application/json")
+
+def _listing_response(listing: CachedListing, if_none_match: Optional[str]) -> Response:
+    """200 with the cached body, or 304 when the client already holds this ETag"""
+    headers = {"ETag": listing.etag, "Cache-Control": "no-cache"}
+    if listing.next_cursor is not None:
+        headers["X-Next-Cursor"] = listing.next_cursor
+    if etag_matches(if_none_match, listing.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(listing.body, media_type="application/json", headers=headers)
 
 @router.get("/available/", response_model=List[RideOut])
 async def get_available_rides(
-    current_user: User = Depends(get_current_driver),
+    lat: Optional[float] = Query(None, ge=-90, le=90, description="Driver latitude"),
+    lon: Optional[float] = Query(None, ge=-180, le=180, description="Driver longitude"),
+    radius_km: Optional[float] = Query(
+        None, gt=0, le=settings.available_rides_max_radius_km, description="Search radius in km"
+    ),
+    k: Optional[int] = Query(
+        None, ge=1, le=settings.available_rides_max_k, description="Maximum number of nearest rides"
+    ),
+    limit: int = Query(
+        settings.available_rides_page_size, ge=1, le=settings.available_rides_max_page_size,
+        description="Page size when listing without coordinates"
+    ),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous X-Next-Cursor header"),
+    if_none_match: Optional[str] = Header(None),
+    current_user: UserPrincipal = Depends(get_current_driver),
+    ride_service: RideService = Depends(get_ride_service),
+):
+    """
+    Driver fetches available rides (requires authentication).
+
+    Without coordinates, rides are listed newest first in pages of ``limit``;
+    the ``X-Next-Cursor`` response header carries the cursor for the next page.
+    When the driver's lat/lon are given, only nearby rides are returned, nearest
+    pickup first: those within ``radius_km`` and/or the ``k`` nearest.
+    Rows are serialized straight to JSON (``response_model`` only documents
+    the shape).
+
+    Serialized listings are cached until the pending set changes. Responses
+    carry a strong ``ETag``; polling with it in ``If-None-Match`` returns
+    ``304 Not Modified`` without a database query while nothing has changed.
+    """
+    if lat is None and lon is None:
+        listing = await ride_service.get_available_listing(limit=limit, cursor=cursor)
+        return _listing_response(listing, if_none_match)
+    if lat is None or lon is None:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="lat and lon must be provided together"
+        )
+    if radius_km is None and k is None:
+        k = settings.available_rides_default_k
+    listing = await ride_service.get_nearby_listing(lat, lon, radius_km=radius_km, k=k)
+    return _listing_response(listing, if_none_match)
+
+@router.get("/available/stream/", response_class=StreamingResponse)
+async def stream_available_rides(
+    current_user: UserPrincipal = Depends(get_current_driver),
     ride_service: RideService = Depends(get_ride_service),
 ):
-    """Driver fetches available rides (requires authentication)"""
-    return await ride_service.get_available_rides()
+    """Driver streams every available ride as NDJSON, newest first (requires authentication)"""
+    return StreamingResponse(
+        ride_service.stream_available_rides(),
+        media_type="application/x-ndjson"
+    )
+
+@router.get("/feed/", response_class=StreamingResponse)
+async def ride_feed(
+    lat: Optional[float] = Query(None, ge=-90, le=90, description="Driver latitude"),
+    lon: Optional[float] = Query(None, ge=-180, le=180, description="Driver longitude"),
+    radius_km: Optional[float] = Query(
+        None, gt=0, le=settings.available_rides_max_radius_km, description="Only rides picking up within this radius"
+    ),
+    current_user: UserPrincipal = Depends(get_current_driver),
+):
+    """
+    Driver subscribes to pending-ride changes as Server-Sent Events (requires authentication).
+
+    The stream opens with a ``snapshot`` event, then sends ``ride.created``,
+    ``ride.accepted`` and ``ride.withdrawn`` deltas. Rides offered to this
+    driver arrive as ``ride.offered`` (with ``expires_in`` seconds) and, if
+    not taken in time, ``ride.offer_expired``. Connections that fall behind
+    receive ``evicted`` and are closed.
+    """
+    if radius_km is not None and (lat is None or lon is None):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="radius_km requires lat and lon"
+        )
+    return StreamingResponse(
+        ride_event_bus.feed(lat=lat, lon=lon, radius_km=radius_km, driver_id=current_user.id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post(
+    "/dispatch/",
+    response_model=RideOut,
+    responses={status.HTTP_204_NO_CONTENT: {"description": "No ride assigned in this round"}},
+)
+async def join_dispatch(
+    payload: DispatchRequest,
+    current_user: UserPrincipal = Depends(get_current_driver),
+):
+    """
+    Driver joins the next batch dispatch round (requires authentication).
+
+    Waiting drivers are matched to nearby pending rides in bulk every dispatch
+    window. Returns the assigned ride, or 204 if none could be assigned.
+    """
+    ride = await batch_dispatcher.request_ride(current_user.id, payload.lat, payload.lon)
+    if ride is None:
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+    return ride
+
+@router.get("/history/", response_class=StreamingResponse)
+async def export_ride_history(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson or csv"),
+    status_filter: Optional[RideStatus] = Query(None, alias="status", description="Only rides in this status"),
+    created_from: Optional[datetime] = Query(None, description="Only rides created at or after this time"),
+    created_to: Optional[datetime] = Query(None, description="Only rides created before this time"),
+    current_user: UserPrincipal = Depends(get_current_user),
+):
+    """
+    Download your ride history, live and archived, oldest first (requires authentication).
+
+    Riders get the rides they requested, drivers the rides they were
+    assigned. The export streams page by page from a read-only connection,
+    so it can be as long as the history is.
+    """
+    owner = (
+        {"rider_id": current_user.id} if current_user.user_type == UserType.RIDER
+        else {"driver_id": current_user.id}
+    )
+    filters = RideExportFilter(
+        **owner, status=status_filter, created_from=created_from, created_to=created_to
+    )
+    return StreamingResponse(
+        ride_exporter.stream(filters, format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="rides.{format}"'},
+    )
 
 @router.post("/{ride_id}/accept/", response_model=RideOut)
 async def accept_ride(
     ride_id: int,
-    background_tasks: BackgroundTasks,
-    current_user: User = Depends(get_current_driver),
+    current_user: UserPrincipal = Depends(get_current_driver),
+    idempotency: IdempotentRequest = Depends(idempotent_request),
+):
+    """Driver accepts a ride (requires authentication); the rider is notified from the outbox"""
+    return await idempotency.respond(
+        lambda session: get_ride_service(session).accept_ride(ride_id, current_user.id), _ride_json
+    )
+
+@router.post("/{ride_id}/decline/", status_code=status.HTTP_204_NO_CONTENT)
+async def decline_ride(
+    ride_id: int,
+    current_user: UserPrincipal = Depends(get_current_driver),
+    offers: OfferScheduler = Depends(get_ride_offers),
+):
+    """Driver turns down a ride offered to them (requires authentication); it goes to the next drivers"""
+    if not offers.decline(ride_id, current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No open offer for this ride"
+        )
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@router.post("/{ride_id}/complete/", response_model=RideOut)
+async def complete_ride(
+    ride_id: int,
+    current_user: UserPrincipal = Depends(get_current_driver),
+    idempotency: IdempotentRequest = Depends(idempotent_request),
+):
+    """Assigned driver completes an accepted ride (requires authentication)"""
+    return await idempotency.respond(
+        lambda session: get_ride_service(session).complete_ride(ride_id, current_user.id), _ride_json
+    )
+
+@router.post("/{ride_id}/cancel/", response_model=RideOut)
+async def cancel_ride(
+    ride_id: int,
+    current_user: UserPrincipal = Depends(get_current_rider),
+    idempotency: IdempotentRequest = Depends(idempotent_request),
+):
+    """Rider cancels their own pending ride (requires authentication)"""
+    return await idempotency.respond(
+        lambda session: get_ride_service(session).cancel_ride(ride_id, current_user.id), _ride_json
+    )
+
+@router.get("/{ride_id}/", response_model=RideOut)
+async def get_ride(
+    ride_id: int,
+    current_user: UserPrincipal = Depends(get_current_user),
     ride_service: RideService = Depends(get_ride_service),
 ):
-    """Driver accepts a ride (requires authentication)"""
-    ride = await ride_service.accept_ride(ride_id, current_user.id)
-    
-    # Add background notification task
-    background_tasks.add_task(notify_rider, ride.rider_id, ride.id, ride.driver_id)
-    
-    return ride
\ No newline at end of file
+    """Fetch one of your rides, live or archived (requires authentication); drivers can also see pending rides"""
+    return await ride_service.get_ride(ride_id, current_user)
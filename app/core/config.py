@@ -5,6 +5,17 @@ from app import env_config
 class Settings(BaseSettings):
     # Database Configuration
     database_url: str = env_config.DATABASE_URL
+    sqlite_high_concurrency: bool = env_config.SQLITE_HIGH_CONCURRENCY
+    sqlite_busy_timeout_ms: int = env_config.SQLITE_BUSY_TIMEOUT_MS
+    sqlite_mmap_size_bytes: int = env_config.SQLITE_MMAP_SIZE_BYTES
+    sqlite_cache_size_kib: int = env_config.SQLITE_CACHE_SIZE_KIB
+    sqlite_read_pool_size: int = env_config.SQLITE_READ_POOL_SIZE
+    write_queue_max_batch: int = env_config.WRITE_QUEUE_MAX_BATCH
+    ride_insert_max_batch: int = env_config.RIDE_INSERT_MAX_BATCH
+    ride_insert_max_wait_ms: float = env_config.RIDE_INSERT_MAX_WAIT_MS
+    bulk_rides_max_rows: int = env_config.BULK_RIDES_MAX_ROWS
+    bulk_rides_chunk_size: int = env_config.BULK_RIDES_CHUNK_SIZE
+    bulk_rides_max_bytes: int = env_config.BULK_RIDES_MAX_BYTES
     
     # Application Configuration
     app_name: str = "Ride Matcher API"
@@ -15,7 +26,116 @@ class Settings(BaseSettings):
     secret_key: str = env_config.SECRET_KEY
     access_token_expire_minutes: int = env_config.ACCESS_TOKEN_EXPIRE_MINUTES
     algorithm: str = env_config.ALGORITHM
+    refresh_token_expire_days: int = env_config.REFRESH_TOKEN_EXPIRE_DAYS
+    password_hash_workers: int = env_config.PASSWORD_HASH_WORKERS
+    password_hash_max_pending: int = env_config.PASSWORD_HASH_MAX_PENDING
+    password_hash_use_processes: bool = env_config.PASSWORD_HASH_USE_PROCESSES
+    user_cache_max_size: int = env_config.USER_CACHE_MAX_SIZE
+    user_cache_ttl_seconds: float = env_config.USER_CACHE_TTL_SECONDS
+
+    # Idempotency keys
+    idempotency_max_keys: int = env_config.IDEMPOTENCY_MAX_KEYS
+    idempotency_ttl_seconds: float = env_config.IDEMPOTENCY_TTL_SECONDS
+    idempotency_persist: bool = env_config.IDEMPOTENCY_PERSIST
     
+    # Available-rides proximity index
+    geo_index_cell_size_deg: float = env_config.GEO_INDEX_CELL_SIZE_DEG
+    available_rides_default_k: int = env_config.AVAILABLE_RIDES_DEFAULT_K
+    available_rides_max_k: int = env_config.AVAILABLE_RIDES_MAX_K
+    available_rides_max_radius_km: float = env_config.AVAILABLE_RIDES_MAX_RADIUS_KM
+    available_rides_page_size: int = env_config.AVAILABLE_RIDES_PAGE_SIZE
+    available_rides_max_page_size: int = env_config.AVAILABLE_RIDES_MAX_PAGE_SIZE
+    ride_stream_chunk_size: int = env_config.RIDE_STREAM_CHUNK_SIZE
+    listing_cache_max_entries: int = env_config.LISTING_CACHE_MAX_ENTRIES
+    listing_cache_max_bytes: int = env_config.LISTING_CACHE_MAX_BYTES
+    listing_cache_ttl_seconds: float = env_config.LISTING_CACHE_TTL_SECONDS
+
+    # Driver locations
+    driver_location_fresh_seconds: float = env_config.DRIVER_LOCATION_FRESH_SECONDS
+    driver_location_expire_seconds: float = env_config.DRIVER_LOCATION_EXPIRE_SECONDS
+    driver_location_snapshot_seconds: float = env_config.DRIVER_LOCATION_SNAPSHOT_SECONDS
+    driver_location_batch_max: int = env_config.DRIVER_LOCATION_BATCH_MAX
+    nearby_drivers_default_k: int = env_config.NEARBY_DRIVERS_DEFAULT_K
+    nearby_drivers_max_k: int = env_config.NEARBY_DRIVERS_MAX_K
+
+    # Ride offers
+    ride_offer_k: int = env_config.RIDE_OFFER_K
+    ride_offer_timeout_seconds: float = env_config.RIDE_OFFER_TIMEOUT_SECONDS
+    ride_offer_start_radius_km: float = env_config.RIDE_OFFER_START_RADIUS_KM
+    ride_offer_radius_growth: float = env_config.RIDE_OFFER_RADIUS_GROWTH
+    ride_offer_max_radius_km: float = env_config.RIDE_OFFER_MAX_RADIUS_KM
+    ride_offer_max_rounds: int = env_config.RIDE_OFFER_MAX_ROUNDS
+
+    # Fare estimates
+    fare_base: float = env_config.FARE_BASE
+    fare_per_km: float = env_config.FARE_PER_KM
+    fare_per_minute: float = env_config.FARE_PER_MINUTE
+    fare_minimum: float = env_config.FARE_MINIMUM
+    fare_detour_factor: float = env_config.FARE_DETOUR_FACTOR
+    fare_average_speed_kmh: float = env_config.FARE_AVERAGE_SPEED_KMH
+    fare_cell_size_deg: float = env_config.FARE_CELL_SIZE_DEG
+    fare_cache_size: int = env_config.FARE_CACHE_SIZE
+    fare_estimate_batch_max: int = env_config.FARE_ESTIMATE_BATCH_MAX
+
+    # Supply/demand heatmap and surge pricing
+    heatmap_cell_size_deg: float = env_config.HEATMAP_CELL_SIZE_DEG
+    heatmap_window_seconds: float = env_config.HEATMAP_WINDOW_SECONDS
+    heatmap_buckets: int = env_config.HEATMAP_BUCKETS
+    heatmap_refresh_seconds: float = env_config.HEATMAP_REFRESH_SECONDS
+    heatmap_max_cells: int = env_config.HEATMAP_MAX_CELLS
+    surge_min_pending: int = env_config.SURGE_MIN_PENDING
+    surge_sensitivity: float = env_config.SURGE_SENSITIVITY
+    surge_max: float = env_config.SURGE_MAX
+    surge_step: float = env_config.SURGE_STEP
+
+    # Pending-ride push feed
+    ride_feed_queue_size: int = env_config.RIDE_FEED_QUEUE_SIZE
+    ride_feed_snapshot_limit: int = env_config.RIDE_FEED_SNAPSHOT_LIMIT
+    ride_feed_heartbeat_seconds: float = env_config.RIDE_FEED_HEARTBEAT_SECONDS
+
+    # Batch dispatch
+    dispatch_window_ms: int = env_config.DISPATCH_WINDOW_MS
+    dispatch_max_drivers: int = env_config.DISPATCH_MAX_DRIVERS
+    dispatch_max_pickup_km: float = env_config.DISPATCH_MAX_PICKUP_KM
+    dispatch_optimal_max_size: int = env_config.DISPATCH_OPTIMAL_MAX_SIZE
+    dispatch_candidates_per_driver: int = env_config.DISPATCH_CANDIDATES_PER_DRIVER
+
+    # Ride event outbox relay
+    outbox_batch_size: int = env_config.OUTBOX_BATCH_SIZE
+    outbox_poll_interval_ms: float = env_config.OUTBOX_POLL_INTERVAL_MS
+    outbox_retention_hours: float = env_config.OUTBOX_RETENTION_HOURS
+    outbox_prune_interval_seconds: float = env_config.OUTBOX_PRUNE_INTERVAL_SECONDS
+
+    # Ride archival
+    archive_batch_size: int = env_config.ARCHIVE_BATCH_SIZE
+    archive_interval_seconds: float = env_config.ARCHIVE_INTERVAL_SECONDS
+    archive_accepted_after_hours: float = env_config.ARCHIVE_ACCEPTED_AFTER_HOURS
+
+    # Ride history export
+    export_page_size: int = env_config.EXPORT_PAGE_SIZE
+
+    # Notifications
+    notification_sink: str = env_config.NOTIFICATION_SINK
+    notification_http_url: str = env_config.NOTIFICATION_HTTP_URL
+    notification_http_timeout_seconds: float = env_config.NOTIFICATION_HTTP_TIMEOUT_SECONDS
+    notification_workers: int = env_config.NOTIFICATION_WORKERS
+    notification_queue_size: int = env_config.NOTIFICATION_QUEUE_SIZE
+    notification_deferred_max: int = env_config.NOTIFICATION_DEFERRED_MAX
+    notification_batch_size: int = env_config.NOTIFICATION_BATCH_SIZE
+    notification_batch_wait_ms: float = env_config.NOTIFICATION_BATCH_WAIT_MS
+    notification_max_retries: int = env_config.NOTIFICATION_MAX_RETRIES
+    notification_retry_base_ms: float = env_config.NOTIFICATION_RETRY_BASE_MS
+    notification_retry_max_ms: float = env_config.NOTIFICATION_RETRY_MAX_MS
+
+    # Metrics
+    metrics_enabled: bool = env_config.METRICS_ENABLED
+
+    # Admin access and request profiling
+    admin_token: str = env_config.ADMIN_TOKEN
+    profiling_sample_rate: float = env_config.PROFILING_SAMPLE_RATE
+    profiling_interval_ms: float = env_config.PROFILING_INTERVAL_MS
+    profile_store_size: int = env_config.PROFILE_STORE_SIZE
+
     # Environment
     environment: str = env_config.ENVIRONMENT
 
@@ -0,0 +1,267 @@
+import bisect
+import math
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str):
+        self._values[labels] = value
+
+
+class CallbackGauge(_Metric):
+    """Gauge whose samples are read from ``collect()`` at scrape time (queue depths, pool sizes)"""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, collect: Callable[[], Iterable[Tuple[LabelValues, float]]], labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for labels, value in self.collect():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return int(sum(series[:-1])) if series else 0
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), series[:-1]):
+                cumulative += n
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{label_str} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Minimal in-process Prometheus registry.
+
+    Metrics are plain dicts updated on the event loop, so no locking is
+    needed. ``enabled`` switches recording off without removing the hooks
+    (used by the overhead benchmark).
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback_gauge(self, name, documentation, collect, labelnames=()) -> CallbackGauge:
+        return self._register(CallbackGauge(name, documentation, collect, labelnames))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry(enabled=settings.metrics_enabled)
+
+# HTTP (recorded by MetricsMiddleware)
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests by route template, method and status code", ("method", "route", "status")
+)
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "Time until the response starts, by route template", ("method", "route")
+)
+http_in_flight = registry.gauge("http_requests_in_flight", "HTTP requests currently being handled", ("method",))
+
+# Database (recorded by engine and pool events)
+db_statements = registry.counter("db_statements_total", "SQL statements executed", ("engine", "operation"))
+db_statement_errors = registry.counter("db_statement_errors_total", "SQL statements that raised", ("engine",))
+db_statement_duration = registry.histogram(
+    "db_statement_duration_seconds", "SQL statement execution time", ("engine", "operation"), DB_BUCKETS
+)
+db_pool_checkout_wait = registry.histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", ("engine",), DB_BUCKETS
+)
+
+_OPERATIONS = ("SELECT", "INSERT", "UPDATE", "DELETE", "BEGIN", "COMMIT", "ROLLBACK", "PRAGMA", "SAVEPOINT", "RELEASE")
+
+
+_operation_cache: Dict[str, str] = {}
+
+
+def _operation(statement: str) -> str:
+    # Compiled statements are cached by SQLAlchemy, so the same strings come back
+    operation = _operation_cache.get(statement)
+    if operation is None:
+        head = statement.lstrip()[:9].split(None, 1)
+        keyword = head[0].upper() if head else ""
+        operation = keyword if keyword in _OPERATIONS else "OTHER"
+        if len(_operation_cache) < 4096:
+            _operation_cache[statement] = operation
+    return operation
+
+
+def instrument_engine(engine: AsyncEngine, name: str) -> None:
+    """Record statement counts/timings and pool checkout waits for ``engine``"""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if registry.enabled:
+            conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stack = conn.info.get("metrics_started")
+        if not stack:
+            return
+        elapsed = time.perf_counter() - stack.pop()
+        operation = _operation(statement)
+        db_statements.inc(name, operation)
+        db_statement_duration.observe(elapsed, name, operation)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context):
+        stack = context.connection.info.get("metrics_started") if context.connection is not None else None
+        if stack:
+            stack.pop()
+        if registry.enabled:
+            db_statement_errors.inc(name)
+
+    # Wrap the engine's checkout rather than the pool itself: dispose() swaps the pool
+    raw_connection = sync_engine.raw_connection
+
+    def timed_raw_connection():
+        if not registry.enabled:
+            return raw_connection()
+        started = time.perf_counter()
+        try:
+            return raw_connection()
+        finally:
+            db_pool_checkout_wait.observe(time.perf_counter() - started, name)
+
+    sync_engine.raw_connection = timed_raw_connection
+
+
+def pool_gauges(engines: Dict[str, AsyncEngine]) -> Iterable[Tuple[LabelValues, float]]:
+    for name, engine in engines.items():
+        pool = engine.sync_engine.pool
+        checkedout = getattr(pool, "checkedout", None)
+        if checkedout is not None:
+            yield (name, "checked_out"), checkedout()
+        size = getattr(pool, "size", None)
+        if size is not None:
+            yield (name, "size"), size()
+
+
+def queue_gauge(sources: Dict[str, Callable[[], Optional[float]]]) -> Callable[[], Iterable[Tuple[LabelValues, float]]]:
+    """Collector for a callback gauge labelled by queue name"""
+
+    def collect():
+        for queue, read in sources.items():
+            value = read()
+            if value is not None:
+                yield (queue,), value
+
+    return collect
@@ -1,6 +1,8 @@
+import time
 from fastapi import Request, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
+from app.core import metrics
 from app.core.config import get_settings
 
 settings = get_settings()
@@ -58,3 +60,43 @@ class AuthMiddleware:
                 status_code=status.HTTP_405_METHOD_NOT_ALLOWED,
                 detail="Method not allowed"
             )
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route latency, in-flight requests and status codes.
+
+    Latency is measured until the response starts, so long-lived streams
+    (SSE, NDJSON) are counted by their time to first byte. Routes are
+    labelled by their path template to keep label cardinality bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not metrics.registry.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                route = scope.get("route")
+                metrics.http_request_duration.observe(
+                    time.perf_counter() - started, method, route.path if route is not None else "unmatched"
+                )
+            await send(message)
+
+        metrics.http_in_flight.inc(method)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.http_in_flight.dec(method)
+            route = scope.get("route")
+            metrics.http_requests.inc(method, route.path if route is not None else "unmatched", str(status_code))
@@ -0,0 +1,356 @@
+import asyncio
+import collections
+import hmac
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Counter, Deque, Dict, List, Optional
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+PROFILE_ID_HEADER = b"x-profile-id"
+
+OTHER = "other"
+
+# asyncio keeps the running task per loop in this dict; reading it from the
+# sampler thread tells us whose code is on the loop thread right now
+_current_tasks: Optional[dict] = getattr(asyncio.tasks, "_current_tasks", None)
+
+_active_profile: ContextVar[Optional["Profile"]] = ContextVar("active_profile", default=None)
+
+
+def folded(samples: Counter[str]) -> str:
+    """Stacks in the folded format read by flamegraph.pl, speedscope and inferno"""
+    return "".join(f"{stack} {count}\n" for stack, count in samples.most_common())
+
+
+class Profile:
+    """
+    Profile of one request: sampled stacks plus exclusive wall time per phase.
+
+    Phases nest; entering one pauses the enclosing phase, so the times add
+    up to the request's duration. Time outside any phase is ``other``.
+    """
+
+    __slots__ = (
+        "id", "method", "path", "route", "status", "trigger", "started_at",
+        "duration_ms", "phases", "samples", "sample_count", "_stack", "_mark",
+    )
+
+    def __init__(self, profile_id: str, method: str, path: str, trigger: str):
+        self.id = profile_id
+        self.method = method
+        self.path = path
+        self.route: Optional[str] = None
+        self.status: Optional[int] = None
+        self.trigger = trigger
+        self.started_at = datetime.utcnow()
+        self.duration_ms = 0.0
+        self.phases: Dict[str, float] = {}
+        self.samples: Counter[str] = collections.Counter()
+        self.sample_count = 0
+        self._stack: List[str] = [OTHER]
+        self._mark = time.perf_counter()
+
+    def _charge(self):
+        now = time.perf_counter()
+        top = self._stack[-1]
+        self.phases[top] = self.phases.get(top, 0.0) + (now - self._mark) * 1000
+        self._mark = now
+
+    def enter(self, name: str):
+        self._charge()
+        self._stack.append(name)
+
+    def exit(self, name: str):
+        if self._stack[-1] == name:
+            self._charge()
+            self._stack.pop()
+
+    def finish_phases(self):
+        """Close any open phases (e.g. ``serialize`` at the first response byte)"""
+        self._charge()
+        del self._stack[1:]
+
+    def collapsed(self) -> str:
+        return folded(self.samples)
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "trigger": self.trigger,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration_ms, 3),
+            "phases_ms": {name: round(ms, 3) for name, ms in sorted(self.phases.items())},
+            "samples": self.sample_count,
+        }
+
+
+@contextmanager
+def phase(name: str):
+    """Attribute the enclosed wall time to ``name`` on the active profile, if any"""
+    profile = _active_profile.get()
+    if profile is None:
+        yield
+        return
+    profile.enter(name)
+    try:
+        yield
+    finally:
+        profile.exit(name)
+
+
+class ProfileStore:
+    """The most recent ``max_size`` profiles, newest first"""
+
+    def __init__(self, max_size: int = settings.profile_store_size):
+        self._profiles: Deque[Profile] = collections.deque(maxlen=max_size)
+
+    def add(self, profile: Profile):
+        self._profiles.appendleft(profile)
+
+    def list(self, route: Optional[str] = None) -> List[Profile]:
+        return [p for p in self._profiles if route is None or p.route == route]
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        return next((p for p in self._profiles if p.id == profile_id), None)
+
+    def clear(self):
+        self._profiles.clear()
+
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _frame_label(code) -> str:
+    path = code.co_filename
+    if path.startswith(_PROJECT_ROOT):
+        path = os.path.relpath(path, _PROJECT_ROOT)
+    elif "site-packages" in path:
+        path = path.split("site-packages" + os.sep, 1)[-1]
+    else:
+        path = os.path.join(os.path.basename(os.path.dirname(path)), os.path.basename(path))
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+
+def _collapse(frame) -> str:
+    labels = []
+    while frame is not None:
+        code = frame.f_code
+        # Everything above the task step is event-loop plumbing shared by all samples
+        if code.co_name == "_run" and code.co_filename.endswith(os.path.join("asyncio", "events.py")):
+            break
+        labels.append(_frame_label(code))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class StackSampler:
+    """
+    Background thread sampling the event loop thread's stack.
+
+    A sample is only recorded for a profiled request when that request's task
+    is the one running on the loop, so concurrent requests do not pollute
+    each other's profiles. While anything is being profiled the interpreter
+    switch interval is lowered to the sampling interval; otherwise the
+    sampler could only get the GIL every 5 ms.
+    """
+
+    def __init__(self, interval_ms: float = settings.profiling_interval_ms):
+        self.interval = interval_ms / 1000
+        self._targets: Dict[asyncio.Task, Profile] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._switch_interval: Optional[float] = None
+
+    def add(self, task: asyncio.Task, profile: Profile):
+        with self._lock:
+            if not self._targets:
+                self._loop = task.get_loop()
+                self._loop_thread_id = threading.get_ident()
+                self._switch_interval = sys.getswitchinterval()
+                sys.setswitchinterval(min(self._switch_interval, self.interval))
+            self._targets[task] = profile
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+            self._thread.start()
+        self._wakeup.set()
+
+    def remove(self, task: asyncio.Task):
+        with self._lock:
+            self._targets.pop(task, None)
+            if not self._targets and self._switch_interval is not None:
+                sys.setswitchinterval(self._switch_interval)
+                self._switch_interval = None
+
+    def _run(self):
+        while True:
+            if not self._targets:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            time.sleep(self.interval)
+            self.sample()
+
+    def sample(self):
+        with self._lock:
+            if not self._targets:
+                return
+            running = _current_tasks.get(self._loop) if _current_tasks is not None else None
+            profile = self._targets.get(running)
+            if profile is None and _current_tasks is None and len(self._targets) == 1:
+                # No way to tell tasks apart here; attribute to the only target
+                profile = next(iter(self._targets.values()))
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if profile is None or frame is None:
+                return
+            profile.samples[_collapse(frame)] += 1
+            profile.sample_count += 1
+
+
+class ProfiledRoute(APIRoute):
+    """
+    APIRoute that times the endpoint body as ``handler`` and opens
+    ``serialize`` when it returns; the profiling middleware closes it at the
+    first response byte, so it covers response-model validation and JSON
+    rendering.
+    """
+
+    def get_route_handler(self):
+        call = self.dependant.call
+        if asyncio.iscoroutinefunction(call) and not getattr(call, "_profiled", False):
+            async def profiled_call(**values):
+                profile = _active_profile.get()
+                if profile is None:
+                    return await call(**values)
+                profile.enter("handler")
+                try:
+                    result = await call(**values)
+                finally:
+                    profile.exit("handler")
+                profile.enter("serialize")
+                return result
+
+            profiled_call._profiled = True
+            self.dependant.call = profiled_call
+        return super().get_route_handler()
+
+
+def track_db_phase(engine: AsyncEngine) -> None:
+    """Charge statement execution on ``engine`` to the ``db`` phase"""
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        profile = _active_profile.get()
+        if profile is not None:
+            profile.enter("db")
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        profile = _active_profile.get()
+        if profile is not None:
+            profile.exit("db")
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def _error(context):
+        profile = _active_profile.get()
+        if profile is not None:
+            profile.exit("db")
+
+
+def is_admin_token(token: Optional[str]) -> bool:
+    """Constant-time check against ADMIN_TOKEN; always False when no token is configured"""
+    return bool(settings.admin_token) and token is not None and hmac.compare_digest(token, settings.admin_token)
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a request when an admin sends ``X-Profile: 1`` with a valid
+    ``X-Admin-Token``, or at random with probability ``sample_rate``. The
+    profile id is returned in ``X-Profile-Id`` and the profile is kept in
+    ``store``.
+    """
+
+    def __init__(
+        self,
+        app,
+        store: Optional[ProfileStore] = None,
+        sampler: Optional[StackSampler] = None,
+        sample_rate: Optional[float] = None,
+    ):
+        self.app = app
+        self.store = store or profile_store
+        self.sampler = sampler or stack_sampler
+        self.sample_rate = settings.profiling_sample_rate if sample_rate is None else sample_rate
+        self._ids = itertools.count(1)
+
+    def _trigger(self, scope) -> Optional[str]:
+        requested = admin_token = None
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                requested = value
+            elif name == b"x-admin-token":
+                admin_token = value
+        if requested is not None and requested not in (b"0", b"false") and admin_token is not None:
+            if is_admin_token(admin_token.decode("latin-1")):
+                return "header"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trigger = self._trigger(scope)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile(f"{int(time.time())}-{next(self._ids)}", scope["method"], scope["path"], trigger)
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile.finish_phases()
+                profile.status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(PROFILE_ID_HEADER, profile.id.encode())]
+            await send(message)
+
+        token = _active_profile.set(profile)
+        task = asyncio.current_task()
+        self.sampler.add(task, profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.sampler.remove(task)
+            _active_profile.reset(token)
+            profile.finish_phases()
+            profile.duration_ms = (time.perf_counter() - started) * 1000
+            route = scope.get("route")
+            profile.route = route.path if route is not None else None
+            self.store.add(profile)
+
+
+# Shared by the middleware and the admin endpoints
+profile_store = ProfileStore()
+stack_sampler = StackSampler()
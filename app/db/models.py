@@ -1,5 +1,5 @@
 from sqlalchemy.orm import DeclarativeBase, mapped_column, Mapped
-from sqlalchemy import Integer, String, Float, Enum, DateTime, Boolean
+from sqlalchemy import Integer, String, Float, Enum, DateTime, Boolean, Index, JSON, LargeBinary
 from datetime import datetime
 import enum
 from typing import Optional
@@ -11,6 +11,7 @@ class RideStatus(str, enum.Enum):
     PENDING = "pending"
     ACCEPTED = "accepted"
     COMPLETED = "completed"
+    CANCELLED = "cancelled"
 
 class UserType(str, enum.Enum):
     RIDER = "rider"
@@ -27,8 +28,32 @@ class User(Base):
     is_active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    # HMAC-SHA256 of the opaque token; the token itself is never stored
+    token_hash: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
+    user_id: Mapped[str] = mapped_column(String(64), nullable=False, index=True)
+    user_type: Mapped[UserType] = mapped_column(Enum(UserType), nullable=False)
+    # All tokens rotated from the same login share a family
+    family_id: Mapped[str] = mapped_column(String(36), nullable=False, index=True)
+    revoked: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+    # Indexed for the periodic purge of expired rows
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
 class Ride(Base):
     __tablename__ = "rides"
+    __table_args__ = (
+        # Keyset pagination of the pending listing on (created_at, id)
+        Index("ix_rides_status_created_at_id", "status", "created_at", "id"),
+        # Per-rider / per-driver history exports, in created_at order
+        Index("ix_rides_rider_id_created_at", "rider_id", "created_at"),
+        Index("ix_rides_driver_id_created_at", "driver_id", "created_at"),
+        # Never reuse the id of a ride that has been archived
+        {"sqlite_autoincrement": True},
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     rider_id: Mapped[str] = mapped_column(String(64), nullable=False)
@@ -45,7 +70,65 @@ class Ride(Base):
     # Price (float)
     price: Mapped[float] = mapped_column(Float, nullable=False)
     
-    # Status (pending/accepted/completed)
+    # Status (pending/accepted/completed/cancelled)
     status: Mapped[RideStatus] = mapped_column(Enum(RideStatus), default=RideStatus.PENDING, nullable=False)
 
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+class RideArchive(Base):
+    """Cold storage for finished rides, moved out of ``rides`` by the archiver with their ids kept"""
+    __tablename__ = "rides_archive"
+    __table_args__ = (
+        # History exports: per rider, per driver, or everything in created_at order
+        Index("ix_rides_archive_rider_id_created_at", "rider_id", "created_at"),
+        Index("ix_rides_archive_driver_id_created_at", "driver_id", "created_at"),
+        Index("ix_rides_archive_created_at", "created_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    rider_id: Mapped[str] = mapped_column(String(64), nullable=False)
+    driver_id: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    pickup_lat: Mapped[float] = mapped_column(Float, nullable=False)
+    pickup_lon: Mapped[float] = mapped_column(Float, nullable=False)
+    dropoff_lat: Mapped[float] = mapped_column(Float, nullable=False)
+    dropoff_lon: Mapped[float] = mapped_column(Float, nullable=False)
+    price: Mapped[float] = mapped_column(Float, nullable=False)
+    status: Mapped[RideStatus] = mapped_column(Enum(RideStatus), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime)
+    archived_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+class OutboxEvent(Base):
+    """Ride event written in the same transaction as the ride change; drained by the outbox relay"""
+    __tablename__ = "ride_outbox"
+    # Never reuse the id of a pruned event: the relay only reads past its cursor
+    __table_args__ = ({"sqlite_autoincrement": True},)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    event_type: Mapped[str] = mapped_column(String(32), nullable=False)
+    ride_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    payload: Mapped[dict] = mapped_column(JSON, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # NULL until the relay has dispatched the event
+    dispatched_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True, index=True)
+
+class DriverLocation(Base):
+    """Last known position of a driver, written periodically from the in-memory location store"""
+    __tablename__ = "driver_locations"
+
+    driver_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    lat: Mapped[float] = mapped_column(Float, nullable=False)
+    lon: Mapped[float] = mapped_column(Float, nullable=False)
+    available: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+class IdempotencyRecord(Base):
+    """Response stored for an Idempotency-Key, replayed to retries until it expires"""
+    __tablename__ = "idempotency_keys"
+
+    # "<user id>:<Idempotency-Key>"
+    key: Mapped[str] = mapped_column(String(320), primary_key=True)
+    # SHA-256 of the method, path and body the key was first used with
+    fingerprint: Mapped[str] = mapped_column(String(64), nullable=False)
+    status_code: Mapped[int] = mapped_column(Integer, nullable=False)
+    body: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
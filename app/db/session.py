@@ -1,32 +1,191 @@
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
-from typing import AsyncGenerator
+from sqlalchemy import event, func, select, Delete, Insert, Update
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import (
+    create_async_engine, async_sessionmaker, AsyncConnection, AsyncEngine, AsyncSession,
+)
+from sqlalchemy.orm import Session
+from typing import AsyncGenerator, Awaitable, Callable, Optional, Tuple, TypeVar
 import logging
+import os
 from app.core.config import get_settings
-from app.db.models import Base
+from app.core.metrics import instrument_engine
+from app.core.profiling import track_db_phase
+from app.db.models import Base, OutboxEvent, Ride, RideArchive
+from app.db.write_queue import WriteQueue
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
-# Create async engine with connection pooling and optimizations
-engine = create_async_engine(
-    settings.database_url,
-    echo=settings.debug,
-    future=True,
-    pool_size=20,
-    max_overflow=30,
-    pool_pre_ping=True,
-    pool_recycle=300,
-)
+T = TypeVar("T")
+
+def _is_file_sqlite(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database not in (None, "", ":memory:")
+
+def _apply_pragmas(engine: AsyncEngine, read_only: bool):
+    """Tune every new SQLite connection of ``engine`` for concurrent WAL access"""
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        # Let SQLAlchemy, not the sqlite3 module, decide when transactions begin
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        if not read_only:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}")
+        cursor.execute(f"PRAGMA mmap_size={settings.sqlite_mmap_size_bytes}")
+        cursor.execute(f"PRAGMA cache_size=-{settings.sqlite_cache_size_kib}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+    @event.listens_for(engine.sync_engine, "begin")
+    def _on_begin(connection):
+        # Writers take the lock up front so they queue on busy_timeout instead of
+        # failing with SQLITE_BUSY when upgrading a read transaction
+        connection.exec_driver_sql("BEGIN" if read_only else "BEGIN IMMEDIATE")
+
+def create_engines(database_url: str, high_concurrency: bool) -> Tuple[AsyncEngine, AsyncEngine]:
+    """
+    Create the (read, write) engine pair.
+
+    In SQLite high-concurrency mode reads fan out over a pool of query-only WAL
+    connections and every write goes through one dedicated writer connection.
+    Otherwise both names refer to the same pooled engine.
+    """
+    if high_concurrency and not _is_file_sqlite(database_url):
+        logger.warning("SQLite high-concurrency mode needs a file-backed SQLite database; disabled")
+        high_concurrency = False
+
+    if not high_concurrency:
+        shared = create_async_engine(
+            database_url,
+            echo=settings.debug,
+            future=True,
+            pool_size=20,
+            max_overflow=30,
+            pool_pre_ping=True,
+            pool_recycle=300,
+        )
+        return shared, shared
+
+    write = create_async_engine(
+        database_url,
+        echo=settings.debug,
+        future=True,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=30,
+    )
+    # The writer sets journal_mode=WAL; open it before any reader connects
+    _apply_pragmas(write, read_only=False)
+    read = create_async_engine(
+        database_url,
+        echo=settings.debug,
+        future=True,
+        pool_size=settings.sqlite_read_pool_size,
+        max_overflow=0,
+    )
+    _apply_pragmas(read, read_only=True)
+    return read, write
+
+def create_read_only_engine(database_url: str) -> Optional[AsyncEngine]:
+    """
+    Engine for long-running reads (history exports) that cannot write.
+
+    File-backed SQLite is opened in read-only URI mode with ``query_only``
+    on, so a reader can never take the write lock. Other databases get None;
+    callers fall back to the read engine.
+    """
+    if not _is_file_sqlite(database_url):
+        return None
+    path = os.path.abspath(make_url(database_url).database)
+    read_only = create_async_engine(
+        f"sqlite+aiosqlite:///file:{path}?mode=ro&uri=true",
+        echo=settings.debug,
+        future=True,
+        pool_size=2,
+        max_overflow=2,
+    )
+
+    @event.listens_for(read_only.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}")
+        cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+    return read_only
+
+# Create async engines with connection pooling and optimizations
+engine, write_engine = create_engines(settings.database_url, settings.sqlite_high_concurrency)
+if write_engine is engine:
+    instrument_engine(engine, "primary")
+    track_db_phase(engine)
+else:
+    instrument_engine(engine, "read")
+    instrument_engine(write_engine, "write")
+    track_db_phase(engine)
+    track_db_phase(write_engine)
+
+# Read-only engine for exports (the read engine when the database is not a SQLite file)
+export_engine = create_read_only_engine(settings.database_url) or engine
+if export_engine is not engine:
+    instrument_engine(export_engine, "export")
+    track_db_phase(export_engine)
+
+class RoutingSession(Session):
+    """Sends flushes and DML to the writer engine and everything else to the read engine"""
+
+    def __init__(self, *args, write_bind=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.write_bind = write_bind
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._flushing or isinstance(clause, (Insert, Update, Delete)):
+            return self.write_bind
+        return super().get_bind(mapper, clause=clause, **kwargs)
+
+def create_session_factory(read_engine: AsyncEngine, write_engine: AsyncEngine) -> async_sessionmaker:
+    """Session factory for an engine pair; routes writes when the engines differ"""
+    routing = {}
+    if write_engine is not read_engine:
+        routing = {"sync_session_class": RoutingSession, "write_bind": write_engine.sync_engine}
+    return async_sessionmaker(
+        bind=read_engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
+        autoflush=False,
+        autocommit=False,
+        **routing,
+    )
 
 # Configure session factory
-SessionLocal = async_sessionmaker(
-    bind=engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-    autoflush=False,
-    autocommit=False,
+SessionLocal = create_session_factory(engine, write_engine)
+
+# Group-commit queue for hot-path writes (high-concurrency mode only)
+write_queue: Optional[WriteQueue] = (
+    WriteQueue(write_engine, max_batch=settings.write_queue_max_batch)
+    if write_engine is not engine else None
 )
 
+async def run_write(session: AsyncSession, work: Callable[[AsyncConnection], Awaitable[T]]) -> T:
+    """
+    Run one unit of write work and commit it.
+
+    While the high-concurrency writer queue is running the unit joins its
+    group commit; otherwise it runs on the session's own (write-routed)
+    connection and the session commits.
+    """
+    if write_queue is not None and write_queue.running:
+        return await write_queue.submit(work)
+    connection = await session.connection()
+    result = await work(connection)
+    await session.commit()
+    return result
+
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
     """Dependency to get database session"""
     async with SessionLocal() as session:
@@ -39,13 +198,62 @@ async def get_session() -> AsyncGenerator[AsyncSession, None]:
         finally:
             await session.close()
 
+# Tables whose ids must never be handed out again, with the tables rows are
+# deleted into (their ids count as used too)
+_AUTOINCREMENT_TABLES = (
+    (Ride.__table__, (RideArchive.__table__,)),
+    (OutboxEvent.__table__, ()),
+)
+
+def _rebuild_with_autoincrement(sync_conn, table, *id_tables) -> bool:
+    """
+    Rebuild ``table`` if it was created before it was declared AUTOINCREMENT.
+
+    ``create_all`` never alters an existing table, and on a plain rowid table
+    SQLite reuses the ids of deleted rows. The rows are copied into a fresh
+    table and its id sequence starts past every id in it and in ``id_tables``.
+    Returns whether a rebuild was needed.
+    """
+    if sync_conn.dialect.name != "sqlite":
+        return False
+    ddl = sync_conn.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table.name,)
+    ).scalar()
+    if ddl is None or "AUTOINCREMENT" in ddl.upper():
+        return False
+    old = f"_{table.name}_rowid"
+    columns = ", ".join(f'"{column.name}"' for column in table.columns)
+    sync_conn.exec_driver_sql(f'ALTER TABLE "{table.name}" RENAME TO "{old}"')
+    for index in table.indexes:
+        sync_conn.exec_driver_sql(f'DROP INDEX IF EXISTS "{index.name}"')
+    table.create(sync_conn)
+    sync_conn.exec_driver_sql(f'INSERT INTO "{table.name}" ({columns}) SELECT {columns} FROM "{old}"')
+    sync_conn.exec_driver_sql(f'DROP TABLE "{old}"')
+    last_id = max(sync_conn.execute(select(func.max(t.c.id))).scalar() or 0 for t in (table, *id_tables))
+    sync_conn.exec_driver_sql("DELETE FROM sqlite_sequence WHERE name = ?", (table.name,))
+    sync_conn.exec_driver_sql("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (table.name, last_id))
+    return True
+
+def _create_missing_indexes(sync_conn):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
 async def init_db():
     """Initialize database tables"""
     try:
-        async with engine.begin() as conn:
+        async with write_engine.begin() as conn:
             logger.info("Creating database tables...")
             await conn.run_sync(Base.metadata.create_all)
+            for table, id_tables in _AUTOINCREMENT_TABLES:
+                if await conn.run_sync(_rebuild_with_autoincrement, table, *id_tables):
+                    logger.info(f"Rebuilt the {table.name} table with AUTOINCREMENT so deleted ids are never reused")
+            # create_all skips existing tables, indexes included
+            await conn.run_sync(_create_missing_indexes)
             logger.info("Database tables created successfully")
+        if write_queue is not None:
+            await write_queue.start()
+            logger.info("SQLite high-concurrency mode: WAL, single writer with group commit")
     except Exception as e:
         logger.error(f"Failed to initialize database: {e}")
         raise
@@ -53,7 +261,13 @@ async def init_db():
 async def close_db():
     """Close database engine"""
     try:
+        if write_queue is not None:
+            await write_queue.stop()
         await engine.dispose()
+        if write_engine is not engine:
+            await write_engine.dispose()
+        if export_engine is not engine:
+            await export_engine.dispose()
         logger.info("Database engine closed")
     except Exception as e:
         logger.error(f"Error closing database: {e}")
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, List, Optional, Tuple, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+WriteWork = Callable[[AsyncConnection], Awaitable[Any]]
+
+
+class WriteQueue:
+    """
+    Single-writer group-commit queue.
+
+    One task owns the writer connection. Work submitted while a commit is in
+    progress piles up in the queue and is then run back to back inside one
+    transaction, each unit under its own SAVEPOINT so a failing unit is rolled
+    back alone, and the whole group pays for a single COMMIT (one fsync).
+    """
+
+    def __init__(self, engine: AsyncEngine, max_batch: int = 64):
+        self.engine = engine
+        self.max_batch = max_batch
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.units = 0
+        self.failed_units = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Finish queued work, then stop the writer task"""
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def submit(self, work: Callable[[AsyncConnection], Awaitable[T]]) -> T:
+        """Queue a unit of write work and wait until its group has committed"""
+        if self._task is None:
+            raise RuntimeError("Write queue is not running")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((work, future))
+        return await future
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._commit_batch(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _commit_batch(self, batch: List[Tuple[WriteWork, asyncio.Future]]):
+        outcomes = []
+        try:
+            async with self.engine.begin() as conn:
+                for work, future in batch:
+                    if future.cancelled():
+                        continue
+                    try:
+                        async with conn.begin_nested():
+                            outcomes.append((future, None, await work(conn)))
+                    except Exception as e:
+                        self.failed_units += 1
+                        outcomes.append((future, e, None))
+        except Exception as e:
+            logger.error(f"Group commit of {len(batch)} writes failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.units += len(batch)
+        for future, error, result in outcomes:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "batches": self.batches,
+            "units": self.units,
+            "failed_units": self.failed_units,
+            "avg_batch": self.units / self.batches if self.batches else 0.0,
+        }
@@ -1,10 +1,142 @@
 # Database Configuration
 DATABASE_URL = "sqlite+aiosqlite:///./ride_matcher.db"
 
+# SQLite high-concurrency mode (WAL, tuned pragmas, single writer with group commit)
+SQLITE_HIGH_CONCURRENCY = False
+SQLITE_BUSY_TIMEOUT_MS = 5000
+SQLITE_MMAP_SIZE_BYTES = 256 * 1024 * 1024
+SQLITE_CACHE_SIZE_KIB = 64 * 1024
+SQLITE_READ_POOL_SIZE = 8
+WRITE_QUEUE_MAX_BATCH = 64
+
+# Ride creation coalescing (one multi-row INSERT ... RETURNING per window)
+RIDE_INSERT_MAX_BATCH = 256
+RIDE_INSERT_MAX_WAIT_MS = 2.0
+
+# Bulk ride ingestion (JSON array or NDJSON per request)
+BULK_RIDES_MAX_ROWS = 50000
+BULK_RIDES_CHUNK_SIZE = 1000  # Rows per insert transaction
+BULK_RIDES_MAX_BYTES = 16 * 1024 * 1024  # Larger bodies are refused before they are read
+
 # Application Configuration
 SECRET_KEY = "TestSecretKey"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 ALGORITHM = "HS256"
+REFRESH_TOKEN_EXPIRE_DAYS = 30
+
+# Password hashing pool (0 workers = hash inline on the event loop)
+PASSWORD_HASH_WORKERS = 4
+PASSWORD_HASH_MAX_PENDING = 64
+PASSWORD_HASH_USE_PROCESSES = False
+
+# Authenticated user cache
+USER_CACHE_MAX_SIZE = 50000
+USER_CACHE_TTL_SECONDS = 300
+
+# Idempotency-Key responses for mutating ride routes
+IDEMPOTENCY_MAX_KEYS = 50000
+IDEMPOTENCY_TTL_SECONDS = 86400  # Retries within a day get the original response
+IDEMPOTENCY_PERSIST = False  # Also keep responses in idempotency_keys, across restarts
+
+# Available-rides proximity index
+GEO_INDEX_CELL_SIZE_DEG = 0.01  # ~1.1 km cells
+AVAILABLE_RIDES_DEFAULT_K = 50
+AVAILABLE_RIDES_MAX_K = 500
+AVAILABLE_RIDES_MAX_RADIUS_KM = 100.0
+AVAILABLE_RIDES_PAGE_SIZE = 100
+AVAILABLE_RIDES_MAX_PAGE_SIZE = 1000
+RIDE_STREAM_CHUNK_SIZE = 500
+
+# Serialized available-rides listings, keyed by pending-set version and query
+LISTING_CACHE_MAX_ENTRIES = 1024
+LISTING_CACHE_MAX_BYTES = 32 * 1024 * 1024
+LISTING_CACHE_TTL_SECONDS = 5.0  # Ceiling on staleness from writes made outside this process
+
+# Driver locations (in-memory store, periodic snapshots to driver_locations)
+DRIVER_LOCATION_FRESH_SECONDS = 30.0  # Drivers silent for longer are not offered as nearby
+DRIVER_LOCATION_EXPIRE_SECONDS = 900.0  # Drivers silent for longer are dropped from memory
+DRIVER_LOCATION_SNAPSHOT_SECONDS = 15.0
+DRIVER_LOCATION_BATCH_MAX = 20000  # Pings per gateway batch
+NEARBY_DRIVERS_DEFAULT_K = 10
+NEARBY_DRIVERS_MAX_K = 100
+
+# Ride offers (new rides pushed to the nearest idle drivers, in rounds)
+RIDE_OFFER_K = 3  # Drivers offered a ride per round
+RIDE_OFFER_TIMEOUT_SECONDS = 15.0
+RIDE_OFFER_START_RADIUS_KM = 2.0
+RIDE_OFFER_RADIUS_GROWTH = 2.0  # Radius factor from one round to the next
+RIDE_OFFER_MAX_RADIUS_KM = 16.0
+RIDE_OFFER_MAX_ROUNDS = 6  # Then the ride is only listed
+
+# Fare estimates: base + per km + per minute, at least the minimum
+FARE_BASE = 2.50
+FARE_PER_KM = 1.20
+FARE_PER_MINUTE = 0.30
+FARE_MINIMUM = 6.00
+FARE_DETOUR_FACTOR = 1.3  # Road distance over great-circle distance
+FARE_AVERAGE_SPEED_KMH = 25.0
+FARE_CELL_SIZE_DEG = 0.002  # Route cache grid, about 200 m
+FARE_CACHE_SIZE = 200000  # Cell pairs
+FARE_ESTIMATE_BATCH_MAX = 5000  # Trips per batch quote
+
+# Supply/demand heatmap and surge pricing
+HEATMAP_CELL_SIZE_DEG = 0.01  # About 1 km
+HEATMAP_WINDOW_SECONDS = 900.0  # Requests and accepts counted over this window
+HEATMAP_BUCKETS = 30  # Window resolution: 30 s buckets
+HEATMAP_REFRESH_SECONDS = 2.0  # Idle driver recount and heatmap rebuild
+HEATMAP_MAX_CELLS = 100000
+SURGE_MIN_PENDING = 2  # Cells with fewer pending rides never surge
+SURGE_SENSITIVITY = 0.5  # Surge added per unit of pending rides per idle driver above 1
+SURGE_MAX = 3.0
+SURGE_STEP = 0.1
+
+# Pending-ride push feed (SSE)
+RIDE_FEED_QUEUE_SIZE = 256  # Frames buffered per connection before it is evicted
+RIDE_FEED_SNAPSHOT_LIMIT = 500
+RIDE_FEED_HEARTBEAT_SECONDS = 15.0
+
+# Batch dispatch
+DISPATCH_WINDOW_MS = 250
+DISPATCH_MAX_DRIVERS = 1000
+DISPATCH_MAX_PICKUP_KM = 10.0
+DISPATCH_OPTIMAL_MAX_SIZE = 150  # Hungarian up to this many drivers/rides, greedy above
+DISPATCH_CANDIDATES_PER_DRIVER = 8
+
+# Ride event outbox relay
+OUTBOX_BATCH_SIZE = 500
+OUTBOX_POLL_INTERVAL_MS = 200.0
+OUTBOX_RETENTION_HOURS = 24.0  # Dispatched events are deleted after this long
+OUTBOX_PRUNE_INTERVAL_SECONDS = 300.0
+
+# Ride archival (completed/cancelled rides, and accepted ones older than the cutoff)
+ARCHIVE_BATCH_SIZE = 1000
+ARCHIVE_INTERVAL_SECONDS = 60.0
+ARCHIVE_ACCEPTED_AFTER_HOURS = 24.0
+
+# Ride history export (NDJSON/CSV, live and archived rides)
+EXPORT_PAGE_SIZE = 1000  # Rows per keyset page, each read on its own short connection
+
+# Notifications ("log" prints/logs; "http" POSTs batches to NOTIFICATION_HTTP_URL)
+NOTIFICATION_SINK = "log"
+NOTIFICATION_HTTP_URL = ""
+NOTIFICATION_HTTP_TIMEOUT_SECONDS = 5.0
+NOTIFICATION_WORKERS = 4
+NOTIFICATION_QUEUE_SIZE = 10000
+NOTIFICATION_DEFERRED_MAX = 100000  # Submitted while the queue is full; moved in as it drains
+NOTIFICATION_BATCH_SIZE = 50
+NOTIFICATION_BATCH_WAIT_MS = 20.0
+NOTIFICATION_MAX_RETRIES = 3
+NOTIFICATION_RETRY_BASE_MS = 100.0
+NOTIFICATION_RETRY_MAX_MS = 2000.0
+
+# Metrics (Prometheus text format at /metrics)
+METRICS_ENABLED = True
+
+# Admin endpoints and request profiling (empty ADMIN_TOKEN disables admin access)
+ADMIN_TOKEN = ""
+PROFILING_SAMPLE_RATE = 0.0  # Fraction of requests profiled without the X-Profile header
+PROFILING_INTERVAL_MS = 1.0
+PROFILE_STORE_SIZE = 100
 
 # Environment
 DEBUG = False
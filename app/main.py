@@ -1,11 +1,30 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 import logging
 import sys
 from contextlib import asynccontextmanager
 
 from app.api.api import api_router
-from app.db.session import init_db, close_db
+from app.core import metrics
+from app.core.middleware import MetricsMiddleware
+from app.core.profiling import ProfilingMiddleware
+from app.db.session import init_db, close_db, SessionLocal, engine, write_engine, write_queue
+from app.services.rides import RideService
+from app.services.dispatch import batch_dispatcher
+from app.services.ride_batcher import ride_insert_batcher
+from app.utils.auth import password_pool
+from app.utils.notifications import notification_dispatcher, notify_rider
+from app.services.outbox import RIDE_ACCEPTED, RIDE_ARCHIVED, RIDE_COMPLETED, outbox_relay
+from app.services.archiver import ride_archiver
+from app.services.ride_events import ride_event_bus
+from app.services.listing_cache import listing_cache
+from app.services.driver_locations import driver_locations, location_snapshotter
+from app.services.geo_index import pending_ride_index
+from app.services.ride_offers import ride_offers
+from app.services.fares import fare_estimator
+from app.services.demand import demand_heatmap
+from app.services.idempotency import idempotency_store
 from app.core.config import get_settings
 
 settings = get_settings()
@@ -19,6 +38,100 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+def _notify_rider_of_acceptance(event):
+    # Never raises on a full queue: the dispatcher holds the message back
+    # itself, so one slow provider cannot stall the rest of the outbox
+    notify_rider(event.payload["rider_id"], event.ride_id, event.payload["driver_id"])
+
+def _track_driver_rides(event):
+    if event.event_type == RIDE_ACCEPTED:
+        driver_locations.assign(event.payload["driver_id"], event.ride_id)
+    else:
+        driver_locations.release(event.payload["driver_id"], event.ride_id)
+
+outbox_relay.subscribe(RIDE_ACCEPTED, _notify_rider_of_acceptance)
+outbox_relay.subscribe(RIDE_ACCEPTED, _track_driver_rides)
+outbox_relay.subscribe(RIDE_COMPLETED, _track_driver_rides)
+outbox_relay.subscribe(RIDE_ARCHIVED, _track_driver_rides)
+
+# Scrape-time gauges over the background components
+metrics.registry.callback_gauge(
+    "background_queue_depth",
+    "Items waiting in background task queues",
+    metrics.queue_gauge({
+        "write_queue": lambda: write_queue.depth if write_queue is not None else None,
+        "ride_insert_batcher": lambda: ride_insert_batcher.stats()["depth"],
+        "notifications": lambda: notification_dispatcher.stats()["queue_depth"],
+        "notification_batches": lambda: notification_dispatcher.stats()["ready_batches"],
+        "notifications_held_back": lambda: notification_dispatcher.stats()["held_back"],
+        "password_hashing": lambda: password_pool.in_flight,
+    }),
+    ("queue",),
+)
+metrics.registry.callback_gauge(
+    "db_pool_connections",
+    "Pooled connections by engine and state",
+    lambda: metrics.pool_gauges({"read": engine, "write": write_engine} if write_engine is not engine else {"primary": engine}),
+    ("engine", "state"),
+)
+metrics.registry.callback_gauge(
+    "outbox_lag_seconds",
+    "Age of the oldest event in the last drained outbox batch",
+    lambda: [((), outbox_relay.stats()["lag_seconds"])],
+)
+metrics.registry.callback_gauge(
+    "outbox_dispatched_events",
+    "Outbox events dispatched since the relay started",
+    lambda: [((), outbox_relay.dispatched)],
+)
+metrics.registry.callback_gauge(
+    "ride_feed_subscribers",
+    "Open pending-ride feed connections",
+    lambda: [((), ride_event_bus.stats()["subscribers"])],
+)
+metrics.registry.callback_gauge(
+    "rides_archived",
+    "Rides moved to the archive since the archiver started",
+    lambda: [((), ride_archiver.archived)],
+)
+metrics.registry.callback_gauge(
+    "driver_locations",
+    "Drivers in the location store, and how many of them are idle",
+    lambda: [(("tracked",), len(driver_locations)), (("idle",), driver_locations.idle_count())],
+    ("state",),
+)
+metrics.registry.callback_gauge(
+    "ride_offers",
+    "Rides being offered to drivers, and offers waiting for an answer",
+    lambda: [(("rides",), len(ride_offers)), (("open",), ride_offers.stats()["open_offers"])],
+    ("state",),
+)
+metrics.registry.callback_gauge(
+    "idempotency_keys",
+    "Responses stored for Idempotency-Key retries",
+    lambda: [((), len(idempotency_store))],
+)
+metrics.registry.callback_gauge(
+    "listing_cache_hit_ratio",
+    "Share of available-rides listings served from the cache",
+    lambda: [((), listing_cache.hit_ratio())],
+)
+metrics.registry.callback_gauge(
+    "heatmap_cells",
+    "Grid cells tracked by the supply/demand heatmap",
+    lambda: [((), len(demand_heatmap))],
+)
+metrics.registry.callback_gauge(
+    "fare_route_cache_hit_ratio",
+    "Share of fare quotes whose route came from the cache",
+    lambda: [((), fare_estimator.hit_ratio())],
+)
+metrics.registry.callback_gauge(
+    "listing_cache_bytes",
+    "Serialized listing bytes held by the cache",
+    lambda: [((), listing_cache.bytes)],
+)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager"""
@@ -26,11 +139,31 @@ async def lifespan(app: FastAPI):
     logger.info("🚀 Starting Ride Matcher API...")
     await init_db()
     logger.info("✅ Database initialized successfully")
+    async with SessionLocal() as session:
+        await RideService(session).rebuild_pending_index()
+    await location_snapshotter.restore()
+    await notification_dispatcher.start()
+    await outbox_relay.start()
+    await ride_insert_batcher.start()
+    await batch_dispatcher.start()
+    await ride_archiver.start()
+    await location_snapshotter.start()
+    await ride_offers.start(pending_ride_index.newest(len(pending_ride_index)))
+    await demand_heatmap.start(pending_ride_index.newest(len(pending_ride_index)))
     
     yield
     
     # Shutdown
     logger.info("🛑 Shutting down Ride Matcher API...")
+    await demand_heatmap.stop()
+    await ride_offers.stop()
+    await location_snapshotter.stop()
+    await ride_archiver.stop()
+    await batch_dispatcher.stop()
+    await ride_insert_batcher.stop()
+    await outbox_relay.stop()
+    await notification_dispatcher.stop()
+    password_pool.shutdown()
     await close_db()
     logger.info("✅ Application shutdown complete")
 
@@ -53,9 +186,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
+
 # Include API routes
 app.include_router(api_router)
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, EmailStr
-from typing import Literal
+from typing import Literal, Optional
 
 class UserCreate(BaseModel):
     """Schema for user registration"""
@@ -18,6 +18,12 @@ class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
     expires_in: int
+    refresh_token: Optional[str] = None
+    refresh_expires_in: Optional[int] = None
+
+class RefreshRequest(BaseModel):
+    """Schema for exchanging (or revoking) a refresh token"""
+    refresh_token: str = Field(..., min_length=1, description="Refresh token from login or a previous refresh")
 
 class UserOut(BaseModel):
     """Schema for user output"""
@@ -0,0 +1,60 @@
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Optional
+
+class DriverPing(BaseModel):
+    """A driver's current position; ``available`` switches them on or off duty (omit to keep it)"""
+    lat: float = Field(..., description="Driver latitude")
+    lon: float = Field(..., description="Driver longitude")
+    available: Optional[bool] = Field(None, description="On duty and willing to take rides")
+
+    @field_validator("lat")
+    @classmethod
+    def validate_lat(cls, v):
+        if not -90 <= v <= 90:
+            raise ValueError("Latitude must be between -90 and 90")
+        return v
+
+    @field_validator("lon")
+    @classmethod
+    def validate_lon(cls, v):
+        if not -180 <= v <= 180:
+            raise ValueError("Longitude must be between -180 and 180")
+        return v
+
+class DriverPingError(BaseModel):
+    """One rejected ping of a batch (``field`` is null for ping-level errors)"""
+    index: int
+    field: Optional[str] = None
+    message: str
+
+class DriverPingBatchResult(BaseModel):
+    """Outcome of a batch: ``applied`` pings moved a driver, ``stale`` ones were older than what was stored"""
+    received: int
+    applied: int
+    stale: int
+    errors: List[DriverPingError]
+
+class NearbyDriver(BaseModel):
+    """An idle driver near the queried point; who and where exactly is only shown to drivers"""
+    driver_id: Optional[str] = None
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+    distance_km: float
+    age_seconds: float
+
+class HeatmapCells(BaseModel):
+    """Per-cell columns: entry ``i`` of every list describes cell ``i`` (lat/lon are its centre)"""
+    lat: List[float]
+    lon: List[float]
+    pending: List[int]
+    requested: List[int]
+    accepted: List[int]
+    idle_drivers: List[int]
+    surge: List[float]
+
+class Heatmap(BaseModel):
+    """Every active cell, as of ``generated_at`` (epoch seconds); requested/accepted count the rolling window"""
+    cell_size_deg: float
+    window_seconds: float
+    generated_at: float
+    cells: HeatmapCells
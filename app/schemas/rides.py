@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, PositiveFloat, field_validator
-from typing import Optional, Literal
+from typing import List, Optional, Literal
 from datetime import datetime
 
 class RideCreate(BaseModel):
@@ -31,10 +31,56 @@ class RideCreate(BaseModel):
             raise ValueError("Price must be positive")
         return v
 
+class BulkRideError(BaseModel):
+    """One rejected row of a bulk upload (``field`` is null for row-level errors)"""
+    index: int
+    field: Optional[str] = None
+    message: str
+
+class BulkRideResult(BaseModel):
+    """Outcome of a bulk upload; ``ids[i]`` is the new ride for row ``i``, or null if it was rejected"""
+    received: int
+    inserted: int
+    ids: List[Optional[int]]
+    errors: List[BulkRideError]
+
+class FareEstimate(BaseModel):
+    """Quoted fare and trip time; ``pickup_eta_minutes`` is null without an idle driver (and in batches)"""
+    distance_km: float
+    duration_minutes: float
+    fare: float
+    surge_multiplier: float = 1.0
+    pickup_eta_minutes: Optional[float] = None
+
+class FareEstimateBatchResult(BaseModel):
+    """Batch quote; ``estimates[i]`` is the quote for trip ``i``, or null if it was rejected"""
+    received: int
+    estimates: List[Optional[FareEstimate]]
+    errors: List[BulkRideError]
+
 class RideAccept(BaseModel):
     """Schema for accepting a ride - driver_id comes from authentication"""
     pass
 
+class DispatchRequest(BaseModel):
+    """Schema for a driver joining the next batch dispatch round"""
+    lat: float = Field(..., description="Driver latitude")
+    lon: float = Field(..., description="Driver longitude")
+
+    @field_validator("lat")
+    @classmethod
+    def validate_lat(cls, v):
+        if not -90 <= v <= 90:
+            raise ValueError("Latitude must be between -90 and 90")
+        return v
+
+    @field_validator("lon")
+    @classmethod
+    def validate_lon(cls, v):
+        if not -180 <= v <= 180:
+            raise ValueError("Longitude must be between -180 and 180")
+        return v
+
 class RideOut(BaseModel):
     """Schema for ride output/response"""
     id: int
@@ -45,7 +91,7 @@ class RideOut(BaseModel):
     dropoff_lat: float
     dropoff_lon: float
     price: float
-    status: Literal["pending", "accepted", "completed"]
+    status: Literal["pending", "accepted", "completed", "cancelled"]
     created_at: datetime
 
     class Config:
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import and_, delete, insert, literal, or_, select
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.config import get_settings
+from app.db.models import Ride, RideArchive, RideStatus
+from app.db.session import SessionLocal, run_write
+from app.services.outbox import RIDE_ARCHIVED, OutboxRelay, outbox_relay, write_outbox
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+_RIDE_COLUMN_NAMES = [column.name for column in Ride.__table__.c]
+
+
+class RideArchiver:
+    """
+    Moves finished rides from ``rides`` into ``rides_archive``.
+
+    Completed and cancelled rides, and accepted rides created more than
+    ``accepted_after_hours`` ago, are copied and deleted in batches of
+    ``batch_size``, each batch in one write transaction, so the live table
+    and its indexes only hold rides that can still change. After a full
+    batch the next one follows straight away; otherwise the archiver sleeps
+    for ``interval_seconds``.
+
+    Each archived accepted ride also gets a ``ride.archived`` outbox event
+    in the same transaction, so its driver is released like on completion.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = settings.archive_batch_size,
+        interval_seconds: float = settings.archive_interval_seconds,
+        accepted_after_hours: float = settings.archive_accepted_after_hours,
+        session_factory=SessionLocal,
+        outbox: OutboxRelay = outbox_relay,
+    ):
+        self.batch_size = batch_size
+        self.interval_seconds = interval_seconds
+        self.accepted_after = timedelta(hours=accepted_after_hours)
+        self.session_factory = session_factory
+        self.outbox = outbox
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.archived = 0
+        self.batches = 0
+        self.failures = 0
+        self.last_batch_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        # Same as the outbox relay: ask the loop to exit instead of cancelling
+        # it mid-transaction
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+
+    def wake(self):
+        """Run a pass now instead of waiting for the next interval"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                moved = await self.archive_once()
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"Ride archival failed: {e}")
+                moved = 0
+            if moved == self.batch_size:
+                await asyncio.sleep(0)  # Let queued requests in between batches
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def _archivable(self, now: datetime):
+        return or_(
+            Ride.status.in_([RideStatus.COMPLETED, RideStatus.CANCELLED]),
+            and_(Ride.status == RideStatus.ACCEPTED, Ride.created_at < now - self.accepted_after),
+        )
+
+    async def archive_once(self) -> int:
+        """Move one batch; returns the number of rides archived"""
+        now = datetime.utcnow()
+        archivable = self._archivable(now)
+        # No ORDER BY: the rides come straight off the status index, where
+        # sorting on id would read every archivable entry for each batch
+        batch = select(Ride.id).where(archivable).limit(self.batch_size)
+
+        async def move(conn: AsyncConnection) -> int:
+            # The INSERT takes the write lock, so the DELETE sees the same rides
+            copied = await conn.execute(
+                insert(RideArchive.__table__)
+                .from_select(
+                    [*_RIDE_COLUMN_NAMES, "archived_at"],
+                    select(*Ride.__table__.c, literal(now, RideArchive.archived_at.type))
+                    .where(Ride.id.in_(batch.scalar_subquery())),
+                )
+                .returning(*RideArchive.__table__.c)
+            )
+            rows = copied.all()
+            if rows:
+                await conn.execute(delete(Ride.__table__).where(Ride.id.in_([row.id for row in rows])))
+                await write_outbox(conn, RIDE_ARCHIVED, [row for row in rows if row.status == RideStatus.ACCEPTED])
+            return len(rows)
+
+        start = time.perf_counter()
+        async with self.session_factory() as session:
+            moved = await run_write(session, move)
+        if moved:
+            self.outbox.wake()
+            self.archived += moved
+            self.batches += 1
+            self.last_batch_ms = 1000 * (time.perf_counter() - start)
+            logger.info(f"Archived {moved} rides in {self.last_batch_ms:.1f} ms")
+        return moved
+
+    async def archive_all(self) -> int:
+        """Archive everything currently eligible; returns the number of rides moved"""
+        total = 0
+        while True:
+            moved = await self.archive_once()
+            total += moved
+            if moved < self.batch_size:
+                return total
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "archived": self.archived,
+            "batches": self.batches,
+            "failures": self.failures,
+            "last_batch_ms": self.last_batch_ms,
+        }
+
+
+# Global archiver started with the application
+ride_archiver = RideArchiver()
@@ -1,19 +1,29 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update, insert, delete, and_
 from fastapi import HTTPException, status, Depends
-from datetime import timedelta
+from datetime import datetime, timedelta
+import itertools
 import uuid
 import logging
 
-from app.db.models import User, UserType
+from app.db.models import User, UserType, RefreshToken
 from app.schemas.auth import UserCreate, UserLogin, UserOut, Token
-from app.utils.auth import get_password_hash, authenticate_user, create_access_token
+from app.utils.auth import (
+    get_password_hash_async, authenticate_user, create_access_token,
+    create_refresh_token, hash_refresh_token,
+)
+from app.utils.user_cache import user_cache
 from app.core.config import get_settings
 from app.db.session import get_session
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# Refresh tokens issued between purges of expired rows; rotated tokens stay
+# until they expire so a replay can still be recognised
+PURGE_EVERY = 1000
+_issued = itertools.count(1)
+
 class AuthService:
     """Service class for authentication operations with dependency injection"""
     
@@ -34,11 +44,12 @@ class AuthService:
                     detail="Email already registered"
                 )
             
-            # Create new user
+            # Create new user (bcrypt runs on the password pool, off the event loop)
+            hashed_password = await get_password_hash_async(user_data.password)
             user = User(
                 id=str(uuid.uuid4()),
                 email=user_data.email,
-                hashed_password=get_password_hash(user_data.password),
+                hashed_password=hashed_password,
                 full_name=user_data.full_name,
                 user_type=UserType(user_data.user_type),
                 is_active=True
@@ -63,7 +74,7 @@ class AuthService:
             )
 
     async def login_user(self, credentials: UserLogin) -> Token:
-        """Authenticate user and return access token"""
+        """Authenticate user and return access and refresh tokens"""
         try:
             user = await authenticate_user(credentials.email, credentials.password, self.session)
             
@@ -79,23 +90,9 @@ class AuthService:
                     detail="Account is deactivated"
                 )
             
-            # Create access token
-            access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
-            access_token = create_access_token(
-                data={
-                    "sub": user.id,
-                    "user_type": user.user_type.value
-                },
-                expires_delta=access_token_expires
-            )
-            
+            token = await self._issue_tokens(user.id, user.user_type, family_id=str(uuid.uuid4()))
             logger.info(f"User logged in: {user.email}")
-            
-            return Token(
-                access_token=access_token,
-                token_type="bearer",
-                expires_in=settings.access_token_expire_minutes * 60
-            )
+            return token
             
         except HTTPException:
             raise
@@ -106,6 +103,131 @@ class AuthService:
                 detail="Failed to login"
             )
 
+    async def refresh_tokens(self, refresh_token: str) -> Token:
+        """
+        Exchange a refresh token for a new access token and a rotated refresh token.
+
+        Costs one HMAC and one indexed UPDATE ... RETURNING on refresh_tokens, and
+        no password hashing; the user is checked against the principal cache and
+        read only on a miss. Presenting an already-rotated token revokes the whole
+        family, since it means the token was replayed, and so does refreshing for
+        a deactivated user.
+        """
+        token_hash = hash_refresh_token(refresh_token)
+        try:
+            # Consume the token atomically: only one concurrent refresh can win
+            stmt = (
+                update(RefreshToken)
+                .where(
+                    and_(
+                        RefreshToken.token_hash == token_hash,
+                        RefreshToken.revoked == False,
+                        RefreshToken.expires_at > datetime.utcnow(),
+                    )
+                )
+                .values(revoked=True)
+                .returning(RefreshToken.user_id, RefreshToken.user_type, RefreshToken.family_id)
+            )
+            row = (await self.session.execute(stmt)).first()
+            
+            if row is None:
+                await self._revoke_replayed_family(token_hash)
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Invalid or expired refresh token"
+                )
+            
+            if not await self._is_active(row.user_id):
+                await self.session.execute(
+                    update(RefreshToken).where(RefreshToken.family_id == row.family_id).values(revoked=True)
+                )
+                await self.session.commit()
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Account is deactivated"
+                )
+            
+            return await self._issue_tokens(row.user_id, row.user_type, family_id=row.family_id)
+            
+        except HTTPException:
+            raise
+        except Exception as e:
+            await self.session.rollback()
+            logger.error(f"Failed to refresh token: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to refresh token"
+            )
+
+    async def revoke_refresh_token(self, refresh_token: str) -> None:
+        """Revoke the refresh token's whole family (logout); unknown tokens are ignored"""
+        stmt = select(RefreshToken.family_id).where(
+            RefreshToken.token_hash == hash_refresh_token(refresh_token)
+        )
+        family_id = (await self.session.execute(stmt)).scalar_one_or_none()
+        if family_id is not None:
+            await self.session.execute(
+                update(RefreshToken).where(RefreshToken.family_id == family_id).values(revoked=True)
+            )
+            await self.session.commit()
+
+    async def _is_active(self, user_id: str) -> bool:
+        # Cached principals are active users
+        if user_cache.get(user_id) is not None:
+            return True
+        stmt = select(User.is_active).where(User.id == user_id)
+        return bool((await self.session.execute(stmt)).scalar_one_or_none())
+
+    async def _revoke_replayed_family(self, token_hash: str) -> None:
+        stmt = select(RefreshToken.family_id, RefreshToken.revoked).where(
+            RefreshToken.token_hash == token_hash
+        )
+        row = (await self.session.execute(stmt)).first()
+        if row is not None and row.revoked:
+            logger.warning(f"Refresh token reuse detected, revoking family {row.family_id}")
+            await self.session.execute(
+                update(RefreshToken).where(RefreshToken.family_id == row.family_id).values(revoked=True)
+            )
+            await self.session.commit()
+        else:
+            await self.session.rollback()
+
+    async def _issue_tokens(self, user_id: str, user_type: UserType, family_id: str) -> Token:
+        """Store a new refresh token in the family, commit, and return both tokens"""
+        refresh_token, token_hash = create_refresh_token()
+        refresh_expires = timedelta(days=settings.refresh_token_expire_days)
+        now = datetime.utcnow()
+        await self.session.execute(
+            insert(RefreshToken).values(
+                token_hash=token_hash,
+                user_id=user_id,
+                user_type=user_type,
+                family_id=family_id,
+                revoked=False,
+                expires_at=now + refresh_expires,
+            )
+        )
+        if next(_issued) % PURGE_EVERY == 0:
+            purged = await self.session.execute(delete(RefreshToken).where(RefreshToken.expires_at <= now))
+            if purged.rowcount:
+                logger.info(f"Purged {purged.rowcount} expired refresh tokens")
+        await self.session.commit()
+        
+        access_token = create_access_token(
+            data={
+                "sub": user_id,
+                "user_type": user_type.value
+            },
+            expires_delta=timedelta(minutes=settings.access_token_expire_minutes)
+        )
+        return Token(
+            access_token=access_token,
+            token_type="bearer",
+            expires_in=settings.access_token_expire_minutes * 60,
+            refresh_token=refresh_token,
+            refresh_expires_in=int(refresh_expires.total_seconds()),
+        )
+
 # Dependency injection function
 def get_auth_service(session: AsyncSession = Depends(get_session)) -> AuthService:
     """Dependency injection for AuthService"""
@@ -0,0 +1,325 @@
+import asyncio
+import logging
+import math
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import orjson
+
+from app.core.config import get_settings
+from app.services.driver_locations import DriverLocationStore, driver_locations
+from app.services.ride_events import RideEventBus, ride_event_bus
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Window counters, first axis of DemandHeatmap.counts
+REQUESTED = 0
+ACCEPTED = 1
+
+# A cell key packs the latitude cell into the high 32 bits and the
+# (offset) longitude cell into the low ones, so keys of many points can be
+# built, sorted and searched as one int64 array
+_LON_OFFSET = 1 << 31
+_LOW_BITS = (1 << 32) - 1
+
+
+class DemandHeatmap:
+    """
+    Per-cell supply and demand over a ``cell_size_deg`` grid, with surge multipliers.
+
+    Each cell that has seen activity gets a slot in parallel numpy arrays:
+    pending rides right now, rides requested and accepted over the last
+    ``window_seconds``, and idle drivers. Ride events (watched on the ride
+    event bus) are O(1) array increments. The window is a ring of
+    ``buckets`` time buckets; when time moves into a new bucket, that
+    bucket is subtracted from the window sums and zeroed for every cell at
+    once, so old events drop out without per-event bookkeeping.
+
+    Idle drivers are counted from the location store every
+    ``refresh_seconds``, when the heatmap JSON is also rebuilt: reading it is
+    returning those bytes (columnar: one array per field, like the arrays
+    behind it). Cells with nothing left in them are recycled then,
+    and at most ``max_cells`` cells are tracked; events in new cells past
+    that are dropped and counted.
+
+    A cell's surge is ``1 + sensitivity * (pending / idle - 1)``, rounded to
+    ``surge_step`` and clamped to [1, ``surge_max``], once it has at least
+    ``surge_min_pending`` pending rides (an empty cell counts as one driver).
+    """
+
+    def __init__(
+        self,
+        cell_size_deg: float = settings.heatmap_cell_size_deg,
+        window_seconds: float = settings.heatmap_window_seconds,
+        buckets: int = settings.heatmap_buckets,
+        refresh_seconds: float = settings.heatmap_refresh_seconds,
+        max_cells: int = settings.heatmap_max_cells,
+        surge_min_pending: int = settings.surge_min_pending,
+        surge_sensitivity: float = settings.surge_sensitivity,
+        surge_max: float = settings.surge_max,
+        surge_step: float = settings.surge_step,
+        locations: DriverLocationStore = driver_locations,
+        events: RideEventBus = ride_event_bus,
+        clock=time.time,
+    ):
+        self.cell_size_deg = cell_size_deg
+        self.window_seconds = window_seconds
+        self.buckets = buckets
+        self.bucket_seconds = window_seconds / buckets
+        self.refresh_seconds = refresh_seconds
+        self.max_cells = max_cells
+        self.surge_min_pending = surge_min_pending
+        self.surge_sensitivity = surge_sensitivity
+        self.surge_max = surge_max
+        self.surge_step = surge_step
+        self.locations = locations
+        self.clock = clock
+        self._slots: Dict[int, int] = {}  # Cell key -> slot
+        self._free: List[int] = []
+        self._ride_slots: Dict[int, int] = {}  # Pending ride -> its pickup cell's slot
+        self._epoch = int(clock() // self.bucket_seconds)
+        self._capacity = 0
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.used = np.zeros(0, dtype=bool)
+        self.counts = np.zeros((2, buckets, 0), dtype=np.int32)
+        self.window = np.zeros((2, 0), dtype=np.int32)
+        self.pending = np.zeros(0, dtype=np.int32)
+        self.idle = np.zeros(0, dtype=np.int32)
+        self._grow(min(1024, max_cells))
+        self._body = b""
+        self.refreshed_at = 0.0
+        self.dropped = 0
+        self.last_refresh_ms = 0.0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._refresh_body()
+        events.watch(self)
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _grow(self, capacity: int):
+        extra = capacity - self._capacity
+        self.keys = np.concatenate((self.keys, np.zeros(extra, dtype=np.int64)))
+        self.used = np.concatenate((self.used, np.zeros(extra, dtype=bool)))
+        self.counts = np.concatenate((self.counts, np.zeros((2, self.buckets, extra), dtype=np.int32)), axis=2)
+        self.window = np.concatenate((self.window, np.zeros((2, extra), dtype=np.int32)), axis=1)
+        self.pending = np.concatenate((self.pending, np.zeros(extra, dtype=np.int32)))
+        self.idle = np.concatenate((self.idle, np.zeros(extra, dtype=np.int32)))
+        self._free.extend(range(capacity - 1, self._capacity - 1, -1))
+        self._capacity = capacity
+
+    def cell_of(self, lat: float, lon: float) -> int:
+        size = self.cell_size_deg
+        return (math.floor(lat / size) << 32) + math.floor(lon / size) + _LON_OFFSET
+
+    def cells_of(self, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        size = self.cell_size_deg
+        return (np.floor(lat / size).astype(np.int64) << 32) + np.floor(lon / size).astype(np.int64) + _LON_OFFSET
+
+    def _slot(self, cell: int) -> Optional[int]:
+        slot = self._slots.get(cell)
+        if slot is not None:
+            return slot
+        if not self._free:
+            if self._capacity >= self.max_cells:
+                self.dropped += 1
+                return None
+            self._grow(min(2 * self._capacity, self.max_cells))
+        slot = self._free.pop()
+        self._slots[cell] = slot
+        self.keys[slot] = cell
+        self.used[slot] = True
+        return slot
+
+    def _advance(self, now: float):
+        """Drop the buckets that have left the window since the last event"""
+        epoch = int(now // self.bucket_seconds)
+        if epoch <= self._epoch:
+            return
+        for step in range(self._epoch + 1, self._epoch + 1 + min(epoch - self._epoch, self.buckets)):
+            bucket = step % self.buckets
+            self.window -= self.counts[:, bucket, :]
+            self.counts[:, bucket, :] = 0
+        self._epoch = epoch
+
+    def _count(self, counter: int, slot: int):
+        self._advance(self.clock())
+        self.counts[counter, self._epoch % self.buckets, slot] += 1
+        self.window[counter, slot] += 1
+
+    # Ride event bus watcher
+
+    def ride_created(self, ride):
+        if ride.id in self._ride_slots:
+            return
+        slot = self._slot(self.cell_of(ride.pickup_lat, ride.pickup_lon))
+        if slot is None:
+            return
+        self._ride_slots[ride.id] = slot
+        self.pending[slot] += 1
+        self._count(REQUESTED, slot)
+
+    def ride_removed(self, ride_id: int, accepted: bool):
+        slot = self._ride_slots.pop(ride_id, None)
+        if slot is None:
+            return
+        self.pending[slot] -= 1
+        if accepted:
+            self._count(ACCEPTED, slot)
+
+    # Surge
+
+    def _surge(self, pending, idle):
+        ratio = pending / np.maximum(idle, 1)
+        surge = np.round((1 + self.surge_sensitivity * (ratio - 1)) / self.surge_step) * self.surge_step
+        surge = np.clip(surge, 1.0, self.surge_max)
+        return np.where(pending >= self.surge_min_pending, surge, 1.0)
+
+    def surge_at(self, lat: float, lon: float) -> float:
+        """Current surge multiplier for a pickup at (lat, lon)"""
+        slot = self._slots.get(self.cell_of(lat, lon))
+        if slot is None:
+            return 1.0
+        return round(float(self._surge(self.pending[slot], self.idle[slot])), 2)
+
+    def surge_many(self, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        slots = self._slots
+        index = np.array([slots.get(cell, -1) for cell in self.cells_of(lat, lon).tolist()], dtype=np.intp)
+        known = index >= 0
+        surge = np.ones(len(index))
+        surge[known] = self._surge(self.pending[index[known]], self.idle[index[known]])
+        return np.round(surge, 2)
+
+    # Refresh
+
+    def refresh(self):
+        """Recount idle drivers, recycle empty cells and rebuild the heatmap body"""
+        start = time.perf_counter()
+        self._advance(self.clock())
+        lat, lon = self.locations.idle_positions()
+        drivers = self.cells_of(lat, lon)
+
+        # Drivers in known cells find their slot by binary search over the sorted keys
+        used = np.flatnonzero(self.used)
+        order = used[np.argsort(self.keys[used])]
+        slots = np.full(len(drivers), -1, dtype=np.intp)
+        if len(order):
+            position = np.minimum(np.searchsorted(self.keys[order], drivers), len(order) - 1)
+            known = self.keys[order[position]] == drivers
+            slots[known] = order[position[known]]
+        unknown = np.flatnonzero(slots < 0)
+        if len(unknown):
+            for cell in np.unique(drivers[unknown]).tolist():
+                self._slot(cell)
+            slots[unknown] = [self._slots.get(cell, -1) for cell in drivers[unknown].tolist()]
+        self.idle[:] = np.bincount(slots[slots >= 0], minlength=self._capacity)
+
+        used = np.flatnonzero(self.used)
+        empty = used[(self.pending[used] == 0) & (self.idle[used] == 0) & ~self.window[:, used].any(axis=0)]
+        for cell in self.keys[empty].tolist():
+            del self._slots[cell]
+        self.used[empty] = False
+        self._free.extend(empty.tolist())
+        self._refresh_body()
+        self.last_refresh_ms = 1000 * (time.perf_counter() - start)
+
+    def _refresh_body(self):
+        used = np.flatnonzero(self.used)
+        keys = self.keys[used]
+        size = self.cell_size_deg
+        pending, idle = self.pending[used], self.idle[used]
+        self.refreshed_at = self.clock()
+        self._body = orjson.dumps({
+            "cell_size_deg": size,
+            "window_seconds": self.window_seconds,
+            "generated_at": self.refreshed_at,
+            "cells": {
+                "lat": np.round(((keys >> 32) + 0.5) * size, 6),
+                "lon": np.round(((keys & _LOW_BITS) - _LON_OFFSET + 0.5) * size, 6),
+                "pending": pending,
+                "requested": self.window[REQUESTED, used],
+                "accepted": self.window[ACCEPTED, used],
+                "idle_drivers": idle,
+                "surge": np.round(self._surge(pending, idle), 2),
+            },
+        }, option=orjson.OPT_SERIALIZE_NUMPY)
+
+    def body(self) -> bytes:
+        """The heatmap as of the last refresh, serialized"""
+        return self._body
+
+    # Background refresh loop
+
+    async def start(self, pending: Iterable = ()):
+        """Start refreshing; ``pending`` rides (already waiting at startup) are counted too"""
+        if self._task is None:
+            for ride in pending:
+                self.ride_created(ride)
+            self.refresh()
+            self._stopping = False
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.refresh_seconds)
+            except asyncio.TimeoutError:
+                pass
+            if self._stopping:
+                break
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Heatmap refresh failed: {e}")
+
+    def clear(self):
+        self._slots.clear()
+        self._ride_slots.clear()
+        self.used[:] = False
+        self._free = list(range(self._capacity - 1, -1, -1))
+        self.counts[:] = 0
+        self.window[:] = 0
+        self.pending[:] = 0
+        self.idle[:] = 0
+        self._refresh_body()
+
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in (self.keys, self.used, self.counts, self.window, self.pending, self.idle))
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "cells": len(self._slots),
+            "capacity": self._capacity,
+            "pending_rides": len(self._ride_slots),
+            "dropped": self.dropped,
+            "array_bytes": self.nbytes(),
+            "body_bytes": len(self._body),
+            "last_refresh_ms": self.last_refresh_ms,
+        }
+
+
+# Global heatmap refreshed by the application
+demand_heatmap = DemandHeatmap()
+
+
+def get_demand_heatmap() -> DemandHeatmap:
+    """Dependency accessor for the process-wide demand heatmap"""
+    return demand_heatmap
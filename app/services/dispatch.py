@@ -0,0 +1,341 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import case, update
+
+from app.core.config import get_settings
+from app.db.models import Ride, RideStatus
+from app.db.session import SessionLocal, run_write
+from app.services.geo_index import PendingRideIndex, haversine_km_array, pending_ride_index
+from app.services.ride_events import RideEventBus, ride_event_bus
+from app.services.outbox import RIDE_ACCEPTED, OutboxRelay, outbox_relay, write_outbox
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Cost used for pairs beyond the pickup limit; never part of a returned match
+UNREACHABLE = 1e9
+
+
+def haversine_matrix(
+    from_lat: np.ndarray, from_lon: np.ndarray, to_lat: np.ndarray, to_lon: np.ndarray
+) -> np.ndarray:
+    """Pairwise great-circle distances (km), shape (len(from), len(to))"""
+    return haversine_km_array(
+        np.asarray(from_lat)[:, None], np.asarray(from_lon)[:, None],
+        np.asarray(to_lat)[None, :], np.asarray(to_lon)[None, :],
+    )
+
+
+def hungarian(cost: np.ndarray) -> List[Tuple[int, int]]:
+    """
+    Minimum-cost assignment (Hungarian algorithm with potentials, O(n^2 m)).
+
+    Every row of the smaller side is matched; returns (row, col) pairs.
+    """
+    transposed = cost.shape[0] > cost.shape[1]
+    if transposed:
+        cost = cost.T
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=np.int64)    # p[j]: row matched to column j (1-based, 0 = free)
+    way = np.zeros(m + 1, dtype=np.int64)
+
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used
+            free[0] = False
+            reduced = cost[i0 - 1] - u[i0] - v[1:]
+            better = free[1:] & (reduced < minv[1:])
+            minv[1:][better] = reduced[better]
+            way[1:][better] = j0
+            candidates = np.where(free[1:], minv[1:], np.inf)
+            j1 = int(np.argmin(candidates)) + 1
+            delta = candidates[j1 - 1]
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[free] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    pairs = [(int(p[j]) - 1, j - 1) for j in range(1, m + 1) if p[j]]
+    if transposed:
+        pairs = [(col, row) for row, col in pairs]
+    return sorted(pairs)
+
+
+def greedy_assignment(
+    driver_lat: np.ndarray,
+    driver_lon: np.ndarray,
+    ride_lat: np.ndarray,
+    ride_lon: np.ndarray,
+    max_km: float,
+    candidates: int = 8,
+    chunk_rows: int = 1024,
+    max_rounds: int = 4,
+) -> List[Tuple[int, int]]:
+    """
+    Approximate assignment for large batches.
+
+    The cost matrix is built ``chunk_rows`` drivers at a time so memory stays
+    bounded; each driver keeps only its ``candidates`` nearest rides. Those
+    edges are taken cheapest-first while both sides are free, and drivers that
+    lost all their candidates retry against the remaining rides.
+    """
+    n_drivers, n_rides = len(driver_lat), len(ride_lat)
+    d_lat32, d_lon32 = driver_lat.astype(np.float32), driver_lon.astype(np.float32)
+    r_lat32, r_lon32 = ride_lat.astype(np.float32), ride_lon.astype(np.float32)
+    driver_free = np.ones(n_drivers, dtype=bool)
+    ride_free = np.ones(n_rides, dtype=bool)
+    pairs: List[Tuple[int, int]] = []
+
+    for _ in range(max_rounds):
+        drivers = np.flatnonzero(driver_free)
+        rides = np.flatnonzero(ride_free)
+        if not len(drivers) or not len(rides):
+            break
+        keep = min(candidates, len(rides))
+        edge_cost, edge_driver, edge_ride = [], [], []
+        for start in range(0, len(drivers), chunk_rows):
+            rows = drivers[start:start + chunk_rows]
+            if keep < len(rides):
+                # Shortlist on a cheap float32 equirectangular distance, then
+                # compute exact haversine only for the shortlisted pairs
+                scale = np.cos(np.radians(driver_lat[rows])).astype(np.float32)[:, None]
+                dy = r_lat32[rides][None, :] - d_lat32[rows][:, None]
+                dx = (r_lon32[rides][None, :] - d_lon32[rows][:, None]) * scale
+                approx = dx * dx + dy * dy
+                nearest = np.argpartition(approx, keep - 1, axis=1)[:, :keep]
+            else:
+                nearest = np.broadcast_to(np.arange(len(rides)), (len(rows), len(rides)))
+            picked_rides = rides[nearest]
+            picked = haversine_km_array(
+                np.repeat(driver_lat[rows], keep), np.repeat(driver_lon[rows], keep),
+                ride_lat[picked_rides.ravel()], ride_lon[picked_rides.ravel()],
+            )
+            edge_cost.append(picked)
+            edge_driver.append(np.repeat(rows, keep))
+            edge_ride.append(picked_rides.ravel())
+
+        cost = np.concatenate(edge_cost)
+        within = cost <= max_km
+        order = np.argsort(cost[within], kind="stable")
+        edge_driver_arr = np.concatenate(edge_driver)[within][order]
+        edge_ride_arr = np.concatenate(edge_ride)[within][order]
+
+        matched = 0
+        for d, r in zip(edge_driver_arr.tolist(), edge_ride_arr.tolist()):
+            if driver_free[d] and ride_free[r]:
+                driver_free[d] = False
+                ride_free[r] = False
+                pairs.append((d, r))
+                matched += 1
+        if not matched:
+            break
+
+    return sorted(pairs)
+
+
+def solve_assignment(
+    driver_lat: np.ndarray,
+    driver_lon: np.ndarray,
+    ride_lat: np.ndarray,
+    ride_lon: np.ndarray,
+    max_km: float,
+    optimal_max_size: int,
+    candidates: int = 8,
+) -> List[Tuple[int, int]]:
+    """Optimal assignment for small batches, greedy for large ones; pairs beyond max_km are dropped"""
+    if not len(driver_lat) or not len(ride_lat):
+        return []
+    if max(len(driver_lat), len(ride_lat)) <= optimal_max_size:
+        cost = haversine_matrix(driver_lat, driver_lon, ride_lat, ride_lon)
+        cost[cost > max_km] = UNREACHABLE
+        return [(d, r) for d, r in hungarian(cost) if cost[d, r] < UNREACHABLE]
+    return greedy_assignment(driver_lat, driver_lon, ride_lat, ride_lon, max_km, candidates)
+
+
+class _DriverRequest:
+    __slots__ = ("driver_id", "lat", "lon", "future")
+
+    def __init__(self, driver_id: str, lat: float, lon: float, future: asyncio.Future):
+        self.driver_id = driver_id
+        self.lat = lat
+        self.lon = lon
+        self.future = future
+
+
+class BatchDispatcher:
+    """
+    Collects idle drivers over a short window and matches them to pending rides in bulk.
+
+    Drivers wait on ``request_ride``; every window the dispatcher pulls candidate
+    rides around the waiting drivers from the pending index, solves the
+    assignment and commits all winners with one conditional UPDATE. Rides
+    that were accepted concurrently fail the ``status == PENDING`` guard and
+    their drivers are told to retry.
+    """
+
+    def __init__(
+        self,
+        index: PendingRideIndex = pending_ride_index,
+        window_ms: int = settings.dispatch_window_ms,
+        max_drivers: int = settings.dispatch_max_drivers,
+        max_pickup_km: float = settings.dispatch_max_pickup_km,
+        optimal_max_size: int = settings.dispatch_optimal_max_size,
+        candidates: int = settings.dispatch_candidates_per_driver,
+        session_factory=SessionLocal,
+        events: RideEventBus = ride_event_bus,
+        outbox: OutboxRelay = outbox_relay,
+    ):
+        self.index = index
+        self.events = events
+        self.outbox = outbox
+        self.window = window_ms / 1000
+        self.max_drivers = max_drivers
+        self.max_pickup_km = max_pickup_km
+        self.optimal_max_size = optimal_max_size
+        self.candidates = candidates
+        self.session_factory = session_factory
+        self._waiting: Dict[str, _DriverRequest] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"batches": 0, "matched": 0, "conflicts": 0, "unmatched": 0}
+
+    async def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for request in self._waiting.values():
+            if not request.future.done():
+                request.future.set_result(None)
+        self._waiting.clear()
+
+    async def request_ride(self, driver_id: str, lat: float, lon: float) -> Optional[Ride]:
+        """Wait for the next dispatch round; returns the assigned ride or None"""
+        if self._task is None:
+            raise RuntimeError("Dispatcher is not running")
+        previous = self._waiting.pop(driver_id, None)
+        if previous is not None and not previous.future.done():
+            previous.future.set_result(None)
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[driver_id] = _DriverRequest(driver_id, lat, lon, future)
+        self._wakeup.set()
+        return await future
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            deadline = time.monotonic() + self.window
+            while len(self._waiting) < self.max_drivers and time.monotonic() < deadline:
+                await asyncio.sleep(min(0.005, max(0.0, deadline - time.monotonic())))
+            self._wakeup.clear()
+
+            batch = list(self._waiting.values())[:self.max_drivers]
+            for request in batch:
+                del self._waiting[request.driver_id]
+            if self._waiting:
+                self._wakeup.set()
+            try:
+                await self.dispatch(batch)
+            except Exception as e:
+                logger.error(f"Dispatch batch failed: {e}")
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_result(None)
+
+    def _candidate_rides(self, batch: Sequence[_DriverRequest]):
+        rides = {}
+        for request in batch:
+            for _, entry in self.index.query(
+                request.lat, request.lon, radius_km=self.max_pickup_km, k=self.candidates
+            ):
+                rides[entry.id] = entry
+        return list(rides.values())
+
+    async def dispatch(self, batch: Sequence[_DriverRequest]) -> Dict[str, Ride]:
+        """Match one batch of waiting drivers and commit the winners atomically"""
+        self.stats["batches"] += 1
+        rides = self._candidate_rides(batch)
+        pairs = solve_assignment(
+            np.fromiter((r.lat for r in batch), float, len(batch)),
+            np.fromiter((r.lon for r in batch), float, len(batch)),
+            np.fromiter((e.pickup_lat for e in rides), float, len(rides)),
+            np.fromiter((e.pickup_lon for e in rides), float, len(rides)),
+            max_km=self.max_pickup_km,
+            optimal_max_size=self.optimal_max_size,
+            candidates=self.candidates,
+        )
+        assignments = {rides[r].id: batch[d].driver_id for d, r in pairs}
+        accepted = await self._commit(assignments) if assignments else {}
+
+        by_driver = {ride.driver_id: ride for ride in accepted.values()}
+        for ride in accepted.values():
+            self.index.remove(ride.id)
+            self.events.publish_accepted(ride.id)
+        for ride_id in assignments.keys() - accepted.keys():
+            # Lost the PENDING guard to a concurrent accept
+            if self.index.remove(ride_id) is not None:
+                self.events.publish_withdrawn(ride_id)
+        self.stats["matched"] += len(accepted)
+        self.stats["conflicts"] += len(assignments) - len(accepted)
+        self.stats["unmatched"] += len(batch) - len(accepted)
+
+        for request in batch:
+            if not request.future.done():
+                request.future.set_result(by_driver.get(request.driver_id))
+        logger.info(f"Dispatched {len(accepted)}/{len(batch)} drivers against {len(rides)} rides")
+        return by_driver
+
+    async def _commit(self, assignments: Dict[int, str]) -> Dict[int, Ride]:
+        """
+        Accept every (ride -> driver) pair with one UPDATE guarded by status == PENDING.
+
+        The ``ride.accepted`` outbox events for the winners commit in the same
+        transaction, through the write queue when it is running.
+        """
+        rides = Ride.__table__
+        stmt = (
+            update(rides)
+            .where(rides.c.id.in_(list(assignments)), rides.c.status == RideStatus.PENDING)
+            .values(status=RideStatus.ACCEPTED, driver_id=case(assignments, value=rides.c.id))
+            .returning(*rides.c)
+        )
+
+        async def accept_all(conn):
+            accepted = [Ride(**row._mapping) for row in (await conn.execute(stmt)).all()]
+            await write_outbox(conn, RIDE_ACCEPTED, accepted)
+            return {ride.id: ride for ride in accepted}
+
+        async with self.session_factory() as session:
+            accepted = await run_write(session, accept_all)
+        if accepted:
+            self.outbox.wake()
+        return accepted
+
+
+batch_dispatcher = BatchDispatcher()
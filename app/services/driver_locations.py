@@ -0,0 +1,502 @@
+import asyncio
+import logging
+import math
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.config import get_settings
+from app.db.models import DriverLocation, Ride, RideStatus
+from app.db.session import SessionLocal, run_write
+from app.services.geo_index import EARTH_RADIUS_KM, haversine_km_array
+from app.utils.driver_pings import KEEP
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+SNAPSHOT_CHUNK = 5000
+
+
+@dataclass(frozen=True)
+class DriverPosition:
+    lat: float
+    lon: float
+    updated_at: float  # Epoch seconds
+    on_duty: bool
+    active_rides: int
+
+
+class DriverLocationStore:
+    """
+    Latest position of every active driver, held as a struct of numpy arrays.
+
+    Each driver owns one slot in ``lat``, ``lon`` and ``updated`` (epoch
+    seconds), the ``on_duty`` and ``dirty`` flags and the ``active_rides``
+    count. That is 29 bytes of arrays plus the driver's entry in the id ->
+    slot dict, with no object per driver. A ping is a dict lookup and a few
+    array stores, and a batch of pings is a few vectorized stores. Nearest-idle
+    queries scan the arrays with numpy. Only ``dirty`` slots are written to
+    the database, by the snapshotter.
+
+    ``on_duty`` is what the driver's app last reported. ``active_rides``
+    counts the accepted rides the driver has not completed and is kept
+    current from the ride events. Those rides are tracked by id, so a
+    replayed event is not counted twice. A driver is idle when on duty, with
+    no active ride, and heard from within ``fresh_seconds``.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 1024,
+        fresh_seconds: float = settings.driver_location_fresh_seconds,
+        search_start_km: float = 2.0,
+        clock=time.time,
+    ):
+        self.fresh_seconds = fresh_seconds
+        self.search_start_km = search_start_km
+        self.clock = clock
+        self._capacity = 0
+        self._slots: Dict[str, int] = {}
+        self._ids: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._rides: Dict[str, Set[int]] = {}
+        self._size = 0  # Slots ever handed out; arrays past it are unused
+        self.lat = self.lon = self.updated = np.empty(0)
+        self.on_duty = self.dirty = self.used = np.empty(0, dtype=bool)
+        self.active_rides = np.empty(0, dtype=np.int16)
+        self._grow(max(capacity, 1))
+        self.pings = 0
+        self.stale_pings = 0
+        self.expired = 0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, driver_id: str) -> bool:
+        return driver_id in self._slots
+
+    def _grow(self, capacity: int):
+        def grown(array: np.ndarray, fill) -> np.ndarray:
+            bigger = np.full(capacity, fill, dtype=array.dtype)
+            bigger[:self._capacity] = array[:self._capacity]
+            return bigger
+
+        self.lat = grown(self.lat, np.nan)
+        self.lon = grown(self.lon, np.nan)
+        self.updated = grown(self.updated, -np.inf)
+        self.on_duty = grown(self.on_duty, False)
+        self.dirty = grown(self.dirty, False)
+        self.used = grown(self.used, False)
+        self.active_rides = grown(self.active_rides, 0)
+        self._ids.extend([None] * (capacity - self._capacity))
+        self._capacity = capacity
+
+    def _allocate(self, driver_id: str) -> int:
+        if self._free:
+            slot = self._free.pop()
+        else:
+            if self._size == self._capacity:
+                self._grow(2 * self._capacity)
+            slot = self._size
+            self._size += 1
+        self._slots[driver_id] = slot
+        self._ids[slot] = driver_id
+        self.used[slot] = True
+        self.on_duty[slot] = True
+        self.updated[slot] = -np.inf
+        self.active_rides[slot] = 0
+        return slot
+
+    def _slot(self, driver_id: str) -> int:
+        slot = self._slots.get(driver_id)
+        return self._allocate(driver_id) if slot is None else slot
+
+    def _release(self, slot: int):
+        self._rides.pop(self._ids[slot], None)
+        del self._slots[self._ids[slot]]
+        self._ids[slot] = None
+        self.used[slot] = self.dirty[slot] = self.on_duty[slot] = False
+        self.lat[slot] = self.lon[slot] = np.nan
+        self.updated[slot] = -np.inf
+        self.active_rides[slot] = 0
+        self._free.append(slot)
+
+    def update(self, driver_id: str, lat: float, lon: float, available: Optional[bool] = None,
+               at: Optional[float] = None) -> bool:
+        """
+        Record one ping; ``available=None`` keeps the driver's duty state.
+
+        A ping older than the stored position is dropped. Returns whether
+        this ping was applied.
+        """
+        now = self.clock()
+        at = now if at is None else min(at, now)
+        slot = self._slot(driver_id)
+        self.pings += 1
+        if at < self.updated[slot]:
+            self.stale_pings += 1
+            return False
+        self.lat[slot] = lat
+        self.lon[slot] = lon
+        self.updated[slot] = at
+        if available is not None:
+            self.on_duty[slot] = available
+        self.dirty[slot] = True
+        return True
+
+    def update_many(
+        self,
+        driver_ids: Sequence[str],
+        lat: np.ndarray,
+        lon: np.ndarray,
+        available: Optional[np.ndarray] = None,
+        at: Optional[np.ndarray] = None,
+        mark_dirty: bool = True,
+    ) -> int:
+        """
+        Record a batch of pings in a few vectorized stores.
+
+        ``available`` holds 1/0, or KEEP to leave the duty state as it is.
+        ``at`` holds ping times; NaN means now, and future times are clamped
+        to now. A driver with several pings keeps only the newest, and a
+        ping older than the stored position is dropped. Returns how many
+        pings were applied.
+        """
+        count = len(driver_ids)
+        if not count:
+            return 0
+        slots = np.fromiter(map(self._slot, driver_ids), dtype=np.intp, count=count)
+        now = self.clock()
+        at = np.full(count, now) if at is None else np.where(np.isnan(at), now, np.minimum(at, now))
+
+        # Order by time (arrival order breaks ties) and keep each driver's last ping
+        order = np.lexsort((np.arange(count), at))
+        _, last = np.unique(slots[order][::-1], return_index=True)
+        newest = order[count - 1 - last]
+        newest = newest[at[newest] >= self.updated[slots[newest]]]
+        target = slots[newest]
+
+        self.lat[target] = lat[newest]
+        self.lon[target] = lon[newest]
+        self.updated[target] = at[newest]
+        if available is not None:
+            chosen = available[newest]
+            given = chosen != KEEP
+            self.on_duty[target[given]] = chosen[given].astype(bool)
+        if mark_dirty:
+            self.dirty[target] = True
+        self.pings += count
+        self.stale_pings += count - len(newest)
+        return len(newest)
+
+    def assign(self, driver_id: str, ride_id: int):
+        """The driver accepted a ride; they stop being idle until it is completed"""
+        rides = self._rides.setdefault(driver_id, set())
+        rides.add(ride_id)
+        self.active_rides[self._slot(driver_id)] = len(rides)
+
+    def release(self, driver_id: str, ride_id: int):
+        """The driver completed a ride, or it was archived unfinished"""
+        rides = self._rides.get(driver_id)
+        if rides is None:
+            return
+        rides.discard(ride_id)
+        if not rides:
+            del self._rides[driver_id]
+        slot = self._slots.get(driver_id)
+        if slot is not None:
+            self.active_rides[slot] = len(rides)
+
+    def get(self, driver_id: str) -> Optional[DriverPosition]:
+        slot = self._slots.get(driver_id)
+        if slot is None:
+            return None
+        return DriverPosition(
+            float(self.lat[slot]), float(self.lon[slot]), float(self.updated[slot]),
+            bool(self.on_duty[slot]), int(self.active_rides[slot]),
+        )
+
+    def _idle_mask(self, now: float) -> np.ndarray:
+        n = self._size
+        return (
+            self.on_duty[:n]
+            & (self.active_rides[:n] == 0)
+            & (self.updated[:n] >= now - self.fresh_seconds)
+        )
+
+    def idle_count(self) -> int:
+        return int(np.count_nonzero(self._idle_mask(self.clock())))
+
+    def idle_positions(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Latitudes and longitudes of every idle driver"""
+        slots = np.flatnonzero(self._idle_mask(self.clock()))
+        return self.lat[slots], self.lon[slots]
+
+    def nearest_idle(
+        self,
+        lat: float,
+        lon: float,
+        k: Optional[int] = None,
+        radius_km: Optional[float] = None,
+        exclude: Iterable[str] = (),
+    ) -> List[Tuple[str, float]]:
+        """
+        Idle drivers around (lat, lon) as (driver_id, km), nearest first.
+
+        With ``radius_km`` only drivers inside the circle are returned (capped at
+        ``k`` when given); with only ``k`` the k nearest. ``exclude`` skips
+        the given drivers. A k-only query searches ``search_start_km`` first
+        and widens fourfold until it has k drivers, so the usual case only
+        looks at the drivers near the point.
+        """
+        if radius_km is None and k is None:
+            raise ValueError("Either radius_km or k must be provided")
+        if k is not None and k <= 0:
+            return []
+        excluded = np.fromiter(
+            (slot for slot in map(self._slots.get, exclude) if slot is not None), dtype=np.intp
+        )
+        if radius_km is not None:
+            return self._nearest(lat, lon, k, radius_km, excluded)
+        radius = self.search_start_km
+        while radius < math.pi * EARTH_RADIUS_KM:
+            found = self._nearest(lat, lon, k, radius, excluded)
+            if len(found) >= k:
+                return found
+            radius *= 4
+        return self._nearest(lat, lon, k, None, excluded)
+
+    def _nearest(
+        self, lat: float, lon: float, k: Optional[int], radius_km: Optional[float], excluded: np.ndarray
+    ) -> List[Tuple[str, float]]:
+        n = self._size
+        now = self.clock()
+        if radius_km is None:
+            slots = np.flatnonzero(self._idle_mask(now))
+        else:
+            # Latitude band first: one pass over the arrays, and everything
+            # after it only touches the drivers inside the band
+            dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+            slots = np.flatnonzero(np.abs(self.lat[:n] - lat) <= dlat)
+            if abs(lat) + dlat < 89.0:
+                dlon = dlat / math.cos(math.radians(abs(lat) + dlat))
+                if dlon < 180.0:
+                    dx = np.abs(self.lon[slots] - lon)
+                    slots = slots[np.minimum(dx, 360.0 - dx) <= dlon]
+            slots = slots[
+                self.on_duty[slots]
+                & (self.active_rides[slots] == 0)
+                & (self.updated[slots] >= now - self.fresh_seconds)
+            ]
+        if len(excluded):
+            slots = slots[~np.isin(slots, excluded)]
+        if not len(slots):
+            return []
+
+        dist = haversine_km_array(lat, lon, self.lat[slots], self.lon[slots])
+        if radius_km is not None:
+            inside = dist <= radius_km
+            slots, dist = slots[inside], dist[inside]
+        if k is not None and k < len(dist):
+            nearest = np.argpartition(dist, k - 1)[:k]
+            slots, dist = slots[nearest], dist[nearest]
+        order = np.argsort(dist, kind="stable")
+        return [(self._ids[slot], d) for slot, d in zip(slots[order].tolist(), dist[order].tolist())]
+
+    def take_dirty(self) -> List[Tuple[str, float, float, bool, float]]:
+        """(driver_id, lat, lon, on_duty, updated) of every driver changed since the last call"""
+        n = self._size
+        slots = np.flatnonzero(self.dirty[:n])
+        self.dirty[slots] = False
+        return list(zip(
+            [self._ids[slot] for slot in slots.tolist()],
+            self.lat[slots].tolist(), self.lon[slots].tolist(),
+            self.on_duty[slots].tolist(), self.updated[slots].tolist(),
+        ))
+
+    def mark_dirty(self, driver_ids: Iterable[str]):
+        """Queue drivers for the next snapshot again (after a failed write)"""
+        for driver_id in driver_ids:
+            slot = self._slots.get(driver_id)
+            if slot is not None:
+                self.dirty[slot] = True
+
+    def expire(self, max_age_seconds: float) -> int:
+        """Forget drivers not heard from for ``max_age_seconds`` (unless they hold a ride)"""
+        n = self._size
+        cutoff = self.clock() - max_age_seconds
+        stale = np.flatnonzero(self.used[:n] & (self.updated[:n] < cutoff) & (self.active_rides[:n] == 0))
+        for slot in stale.tolist():
+            self._release(slot)
+        self.expired += len(stale)
+        return len(stale)
+
+    def clear(self):
+        for slot in np.flatnonzero(self.used[:self._size]).tolist():
+            self._release(slot)
+
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (
+            self.lat, self.lon, self.updated, self.on_duty, self.dirty, self.used, self.active_rides,
+        ))
+
+    def stats(self) -> dict:
+        return {
+            "drivers": len(self._slots),
+            "idle": self.idle_count(),
+            "capacity": self._capacity,
+            "array_bytes": self.nbytes(),
+            "pings": self.pings,
+            "stale_pings": self.stale_pings,
+            "expired": self.expired,
+        }
+
+
+# Process-wide store fed by the location endpoints
+driver_locations = DriverLocationStore()
+
+
+class DriverLocationSnapshotter:
+    """
+    Persists the location store to ``driver_locations`` every ``interval_seconds``.
+
+    Each pass upserts only the drivers that pinged since the previous one,
+    in chunks of SNAPSHOT_CHUNK rows per write, and then forgets drivers
+    silent for ``expire_seconds``. ``restore`` reloads recent positions on
+    startup. It also recounts each driver's accepted rides, which are not
+    snapshotted.
+    """
+
+    def __init__(
+        self,
+        store: DriverLocationStore = driver_locations,
+        interval_seconds: float = settings.driver_location_snapshot_seconds,
+        expire_seconds: float = settings.driver_location_expire_seconds,
+        session_factory=SessionLocal,
+    ):
+        self.store = store
+        self.interval_seconds = interval_seconds
+        self.expire_seconds = expire_seconds
+        self.session_factory = session_factory
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.written = 0
+        self.failures = 0
+        self.last_snapshot_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        # Keep the last positions across the restart
+        await self.snapshot_once()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._stopping:
+                break
+            try:
+                await self.snapshot_once()
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"Driver location snapshot failed: {e}")
+            self.store.expire(self.expire_seconds)
+
+    async def snapshot_once(self) -> int:
+        """Upsert every changed driver; returns the number of rows written"""
+        rows = self.store.take_dirty()
+        if not rows:
+            return 0
+        start = time.perf_counter()
+        written = 0
+        try:
+            for offset in range(0, len(rows), SNAPSHOT_CHUNK):
+                chunk = [
+                    {
+                        "driver_id": driver_id, "lat": lat, "lon": lon, "available": on_duty,
+                        "updated_at": datetime.utcfromtimestamp(updated),
+                    }
+                    for driver_id, lat, lon, on_duty, updated in rows[offset:offset + SNAPSHOT_CHUNK]
+                ]
+                stmt = sqlite_insert(DriverLocation.__table__)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[DriverLocation.driver_id],
+                    set_={name: stmt.excluded[name] for name in ("lat", "lon", "available", "updated_at")},
+                )
+
+                async def upsert(conn: AsyncConnection, stmt=stmt, chunk=chunk):
+                    await conn.execute(stmt, chunk)
+
+                async with self.session_factory() as session:
+                    await run_write(session, upsert)
+                written += len(chunk)
+        except Exception:
+            self.store.mark_dirty(driver_id for driver_id, *_ in rows[written:])
+            raise
+        finally:
+            self.written += written
+        self.last_snapshot_ms = 1000 * (time.perf_counter() - start)
+        logger.info(f"Snapshotted {written} driver locations in {self.last_snapshot_ms:.1f} ms")
+        return written
+
+    async def restore(self) -> int:
+        """Load positions updated within ``expire_seconds`` and each driver's accepted rides"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.expire_seconds)
+        async with self.session_factory() as session:
+            positions = (await session.execute(
+                select(DriverLocation.driver_id, DriverLocation.lat, DriverLocation.lon,
+                       DriverLocation.available, DriverLocation.updated_at)
+                .where(DriverLocation.updated_at >= cutoff)
+            )).all()
+            active = (await session.execute(
+                select(Ride.driver_id, Ride.id)
+                .where(Ride.status == RideStatus.ACCEPTED, Ride.driver_id.is_not(None))
+            )).all()
+        if positions:
+            ids, lat, lon, available, updated_at = zip(*positions)
+            epoch = datetime(1970, 1, 1)
+            self.store.update_many(
+                ids, np.array(lat), np.array(lon), np.array(available, dtype=np.int8),
+                np.array([(t - epoch).total_seconds() for t in updated_at]), mark_dirty=False,
+            )
+        for driver_id, ride_id in active:
+            self.store.assign(driver_id, ride_id)
+        logger.info(f"Restored {len(positions)} driver locations and {len(active)} accepted rides")
+        return len(positions)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "written": self.written,
+            "failures": self.failures,
+            "last_snapshot_ms": self.last_snapshot_ms,
+        }
+
+
+# Snapshotter started with the application
+location_snapshotter = DriverLocationSnapshotter()
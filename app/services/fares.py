@@ -0,0 +1,175 @@
+import math
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.services.demand import DemandHeatmap, demand_heatmap
+from app.services.driver_locations import DriverLocationStore, driver_locations
+from app.services.geo_index import haversine_km, haversine_km_array
+
+settings = get_settings()
+
+# (pickup lat cell, pickup lon cell, dropoff lat cell, dropoff lon cell)
+CellPair = Tuple[int, int, int, int]
+
+
+class FareEstimator:
+    """
+    Server-side fare and trip time quotes.
+
+    A trip is priced from its road distance, taken as the great-circle
+    distance times ``detour_factor``, and its duration at
+    ``average_speed_kmh``: ``base + per_km * km + per_minute * minutes``,
+    at least ``minimum_fare``, times the pickup cell's surge multiplier.
+
+    Routes are quoted between cell centres of a ``cell_size_deg`` grid and
+    kept in an LRU of up to ``cache_size`` cell pairs, so a cached quote is
+    exactly what a fresh computation would give. Batches look up every pair,
+    then compute all misses in one vectorized haversine pass.
+    """
+
+    def __init__(
+        self,
+        cell_size_deg: float = settings.fare_cell_size_deg,
+        cache_size: int = settings.fare_cache_size,
+        base_fare: float = settings.fare_base,
+        per_km: float = settings.fare_per_km,
+        per_minute: float = settings.fare_per_minute,
+        minimum_fare: float = settings.fare_minimum,
+        detour_factor: float = settings.fare_detour_factor,
+        average_speed_kmh: float = settings.fare_average_speed_kmh,
+        locations: DriverLocationStore = driver_locations,
+        surge: Optional[DemandHeatmap] = demand_heatmap,
+    ):
+        self.cell_size_deg = cell_size_deg
+        self.cache_size = cache_size
+        self.base_fare = base_fare
+        self.per_km = per_km
+        self.per_minute = per_minute
+        self.minimum_fare = minimum_fare
+        self.detour_factor = detour_factor
+        self.average_speed_kmh = average_speed_kmh
+        self.locations = locations
+        self.surge = surge
+        self._routes: "OrderedDict[CellPair, float]" = OrderedDict()  # Cell pair -> road km
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._routes)
+
+    def _remember(self, key: CellPair, km: float):
+        routes = self._routes
+        routes[key] = km
+        if len(routes) > self.cache_size:
+            routes.popitem(last=False)
+            self.evictions += 1
+
+    def route_km(self, pickup_lat: float, pickup_lon: float, dropoff_lat: float, dropoff_lon: float) -> float:
+        """Road distance estimate for one trip, through the cache"""
+        size = self.cell_size_deg
+        key = (
+            math.floor(pickup_lat / size), math.floor(pickup_lon / size),
+            math.floor(dropoff_lat / size), math.floor(dropoff_lon / size),
+        )
+        km = self._routes.get(key)
+        if km is not None:
+            self._routes.move_to_end(key)
+            self.hits += 1
+            return km
+        self.misses += 1
+        km = self.detour_factor * haversine_km(*((cell + 0.5) * size for cell in key))
+        self._remember(key, km)
+        return km
+
+    def routes_km(self, pickup_lat, pickup_lon, dropoff_lat, dropoff_lon) -> np.ndarray:
+        """Road distance estimates for arrays of trips"""
+        size = self.cell_size_deg
+        cells = np.floor(np.column_stack((pickup_lat, pickup_lon, dropoff_lat, dropoff_lon)) / size).astype(np.int64)
+        keys = list(map(tuple, cells.tolist()))
+        km = np.empty(len(keys))
+        routes = self._routes
+        missing: Dict[CellPair, List[int]] = {}
+        for i, key in enumerate(keys):
+            cached = routes.get(key)
+            if cached is None:
+                missing.setdefault(key, []).append(i)
+            else:
+                routes.move_to_end(key)
+                km[i] = cached
+        missed = sum(map(len, missing.values()))
+        self.hits += len(keys) - missed
+        self.misses += missed
+        if missing:
+            centres = (np.array(list(missing), dtype=np.float64) + 0.5) * size
+            fresh = self.detour_factor * haversine_km_array(*centres.T)
+            for (key, rows), value in zip(missing.items(), fresh.tolist()):
+                km[rows] = value
+                self._remember(key, value)
+        return km
+
+    def minutes(self, km):
+        return km / self.average_speed_kmh * 60
+
+    def fare(self, km, minutes, surge=1.0):
+        """Fare for a road distance and duration (scalars or arrays), rounded to cents"""
+        fare = np.maximum(self.base_fare + self.per_km * km + self.per_minute * minutes, self.minimum_fare)
+        return np.round(fare * surge, 2)
+
+    def estimate(self, pickup_lat: float, pickup_lon: float, dropoff_lat: float, dropoff_lon: float) -> dict:
+        km = self.route_km(pickup_lat, pickup_lon, dropoff_lat, dropoff_lon)
+        minutes = self.minutes(km)
+        surge = self.surge.surge_at(pickup_lat, pickup_lon) if self.surge is not None else 1.0
+        return {
+            "distance_km": round(km, 3),
+            "duration_minutes": round(minutes, 1),
+            "fare": float(self.fare(km, minutes, surge)),
+            "surge_multiplier": surge,
+            "pickup_eta_minutes": self.pickup_eta(pickup_lat, pickup_lon),
+        }
+
+    def estimate_many(
+        self, pickup_lat, pickup_lon, dropoff_lat, dropoff_lon
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """(distance_km, duration_minutes, fare, surge_multiplier) arrays for arrays of trips"""
+        km = self.routes_km(pickup_lat, pickup_lon, dropoff_lat, dropoff_lon)
+        minutes = self.minutes(km)
+        if self.surge is not None:
+            surge = self.surge.surge_many(np.asarray(pickup_lat), np.asarray(pickup_lon))
+        else:
+            surge = np.ones(len(km))
+        return np.round(km, 3), np.round(minutes, 1), self.fare(km, minutes, surge), surge
+
+    def pickup_eta(self, lat: float, lon: float) -> Optional[float]:
+        """Minutes for the nearest idle driver to reach (lat, lon), or None without one"""
+        nearest = self.locations.nearest_idle(lat, lon, k=1)
+        if not nearest:
+            return None
+        return round(self.minutes(self.detour_factor * nearest[0][1]), 1)
+
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def clear(self):
+        self._routes.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._routes),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hit_ratio(),
+        }
+
+
+fare_estimator = FareEstimator()
+
+
+def get_fare_estimator() -> FareEstimator:
+    """Dependency accessor for the process-wide fare estimator"""
+    return fare_estimator
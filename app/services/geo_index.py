@@ -0,0 +1,250 @@
+import heapq
+import logging
+import math
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in kilometres"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlam = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlam / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def haversine_km_array(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Element-wise great-circle distances (km) between point arrays (broadcast like any ufunc)"""
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    dlam = np.radians(np.subtract(lon2, lon1))
+    a = np.sin((phi2 - phi1) / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlam / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class IndexedRide:
+    """Snapshot of a pending ride held by the index (enough to build a RideOut)"""
+
+    __slots__ = (
+        "id", "rider_id", "pickup_lat", "pickup_lon",
+        "dropoff_lat", "dropoff_lon", "price", "created_at", "cell",
+    )
+
+    def __init__(
+        self,
+        id: int,
+        rider_id: str,
+        pickup_lat: float,
+        pickup_lon: float,
+        dropoff_lat: float,
+        dropoff_lon: float,
+        price: float,
+        created_at: datetime,
+    ):
+        self.id = id
+        self.rider_id = rider_id
+        self.pickup_lat = pickup_lat
+        self.pickup_lon = pickup_lon
+        self.dropoff_lat = dropoff_lat
+        self.dropoff_lon = dropoff_lon
+        self.price = price
+        self.created_at = created_at
+        self.cell: Tuple[int, int] = (0, 0)
+
+    @classmethod
+    def from_ride(cls, ride) -> "IndexedRide":
+        return cls(
+            id=ride.id,
+            rider_id=ride.rider_id,
+            pickup_lat=ride.pickup_lat,
+            pickup_lon=ride.pickup_lon,
+            dropoff_lat=ride.dropoff_lat,
+            dropoff_lon=ride.dropoff_lon,
+            price=ride.price,
+            created_at=ride.created_at,
+        )
+
+    # Pending rides never have a driver; these keep RideOut(from_attributes) happy
+    @property
+    def driver_id(self) -> Optional[str]:
+        return None
+
+    @property
+    def status(self) -> str:
+        return "pending"
+
+
+class PendingRideIndex:
+    """
+    Uniform lat/lon grid over the pickup points of pending rides.
+
+    Each cell maps ride id -> IndexedRide, so add/remove are O(1) and a
+    proximity query only touches the cells around the driver instead of the
+    whole pending backlog. The index is per-process: it is rebuilt from the
+    rides table on startup and kept current by RideService.
+
+    ``version`` is bumped on every change to the pending set, so anything
+    derived from it (the cached available-rides listings) can tell whether
+    it is still current.
+    """
+
+    def __init__(self, cell_size_deg: float = 0.01):
+        if cell_size_deg <= 0:
+            raise ValueError("cell_size_deg must be positive")
+        self.cell_size_deg = cell_size_deg
+        self._lon_cells = int(math.ceil(360.0 / cell_size_deg))
+        self._cells: Dict[Tuple[int, int], Dict[int, IndexedRide]] = {}
+        self._rides: Dict[int, IndexedRide] = {}
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self._rides)
+
+    def __contains__(self, ride_id: int) -> bool:
+        return ride_id in self._rides
+
+    def _cell_for(self, lat: float, lon: float) -> Tuple[int, int]:
+        row = int(math.floor((lat + 90.0) / self.cell_size_deg))
+        col = int(math.floor((lon + 180.0) / self.cell_size_deg)) % self._lon_cells
+        return row, col
+
+    def add(self, ride) -> None:
+        """Insert (or replace) a pending ride"""
+        entry = ride if isinstance(ride, IndexedRide) else IndexedRide.from_ride(ride)
+        self.remove(entry.id)
+        entry.cell = self._cell_for(entry.pickup_lat, entry.pickup_lon)
+        self._cells.setdefault(entry.cell, {})[entry.id] = entry
+        self._rides[entry.id] = entry
+        self.version += 1
+
+    def remove(self, ride_id: int) -> Optional[IndexedRide]:
+        """Drop a ride that is no longer pending; unknown ids are ignored"""
+        entry = self._rides.pop(ride_id, None)
+        if entry is None:
+            return None
+        bucket = self._cells.get(entry.cell)
+        if bucket is not None:
+            bucket.pop(ride_id, None)
+            if not bucket:
+                del self._cells[entry.cell]
+        self.version += 1
+        return entry
+
+    def get(self, ride_id: int) -> Optional[IndexedRide]:
+        return self._rides.get(ride_id)
+
+    def newest(self, limit: int) -> List[IndexedRide]:
+        """The ``limit`` most recently created pending rides, newest first"""
+        return heapq.nlargest(limit, self._rides.values(), key=lambda e: (e.created_at, e.id))
+
+    def clear(self) -> None:
+        self._cells.clear()
+        self._rides.clear()
+        self.version += 1
+
+    def rebuild(self, rides: Iterable) -> int:
+        """Replace the index contents with the given pending rides"""
+        self.clear()
+        for ride in rides:
+            self.add(ride)
+        return len(self._rides)
+
+    def _cell_width_km(self, lat: float, ring: int) -> float:
+        """Lower bound on a cell's width (km) within ``ring`` cells of ``lat``"""
+        edge_lat = min(abs(lat) + (ring + 1) * self.cell_size_deg, 89.9)
+        return self.cell_size_deg * KM_PER_DEGREE_LAT * max(math.cos(math.radians(edge_lat)), 1e-3)
+
+    def _ring(self, center: Tuple[int, int], radius: int) -> Iterable[Tuple[int, int]]:
+        """Cells at Chebyshev distance exactly ``radius`` from ``center``"""
+        row0, col0 = center
+        if radius == 0:
+            yield center
+            return
+        for dc in range(-radius, radius + 1):
+            yield row0 - radius, (col0 + dc) % self._lon_cells
+            yield row0 + radius, (col0 + dc) % self._lon_cells
+        for dr in range(-radius + 1, radius):
+            yield row0 + dr, (col0 - radius) % self._lon_cells
+            yield row0 + dr, (col0 + radius) % self._lon_cells
+
+    def _scan(
+        self, cells: Iterable[Tuple[int, int]], lat: float, lon: float, radius_km: Optional[float]
+    ) -> List[Tuple[float, int, IndexedRide]]:
+        found = []
+        for cell in cells:
+            bucket = self._cells.get(cell)
+            if not bucket:
+                continue
+            for entry in bucket.values():
+                dist = haversine_km(lat, lon, entry.pickup_lat, entry.pickup_lon)
+                if radius_km is None or dist <= radius_km:
+                    found.append((dist, entry.id, entry))
+        return found
+
+    def query(
+        self,
+        lat: float,
+        lon: float,
+        radius_km: Optional[float] = None,
+        k: Optional[int] = None,
+    ) -> List[Tuple[float, IndexedRide]]:
+        """
+        Pending rides around (lat, lon) ordered by pickup distance.
+
+        With ``radius_km`` only rides inside the circle are returned (capped at
+        ``k`` when given); with only ``k`` the k nearest rides are returned.
+        """
+        if radius_km is None and k is None:
+            raise ValueError("Either radius_km or k must be provided")
+        if k is not None and k <= 0:
+            return []
+        if not self._rides:
+            return []
+
+        center = self._cell_for(lat, lon)
+        full_scan_cells = 4 * len(self._cells)
+
+        found = []
+        visited = 0
+        ring = 0
+        while True:
+            if visited + 8 * max(ring, 1) > full_scan_cells:
+                # The next rings cover more cells than are occupied: scan those instead
+                found = self._scan(list(self._cells), lat, lon, radius_km)
+                break
+            found.extend(self._scan(self._ring(center, ring), lat, lon, radius_km))
+            visited += 8 * ring if ring else 1
+            if len(found) == len(self._rides):
+                break
+            # Anything outside the scanned rings is at least this far away
+            reach_km = ring * self._cell_width_km(lat, ring)
+            if radius_km is not None and reach_km >= radius_km:
+                break
+            if k is not None and len(found) >= k and heapq.nsmallest(k, found)[-1][0] <= reach_km:
+                break
+            ring += 1
+
+        if k is not None:
+            found = heapq.nsmallest(k, found)
+        else:
+            found.sort()
+        return [(dist, entry) for dist, _, entry in found]
+
+
+pending_ride_index = PendingRideIndex(cell_size_deg=settings.geo_index_cell_size_deg)
+
+
+def get_pending_ride_index() -> PendingRideIndex:
+    """Dependency accessor for the process-wide pending ride index"""
+    return pending_ride_index
@@ -0,0 +1,323 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import orjson
+from fastapi import Depends, Header, HTTPException, Request, Response, status
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.core.config import get_settings
+from app.db.models import IdempotencyRecord
+from app.db.session import SessionLocal, get_session, run_write
+from app.utils.auth import get_current_user
+from app.utils.user_cache import UserPrincipal
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Set to "true" on responses replayed from the store
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+# Persisted writes between purges of expired rows
+PURGE_EVERY = 1000
+
+# The work behind a response, given the database session to do it on
+SessionCall = Callable[[AsyncSession], Awaitable[Any]]
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    """The response first sent for an idempotency key"""
+    fingerprint: str
+    status_code: int
+    body: bytes
+    expires_at: float
+
+
+class IdempotencyStore:
+    """
+    Responses of mutating requests by ``Idempotency-Key``, for safe client retries.
+
+    Keys are scoped to the user. The first request with a key runs; its
+    response (status and JSON body, errors below 500 included) is kept for
+    ``ttl_seconds`` in an LRU of up to ``max_keys`` entries and replayed,
+    byte for byte, to every retry. The first request runs in a task of its
+    own, on a session from ``session_factory`` rather than the request's, so
+    a client that disconnects halfway does not abort it; duplicates
+    arriving while it still runs wait for that task instead of running too.
+    A key reused for a different request (method, path or body) is rejected
+    with 422.
+
+    With ``persist`` the responses are also written to ``idempotency_keys``
+    before they are returned, and looked up there on a miss, so retries
+    spanning a restart or an LRU eviction are still replayed. Rows queued
+    while a write is in progress share the next one (one upsert, one commit).
+    """
+
+    def __init__(
+        self,
+        max_keys: int = settings.idempotency_max_keys,
+        ttl_seconds: float = settings.idempotency_ttl_seconds,
+        persist: bool = settings.idempotency_persist,
+        session_factory=SessionLocal,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_keys = max_keys
+        self.ttl_seconds = ttl_seconds
+        self.persist = persist
+        self.session_factory = session_factory
+        self._clock = clock
+        self._entries: "OrderedDict[str, StoredResponse]" = OrderedDict()
+        self._inflight: Dict[str, Tuple[str, asyncio.Task]] = {}
+        self._unsaved: List[Tuple[dict, asyncio.Future]] = []
+        self._saver: Optional[asyncio.Task] = None
+        self.executed = 0
+        self.replayed = 0
+        self.coalesced = 0
+        self.conflicts = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.persisted = 0
+        self._purge_countdown = PURGE_EVERY
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _get(self, key: str) -> Optional[StoredResponse]:
+        stored = self._entries.get(key)
+        if stored is None:
+            return None
+        if stored.expires_at <= self._clock():
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return stored
+
+    def _remember(self, key: str, stored: StoredResponse):
+        if self.max_keys <= 0:
+            return
+        self._entries[key] = stored
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_keys:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def _load(self, key: str) -> Optional[StoredResponse]:
+        async with self.session_factory() as session:
+            row = (await session.execute(
+                select(IdempotencyRecord.fingerprint, IdempotencyRecord.status_code,
+                       IdempotencyRecord.body, IdempotencyRecord.expires_at)
+                .where(IdempotencyRecord.key == key)
+            )).first()
+        if row is None:
+            return None
+        expires_at = (row.expires_at - datetime(1970, 1, 1)).total_seconds()
+        if expires_at <= self._clock():
+            return None
+        return StoredResponse(row.fingerprint, row.status_code, row.body, expires_at)
+
+    async def _save(self, key: str, stored: StoredResponse):
+        row = {
+            "key": key, "fingerprint": stored.fingerprint, "status_code": stored.status_code,
+            "body": stored.body, "expires_at": datetime.utcfromtimestamp(stored.expires_at),
+        }
+        saved = asyncio.get_running_loop().create_future()
+        self._unsaved.append((row, saved))
+        if self._saver is None or self._saver.done():
+            self._saver = asyncio.create_task(self._save_queued())
+        await asyncio.shield(saved)
+
+    async def _save_queued(self):
+        while self._unsaved:
+            batch, self._unsaved = self._unsaved, []
+            stmt = sqlite_insert(IdempotencyRecord.__table__)
+            # An expired row may still hold the key
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[IdempotencyRecord.key],
+                set_={name: stmt.excluded[name] for name in ("fingerprint", "status_code", "body", "expires_at")},
+            )
+            self._purge_countdown -= len(batch)
+            purge = self._purge_countdown <= 0
+            if purge:
+                self._purge_countdown = PURGE_EVERY
+            now = datetime.utcfromtimestamp(self._clock())
+
+            async def write(conn: AsyncConnection, stmt=stmt, rows=[row for row, _ in batch], purge=purge):
+                await conn.execute(stmt, rows)
+                if purge:
+                    await conn.execute(delete(IdempotencyRecord.__table__).where(IdempotencyRecord.expires_at <= now))
+
+            try:
+                async with self.session_factory() as session:
+                    await run_write(session, write)
+            except Exception as e:
+                for _, saved in batch:
+                    saved.set_exception(e)
+                    saved.exception()  # Only logged by the request that queued it
+                continue
+            self.persisted += len(batch)
+            for _, saved in batch:
+                saved.set_result(None)
+
+    async def _execute(
+        self, fingerprint: str, call: SessionCall, serialize: Callable[[Any], bytes],
+        status_code: int,
+    ) -> StoredResponse:
+        self.executed += 1
+        try:
+            # Not the request's session: FastAPI closes that one if the request is cancelled
+            async with self.session_factory() as session:
+                body = serialize(await call(session))
+        except HTTPException as e:
+            if e.status_code >= 500:
+                raise
+            status_code, body = e.status_code, orjson.dumps({"detail": e.detail})
+        return StoredResponse(fingerprint, status_code, body, self._clock() + self.ttl_seconds)
+
+    async def run(
+        self, key: str, fingerprint: str, call: SessionCall,
+        serialize: Callable[[Any], bytes], status_code: int = status.HTTP_200_OK,
+    ) -> Tuple[StoredResponse, bool]:
+        """
+        The response for ``key``: stored, or made by awaiting ``call(session)``
+        on a session of the store's own and serializing its result. Returns it
+        and whether it was replayed.
+
+        Errors of 500 and above are not stored, so a retry runs again.
+        """
+        while True:
+            stored = self._get(key)
+            if stored is not None:
+                break
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                return await self._lead(key, fingerprint, call, serialize, status_code)
+            if inflight[0] != fingerprint:
+                self._conflict()
+            self.coalesced += 1
+            try:
+                stored, _ = await asyncio.shield(inflight[1])
+                break
+            except asyncio.CancelledError:
+                if not inflight[1].cancelled():
+                    raise
+                # The leading task itself was cancelled (shutdown); take over
+        if stored.fingerprint != fingerprint:
+            self._conflict()
+        self.replayed += 1
+        return stored, True
+
+    async def _produce(
+        self, key: str, fingerprint: str, call: SessionCall,
+        serialize: Callable[[Any], bytes], status_code: int,
+    ) -> Tuple[StoredResponse, bool]:
+        stored = await self._load(key) if self.persist else None
+        replayed = stored is not None
+        if stored is None:
+            stored = await self._execute(fingerprint, call, serialize, status_code)
+            if self.persist:
+                try:
+                    await self._save(key, stored)
+                except Exception as e:
+                    logger.error(f"Failed to persist idempotency key: {e}")
+        self._remember(key, stored)
+        return stored, replayed
+
+    def _finished(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key, (None, None))[1] is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Waiters re-raise it; nobody else needs to
+
+    async def _lead(
+        self, key: str, fingerprint: str, call: SessionCall,
+        serialize: Callable[[Any], bytes], status_code: int,
+    ) -> Tuple[StoredResponse, bool]:
+        # Shielded: cancelling this request must not let a waiting duplicate
+        # take over and run ``call()`` a second time
+        task = asyncio.create_task(self._produce(key, fingerprint, call, serialize, status_code))
+        self._inflight[key] = (fingerprint, task)
+        task.add_done_callback(lambda task: self._finished(key, task))
+        stored, replayed = await asyncio.shield(task)
+        if replayed:
+            if stored.fingerprint != fingerprint:
+                self._conflict()
+            self.replayed += 1
+        return stored, replayed
+
+    def _conflict(self):
+        self.conflicts += 1
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used for a different request"
+        )
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "in_flight": len(self._inflight),
+            "executed": self.executed,
+            "replayed": self.replayed,
+            "coalesced": self.coalesced,
+            "conflicts": self.conflicts,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "persisted": self.persisted,
+        }
+
+
+# Process-wide store behind the mutating ride routes
+idempotency_store = IdempotencyStore()
+
+
+class IdempotentRequest:
+    """A mutating request and its optional ``Idempotency-Key``, scoped to the caller"""
+
+    def __init__(
+        self, store: IdempotencyStore, session: AsyncSession, key: Optional[str], fingerprint: str = "",
+    ):
+        self.store = store
+        self.session = session
+        self.key = key
+        self.fingerprint = fingerprint
+
+    async def respond(
+        self, call: SessionCall, serialize: Callable[[Any], bytes],
+        status_code: int = status.HTTP_200_OK,
+    ):
+        """
+        Without a key, ``call(session)``'s result as is, on the request's
+        session. With one, the stored response for the key as JSON bytes, made
+        by ``call`` only the first time, on a session it does not share with
+        the request.
+        """
+        if self.key is None:
+            return await call(self.session)
+        stored, replayed = await self.store.run(self.key, self.fingerprint, call, serialize, status_code)
+        headers = {REPLAYED_HEADER: "true"} if replayed else None
+        return Response(stored.body, status_code=stored.status_code, media_type="application/json", headers=headers)
+
+
+async def idempotent_request(
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, min_length=1, max_length=255),
+    current_user: UserPrincipal = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+) -> IdempotentRequest:
+    """Dependency for routes that honor ``Idempotency-Key``"""
+    if idempotency_key is None:
+        return IdempotentRequest(idempotency_store, session, None)
+    digest = hashlib.sha256(f"{request.method} {request.url.path}\n".encode())
+    digest.update(await request.body())
+    return IdempotentRequest(idempotency_store, session, f"{current_user.id}:{idempotency_key}", digest.hexdigest())
@@ -0,0 +1,188 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class CachedListing:
+    """A serialized available-rides response and its strong ETag"""
+
+    __slots__ = ("body", "etag", "next_cursor")
+
+    def __init__(self, body: bytes, next_cursor: Optional[str] = None):
+        self.body = body
+        self.etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        self.next_cursor = next_cursor
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an ``If-None-Match`` header names ``etag`` (weak comparison, as RFC 9110 asks)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class ListingCache:
+    """
+    Bounded LRU cache of serialized available-rides listings.
+
+    Entries are keyed by the query parameters and belong to one version of
+    the pending set (``PendingRideIndex.version``). The first lookup or store
+    for a newer version drops everything cached for older ones, and stores
+    computed against an older version are not kept, so a hit is always
+    current for this process. Writes that bypass this process (another
+    worker, admin tooling, manual fixes) do not bump the version, so entries
+    also expire ``ttl_seconds`` after they were built. Memory is bounded by
+    entry count and by total body bytes, evicting least recently used
+    entries first.
+
+    ``fetch`` coalesces concurrent misses: right after the pending set
+    changes, every poller misses at once, and only the first one builds the
+    listing while the rest wait for it.
+    """
+
+    def __init__(
+        self, max_entries: int, max_bytes: int, ttl_seconds: float = float("inf"),
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, CachedListing]]" = OrderedDict()
+        self._version = -1
+        self._building: Dict[Tuple[int, Hashable], "asyncio.Future[Optional[CachedListing]]"] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _advance(self, version: int) -> None:
+        if version > self._version:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self.bytes = 0
+            self._version = version
+
+    def _lookup(self, version: int, key: Hashable) -> Optional[CachedListing]:
+        self._advance(version)
+        entry = self._entries.get(key) if version == self._version else None
+        if entry is None:
+            return None
+        expires_at, listing = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            self.bytes -= len(listing.body)
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return listing
+
+    def get(self, version: int, key: Hashable) -> Optional[CachedListing]:
+        entry = self._lookup(version, key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    async def fetch(
+        self, version: int, key: Hashable, build: Callable[[], Awaitable[CachedListing]]
+    ) -> CachedListing:
+        """The cached listing for ``key``, building (and storing) it on a miss"""
+        if self.max_entries <= 0:
+            return await build()
+        entry = self._lookup(version, key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        pending = self._building.get((version, key))
+        if pending is not None:
+            entry = await asyncio.shield(pending)
+            if entry is not None:
+                self.coalesced += 1
+                return entry
+            # The build we waited on failed; try ourselves so errors surface here
+        self.misses += 1
+        if pending is not None:
+            return await build()
+
+        future = asyncio.get_running_loop().create_future()
+        self._building[(version, key)] = future
+        try:
+            entry = await build()
+            self.put(version, key, entry)
+            future.set_result(entry)
+            return entry
+        finally:
+            if not future.done():
+                future.set_result(None)
+            del self._building[(version, key)]
+
+    def put(self, version: int, key: Hashable, listing: CachedListing) -> None:
+        """Store ``listing`` for ``key``; ignored if the pending set has moved past ``version``"""
+        self._advance(version)
+        size = len(listing.body)
+        if version != self._version or self.max_entries <= 0 or size > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.bytes -= len(previous[1].body)
+        self._entries[key] = (self._clock() + self.ttl_seconds, listing)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.bytes -= len(evicted.body)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.bytes = 0
+
+    def hit_ratio(self) -> float:
+        """Share of lookups answered without building a listing (coalesced waits count as hits)"""
+        served = self.hits + self.coalesced
+        lookups = served + self.misses
+        return served / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "size": len(self._entries),
+            "bytes": self.bytes,
+            "version": self._version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": self.hit_ratio(),
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "expirations": self.expirations,
+        }
+
+
+listing_cache = ListingCache(
+    max_entries=settings.listing_cache_max_entries,
+    max_bytes=settings.listing_cache_max_bytes,
+    ttl_seconds=settings.listing_cache_ttl_seconds,
+)
@@ -0,0 +1,248 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Tuple, Union
+
+import orjson
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.config import get_settings
+from app.db.models import OutboxEvent
+from app.db.session import SessionLocal, run_write
+from app.utils.ride_json import dumps_ride, ride_row
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+RIDE_CREATED = "ride.created"
+RIDE_ACCEPTED = "ride.accepted"
+RIDE_COMPLETED = "ride.completed"
+RIDE_CANCELLED = "ride.cancelled"
+# An accepted ride that went stale and was archived without completing
+RIDE_ARCHIVED = "ride.archived"
+
+OutboxHandler = Callable[[OutboxEvent], Union[None, Awaitable[None]]]
+
+
+def outbox_values(event_type: str, ride) -> dict:
+    return {
+        "event_type": event_type,
+        "ride_id": ride.id,
+        # Same dict as RideOut.model_validate(ride).model_dump(mode="json"), minus Pydantic
+        "payload": orjson.loads(dumps_ride(ride_row(ride))),
+        "created_at": datetime.utcnow(),
+    }
+
+
+async def write_outbox(conn: AsyncConnection, event_type: str, rides: Sequence) -> None:
+    """Record one event per ride on ``conn``, inside the caller's transaction"""
+    if rides:
+        await conn.execute(insert(OutboxEvent.__table__), [outbox_values(event_type, ride) for ride in rides])
+
+
+class OutboxRelay:
+    """
+    Drains the ride outbox to in-process handlers.
+
+    Every ``poll_interval_ms`` (or sooner after ``wake``) the relay reads up
+    to ``batch_size`` undispatched events past its id cursor, calls the
+    handlers registered for each event type in id order, and marks the
+    dispatched rows done. A handler failure stops the batch at that event;
+    it is retried on the next poll, so delivery is at-least-once and in
+    order. Events left over from a crash are picked up on start.
+
+    Every ``prune_interval_seconds`` the relay also deletes events dispatched
+    more than ``retention_hours`` ago, ``batch_size`` rows per write.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = settings.outbox_batch_size,
+        poll_interval_ms: float = settings.outbox_poll_interval_ms,
+        retention_hours: float = settings.outbox_retention_hours,
+        prune_interval_seconds: float = settings.outbox_prune_interval_seconds,
+        session_factory=SessionLocal,
+    ):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval_ms / 1000
+        self.retention = timedelta(hours=retention_hours)
+        self.prune_interval = prune_interval_seconds
+        self._next_prune = 0.0
+        self.session_factory = session_factory
+        self._handlers: Dict[str, List[OutboxHandler]] = {}
+        self._cursor = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._drain_lock = asyncio.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.dispatched = 0
+        self.failures = 0
+        self.pruned = 0
+        self.last_lag_seconds = 0.0
+        # (monotonic time, events dispatched) per drained batch, for the drain rate
+        self._drained: Deque[Tuple[float, int]] = deque(maxlen=256)
+
+    def subscribe(self, event_type: str, handler: OutboxHandler):
+        self._handlers.setdefault(event_type, []).append(handler)
+
+    def wake(self):
+        """Poll now instead of waiting for the next interval"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self):
+        if self._task is None:
+            async with self.session_factory() as session:
+                oldest = await session.scalar(
+                    select(func.min(OutboxEvent.id)).where(OutboxEvent.dispatched_at.is_(None))
+                )
+            self._cursor = oldest - 1 if oldest is not None else 0
+            self._drain_lock = asyncio.Lock()
+            self._reset_stats()
+            self._stopping = False
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Drain what is already in the outbox, then stop polling"""
+        if self._task is None:
+            return
+        # Ask the loop to exit rather than cancelling it: on Python < 3.12 a
+        # cancel that lands as the wakeup fires is swallowed by wait_for
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        try:
+            while await self.drain_once() == self.batch_size:
+                pass
+        except Exception as e:
+            logger.error(f"Final outbox drain failed: {e}")
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                drained = await self.drain_once()
+            except Exception as e:
+                logger.error(f"Outbox relay poll failed: {e}")
+                drained = 0
+            if time.monotonic() >= self._next_prune:
+                self._next_prune = time.monotonic() + self.prune_interval
+                try:
+                    await self.prune_once()
+                except Exception as e:
+                    logger.error(f"Outbox prune failed: {e}")
+            if drained == self.batch_size:
+                continue  # Backlog: keep draining without waiting
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def drain_once(self) -> int:
+        """Dispatch one batch; returns the number of events marked done"""
+        async with self._drain_lock:
+            return await self._drain_batch()
+
+    async def _drain_batch(self) -> int:
+        async with self.session_factory() as session:
+            events = (await session.scalars(
+                select(OutboxEvent)
+                .where(OutboxEvent.id > self._cursor, OutboxEvent.dispatched_at.is_(None))
+                .order_by(OutboxEvent.id)
+                .limit(self.batch_size)
+            )).all()
+            if not events:
+                self.last_lag_seconds = 0.0
+                return 0
+
+            done = []
+            for event in events:
+                try:
+                    for handler in self._handlers.get(event.event_type, ()):
+                        result = handler(event)
+                        if asyncio.iscoroutine(result):
+                            await result
+                except Exception as e:
+                    self.failures += 1
+                    logger.error(f"Outbox handler failed for event {event.id} ({event.event_type}): {e}")
+                    break
+                done.append(event)
+            if not done:
+                return 0
+
+            ids = [event.id for event in done]
+
+            async def mark_done(conn):
+                await conn.execute(
+                    update(OutboxEvent.__table__)
+                    .where(OutboxEvent.id.in_(ids))
+                    .values(dispatched_at=datetime.utcnow())
+                )
+
+            await run_write(session, mark_done)
+
+        self._cursor = ids[-1]
+        self.dispatched += len(done)
+        self.last_lag_seconds = (datetime.utcnow() - done[0].created_at).total_seconds()
+        self._drained.append((time.monotonic(), len(done)))
+        return len(done)
+
+    async def prune_once(self) -> int:
+        """Delete events dispatched before the retention window; returns the number deleted"""
+        cutoff = datetime.utcnow() - self.retention
+        expired = (
+            select(OutboxEvent.id)
+            .where(OutboxEvent.dispatched_at < cutoff)
+            .limit(self.batch_size)
+            .scalar_subquery()
+        )
+        stmt = delete(OutboxEvent.__table__).where(OutboxEvent.id.in_(expired))
+
+        async def delete_batch(conn):
+            return (await conn.execute(stmt)).rowcount
+
+        pruned = 0
+        while True:
+            async with self.session_factory() as session:
+                deleted = await run_write(session, delete_batch)
+            pruned += deleted
+            if deleted < self.batch_size:
+                break
+        self.pruned += pruned
+        if pruned:
+            logger.info(f"Pruned {pruned} dispatched outbox events")
+        return pruned
+
+    async def backlog(self) -> int:
+        """Number of events not yet dispatched"""
+        async with self.session_factory() as session:
+            return await session.scalar(
+                select(func.count()).select_from(OutboxEvent).where(OutboxEvent.dispatched_at.is_(None))
+            )
+
+    def stats(self) -> dict:
+        drain_rate = 0.0
+        if len(self._drained) > 1:
+            span = self._drained[-1][0] - self._drained[0][0]
+            if span > 0:
+                drain_rate = sum(n for _, n in list(self._drained)[1:]) / span
+        return {
+            "cursor": self._cursor,
+            "dispatched": self.dispatched,
+            "handler_failures": self.failures,
+            "pruned": self.pruned,
+            "lag_seconds": self.last_lag_seconds,
+            "drain_rate_per_second": drain_rate,
+        }
+
+
+# Global relay started with the application
+outbox_relay = OutboxRelay()
@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Row, insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.config import get_settings
+from app.db.models import Ride
+from app.db.session import SessionLocal, run_write
+from app.services.outbox import RIDE_CREATED, write_outbox
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+_RIDE_COLUMNS = tuple(Ride.__table__.c)
+
+
+async def insert_ride_rows(conn: AsyncConnection, rows: Sequence[Dict[str, Any]]) -> List[Row]:
+    """
+    Insert ``rows`` with one multi-row INSERT … RETURNING.
+
+    The result is in parameter order: ``result[i]`` is the Core row (every
+    rides column) built from ``rows[i]``, so ids and defaults come back
+    without a second SELECT. A ``ride.created`` outbox event per ride is
+    written in the same transaction.
+    """
+    # SQLite can only batch RETURNING without sort_by_parameter_order; rows of
+    # one multi-row INSERT get ascending rowids in VALUES order, so sort on id
+    stmt = insert(Ride.__table__).returning(*_RIDE_COLUMNS)
+    result = await conn.execute(stmt, list(rows))
+    rides = sorted(result, key=lambda row: row.id)
+    await write_outbox(conn, RIDE_CREATED, rides)
+    return rides
+
+
+async def insert_rides(conn: AsyncConnection, rows: Sequence[Dict[str, Any]]) -> List[Ride]:
+    """``insert_ride_rows`` returning plain transient ``Ride`` objects"""
+    return [Ride(**row._mapping) for row in await insert_ride_rows(conn, rows)]
+
+
+class RideInsertBatcher:
+    """
+    Coalesces concurrent ride inserts into one statement and one commit.
+
+    The first ``submit`` opens a window of ``max_wait_ms``. Everything that
+    arrives before it closes (up to ``max_batch`` rows) is written with a
+    single multi-row INSERT … RETURNING, and each caller's future resolves
+    with its own row. Inserts that arrive while a batch is committing queue
+    up for the next one.
+    """
+
+    def __init__(
+        self,
+        max_batch: int = settings.ride_insert_max_batch,
+        max_wait_ms: float = settings.ride_insert_max_wait_ms,
+        session_factory=SessionLocal,
+    ):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.session_factory = session_factory
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.rows = 0
+        self.failed_batches = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush queued inserts, then stop the batching task"""
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def submit(self, values: Dict[str, Any]) -> Ride:
+        """Queue one ride row and wait until its batch has committed"""
+        if self._task is None:
+            raise RuntimeError("Ride insert batcher is not running")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((values, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[Dict[str, Any], asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            try:
+                await self._flush(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _flush(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        batch = [(values, future) for values, future in batch if not future.cancelled()]
+        if not batch:
+            return
+        try:
+            async with self.session_factory() as session:
+                rides = await run_write(session, lambda conn: insert_rides(conn, [v for v, _ in batch]))
+        except Exception as e:
+            self.failed_batches += 1
+            logger.error(f"Batched insert of {len(batch)} rides failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.rows += len(rides)
+        for (_, future), ride in zip(batch, rides):
+            if not future.done():
+                future.set_result(ride)
+
+    def stats(self) -> dict:
+        return {
+            "depth": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self.batches,
+            "rows": self.rows,
+            "failed_batches": self.failed_batches,
+            "avg_batch": self.rows / self.batches if self.batches else 0.0,
+        }
+
+
+# Global batcher started with the application
+ride_insert_batcher = RideInsertBatcher()
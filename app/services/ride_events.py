@@ -0,0 +1,226 @@
+import asyncio
+import json
+import logging
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Protocol, Set
+
+from app.core.config import get_settings
+from app.services.geo_index import PendingRideIndex, haversine_km, pending_ride_index
+from app.utils.ride_json import dumps_ride, dumps_rides, ride_row
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+RIDE_CREATED = "ride.created"
+RIDE_ACCEPTED = "ride.accepted"
+RIDE_WITHDRAWN = "ride.withdrawn"
+RIDE_OFFERED = "ride.offered"
+RIDE_OFFER_EXPIRED = "ride.offer_expired"
+SNAPSHOT = "snapshot"
+EVICTED = "evicted"
+
+# Queued in place of an event to tell an evicted subscriber to hang up
+_EVICTED = object()
+
+
+def encode_sse(event: str, data: str) -> bytes:
+    return f"event: {event}\ndata: {data}\n\n".encode()
+
+
+class RideWatcher(Protocol):
+    """In-process observer of the pending set, called synchronously as changes are published"""
+
+    def ride_created(self, ride) -> None:
+        ...
+
+    def ride_removed(self, ride_id: int, accepted: bool) -> None:
+        ...
+
+
+class Subscription:
+    """One feed connection: a bounded queue of encoded SSE frames plus an optional pickup filter"""
+
+    __slots__ = ("queue", "lat", "lon", "radius_km", "driver_id", "evicted")
+
+    def __init__(
+        self,
+        max_queue: int,
+        lat: Optional[float],
+        lon: Optional[float],
+        radius_km: Optional[float],
+        driver_id: Optional[str] = None,
+    ):
+        self.queue: asyncio.Queue = asyncio.Queue(max_queue)
+        self.lat = lat
+        self.lon = lon
+        self.radius_km = radius_km
+        self.driver_id = driver_id
+        self.evicted = False
+
+    def wants(self, pickup_lat: float, pickup_lon: float) -> bool:
+        if self.radius_km is None:
+            return True
+        return haversine_km(self.lat, self.lon, pickup_lat, pickup_lon) <= self.radius_km
+
+    async def next_frame(self, timeout: float):
+        """Next encoded frame, None on timeout, or ``_EVICTED``"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class RideEventBus:
+    """
+    In-process pub/sub for pending-ride changes.
+
+    Each event is serialized once and the same bytes are fanned out to every
+    subscriber with ``put_nowait``, so publishing never blocks the writer. A
+    subscriber whose queue is full is a slow consumer: it is evicted (told to
+    disconnect) instead of growing memory or stalling everyone else.
+
+    Ride offers go only to the connections of the driver they are for.
+    Watchers (the offer scheduler) see every change as it is published.
+    """
+
+    def __init__(self, max_queue: int = settings.ride_feed_queue_size):
+        self.max_queue = max_queue
+        self._subscribers: Set[Subscription] = set()
+        self._by_driver: Dict[str, Set[Subscription]] = {}
+        self._watchers: List[RideWatcher] = []
+        self.published = 0
+        self.delivered = 0
+        self.evicted = 0
+
+    def subscribe(
+        self,
+        lat: Optional[float] = None,
+        lon: Optional[float] = None,
+        radius_km: Optional[float] = None,
+        driver_id: Optional[str] = None,
+    ) -> Subscription:
+        subscription = Subscription(self.max_queue, lat, lon, radius_km, driver_id)
+        self._subscribers.add(subscription)
+        if driver_id is not None:
+            self._by_driver.setdefault(driver_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+        connections = self._by_driver.get(subscription.driver_id)
+        if connections is not None:
+            connections.discard(subscription)
+            if not connections:
+                del self._by_driver[subscription.driver_id]
+
+    def watch(self, watcher: RideWatcher):
+        self._watchers.append(watcher)
+
+    def _notify(self, method: str, *args):
+        for watcher in self._watchers:
+            try:
+                getattr(watcher, method)(*args)
+            except Exception as e:
+                logger.error(f"Ride watcher {method} failed: {e}")
+
+    def _evict(self, subscription: Subscription):
+        self.unsubscribe(subscription)
+        subscription.evicted = True
+        self.evicted += 1
+        # Make room for the hang-up marker so the connection notices immediately
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(_EVICTED)
+
+    def _fan_out(self, frame: bytes, subscribers: Iterable[Subscription]):
+        self.published += 1
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(frame)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                logger.warning("Evicting slow ride feed subscriber")
+                self._evict(subscription)
+
+    def publish_created(self, ride):
+        self._notify("ride_created", ride)
+        if not self._subscribers:
+            return
+        frame = encode_sse(RIDE_CREATED, dumps_ride(ride_row(ride)).decode())
+        self._fan_out(frame, [s for s in self._subscribers if s.wants(ride.pickup_lat, ride.pickup_lon)])
+
+    def _publish_removed(self, event: str, ride_id: int):
+        if not self._subscribers:
+            return
+        self._fan_out(encode_sse(event, json.dumps({"id": ride_id})), list(self._subscribers))
+
+    def publish_accepted(self, ride_id: int):
+        self._notify("ride_removed", ride_id, True)
+        self._publish_removed(RIDE_ACCEPTED, ride_id)
+
+    def publish_withdrawn(self, ride_id: int):
+        self._notify("ride_removed", ride_id, False)
+        self._publish_removed(RIDE_WITHDRAWN, ride_id)
+
+    def publish_offer(self, driver_id: str, ride_json: bytes, expires_in: float) -> bool:
+        """Offer a ride to one driver; returns False if they have no feed connection open"""
+        connections = self._by_driver.get(driver_id)
+        if not connections:
+            return False
+        data = f'{{"expires_in":{expires_in},"ride":{ride_json.decode()}}}'
+        self._fan_out(encode_sse(RIDE_OFFERED, data), list(connections))
+        return True
+
+    def publish_offer_expired(self, driver_id: str, ride_id: int):
+        connections = self._by_driver.get(driver_id)
+        if connections:
+            self._fan_out(encode_sse(RIDE_OFFER_EXPIRED, json.dumps({"id": ride_id})), list(connections))
+
+    async def feed(
+        self,
+        index: PendingRideIndex = pending_ride_index,
+        lat: Optional[float] = None,
+        lon: Optional[float] = None,
+        radius_km: Optional[float] = None,
+        driver_id: Optional[str] = None,
+        snapshot_limit: int = settings.ride_feed_snapshot_limit,
+        heartbeat_seconds: float = settings.ride_feed_heartbeat_seconds,
+    ) -> AsyncIterator[bytes]:
+        """
+        SSE stream: one ``snapshot`` of pending rides, then live deltas.
+
+        The subscription is registered before the snapshot is taken, so no
+        change can fall between the two. Idle connections get a comment line
+        every ``heartbeat_seconds`` to keep proxies from timing them out.
+        With ``driver_id`` the stream also carries that driver's ride offers.
+        """
+        subscription = self.subscribe(lat, lon, radius_km, driver_id)
+        try:
+            if radius_km is not None:
+                rides = [entry for _, entry in index.query(lat, lon, radius_km=radius_km, k=snapshot_limit)]
+            else:
+                rides = index.newest(snapshot_limit)
+            yield encode_sse(SNAPSHOT, dumps_rides(map(ride_row, rides)).decode())
+
+            while True:
+                frame = await subscription.next_frame(heartbeat_seconds)
+                if frame is None:
+                    yield b": keepalive\n\n"
+                elif frame is _EVICTED:
+                    yield encode_sse(EVICTED, json.dumps({"reason": "slow consumer"}))
+                    return
+                else:
+                    yield frame
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "delivered": self.delivered,
+            "evicted": self.evicted,
+        }
+
+
+# Global bus shared by the ride service, the dispatcher and the feed endpoint
+ride_event_bus = RideEventBus()
@@ -0,0 +1,127 @@
+import csv
+import io
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from enum import Enum
+from typing import AsyncIterator, List, Optional, Tuple
+
+from sqlalchemy import Table, or_, select, union_all
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import get_settings
+from app.db.models import Ride, RideArchive, RideStatus
+from app.db.session import export_engine
+from app.utils.ride_json import RIDE_OUT_FIELDS, dumps_ride
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+@dataclass(frozen=True)
+class RideExportFilter:
+    """Which rides to export; ``created_from`` is inclusive and ``created_to`` exclusive"""
+    rider_id: Optional[str] = None
+    driver_id: Optional[str] = None
+    status: Optional[RideStatus] = None
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+class RideExporter:
+    """
+    Streams ride history, live and archived rides together, as NDJSON or CSV.
+
+    Rows come in (created_at, id) order, one keyset page of ``page_size`` at
+    a time. Each page is a single query on its own connection from the
+    read-only export engine, so no transaction outlives a page, writers are
+    never blocked, and memory stays at one page however many rows match.
+    """
+
+    def __init__(self, engine: AsyncEngine = export_engine, page_size: int = settings.export_page_size):
+        self.engine = engine
+        self.page_size = page_size
+
+    def _page(self, table: Table, filters: RideExportFilter, after: Optional[Tuple[datetime, int]]):
+        """The next page of one table, already ordered and limited so its index does the work"""
+        c = table.c
+        stmt = select(*(c[name] for name in RIDE_OUT_FIELDS))
+        if filters.rider_id is not None:
+            stmt = stmt.where(c.rider_id == filters.rider_id)
+        if filters.driver_id is not None:
+            stmt = stmt.where(c.driver_id == filters.driver_id)
+        if filters.status is not None:
+            stmt = stmt.where(c.status == filters.status)
+        if filters.created_from is not None:
+            stmt = stmt.where(c.created_at >= filters.created_from)
+        if filters.created_to is not None:
+            stmt = stmt.where(c.created_at < filters.created_to)
+        if after is not None:
+            created_at, ride_id = after
+            # The bare >= lets SQLite seek the index to the cursor (see
+            # RideService.get_available_rides)
+            stmt = stmt.where(
+                c.created_at >= created_at,
+                or_(c.created_at > created_at, c.id > ride_id),
+            )
+        return stmt.order_by(c.created_at, c.id).limit(self.page_size)
+
+    async def pages(self, filters: RideExportFilter) -> AsyncIterator[List[Row]]:
+        """Yield the matching rides page by page, oldest first"""
+        after = None
+        while True:
+            # A ride moved to the archive between pages keeps its key, so the
+            # cursor still skips it on the other side
+            merged = union_all(
+                self._page(Ride.__table__, filters, after).subquery().select(),
+                self._page(RideArchive.__table__, filters, after).subquery().select(),
+            ).subquery()
+            stmt = select(merged).order_by(merged.c.created_at, merged.c.id).limit(self.page_size)
+            async with self.engine.connect() as conn:
+                page = (await conn.execute(stmt)).all()
+            if page:
+                yield page
+            if len(page) < self.page_size:
+                return
+            after = (page[-1].created_at, page[-1].id)
+
+    async def stream(self, filters: RideExportFilter, fmt: str = "ndjson") -> AsyncIterator[bytes]:
+        """The export as ``fmt`` ("ndjson" or "csv"), one chunk per page"""
+        rows = 0
+        try:
+            if fmt == "csv":
+                buffer = io.StringIO()
+                writer = csv.writer(buffer, lineterminator="\n")
+                writer.writerow(RIDE_OUT_FIELDS)
+                yield buffer.getvalue().encode()
+                async for page in self.pages(filters):
+                    buffer.seek(0)
+                    buffer.truncate()
+                    writer.writerows([_csv_value(value) for value in row] for row in page)
+                    rows += len(page)
+                    yield buffer.getvalue().encode()
+            else:
+                async for page in self.pages(filters):
+                    rows += len(page)
+                    yield b"".join(dumps_ride(row) + b"\n" for row in page)
+        except Exception as e:
+            logger.error(f"Ride export failed after {rows} rows: {e}")
+            raise
+        logger.info(f"Exported {rows} rides as {fmt}")
+
+
+# Global exporter used by the history and admin export routes
+ride_exporter = RideExporter()
@@ -0,0 +1,268 @@
+import asyncio
+import heapq
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.config import get_settings
+from app.services.driver_locations import DriverLocationStore, driver_locations
+from app.services.ride_events import RideEventBus, ride_event_bus
+from app.utils.ride_json import dumps_ride, ride_row
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Rides started per loop pass before yielding to requests
+_ROUNDS_PER_PASS = 100
+
+
+class _RideOffers:
+    """Offer state of one pending ride"""
+
+    __slots__ = ("ride", "ride_json", "created", "round", "radius_km", "offered", "pending")
+
+    def __init__(self, ride, created: float, radius_km: float):
+        self.ride = ride
+        self.ride_json: Optional[bytes] = None
+        self.created = created
+        self.round = 0
+        self.radius_km = radius_km
+        self.offered: Set[str] = set()  # Everyone offered so far, never asked twice
+        self.pending: Set[str] = set()  # Offers of the current round still open
+
+
+class OfferScheduler:
+    """
+    Pushes each new ride to the nearest idle drivers, in rounds.
+
+    A round offers the ride to the ``k`` nearest idle drivers within the
+    current radius who were not offered it before and hold no other open
+    offer. Offers stay open for ``timeout_seconds``; when all of them expire
+    or are declined, the next round widens the radius by ``radius_growth``
+    (up to ``max_radius_km``). A round that finds nobody escalates straight
+    away, and after ``max_rounds`` the ride is left to the available-rides
+    listing. Rounds are never resolved here: drivers accept through the
+    usual endpoint, whose ``status == PENDING`` guard picks the winner, and
+    the ride event bus tells the scheduler when the ride is gone.
+
+    Timeouts live in one heap of ``(deadline, seq, ride_id, round)``. Entries
+    of rides that were accepted, or moved to a later round, are not removed;
+    they are skipped when they reach the top.
+    """
+
+    def __init__(
+        self,
+        locations: DriverLocationStore = driver_locations,
+        events: RideEventBus = ride_event_bus,
+        k: int = settings.ride_offer_k,
+        timeout_seconds: float = settings.ride_offer_timeout_seconds,
+        start_radius_km: float = settings.ride_offer_start_radius_km,
+        radius_growth: float = settings.ride_offer_radius_growth,
+        max_radius_km: float = settings.ride_offer_max_radius_km,
+        max_rounds: int = settings.ride_offer_max_rounds,
+        clock=time.monotonic,
+    ):
+        self.locations = locations
+        self.events = events
+        self.k = k
+        self.timeout_seconds = timeout_seconds
+        self.start_radius_km = start_radius_km
+        self.radius_growth = radius_growth
+        self.max_radius_km = max_radius_km
+        self.max_rounds = max_rounds
+        self.clock = clock
+        self._rides: Dict[int, _RideOffers] = {}
+        self._offer_of: Dict[str, int] = {}  # Driver -> ride of their open offer
+        self._timers: List[Tuple[float, int, int, int]] = []
+        self._seq = 0
+        self._ready: Deque[Tuple[int, int]] = deque()  # (ride_id, round it follows)
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.offers = 0
+        self.expired = 0
+        self.declined = 0
+        self.matched = 0
+        self.exhausted = 0
+        self._match_seconds: Deque[float] = deque(maxlen=1000)
+        self._match_offers: Deque[int] = deque(maxlen=1000)
+        events.watch(self)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def __len__(self) -> int:
+        return len(self._rides)
+
+    async def start(self, pending: Iterable = ()):
+        """Start the loop; ``pending`` rides (already waiting at startup) are offered too"""
+        if self._task is None:
+            for ride in pending:
+                self.ride_created(ride)
+            self._stopping = False
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+
+    def _wake(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    # Ride event bus watcher
+
+    def ride_created(self, ride):
+        if ride.id in self._rides:
+            return
+        self._rides[ride.id] = _RideOffers(ride, self.clock(), self.start_radius_km)
+        self._ready.append((ride.id, 0))
+        self._wake()
+
+    def ride_removed(self, ride_id: int, accepted: bool):
+        state = self._rides.pop(ride_id, None)
+        if state is None:
+            return
+        self._close_offers(state)
+        if accepted and state.offered:
+            self.matched += 1
+            self._match_seconds.append(self.clock() - state.created)
+            self._match_offers.append(len(state.offered))
+
+    def _close_offers(self, state: _RideOffers):
+        for driver_id in state.pending:
+            if self._offer_of.get(driver_id) == state.ride.id:
+                del self._offer_of[driver_id]
+        state.pending.clear()
+
+    def decline(self, ride_id: int, driver_id: str) -> bool:
+        """Driver turns down their open offer; False if they hold no offer for this ride"""
+        if self._offer_of.get(driver_id) != ride_id:
+            return False
+        del self._offer_of[driver_id]
+        state = self._rides[ride_id]
+        state.pending.discard(driver_id)
+        self.declined += 1
+        if not state.pending:
+            # Nobody left to answer this round: move on without waiting it out
+            self._ready.append((ride_id, state.round))
+            self._wake()
+        return True
+
+    def open_offer(self, driver_id: str) -> Optional[int]:
+        return self._offer_of.get(driver_id)
+
+    # Rounds
+
+    def _offer_round(self, state: _RideOffers, now: float):
+        ride = state.ride
+        while True:
+            if state.round >= self.max_rounds:
+                del self._rides[ride.id]
+                self.exhausted += 1
+                logger.info(f"Ride {ride.id}: no driver accepted after {state.round} offer rounds")
+                return
+            if state.round:
+                state.radius_km = min(state.radius_km * self.radius_growth, self.max_radius_km)
+            state.round += 1
+            exclude = state.offered.union(self._offer_of)
+            found = self.locations.nearest_idle(
+                ride.pickup_lat, ride.pickup_lon, k=self.k, radius_km=state.radius_km, exclude=exclude
+            )
+            if found or state.radius_km >= self.max_radius_km:
+                break
+
+        if found:
+            if state.ride_json is None:
+                state.ride_json = dumps_ride(ride_row(ride))
+            for driver_id, _ in found:
+                self._offer_of[driver_id] = ride.id
+                state.offered.add(driver_id)
+                state.pending.add(driver_id)
+                self.events.publish_offer(driver_id, state.ride_json, self.timeout_seconds)
+            self.offers += len(found)
+        # With nobody in reach even at the widest radius, wait a timeout for drivers to come free
+        self._seq += 1
+        heapq.heappush(self._timers, (now + self.timeout_seconds, self._seq, ride.id, state.round))
+
+    def _expire(self, now: float):
+        timers = self._timers
+        while timers and timers[0][0] <= now:
+            _, _, ride_id, round_ = heapq.heappop(timers)
+            state = self._rides.get(ride_id)
+            if state is None or state.round != round_:
+                continue  # Accepted, withdrawn or already in a later round
+            for driver_id in state.pending:
+                self.events.publish_offer_expired(driver_id, ride_id)
+            self.expired += len(state.pending)
+            self._close_offers(state)
+            self._offer_round(state, now)
+
+    def run_due(self) -> Optional[float]:
+        """Start waiting rounds and expire due offers; returns seconds until the next deadline"""
+        now = self.clock()
+        for _ in range(min(len(self._ready), _ROUNDS_PER_PASS)):
+            ride_id, round_ = self._ready.popleft()
+            state = self._rides.get(ride_id)
+            if state is not None and state.round == round_:
+                self._close_offers(state)
+                self._offer_round(state, now)
+        self._expire(now)
+        if self._ready:
+            return 0.0
+        if self._timers:
+            return max(self._timers[0][0] - self.clock(), 0.0)
+        return None
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                delay = self.run_due()
+            except Exception as e:
+                logger.error(f"Ride offer round failed: {e}")
+                delay = self.timeout_seconds
+            if delay == 0.0:
+                await asyncio.sleep(0)
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def clear(self):
+        self._rides.clear()
+        self._offer_of.clear()
+        self._timers.clear()
+        self._ready.clear()
+
+    def stats(self) -> dict:
+        seconds = sorted(self._match_seconds)
+        return {
+            "running": self.running,
+            "rides": len(self._rides),
+            "open_offers": len(self._offer_of),
+            "offers": self.offers,
+            "expired": self.expired,
+            "declined": self.declined,
+            "matched": self.matched,
+            "exhausted": self.exhausted,
+            "median_time_to_match_seconds": seconds[len(seconds) // 2] if seconds else None,
+            "offers_per_match": sum(self._match_offers) / len(self._match_offers) if self._match_offers else None,
+        }
+
+
+# Global scheduler started with the application
+ride_offers = OfferScheduler()
+
+
+def get_ride_offers() -> OfferScheduler:
+    """Dependency accessor for the process-wide offer scheduler"""
+    return ride_offers
@@ -1,26 +1,52 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, and_
+from sqlalchemy import Row, select, update, or_
 from fastapi import HTTPException, status, Depends
-from typing import List
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
 from datetime import datetime
 import logging
 
-from app.db.models import Ride, RideStatus
-from app.schemas.rides import RideCreate, RideOut, RideAccept
-from app.db.session import get_session
+from app.db.models import Ride, RideArchive, RideStatus, UserType
+from app.schemas.rides import BulkRideResult, RideCreate, RideOut, RideAccept
+from app.db.session import get_session, run_write
+from app.core.config import get_settings
+from app.utils.pagination import encode_cursor, decode_cursor
+from app.utils.user_cache import UserPrincipal
+from app.utils.bulk_rides import RIDE_CREATE_FIELDS, validate_ride_columns
+from app.utils.ride_json import RIDE_OUT_COLUMNS, dumps_ride, dumps_rides, ride_row
+from app.services.geo_index import IndexedRide, PendingRideIndex, pending_ride_index
+from app.services.listing_cache import CachedListing, ListingCache, listing_cache
+from app.services.ride_events import RideEventBus, ride_event_bus
+from app.services.outbox import (
+    RIDE_ACCEPTED, RIDE_CANCELLED, RIDE_COMPLETED, OutboxRelay, outbox_relay, write_outbox,
+)
+from app.services.ride_batcher import RideInsertBatcher, insert_ride_rows, insert_rides, ride_insert_batcher
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
 class RideService:
     """Service class for ride operations with dependency injection"""
     
-    def __init__(self, session: AsyncSession):
+    def __init__(
+        self,
+        session: AsyncSession,
+        index: PendingRideIndex = pending_ride_index,
+        inserter: Optional[RideInsertBatcher] = ride_insert_batcher,
+        events: RideEventBus = ride_event_bus,
+        outbox: OutboxRelay = outbox_relay,
+        listings: ListingCache = listing_cache,
+    ):
         self.session = session
+        self.index = index
+        self.inserter = inserter
+        self.events = events
+        self.outbox = outbox
+        self.listings = listings
 
     async def create_ride(self, payload: RideCreate, rider_id: str) -> RideOut:
         """Create a new ride request"""
         try:
-            ride = Ride(
+            values = dict(
                 rider_id=rider_id,
                 pickup_lat=payload.pickup_lat,
                 pickup_lon=payload.pickup_lon,
@@ -30,9 +56,14 @@ class RideService:
                 status=RideStatus.PENDING,
             )
             
-            self.session.add(ride)
-            await self.session.commit()
-            await self.session.refresh(ride)
+            if self.inserter is not None and self.inserter.running:
+                ride = await self.inserter.submit(values)
+            else:
+                rides = await run_write(self.session, lambda conn: insert_rides(conn, [values]))
+                ride = rides[0]
+            self.index.add(ride)
+            self.events.publish_created(ride)
+            self.outbox.wake()
             
             logger.info(f"Created ride {ride.id} for rider {rider_id}")
             return ride
@@ -45,15 +76,85 @@ class RideService:
                 detail="Failed to create ride"
             )
 
-    async def get_available_rides(self) -> List[RideOut]:
-        """Get available rides"""
+    async def create_rides_bulk(
+        self, records: List[Any], rider_id: str, errors: Optional[List[Dict[str, Any]]] = None
+    ) -> BulkRideResult:
+        """
+        Validate and insert many rides for one rider.
+
+        Records are validated column-wise (see ``app.utils.bulk_rides``); the
+        valid ones are inserted ``bulk_rides_chunk_size`` rows per transaction,
+        each chunk one executemany INSERT … RETURNING plus its outbox events.
+        Invalid rows, and the rows of a chunk that fails to commit, are
+        reported in ``errors`` by index. ``errors`` may carry parse errors
+        found before validation.
+        """
+        values, valid, column_errors = validate_ride_columns(records)
+        errors = sorted((errors or []) + column_errors, key=lambda error: error["index"])
+        ids: List[Optional[int]] = [None] * len(records)
+        indices = valid.nonzero()[0].tolist()
+        rows = values[valid].tolist()
+        chunk_size = settings.bulk_rides_chunk_size
+
+        for start in range(0, len(rows), chunk_size):
+            chunk = [
+                dict(zip(RIDE_CREATE_FIELDS, row), rider_id=rider_id, status=RideStatus.PENDING)
+                for row in rows[start:start + chunk_size]
+            ]
+            try:
+                rides = await run_write(self.session, lambda conn: insert_ride_rows(conn, chunk))
+            except Exception as e:
+                await self.session.rollback()
+                logger.error(f"Bulk insert of {len(chunk)} rides for rider {rider_id} failed: {e}")
+                errors.extend(
+                    {"index": i, "field": None, "message": "Failed to insert ride"}
+                    for i in indices[start:start + chunk_size]
+                )
+                continue
+            for i, ride in zip(indices[start:start + chunk_size], rides):
+                ids[i] = ride.id
+                self.index.add(ride)
+                self.events.publish_created(ride)
+            self.outbox.wake()
+
+        inserted = len(ids) - ids.count(None)
+        logger.info(f"Bulk upload by rider {rider_id}: {inserted}/{len(records)} rides inserted")
+        return BulkRideResult(received=len(records), inserted=inserted, ids=ids, errors=errors)
+
+    async def get_available_rides(
+        self, limit: Optional[int] = None, cursor: Optional[str] = None
+    ) -> Tuple[List[Row], Optional[str]]:
+        """
+        Get available rides, newest first, keyset-paginated on (created_at, id).
+
+        Returns the page and the cursor for the next one (None on the last page).
+        Without a limit every pending ride is returned. Rides are plain Core
+        rows in RideOut field order (see ``app.utils.ride_json``), so no ORM
+        objects are built for the listing.
+        """
+        stmt = self._pending_rides_stmt()
+        if cursor is not None:
+            try:
+                created_at, ride_id = decode_cursor(cursor)
+            except ValueError:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Invalid cursor"
+                )
+            # Spelled with a bare <= so SQLite seeks the index to the cursor;
+            # the equivalent "a < x OR (a = x AND id < y)" scans every pending
+            # ride newer than it
+            stmt = stmt.where(
+                Ride.created_at <= created_at,
+                or_(Ride.created_at < created_at, Ride.id < ride_id),
+            )
+        if limit is not None:
+            # One extra row tells us whether another page exists
+            stmt = stmt.limit(limit + 1)
+
         try:
-            stmt = select(Ride).where(Ride.status == RideStatus.PENDING).order_by(Ride.created_at.desc())
             result = await self.session.execute(stmt)
-            rides = result.scalars().all()
-            
-            return rides
-            
+            rides = result.all()
         except Exception as e:
             logger.error(f"Failed to get available rides: {e}")
             raise HTTPException(
@@ -61,45 +162,222 @@ class RideService:
                 detail="Failed to retrieve rides"
             )
 
+        next_cursor = None
+        if limit is not None and len(rides) > limit:
+            rides = rides[:limit]
+            next_cursor = encode_cursor(rides[-1].created_at, rides[-1].id)
+        return rides, next_cursor
+
+    async def get_available_listing(
+        self, limit: Optional[int] = None, cursor: Optional[str] = None
+    ) -> CachedListing:
+        """
+        One page of ``get_available_rides`` serialized to JSON, served from
+        the listing cache while the pending set is unchanged.
+        """
+        async def build() -> CachedListing:
+            rides, next_cursor = await self.get_available_rides(limit=limit, cursor=cursor)
+            return CachedListing(dumps_rides(rides), next_cursor)
+
+        # The version is read before querying: a ride created or taken while
+        # the query runs bumps it, and the cache then drops this build
+        return await self.listings.fetch(self.index.version, ("page", limit, cursor), build)
+
+    async def get_nearby_listing(
+        self,
+        lat: float,
+        lon: float,
+        radius_km: Optional[float] = None,
+        k: Optional[int] = None,
+    ) -> CachedListing:
+        """``get_nearby_rides`` serialized to JSON, served from the listing cache"""
+        async def build() -> CachedListing:
+            rides = await self.get_nearby_rides(lat, lon, radius_km=radius_km, k=k)
+            return CachedListing(dumps_rides(rides))
+
+        return await self.listings.fetch(self.index.version, ("nearby", lat, lon, radius_km, k), build)
+
+    async def stream_available_rides(self) -> AsyncIterator[bytes]:
+        """
+        Yield available rides as NDJSON, newest first, one chunk of lines per
+        ``yield_per`` partition.
+
+        Rows come from a server-side cursor so the full result is never held
+        in memory. The generator owns the session for its lifetime and closes
+        it when done.
+        """
+        stmt = self._pending_rides_stmt().execution_options(yield_per=settings.ride_stream_chunk_size)
+        try:
+            result = await self.session.stream(stmt)
+            async for partition in result.partitions():
+                yield b"".join(dumps_ride(row) + b"\n" for row in partition)
+        except Exception as e:
+            logger.error(f"Failed to stream available rides: {e}")
+            raise
+        finally:
+            await self.session.close()
+
+    @staticmethod
+    def _pending_rides_stmt():
+        return (
+            select(*RIDE_OUT_COLUMNS)
+            .where(Ride.status == RideStatus.PENDING)
+            .order_by(Ride.created_at.desc(), Ride.id.desc())
+        )
+
+    async def get_nearby_rides(
+        self,
+        lat: float,
+        lon: float,
+        radius_km: Optional[float] = None,
+        k: Optional[int] = None,
+    ) -> List[tuple]:
+        """Get pending rides near a driver, nearest pickup first, from the in-memory index, as RideOut rows"""
+        return [ride_row(entry) for _, entry in self.index.query(lat, lon, radius_km=radius_km, k=k)]
+
+    async def get_ride(self, ride_id: int, user: UserPrincipal) -> Union[Ride, RideArchive]:
+        """
+        One ride, from the live table or else the archive.
+
+        Visible to its rider and its assigned driver, and to any driver while
+        it is still pending.
+        """
+        ride = await self.session.get(Ride, ride_id)
+        if ride is None:
+            ride = await self.session.get(RideArchive, ride_id)
+        visible = ride is not None and (
+            user.id in (ride.rider_id, ride.driver_id)
+            or (ride.status == RideStatus.PENDING and user.user_type == UserType.DRIVER)
+        )
+        if not visible:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Ride not found"
+            )
+        return ride
+
+    async def rebuild_pending_index(self) -> int:
+        """Reload the pending ride index from the rides table"""
+        stmt = select(
+            Ride.id, Ride.rider_id, Ride.pickup_lat, Ride.pickup_lon,
+            Ride.dropoff_lat, Ride.dropoff_lon, Ride.price, Ride.created_at,
+        ).where(Ride.status == RideStatus.PENDING)
+        result = await self.session.execute(stmt)
+        count = self.index.rebuild(IndexedRide(*row) for row in result)
+        logger.info(f"Pending ride index rebuilt with {count} rides")
+        return count
+
+    async def _transition(self, ride_id: int, guard, event_type: str, **values) -> Optional[Ride]:
+        """
+        Apply one guarded state change with a single UPDATE … RETURNING.
+
+        ``guard`` is the WHERE clause that must still hold (current status,
+        owner). On success an ``event_type`` outbox event is written in the
+        same transaction. Returns the updated ride, or None if the guard did
+        not match.
+        """
+        stmt = (
+            update(Ride.__table__)
+            .where(Ride.id == ride_id, *guard)
+            .values(**values)
+            .returning(*Ride.__table__.c)
+        )
+
+        async def conditional_update(conn):
+            row = (await conn.execute(stmt)).first()
+            if row is None:
+                return None
+            ride = Ride(**row._mapping)
+            await write_outbox(conn, event_type, [ride])
+            return ride
+
+        ride = await run_write(self.session, conditional_update)
+        if ride is not None:
+            self.outbox.wake()
+        return ride
+
     async def accept_ride(self, ride_id: int, driver_id: str) -> RideOut:
         """Accept a ride with proper concurrency control"""
         try:
-            # Use atomic UPDATE with WHERE conditions for concurrency safety
-            stmt = (
-                update(Ride)
-                .where(
-                    and_(
-                        Ride.id == ride_id,
-                        Ride.status == RideStatus.PENDING  # Only pending rides can be accepted
-                    )
-                )
-                .values(
-                    status=RideStatus.ACCEPTED,
-                    driver_id=driver_id
-                )
-                .execution_options(synchronize_session=False)
+            # Atomic UPDATE guarded on status: only one driver can win a pending ride
+            ride = await self._transition(
+                ride_id,
+                [Ride.status == RideStatus.PENDING],
+                RIDE_ACCEPTED,
+                status=RideStatus.ACCEPTED,
+                driver_id=driver_id,
             )
+            stale = self.index.remove(ride_id)
+            if ride is None:
+                if stale is not None:
+                    self.events.publish_withdrawn(ride_id)
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Ride not found, already accepted, or not available"
+                )
             
-            result = await self.session.execute(stmt)
+            self.events.publish_accepted(ride_id)
+            logger.info(f"Driver {driver_id} accepted ride {ride_id}")
+            return ride
             
-            # Check if exactly one row was affected (ride exists and was pending)
-            if result.rowcount == 0:
+        except HTTPException:
+            await self.session.rollback()
+            raise
+        except Exception as e:
+            await self.session.rollback()
+            logger.error(f"Failed to accept ride {ride_id}: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to accept ride"
+            )
+
+    async def complete_ride(self, ride_id: int, driver_id: str) -> RideOut:
+        """Complete an accepted ride; only its assigned driver may do so"""
+        try:
+            ride = await self._transition(
+                ride_id,
+                [Ride.status == RideStatus.ACCEPTED, Ride.driver_id == driver_id],
+                RIDE_COMPLETED,
+                status=RideStatus.COMPLETED,
+            )
+            if ride is None:
                 raise HTTPException(
                     status_code=status.HTTP_409_CONFLICT,
-                    detail="Ride not found, already accepted, or not available"
+                    detail="Ride not found, not accepted by this driver, or already completed"
                 )
             
-            await self.session.commit()
+            logger.info(f"Driver {driver_id} completed ride {ride_id}")
+            return ride
             
-            # Fetch the updated ride
-            ride = await self.session.get(Ride, ride_id)
-            if not ride:
+        except HTTPException:
+            await self.session.rollback()
+            raise
+        except Exception as e:
+            await self.session.rollback()
+            logger.error(f"Failed to complete ride {ride_id}: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to complete ride"
+            )
+
+    async def cancel_ride(self, ride_id: int, rider_id: str) -> RideOut:
+        """Cancel a pending ride; only the rider who requested it may do so"""
+        try:
+            ride = await self._transition(
+                ride_id,
+                [Ride.status == RideStatus.PENDING, Ride.rider_id == rider_id],
+                RIDE_CANCELLED,
+                status=RideStatus.CANCELLED,
+            )
+            if ride is None:
                 raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Ride not found after acceptance"
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Ride not found, not yours, or no longer pending"
                 )
+            self.index.remove(ride_id)
+            self.events.publish_withdrawn(ride_id)
             
-            logger.info(f"Driver {driver_id} accepted ride {ride_id}")
+            logger.info(f"Rider {rider_id} cancelled ride {ride_id}")
             return ride
             
         except HTTPException:
@@ -107,10 +385,10 @@ class RideService:
             raise
         except Exception as e:
             await self.session.rollback()
-            logger.error(f"Failed to accept ride {ride_id}: {e}")
+            logger.error(f"Failed to cancel ride {ride_id}: {e}")
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to accept ride"
+                detail="Failed to cancel ride"
             )
 
 # Dependency injection function
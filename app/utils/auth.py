@@ -1,19 +1,30 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
+import hashlib
+import hmac
+import secrets
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from fastapi import HTTPException, status, Depends
+from fastapi import HTTPException, Header, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from app.core.config import get_settings
-from app.db.session import get_session
+from app.core.profiling import is_admin_token, phase
+from app.db.session import SessionLocal
 from app.db.models import User, UserType
+from app.utils.user_cache import UserPrincipal, user_cache
+from app.utils.password_hashing import PasswordWorkerPool
 
 settings = get_settings()
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
+password_pool = PasswordWorkerPool(
+    max_workers=settings.password_hash_workers,
+    max_pending=settings.password_hash_max_pending,
+    use_processes=settings.password_hash_use_processes,
+)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
@@ -23,6 +34,14 @@ def get_password_hash(password: str) -> str:
     """Generate password hash"""
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the password worker pool (503 when saturated)"""
+    return await password_pool.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Generate a password hash on the password worker pool (503 when saturated)"""
+    return await password_pool.run(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token"""
     to_encode = data.copy()
@@ -35,6 +54,15 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
     return encoded_jwt
 
+def hash_refresh_token(token: str) -> str:
+    """HMAC-SHA256 of an opaque refresh token, as stored in refresh_tokens.token_hash"""
+    return hmac.new(settings.secret_key.encode(), token.encode(), hashlib.sha256).hexdigest()
+
+def create_refresh_token() -> Tuple[str, str]:
+    """Create an opaque refresh token; returns (token, token_hash)"""
+    token = secrets.token_urlsafe(32)
+    return token, hash_refresh_token(token)
+
 def verify_token(token: str) -> dict:
     """Verify and decode JWT token"""
     credentials_exception = HTTPException(
@@ -58,15 +86,27 @@ def verify_token(token: str) -> dict:
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    session: AsyncSession = Depends(get_session)
-) -> User:
-    """Get current authenticated user"""
-    token = credentials.credentials
+) -> UserPrincipal:
+    """
+    Get current authenticated user.
+
+    Principals are served from the user cache; only a miss opens a session
+    and reads the users table.
+    """
+    with phase("auth"):
+        return await _load_principal(credentials.credentials)
+
+async def _load_principal(token: str) -> UserPrincipal:
     token_data = verify_token(token)
     
-    stmt = select(User).where(User.id == token_data["user_id"], User.is_active == True)
-    result = await session.execute(stmt)
-    user = result.scalar_one_or_none()
+    principal = user_cache.get(token_data["user_id"])
+    if principal is not None:
+        return principal
+    
+    async with SessionLocal() as session:
+        stmt = select(User).where(User.id == token_data["user_id"], User.is_active == True)
+        result = await session.execute(stmt)
+        user = result.scalar_one_or_none()
     
     if user is None:
         raise HTTPException(
@@ -74,9 +114,11 @@ async def get_current_user(
             detail="User not found or inactive",
         )
     
-    return user
+    principal = UserPrincipal.from_user(user)
+    user_cache.set(principal)
+    return principal
 
-async def get_current_rider(current_user: User = Depends(get_current_user)) -> User:
+async def get_current_rider(current_user: UserPrincipal = Depends(get_current_user)) -> UserPrincipal:
     """Get current user and verify they are a rider"""
     if current_user.user_type != UserType.RIDER:
         raise HTTPException(
@@ -85,7 +127,7 @@ async def get_current_rider(current_user: User = Depends(get_current_user)) -> U
         )
     return current_user
 
-async def get_current_driver(current_user: User = Depends(get_current_user)) -> User:
+async def get_current_driver(current_user: UserPrincipal = Depends(get_current_user)) -> UserPrincipal:
     """Get current user and verify they are a driver"""
     if current_user.user_type != UserType.DRIVER:
         raise HTTPException(
@@ -94,6 +136,14 @@ async def get_current_driver(current_user: User = Depends(get_current_user)) ->
         )
     return current_user
 
+async def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Allow the request only with a valid X-Admin-Token (admin access is off while ADMIN_TOKEN is unset)"""
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin token required"
+        )
+
 async def authenticate_user(email: str, password: str, session: AsyncSession) -> Optional[User]:
     """Authenticate user by email and password"""
     stmt = select(User).where(User.email == email, User.is_active == True)
@@ -102,7 +152,7 @@ async def authenticate_user(email: str, password: str, session: AsyncSession) ->
     
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
         return None
     
     return user
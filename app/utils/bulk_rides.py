@@ -0,0 +1,124 @@
+from typing import Any, Dict, List, Set, Tuple
+
+import numpy as np
+import orjson
+
+from app.schemas.rides import RideCreate
+
+# RideCreate's fields, in declaration order, and the ones that make up a trip
+RIDE_CREATE_FIELDS = tuple(RideCreate.model_fields)
+TRIP_FIELDS = RIDE_CREATE_FIELDS[:4]
+
+# (low, high, message) per field, the same bounds RideCreate enforces;
+# price only has a lower bound, which is exclusive
+_BOUNDS = {
+    "pickup_lat": (-90.0, 90.0, "Latitude must be between -90 and 90"),
+    "dropoff_lat": (-90.0, 90.0, "Latitude must be between -90 and 90"),
+    "pickup_lon": (-180.0, 180.0, "Longitude must be between -180 and 180"),
+    "dropoff_lon": (-180.0, 180.0, "Longitude must be between -180 and 180"),
+    "price": (0.0, None, "Price must be positive"),
+}
+
+# Placeholder for an NDJSON line that is not valid JSON (its error is already recorded)
+UNPARSEABLE = object()
+
+
+def _error(index: int, field, message: str) -> Dict[str, Any]:
+    return {"index": index, "field": field, "message": message}
+
+
+def parse_ride_records(body: bytes, ndjson: bool) -> Tuple[List[Any], List[Dict[str, Any]]]:
+    """
+    Decode a bulk upload: a JSON array, or one JSON object per line.
+
+    Returns the records and the per-record parse errors. A bad NDJSON line
+    becomes ``UNPARSEABLE`` so later records keep their index; blank lines
+    are skipped. A body that is not a JSON array raises ValueError.
+    """
+    if not ndjson:
+        try:
+            records = orjson.loads(body)
+        except orjson.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e}") from e
+        if not isinstance(records, list):
+            raise ValueError("Expected a JSON array of rides")
+        return records, []
+
+    records, errors = [], []
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        try:
+            records.append(orjson.loads(line))
+        except orjson.JSONDecodeError:
+            errors.append(_error(len(records), None, "Invalid JSON"))
+            records.append(UNPARSEABLE)
+    return records, errors
+
+
+def float_column(records: List[Any], field: str) -> Tuple[np.ndarray, Set[int]]:
+    """
+    One field of every record as float64, coerced like Pydantic's lax float
+    (numbers, numeric strings, booleans). Returns the column and the indices
+    of values that are not numbers at all; those and missing values are NaN.
+    """
+    values = [record.get(field) if type(record) is dict else None for record in records]
+    try:
+        column = np.array(values, dtype=np.float64)
+        if column.ndim == 1:
+            return column, set()
+    except (TypeError, ValueError, OverflowError):
+        pass
+    column = np.empty(len(values))
+    invalid = set()
+    for i, value in enumerate(values):
+        try:
+            column[i] = np.nan if value is None else float(value)
+        except (TypeError, ValueError, OverflowError):
+            column[i] = np.nan
+            invalid.add(i)
+    return column, invalid
+
+
+def validate_ride_columns(
+    records: List[Any], fields: Tuple[str, ...] = RIDE_CREATE_FIELDS
+) -> Tuple[np.ndarray, np.ndarray, List[Dict[str, Any]]]:
+    """
+    Validate bulk ride records column by column, as ``RideCreate`` would row by row.
+
+    Returns ``(values, valid, errors)``: a (len(records), len(fields)) float
+    array in ``fields`` order, a boolean mask of the records that passed, and
+    one ``{"index", "field", "message"}`` error per failed check. Only the
+    records that fail are looked at individually.
+    """
+    count = len(records)
+    values = np.empty((count, len(fields)))
+    failed = np.zeros(count, dtype=bool)
+    errors = []
+
+    not_objects = [i for i, record in enumerate(records) if type(record) is not dict]
+    for i in not_objects:
+        if records[i] is not UNPARSEABLE:
+            errors.append(_error(i, None, "Input should be an object"))
+    failed[not_objects] = True
+
+    for j, field in enumerate(fields):
+        column, invalid = float_column(records, field)
+        values[:, j] = column
+        low, high, message = _BOUNDS[field]
+        # NaN (missing, null or unparseable) fails both comparisons
+        in_range = column > low if high is None else (column >= low) & (column <= high)
+        for i in np.flatnonzero(~in_range).tolist():
+            record = records[i]
+            if type(record) is not dict:
+                continue
+            if field not in record:
+                errors.append(_error(i, field, "Field required"))
+            elif record[field] is None or i in invalid:
+                errors.append(_error(i, field, "Input should be a valid number"))
+            else:
+                errors.append(_error(i, field, message))
+        failed |= ~in_range
+
+    errors.sort(key=lambda error: error["index"])
+    return values, ~failed, errors
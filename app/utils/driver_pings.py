@@ -0,0 +1,104 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import orjson
+
+from app.utils.bulk_rides import float_column
+
+# Ping fields: driver_id, lat and lon are required
+_BOUNDS = {
+    "lat": (-90.0, 90.0, "Latitude must be between -90 and 90"),
+    "lon": (-180.0, 180.0, "Longitude must be between -180 and 180"),
+}
+MAX_DRIVER_ID_LENGTH = 64
+
+# ``available`` of a ping that leaves the driver's duty state as it is
+KEEP = -1
+
+
+@dataclass(frozen=True)
+class PingBatch:
+    """The valid pings of a batch, column by column"""
+    driver_ids: List[str]
+    lat: np.ndarray
+    lon: np.ndarray
+    available: np.ndarray  # int8: 1, 0 or KEEP
+    ts: np.ndarray  # Epoch seconds, NaN when the ping has none
+
+
+def _error(index: int, field, message: str) -> Dict[str, Any]:
+    return {"index": index, "field": field, "message": message}
+
+
+def parse_ping_batch(body: bytes) -> List[Any]:
+    """Decode a gateway batch, which must be a JSON array; raises ValueError otherwise"""
+    try:
+        records = orjson.loads(body)
+    except orjson.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON: {e}") from e
+    if not isinstance(records, list):
+        raise ValueError("Expected a JSON array of pings")
+    return records
+
+
+def validate_pings(records: List[Any]) -> Tuple[PingBatch, List[Dict[str, Any]]]:
+    """
+    Validate ``{"driver_id", "lat", "lon", "available"?, "ts"?}`` pings column by column.
+
+    Returns the valid pings and one ``{"index", "field", "message"}`` error
+    per failed check, in the style of ``validate_ride_columns``.
+    """
+    count = len(records)
+    failed = np.zeros(count, dtype=bool)
+    errors = []
+
+    driver_ids = []
+    available = np.full(count, KEEP, dtype=np.int8)
+    for i, record in enumerate(records):
+        if type(record) is not dict:
+            errors.append(_error(i, None, "Input should be an object"))
+            failed[i] = True
+            driver_ids.append("")
+            continue
+        driver_id = record.get("driver_id")
+        if type(driver_id) is not str or not 0 < len(driver_id) <= MAX_DRIVER_ID_LENGTH:
+            errors.append(_error(i, "driver_id", "Field required" if driver_id is None else "Invalid driver id"))
+            failed[i] = True
+        driver_ids.append(driver_id)
+        flag = record.get("available")
+        if flag is not None:
+            if type(flag) is bool:
+                available[i] = flag
+            else:
+                errors.append(_error(i, "available", "Input should be a valid boolean"))
+                failed[i] = True
+
+    columns = {}
+    for field, (low, high, message) in _BOUNDS.items():
+        column, invalid = float_column(records, field)
+        columns[field] = column
+        # NaN (missing, null or unparseable) fails both comparisons
+        for i in np.flatnonzero(~((column >= low) & (column <= high))).tolist():
+            record = records[i]
+            if type(record) is not dict:
+                continue
+            if field not in record:
+                errors.append(_error(i, field, "Field required"))
+            elif record[field] is None or i in invalid:
+                errors.append(_error(i, field, "Input should be a valid number"))
+            else:
+                errors.append(_error(i, field, message))
+            failed[i] = True
+
+    ts, invalid = float_column(records, "ts")
+    for i in sorted(invalid):
+        errors.append(_error(i, "ts", "Input should be a valid number"))
+        failed[i] = True
+
+    errors.sort(key=lambda error: error["index"])
+    valid = ~failed
+    if failed.any():
+        driver_ids = [driver_id for driver_id, ok in zip(driver_ids, valid.tolist()) if ok]
+    batch = PingBatch(driver_ids, columns["lat"][valid], columns["lon"][valid], available[valid], ts[valid])
+    return batch, errors
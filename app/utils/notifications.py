@@ -1,13 +1,309 @@
+import asyncio
+import collections
 import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Protocol
+
+from app.core.config import get_settings
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+@dataclass(frozen=True)
+class Notification:
+    """A message for one destination (for riders, their user id)"""
+    destination: str
+    message: str
+    payload: Dict[str, Any] = field(default_factory=dict)
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class NotificationRejected(Exception):
+    """The provider refused the batch; retrying will not help"""
+
+
+class NotificationSink(Protocol):
+    async def send(self, destination: str, batch: List[Notification]) -> None:
+        """Deliver ``batch`` to ``destination``; raise to have it retried"""
+        ...
+
+    async def close(self) -> None:
+        ...
+
+
+class LogSink:
+    """Simulated delivery: print and log each message (the original assignment behaviour)"""
+
+    async def send(self, destination: str, batch: List[Notification]) -> None:
+        for notification in batch:
+            print(notification.message)
+            logger.info(notification.message)
+
+    async def close(self) -> None:
+        pass
+
+
+class HttpSink:
+    """
+    POSTs each destination's batch as JSON to a push provider.
+
+    5xx and transport errors are retried by the dispatcher; any other
+    non-2xx response raises NotificationRejected and the batch is dropped.
+    """
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        import httpx
+
+        self.url = url
+        self._client = httpx.AsyncClient(timeout=timeout)
+
+    async def send(self, destination: str, batch: List[Notification]) -> None:
+        response = await self._client.post(self.url, json={
+            "destination": destination,
+            "notifications": [{"message": n.message, **n.payload} for n in batch],
+        })
+        if response.status_code >= 500:
+            response.raise_for_status()
+        if response.status_code >= 300:
+            raise NotificationRejected(f"{response.status_code} from {self.url}")
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+def build_sink(kind: str = settings.notification_sink, url: Optional[str] = settings.notification_http_url):
+    if kind == "http":
+        if not url:
+            raise ValueError("NOTIFICATION_HTTP_URL is required for the http notification sink")
+        return HttpSink(url, timeout=settings.notification_http_timeout_seconds)
+    if kind == "log":
+        return LogSink()
+    raise ValueError(f"Unknown notification sink: {kind}")
+
+
+class NotificationDispatcher:
+    """
+    Delivers notifications off the request path.
+
+    ``enqueue`` never blocks: it puts the message on a bounded queue and
+    returns False (counted as dropped) when the queue is full. ``submit``
+    holds such a message back instead, up to ``max_deferred`` of them, and
+    they move into the queue as it drains. A collector task waits up to ``batch_wait_ms`` after the first message and groups
+    what has arrived by destination, at most ``batch_size`` per batch. A
+    pool of ``workers`` sends the batches. Failed sends are retried up to
+    ``max_retries`` times with capped exponential backoff and full jitter.
+    """
+
+    def __init__(
+        self,
+        sink: Optional[NotificationSink] = None,
+        workers: int = settings.notification_workers,
+        max_queue: int = settings.notification_queue_size,
+        max_deferred: int = settings.notification_deferred_max,
+        batch_size: int = settings.notification_batch_size,
+        batch_wait_ms: float = settings.notification_batch_wait_ms,
+        max_retries: int = settings.notification_max_retries,
+        retry_base_ms: float = settings.notification_retry_base_ms,
+        retry_max_ms: float = settings.notification_retry_max_ms,
+    ):
+        self.sink = sink
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_deferred = max_deferred
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait_ms / 1000
+        self.max_retries = max_retries
+        self.retry_base = retry_base_ms / 1000
+        self.retry_max = retry_max_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._ready: Optional[asyncio.Queue] = None
+        self._deferred: Deque[Notification] = collections.deque()
+        self._tasks: List[asyncio.Task] = []
+        self._owns_sink = False
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.enqueued = 0
+        self.dropped = 0
+        self.deferred = 0
+        self.delivered = 0
+        self.failed = 0
+        self.batches = 0
+        self.retries = 0
+        self.started_at = time.monotonic()
+        self._latencies: Deque[float] = collections.deque(maxlen=10000)
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self):
+        if self._tasks:
+            return
+        if self.sink is None:
+            self.sink = build_sink()
+            self._owns_sink = True
+        self._reset_stats()
+        self._queue = asyncio.Queue(self.max_queue)
+        self._ready = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._collect())]
+        self._tasks += [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Deliver everything already queued, then stop the collector and workers"""
+        if not self._tasks:
+            return
+        # Held-back messages are refilled before the ones taken are marked
+        # done, so the join also waits for them
+        await self._queue.join()
+        await self._ready.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._owns_sink:
+            await self.sink.close()
+            self.sink = None
+            self._owns_sink = False
+
+    def _put(self, notification: Notification) -> bool:
+        if not self._tasks:
+            raise RuntimeError("Notification dispatcher is not running")
+        try:
+            self._queue.put_nowait(notification)
+        except asyncio.QueueFull:
+            return False
+        self.enqueued += 1
+        return True
+
+    def _drop(self, notification: Notification) -> bool:
+        self.dropped += 1
+        logger.warning(f"Notification queue full, dropping message for {notification.destination}")
+        return False
+
+    def enqueue(self, notification: Notification) -> bool:
+        """Queue a notification without waiting; False if it was dropped"""
+        return self._put(notification) or self._drop(notification)
+
+    def submit(self, notification: Notification) -> bool:
+        """
+        Queue a notification without waiting, holding it back while the queue
+        is full; False only if it was dropped because too many are held back.
+        """
+        self._refill()
+        if not self._deferred and self._put(notification):
+            return True
+        if len(self._deferred) >= self.max_deferred:
+            return self._drop(notification)
+        self._deferred.append(notification)
+        self.deferred += 1
+        return True
+
+    def _refill(self):
+        while self._deferred and self._put(self._deferred[0]):
+            self._deferred.popleft()
+
+    async def _collect(self):
+        while True:
+            taken = [await self._queue.get()]
+            deadline = time.monotonic() + self.batch_wait
+            while True:
+                if not self._queue.empty():
+                    taken.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    taken.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            by_destination: Dict[str, List[Notification]] = {}
+            for notification in taken:
+                by_destination.setdefault(notification.destination, []).append(notification)
+            for destination, notifications in by_destination.items():
+                for i in range(0, len(notifications), self.batch_size):
+                    self._ready.put_nowait((destination, notifications[i:i + self.batch_size]))
+            self._refill()
+            for _ in taken:
+                self._queue.task_done()
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.retry_max, self.retry_base * 2 ** attempt))
+
+    async def _work(self):
+        while True:
+            destination, batch = await self._ready.get()
+            try:
+                await self._deliver(destination, batch)
+            finally:
+                self._ready.task_done()
+
+    async def _deliver(self, destination: str, batch: List[Notification]):
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self.sink.send(destination, batch)
+            except NotificationRejected as e:
+                logger.error(f"Notification batch for {destination} rejected: {e}")
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    logger.error(f"Notification batch for {destination} failed after {attempt + 1} attempts: {e}")
+                    break
+                self.retries += 1
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+            now = time.monotonic()
+            self.batches += 1
+            self.delivered += len(batch)
+            self._latencies.extend(now - n.enqueued_at for n in batch)
+            return
+        self.failed += len(batch)
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies)
+        elapsed = time.monotonic() - self.started_at
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "ready_batches": self._ready.qsize() if self._ready is not None else 0,
+            "held_back": len(self._deferred),
+            "enqueued": self.enqueued,
+            "deferred": self.deferred,
+            "dropped": self.dropped,
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "batches": self.batches,
+            "retries": self.retries,
+            "avg_batch": self.delivered / self.batches if self.batches else 0.0,
+            "delivered_per_second": self.delivered / elapsed if elapsed > 0 else 0.0,
+            "p50_latency_ms": 1000 * latencies[len(latencies) // 2] if latencies else 0.0,
+            "p99_latency_ms": 1000 * latencies[int(0.99 * (len(latencies) - 1))] if latencies else 0.0,
+        }
+
+
+# Global dispatcher started with the application
+notification_dispatcher = NotificationDispatcher()
+
+
+def notify_rider(rider_id: str, ride_id: int, driver_id: str) -> bool:
+    """
+    Notify rider when their ride is accepted; only enqueues, delivery happens on the dispatcher.
 
-def notify_rider(rider_id: str, ride_id: int, driver_id: str):
-    """Notify rider via background task when ride is accepted (simulated with print/log)"""
+    Returns False if the dispatcher was too far behind and the notification was dropped.
+    """
     notification_message = f"🚗 NOTIFICATION: Rider {rider_id}, your ride {ride_id} was accepted by driver {driver_id}"
-    
-    # Print to console (as per assignment requirement)
+    notification = Notification(
+        destination=rider_id,
+        message=notification_message,
+        payload={"event": "ride.accepted", "ride_id": ride_id, "driver_id": driver_id},
+    )
+    if notification_dispatcher.running:
+        return notification_dispatcher.submit(notification)
+    # Outside the app lifespan (scripts, benchmarks) fall back to logging inline
     print(notification_message)
-    
-    # Also log it
-    logger.info(notification_message)
\ No newline at end of file
+    logger.info(notification_message)
+    return True
@@ -0,0 +1,31 @@
+from operator import attrgetter
+from typing import Iterable, Sequence
+
+import orjson
+
+from app.db.models import Ride
+from app.schemas.rides import RideOut
+
+# RideOut's fields in declaration order, and the matching Core columns, so
+# rows selected with RIDE_OUT_COLUMNS line up with RIDE_OUT_FIELDS
+RIDE_OUT_FIELDS = tuple(RideOut.model_fields)
+RIDE_OUT_COLUMNS = tuple(Ride.__table__.c[name] for name in RIDE_OUT_FIELDS)
+
+# Works for Ride, IndexedRide and Core rows alike
+ride_row = attrgetter(*RIDE_OUT_FIELDS)
+
+
+def dumps_ride(row: Sequence) -> bytes:
+    """One ride row as JSON bytes, byte-identical to ``RideOut(...).model_dump_json()``"""
+    return orjson.dumps(dict(zip(RIDE_OUT_FIELDS, row)))
+
+
+def dumps_rides(rows: Iterable[Sequence]) -> bytes:
+    """
+    A JSON array of ride rows, byte-identical to ``List[RideOut]`` output.
+
+    Skips Pydantic entirely: rows must already hold RideOut-compatible values,
+    which is the case for rows read from the rides table (the column types
+    match RideOut's) and for ``ride_row`` of a Ride or an index entry.
+    """
+    return orjson.dumps([dict(zip(RIDE_OUT_FIELDS, row)) for row in rows])
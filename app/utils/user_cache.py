@@ -0,0 +1,128 @@
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import get_settings
+from app.db.models import User, UserType
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+@dataclass(frozen=True)
+class UserPrincipal:
+    """Immutable snapshot of an authenticated user, safe to share across requests"""
+    id: str
+    email: str
+    full_name: str
+    user_type: UserType
+    is_active: bool
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserPrincipal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            full_name=user.full_name,
+            user_type=user.user_type,
+            is_active=user.is_active,
+        )
+
+
+class UserCache:
+    """
+    Bounded LRU cache of active user principals keyed by user id (the JWT ``sub``).
+
+    Entries expire ``ttl_seconds`` after they were loaded, so a change made
+    outside this process is picked up within one TTL; changes made through
+    the ORM here invalidate the entry immediately, and Core or bulk
+    UPDATE/DELETE statements on ``users`` drop every entry.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, UserPrincipal]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, user_id: str) -> Optional[UserPrincipal]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, principal = entry
+        if expires_at <= self._clock():
+            del self._entries[user_id]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return principal
+
+    def set(self, principal: UserPrincipal) -> None:
+        if self.max_size <= 0:
+            return
+        self._entries[principal.id] = (self._clock() + self.ttl_seconds, principal)
+        self._entries.move_to_end(principal.id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, user_id: str) -> None:
+        if self._entries.pop(user_id, None) is not None:
+            self.invalidations += 1
+
+    def invalidate_all(self) -> None:
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+user_cache = UserCache(max_size=settings.user_cache_max_size, ttl_seconds=settings.user_cache_ttl_seconds)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target: User):
+    """Drop cached principals when a user row is changed or deleted through the ORM"""
+    user_cache.invalidate(target.id)
+
+
+@event.listens_for(Engine, "after_execute")
+def _invalidate_after_user_dml(conn, statement, multiparams, params, execution_options, result):
+    """
+    Drop every cached principal after an UPDATE or DELETE on ``users``.
+
+    Core statements (``run_write`` units, ``update(User)`` through a session)
+    carry no per-row events and may touch any number of users, so the whole
+    cache goes; such writes are rare.
+    """
+    if getattr(statement, "is_update", False) or getattr(statement, "is_delete", False):
+        if getattr(getattr(statement, "table", None), "name", None) == User.__tablename__:
+            user_cache.invalidate_all()
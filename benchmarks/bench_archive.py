@@ -0,0 +1,122 @@
+"""
+Pending-ride query latency with finished rides in the live table versus archived.
+
+    python -m benchmarks.bench_archive --pending 5000 --history 10000000
+
+Builds a scratch SQLite database with ``--pending`` pending rides and times the
+pending-ride queries in three states:
+
+* none: only the pending rides exist
+* live: ``--history`` completed rides added to ``rides`` (no archival)
+* archived: the same rides moved to ``rides_archive`` by ``RideArchiver``
+
+Queries: the first page of /rides/available/ (``--page`` rows), the full
+pending scan used to rebuild the proximity index, and a pending count.
+Reports the median wall time of ``--repeat`` runs, plus the archiver's
+throughput.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+_tmp = tempfile.mkdtemp(prefix="bench_archive_")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_tmp}/archive.db"
+
+from sqlalchemy import func, select  # noqa: E402
+
+from app.db.models import Base, Ride, RideStatus  # noqa: E402
+from app.db.session import SessionLocal, engine, write_engine  # noqa: E402
+from app.services.archiver import RideArchiver  # noqa: E402
+from app.services.rides import RideService  # noqa: E402
+
+SEED_CHUNK = 50000
+INSERT_SQL = (
+    "INSERT INTO rides (rider_id, driver_id, pickup_lat, pickup_lon, dropoff_lat, dropoff_lon, price, status, created_at) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def _rows(count: int, status: RideStatus, start: datetime, rng: random.Random):
+    driver = None if status == RideStatus.PENDING else "driver-1"
+    for i in range(count):
+        yield (
+            f"rider-{i % 5000}", driver,
+            40.73 + rng.uniform(-0.3, 0.3), -73.95 + rng.uniform(-0.3, 0.3),
+            40.73 + rng.uniform(-0.3, 0.3), -73.95 + rng.uniform(-0.3, 0.3),
+            round(rng.uniform(5, 80), 2), status.name,
+            (start + timedelta(milliseconds=i)).isoformat(sep=" "),
+        )
+
+
+async def _insert(count: int, status: RideStatus, start: datetime, rng: random.Random):
+    rows = _rows(count, status, start, rng)
+    for _ in range(0, count, SEED_CHUNK):
+        chunk = [row for _, row in zip(range(SEED_CHUNK), rows)]
+        async with write_engine.begin() as conn:
+            await conn.exec_driver_sql(INSERT_SQL, chunk)
+
+
+async def _measure(page: int, repeat: int) -> dict:
+    queries = {
+        "first page": RideService._pending_rides_stmt().limit(page),
+        "pending scan": select(Ride.id, Ride.pickup_lat, Ride.pickup_lon).where(Ride.status == RideStatus.PENDING),
+        "pending count": select(func.count()).select_from(Ride).where(Ride.status == RideStatus.PENDING),
+    }
+    results = {}
+    async with SessionLocal() as session:
+        for name, stmt in queries.items():
+            (await session.execute(stmt)).all()  # warm-up
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                (await session.execute(stmt)).all()
+                times.append(1000 * (time.perf_counter() - start))
+            results[name] = statistics.median(times)
+    return results
+
+
+async def run(args):
+    rng = random.Random(18)
+    async with write_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    now = datetime.utcnow()
+    await _insert(args.pending, RideStatus.PENDING, now - timedelta(hours=1), rng)
+    results = {"none": await _measure(args.page, args.repeat)}
+
+    start = time.perf_counter()
+    await _insert(args.history, RideStatus.COMPLETED, now - timedelta(days=365), rng)
+    print(f"seeded {args.history} completed rides in {time.perf_counter() - start:.1f} s")
+    results["live"] = await _measure(args.page, args.repeat)
+
+    archiver = RideArchiver(batch_size=args.batch_size)
+    start = time.perf_counter()
+    moved = await archiver.archive_all()
+    elapsed = time.perf_counter() - start
+    print(f"archived {moved} rides in {elapsed:.1f} s ({moved / elapsed:,.0f} rides/s, batch {args.batch_size})")
+    results["archived"] = await _measure(args.page, args.repeat)
+    await engine.dispose()
+    await write_engine.dispose()
+
+    names = list(results["none"])
+    print(f"{'state':>9} " + " ".join(f"{name + ' ms':>17}" for name in names))
+    for state, timings in results.items():
+        print(f"{state:>9} " + " ".join(f"{timings[name]:>17.3f}" for name in names))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pending", type=int, default=5000)
+    parser.add_argument("--history", type=int, default=1000000)
+    parser.add_argument("--page", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
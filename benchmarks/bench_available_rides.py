@@ -0,0 +1,125 @@
+"""
+Compare the full-table /rides/available/ path with the proximity index.
+
+    python -m benchmarks.bench_available_rides --sizes 10000 100000 1000000
+
+For every backlog size the script fills a scratch SQLite database with pending
+rides spread over a ~60 km metro area, then times:
+
+* full-table: RideService.get_available_rides() plus RideOut validation of the
+  whole list (what a polling driver paid before)
+* index: PendingRideIndex.query(k=50) from random driver positions, plus
+  RideOut validation of the returned page
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.db.models import Base, Ride, RideStatus
+from app.schemas.rides import RideOut
+from app.services.geo_index import PendingRideIndex
+from app.services.rides import RideService
+
+CENTER_LAT, CENTER_LON, SPREAD_DEG = 40.73, -73.95, 0.3
+ride_list_adapter = TypeAdapter(List[RideOut])
+
+
+def _rows(count: int, rng: random.Random):
+    now = datetime.utcnow()
+    for i in range(count):
+        lat = CENTER_LAT + rng.uniform(-SPREAD_DEG, SPREAD_DEG)
+        lon = CENTER_LON + rng.uniform(-SPREAD_DEG, SPREAD_DEG)
+        yield {
+            "rider_id": f"rider-{i % 5000}",
+            "pickup_lat": lat,
+            "pickup_lon": lon,
+            "dropoff_lat": lat + 0.02,
+            "dropoff_lon": lon + 0.02,
+            "price": round(rng.uniform(5, 80), 2),
+            "status": RideStatus.PENDING,
+            "created_at": now,
+        }
+
+
+async def _seed(engine, count: int, rng: random.Random, chunk: int = 20000):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    rows = _rows(count, rng)
+    while True:
+        batch = [row for _, row in zip(range(chunk), rows)]
+        if not batch:
+            break
+        async with engine.begin() as conn:
+            await conn.execute(insert(Ride), batch)
+
+
+async def run_size(count: int, full_repeat: int, index_queries: int, k: int) -> dict:
+    rng = random.Random(count)
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}")
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        await _seed(engine, count, rng)
+
+        full_times = []
+        for _ in range(full_repeat):
+            async with sessions() as session:
+                start = time.perf_counter()
+                rides, _ = await RideService(session).get_available_rides()
+                ride_list_adapter.validate_python(rides, from_attributes=True)
+                full_times.append(time.perf_counter() - start)
+
+        index = PendingRideIndex()
+        async with sessions() as session:
+            start = time.perf_counter()
+            await RideService(session, index=index).rebuild_pending_index()
+            rebuild_s = time.perf_counter() - start
+
+        index_times = []
+        for _ in range(index_queries):
+            lat = CENTER_LAT + rng.uniform(-SPREAD_DEG, SPREAD_DEG)
+            lon = CENTER_LON + rng.uniform(-SPREAD_DEG, SPREAD_DEG)
+            start = time.perf_counter()
+            page = [entry for _, entry in index.query(lat, lon, k=k)]
+            ride_list_adapter.validate_python(page, from_attributes=True)
+            index_times.append(time.perf_counter() - start)
+
+        await engine.dispose()
+
+    return {
+        "pending": count,
+        "full_table_ms": statistics.median(full_times) * 1000,
+        "index_ms": statistics.median(index_times) * 1000,
+        "index_p99_ms": sorted(index_times)[int(len(index_times) * 0.99) - 1] * 1000,
+        "rebuild_s": rebuild_s,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--full-repeat", type=int, default=3, help="Full-table runs per size")
+    parser.add_argument("--index-queries", type=int, default=500, help="Index queries per size")
+    parser.add_argument("-k", type=int, default=50, help="Rides returned per index query")
+    args = parser.parse_args()
+
+    print(f"{'pending':>10} {'full-table ms':>14} {'index ms':>10} {'index p99':>10} {'speedup':>9} {'rebuild s':>10}")
+    for size in args.sizes:
+        r = asyncio.run(run_size(size, args.full_repeat, args.index_queries, args.k))
+        print(
+            f"{r['pending']:>10} {r['full_table_ms']:>14.1f} {r['index_ms']:>10.3f} "
+            f"{r['index_p99_ms']:>10.3f} {r['full_table_ms'] / r['index_ms']:>8.0f}x {r['rebuild_s']:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Ride ingest rate: one POST per ride versus the bulk endpoint.
+
+    python -m benchmarks.bench_bulk_ingest --rides 20000 --single-rides 2000 --invalid 0.01
+
+Drives the app in-process through httpx's ASGITransport against a scratch
+SQLite database, as one rider:
+
+* single: ``--single-rides`` rides through ``POST /rides/`` with
+  ``--concurrency`` clients (JWT check, RideCreate validation and a
+  coalesced commit per ride)
+* bulk json / bulk ndjson: ``--rides`` rides in one ``POST /rides/bulk/``
+
+``--invalid`` is the share of rows with an out-of-range field in the bulk
+uploads. Also times validation alone on the same rows: RideCreate per row
+versus the column-wise check.
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp(prefix="bench_bulk_ingest_")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_tmp}/bulk.db"
+
+import httpx  # noqa: E402
+import orjson  # noqa: E402
+from pydantic import ValidationError  # noqa: E402
+
+from app.schemas.rides import RideCreate  # noqa: E402
+from app.utils.bulk_rides import validate_ride_columns  # noqa: E402
+
+
+def _rides(count: int, invalid: float, rng: random.Random):
+    rides = []
+    for _ in range(count):
+        ride = {
+            "pickup_lat": 40.73 + rng.uniform(-0.3, 0.3), "pickup_lon": -73.95 + rng.uniform(-0.3, 0.3),
+            "dropoff_lat": 40.73 + rng.uniform(-0.3, 0.3), "dropoff_lon": -73.95 + rng.uniform(-0.3, 0.3),
+            "price": round(rng.uniform(5, 80), 2),
+        }
+        if rng.random() < invalid:
+            ride[rng.choice(list(ride))] = -500.0
+        rides.append(ride)
+    return rides
+
+
+def _validation_ms(rides) -> tuple:
+    start = time.perf_counter()
+    for ride in rides:
+        try:
+            RideCreate.model_validate(ride)
+        except ValidationError:
+            pass
+    per_row = time.perf_counter() - start
+    start = time.perf_counter()
+    validate_ride_columns(rides)
+    return 1000 * per_row, 1000 * (time.perf_counter() - start)
+
+
+async def _login(client: httpx.AsyncClient) -> dict:
+    user = {"email": "partner@bench.example.com", "password": "BenchPass123",
+            "full_name": "Bench Partner", "user_type": "rider"}
+    await client.post("/api/v1/auth/register", json=user)
+    response = await client.post("/api/v1/auth/login", json={"email": user["email"], "password": user["password"]})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def run(args):
+    from app.main import app
+
+    rng = random.Random(19)
+    rides = _rides(args.rides, args.invalid, rng)
+    results = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+            rider = await _login(client)
+
+            singles = iter(_rides(args.single_rides, 0, rng))
+
+            async def worker():
+                for ride in singles:
+                    await client.post("/api/v1/rides/", json=ride, headers=rider)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+            results["single"] = (args.single_rides, args.single_rides, time.perf_counter() - start)
+
+            uploads = {
+                "bulk json": (orjson.dumps(rides), "application/json"),
+                "bulk ndjson": (b"".join(orjson.dumps(ride) + b"\n" for ride in rides), "application/x-ndjson"),
+            }
+            for name, (body, content_type) in uploads.items():
+                start = time.perf_counter()
+                response = await client.post(
+                    "/api/v1/rides/bulk/", content=body, headers={**rider, "Content-Type": content_type}
+                )
+                elapsed = time.perf_counter() - start
+                results[name] = (args.rides, response.json()["inserted"], elapsed)
+
+    print(f"{'path':>12} {'rows':>7} {'inserted':>9} {'seconds':>8} {'rides/s':>9}")
+    for name, (rows, inserted, elapsed) in results.items():
+        print(f"{name:>12} {rows:>7} {inserted:>9} {elapsed:>8.2f} {inserted / elapsed:>9.0f}")
+    per_row, columns = _validation_ms(rides)
+    print(f"validation of {args.rides} rows: RideCreate per row {per_row:.1f} ms, "
+          f"column-wise {columns:.1f} ms ({per_row / columns:.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rides", type=int, default=20000)
+    parser.add_argument("--single-rides", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--invalid", type=float, default=0.01)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
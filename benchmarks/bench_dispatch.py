@@ -0,0 +1,108 @@
+"""
+Batch dispatch throughput in matches/sec.
+
+    python -m benchmarks.bench_dispatch --sizes 150 1000 10000
+
+For each size N the solver matches N drivers to N pending rides spread over a
+~60 km metro area (Hungarian up to --optimal-max-size, greedy above), then the
+winners are committed with the dispatcher's single guarded UPDATE against a
+scratch SQLite database.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.db.models import Base, Ride, RideStatus
+from app.services.dispatch import BatchDispatcher, solve_assignment
+
+CENTER_LAT, CENTER_LON, SPREAD_DEG = 40.73, -73.95, 0.3
+
+
+async def _commit(pairs, session_factory) -> float:
+    dispatcher = BatchDispatcher(session_factory=session_factory)
+    start = time.perf_counter()
+    accepted = await dispatcher._commit({r + 1: f"driver-{d}" for d, r in pairs})
+    elapsed = time.perf_counter() - start
+    assert len(accepted) == len(pairs)
+    return elapsed
+
+
+async def _seed(engine, lat, lon):
+    now = datetime.utcnow()
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(Ride), [
+            {
+                "id": i + 1, "rider_id": f"rider-{i}", "pickup_lat": float(lat[i]), "pickup_lon": float(lon[i]),
+                "dropoff_lat": float(lat[i]) + 0.02, "dropoff_lon": float(lon[i]) + 0.02,
+                "price": 20.0, "status": RideStatus.PENDING, "created_at": now,
+            }
+            for i in range(len(lat))
+        ])
+
+
+async def run_size(size: int, args) -> dict:
+    rng = np.random.default_rng(size)
+    d_lat = CENTER_LAT + rng.uniform(-SPREAD_DEG, SPREAD_DEG, size)
+    d_lon = CENTER_LON + rng.uniform(-SPREAD_DEG, SPREAD_DEG, size)
+    r_lat = CENTER_LAT + rng.uniform(-SPREAD_DEG, SPREAD_DEG, size)
+    r_lon = CENTER_LON + rng.uniform(-SPREAD_DEG, SPREAD_DEG, size)
+
+    start = time.perf_counter()
+    pairs = solve_assignment(
+        d_lat, d_lon, r_lat, r_lon,
+        max_km=args.max_pickup_km,
+        optimal_max_size=args.optimal_max_size,
+        candidates=args.candidates,
+    )
+    solve_s = time.perf_counter() - start
+    mean_km = float(np.mean([
+        np.hypot((d_lat[d] - r_lat[r]) * 111.32, (d_lon[d] - r_lon[r]) * 84.3) for d, r in pairs
+    ])) if pairs else 0.0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}")
+        await _seed(engine, r_lat, r_lon)
+        commit_s = 0.0
+        chunk = 5000  # stay under SQLite's bound-parameter limit
+        for i in range(0, len(pairs), chunk):
+            commit_s += await _commit(pairs[i:i + chunk], async_sessionmaker(engine, expire_on_commit=False))
+        await engine.dispose()
+
+    return {
+        "size": size,
+        "solver": "hungarian" if size <= args.optimal_max_size else "greedy",
+        "matched": len(pairs),
+        "mean_pickup_km": mean_km,
+        "solve_s": solve_s,
+        "commit_s": commit_s,
+        "matches_per_s": len(pairs) / (solve_s + commit_s),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[150, 1000, 10000])
+    parser.add_argument("--optimal-max-size", type=int, default=150)
+    parser.add_argument("--candidates", type=int, default=8)
+    parser.add_argument("--max-pickup-km", type=float, default=10.0)
+    args = parser.parse_args()
+
+    print(f"{'N x N':>12} {'solver':>10} {'matched':>8} {'pickup km':>10} {'solve s':>8} {'commit s':>9} {'matches/s':>10}")
+    for size in args.sizes:
+        r = asyncio.run(run_size(size, args))
+        print(
+            f"{f'{size}x{size}':>12} {r['solver']:>10} {r['matched']:>8} {r['mean_pickup_km']:>10.2f} "
+            f"{r['solve_s']:>8.3f} {r['commit_s']:>9.3f} {r['matches_per_s']:>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Driver location ingest rate, memory per driver and nearest-idle query latency.
+
+    python -m benchmarks.bench_driver_locations --drivers 50000 --batch 5000 --http-pings 5000
+
+Store level (``DriverLocationStore`` directly, ``--drivers`` drivers spread
+over a ~60 km square):
+
+* memory: tracemalloc bytes per driver once every driver has pinged (arrays,
+  id -> slot dict and id list; the id strings themselves excluded)
+* single: ``update()`` pings per second
+* batch: ``update_many()`` pings per second in batches of ``--batch``
+* nearest: median latency of ``nearest_idle`` for k=10 and for a 2 km radius
+
+HTTP level, in-process through httpx's ASGITransport: ``--http-pings``
+single pings from ``--concurrency`` authenticated drivers via
+``POST /drivers/location/``, then the same number of pings through the
+gateway batch endpoint, plus the snapshot time for every driver.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+_tmp = tempfile.mkdtemp(prefix="bench_driver_locations_")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_tmp}/locations.db"
+os.environ.setdefault("ADMIN_TOKEN", "bench-admin-token")
+
+import httpx  # noqa: E402
+import numpy as np  # noqa: E402
+import orjson  # noqa: E402
+
+from app.services.driver_locations import DriverLocationSnapshotter, DriverLocationStore  # noqa: E402
+
+
+def _positions(count: int, rng: np.random.Generator):
+    return 40.73 + rng.uniform(-0.27, 0.27, count), -73.95 + rng.uniform(-0.35, 0.35, count)
+
+
+def _store_level(args, rng: np.random.Generator) -> DriverLocationStore:
+    ids = [f"driver-{i}" for i in range(args.drivers)]
+    lat, lon = _positions(args.drivers, rng)
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    store = DriverLocationStore(capacity=1024)
+    store.update_many(ids, lat, lon)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"memory: {(after - before) / args.drivers:.1f} bytes/driver "
+          f"({store.nbytes() / store.stats()['capacity']:.0f} of them array bytes per slot)")
+
+    lat, lon = _positions(args.drivers, rng)
+    lat_list, lon_list = lat.tolist(), lon.tolist()
+    start = time.perf_counter()
+    for driver_id, y, x in zip(ids, lat_list, lon_list):
+        store.update(driver_id, y, x)
+    elapsed = time.perf_counter() - start
+    print(f"single: {args.drivers / elapsed:,.0f} pings/s")
+
+    lat, lon = _positions(args.drivers, rng)
+    start = time.perf_counter()
+    for offset in range(0, args.drivers, args.batch):
+        chunk = slice(offset, offset + args.batch)
+        store.update_many(ids[chunk], lat[chunk], lon[chunk])
+    elapsed = time.perf_counter() - start
+    print(f"batch:  {args.drivers / elapsed:,.0f} pings/s (batches of {args.batch})")
+
+    for name, kwargs in (("k=10", {"k": 10}), ("radius 2 km", {"radius_km": 2.0})):
+        times = []
+        found = 0
+        for y, x in zip(*_positions(200, rng)):
+            start = time.perf_counter()
+            found += len(store.nearest_idle(float(y), float(x), **kwargs))
+            times.append(1000 * (time.perf_counter() - start))
+        print(f"nearest {name}: median {statistics.median(times):.3f} ms, {found / 200:.1f} drivers per query")
+    return store
+
+
+async def _login(client: httpx.AsyncClient, i: int) -> dict:
+    user = {"email": f"driver{i}@bench.example.com", "password": "BenchPass123",
+            "full_name": f"Bench Driver {i}", "user_type": "driver"}
+    await client.post("/api/v1/auth/register", json=user)
+    response = await client.post("/api/v1/auth/login", json={"email": user["email"], "password": user["password"]})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def _http_level(args, rng: np.random.Generator):
+    from app.main import app
+    from app.services.driver_locations import driver_locations
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+            drivers = [await _login(client, i) for i in range(args.concurrency)]
+            per_driver = args.http_pings // args.concurrency
+
+            async def pinger(headers):
+                for y, x in zip(*_positions(per_driver, rng)):
+                    await client.post("/api/v1/drivers/location/", json={"lat": y, "lon": x}, headers=headers)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(pinger(headers) for headers in drivers))
+            elapsed = time.perf_counter() - start
+            print(f"http single: {per_driver * len(drivers) / elapsed:,.0f} pings/s "
+                  f"({len(drivers)} drivers, one ping per request)")
+
+            lat, lon = _positions(args.http_pings, rng)
+            body = orjson.dumps([
+                {"driver_id": f"gateway-{i}", "lat": y, "lon": x}
+                for i, (y, x) in enumerate(zip(lat.tolist(), lon.tolist()))
+            ])
+            admin = {"X-Admin-Token": os.environ["ADMIN_TOKEN"], "Content-Type": "application/json"}
+            start = time.perf_counter()
+            response = await client.post("/api/v1/drivers/locations/batch/", content=body, headers=admin)
+            elapsed = time.perf_counter() - start
+            print(f"http batch:  {response.json()['applied'] / elapsed:,.0f} pings/s "
+                  f"({args.http_pings} pings in one request)")
+
+            snapshotter = DriverLocationSnapshotter(driver_locations)
+            start = time.perf_counter()
+            written = await snapshotter.snapshot_once()
+            print(f"snapshot: {written} drivers in {1000 * (time.perf_counter() - start):.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--drivers", type=int, default=50000)
+    parser.add_argument("--batch", type=int, default=5000)
+    parser.add_argument("--http-pings", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    rng = np.random.default_rng(21)
+    _store_level(args, rng)
+    asyncio.run(_http_level(args, rng))
+
+
+if __name__ == "__main__":
+    main()
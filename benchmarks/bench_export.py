@@ -0,0 +1,163 @@
+"""
+Ride history export: throughput, memory, and writer latency while it runs.
+
+    python -m benchmarks.bench_export --archived 1000000 --live 50000
+
+Builds a scratch SQLite database (WAL) with ``--archived`` rows in
+``rides_archive`` and ``--live`` rows in ``rides`` spread over ``--riders``
+riders, then streams through ``RideExporter``:
+
+* all: every ride as NDJSON and as CSV
+* one rider: a single rider's history (``rider_id`` index on both tables)
+
+For each export it reports rows/s, bytes and the tracemalloc peak, which
+stays at about one page whatever the row count. The NDJSON export is run
+again while a writer commits single-row inserts: the writer never waits for
+a lock, only for the export's turns on the shared event loop.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+_tmp = tempfile.mkdtemp(prefix="bench_export_")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_tmp}/export.db"
+os.environ.setdefault("SQLITE_HIGH_CONCURRENCY", "true")
+
+from sqlalchemy import text  # noqa: E402
+
+from app.db.models import Base, RideStatus  # noqa: E402
+from app.db.session import engine, export_engine, write_engine  # noqa: E402
+from app.services.ride_export import RideExporter, RideExportFilter  # noqa: E402
+
+SEED_CHUNK = 50000
+COLUMNS = "rider_id, driver_id, pickup_lat, pickup_lon, dropoff_lat, dropoff_lon, price, status, created_at"
+
+
+def _rows(count: int, riders: int, status: RideStatus, start: datetime, rng: random.Random, archived: bool):
+    for i in range(count):
+        row = (
+            f"rider-{i % riders}", "driver-1",
+            40.73 + rng.uniform(-0.3, 0.3), -73.95 + rng.uniform(-0.3, 0.3),
+            40.73 + rng.uniform(-0.3, 0.3), -73.95 + rng.uniform(-0.3, 0.3),
+            round(rng.uniform(5, 80), 2), status.name,
+            (start + timedelta(milliseconds=i)).isoformat(sep=" "),
+        )
+        # Archived rows keep explicit ids, below the live table's
+        yield (i + 1, *row, start.isoformat(sep=" ")) if archived else row
+
+
+async def _seed(args, rng: random.Random):
+    async with write_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    start = datetime.utcnow() - timedelta(days=365)
+    archive_sql = f"INSERT INTO rides_archive (id, {COLUMNS}, archived_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    live_sql = f"INSERT INTO rides ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    for sql, count, status, archived in (
+        (archive_sql, args.archived, RideStatus.COMPLETED, True),
+        (live_sql, args.live, RideStatus.ACCEPTED, False),
+    ):
+        rows = _rows(count, args.riders, status, start, rng, archived)
+        for _ in range(0, count, SEED_CHUNK):
+            chunk = [row for _, row in zip(range(SEED_CHUNK), rows)]
+            async with write_engine.begin() as conn:
+                await conn.exec_driver_sql(sql, chunk)
+        start += timedelta(milliseconds=count)
+    if args.live:
+        async with write_engine.begin() as conn:
+            await conn.execute(text(f"UPDATE rides SET id = id + {args.archived}"))
+
+
+async def _consume(exporter: RideExporter, filters: RideExportFilter, fmt: str) -> tuple:
+    lines = size = 0
+    async for chunk in exporter.stream(filters, fmt):
+        size += len(chunk)
+        lines += chunk.count(b"\n")
+    return (lines - 1 if fmt == "csv" else lines), size
+
+
+async def _export(exporter: RideExporter, filters: RideExportFilter, fmt: str) -> tuple:
+    """Timed run, then a second run under tracemalloc (which slows it down) for the peak"""
+    start = time.perf_counter()
+    rows, size = await _consume(exporter, filters, fmt)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    await _consume(exporter, filters, fmt)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return rows, size, elapsed, peak
+
+
+async def _writer(stop: asyncio.Event, latencies: list):
+    sql = text(f"INSERT INTO rides ({COLUMNS}) VALUES "
+               "('writer', NULL, 40.7, -74.0, 40.8, -73.9, 20.0, 'PENDING', :now)")
+    while not stop.is_set():
+        start = time.perf_counter()
+        async with write_engine.begin() as conn:
+            await conn.execute(sql, {"now": datetime.utcnow()})
+        latencies.append(1000 * (time.perf_counter() - start))
+        await asyncio.sleep(0.005)
+
+
+def _writer_summary(latencies: list) -> str:
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))]
+    return f"{len(latencies)} inserts, median {statistics.median(latencies):.2f} ms, p99 {p99:.2f} ms"
+
+
+async def run(args):
+    rng = random.Random(20)
+    start = time.perf_counter()
+    await _seed(args, rng)
+    print(f"seeded {args.archived} archived + {args.live} live rides in {time.perf_counter() - start:.1f} s "
+          f"({'separate read-only engine' if export_engine is not engine else 'read engine'})")
+
+    exporter = RideExporter(page_size=args.page_size)
+    cases = [
+        ("all", RideExportFilter(), "ndjson"),
+        ("all", RideExportFilter(), "csv"),
+        ("one rider", RideExportFilter(rider_id="rider-7"), "ndjson"),
+    ]
+    print(f"{'export':>10} {'format':>7} {'rows':>9} {'MiB':>8} {'seconds':>8} {'rows/s':>9} {'peak KiB':>9}")
+    for name, filters, fmt in cases:
+        rows, size, elapsed, peak = await _export(exporter, filters, fmt)
+        print(f"{name:>10} {fmt:>7} {rows:>9} {size / 2**20:>8.1f} {elapsed:>8.2f} "
+              f"{rows / elapsed:>9.0f} {peak / 1024:>9.0f}")
+
+    idle = []
+    stop = asyncio.Event()
+    task = asyncio.create_task(_writer(stop, idle))
+    await asyncio.sleep(1.0)
+    stop.set()
+    await task
+
+    during = []
+    stop = asyncio.Event()
+    task = asyncio.create_task(_writer(stop, during))
+    await _consume(exporter, RideExportFilter(), "ndjson")
+    stop.set()
+    await task
+    print(f"writer idle:          {_writer_summary(idle)}")
+    print(f"writer during export: {_writer_summary(during)}")
+
+    await engine.dispose()
+    await write_engine.dispose()
+    await export_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--archived", type=int, default=1000000)
+    parser.add_argument("--live", type=int, default=50000)
+    parser.add_argument("--riders", type=int, default=1000)
+    parser.add_argument("--page-size", type=int, default=1000)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
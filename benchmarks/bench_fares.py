@@ -0,0 +1,129 @@
+"""
+Fare quotes per second, single and batched, with a cold and a warm route cache.
+
+    python -m benchmarks.bench_fares --quotes 100000 --batch 1000 --drivers 5000 --http-quotes 2000
+
+Estimator level (``FareEstimator`` directly), ``--quotes`` trips with
+pickups and dropoffs spread over a ~60 km square and ``--drivers`` idle
+drivers spread the same way:
+
+* single: ``estimate()`` per trip, first with an empty cache, then again
+  with every cell pair cached; includes the nearest-driver pickup ETA
+* batch: ``estimate_many()`` over batches of ``--batch`` trips, cold and warm
+* a "hot" workload where trips come from ``--hotspots`` pickup/dropoff
+  areas (within ~50 m, as at stations and airports), to show the hit ratio
+  in practice
+
+HTTP level, in-process through httpx's ASGITransport: ``--http-quotes``
+single ``GET /rides/estimate/`` requests, then the same number of trips in
+``POST /rides/estimate/batch/`` requests of ``--batch``.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp(prefix="bench_fares_")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_tmp}/fares.db"
+
+import httpx  # noqa: E402
+import numpy as np  # noqa: E402
+import orjson  # noqa: E402
+
+from app.services.driver_locations import DriverLocationStore, driver_locations  # noqa: E402
+from app.services.fares import FareEstimator  # noqa: E402
+
+
+def _trips(count: int, rng: np.random.Generator, hotspots: int = 0) -> np.ndarray:
+    """(count, 4) pickup_lat, pickup_lon, dropoff_lat, dropoff_lon"""
+    if hotspots:
+        centres = np.column_stack((40.73 + rng.uniform(-0.27, 0.27, hotspots), -73.95 + rng.uniform(-0.35, 0.35, hotspots)))
+        ends = centres[rng.integers(0, hotspots, (count, 2))] + rng.normal(0, 0.0005, (count, 2, 2))
+        return ends.reshape(count, 4)
+    lat = 40.73 + rng.uniform(-0.27, 0.27, (count, 2))
+    lon = -73.95 + rng.uniform(-0.35, 0.35, (count, 2))
+    return np.column_stack((lat[:, 0], lon[:, 0], lat[:, 1], lon[:, 1]))
+
+
+def _single(fares: FareEstimator, trips: np.ndarray) -> float:
+    rows = trips.tolist()
+    start = time.perf_counter()
+    for row in rows:
+        fares.estimate(*row)
+    return len(rows) / (time.perf_counter() - start)
+
+
+def _batched(fares: FareEstimator, trips: np.ndarray, batch: int) -> float:
+    start = time.perf_counter()
+    for offset in range(0, len(trips), batch):
+        fares.estimate_many(*trips[offset:offset + batch].T)
+    return len(trips) / (time.perf_counter() - start)
+
+
+def _add_drivers(store: DriverLocationStore, count: int, rng: np.random.Generator):
+    pickups = _trips(count, rng)
+    store.update_many([f"driver-{i}" for i in range(count)], pickups[:, 0], pickups[:, 1])
+
+
+def _estimator_level(args, rng: np.random.Generator):
+    drivers = DriverLocationStore()
+    _add_drivers(drivers, args.drivers, rng)
+    trips = _trips(args.quotes, rng)
+    for name, run in (("single", lambda f: _single(f, trips)), ("batch", lambda f: _batched(f, trips, args.batch))):
+        fares = FareEstimator(locations=drivers)
+        cold = run(fares)
+        warm = run(fares)
+        print(f"{name}: {cold:,.0f} quotes/s cold, {warm:,.0f} quotes/s warm")
+
+    fares = FareEstimator(locations=drivers)
+    hot = _trips(args.quotes, rng, args.hotspots)
+    rate = _batched(fares, hot, args.batch)
+    print(f"hotspots: {rate:,.0f} quotes/s batched, hit ratio {fares.hit_ratio():.1%}, "
+          f"{len(fares):,} cell pairs cached")
+
+
+async def _http_level(args, rng: np.random.Generator):
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        _add_drivers(driver_locations, args.drivers, rng)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+            user = {"email": "rider@bench.example.com", "password": "BenchPass123",
+                    "full_name": "Bench Rider", "user_type": "rider"}
+            await client.post("/api/v1/auth/register", json=user)
+            login = await client.post("/api/v1/auth/login", json={"email": user["email"], "password": user["password"]})
+            headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+            fields = ("pickup_lat", "pickup_lon", "dropoff_lat", "dropoff_lon")
+            trips = [dict(zip(fields, row)) for row in _trips(args.http_quotes, rng).tolist()]
+
+            start = time.perf_counter()
+            for trip in trips:
+                await client.get("/api/v1/rides/estimate/", params=trip, headers=headers)
+            print(f"http single: {len(trips) / (time.perf_counter() - start):,.0f} quotes/s")
+
+            bodies = [orjson.dumps(trips[i:i + args.batch]) for i in range(0, len(trips), args.batch)]
+            start = time.perf_counter()
+            for body in bodies:
+                await client.post("/api/v1/rides/estimate/batch/", content=body,
+                                  headers={**headers, "Content-Type": "application/json"})
+            print(f"http batch:  {len(trips) / (time.perf_counter() - start):,.0f} quotes/s "
+                  f"(batches of {args.batch})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quotes", type=int, default=100000)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--hotspots", type=int, default=50)
+    parser.add_argument("--drivers", type=int, default=5000)
+    parser.add_argument("--http-quotes", type=int, default=2000)
+    args = parser.parse_args()
+    rng = np.random.default_rng(23)
+    _estimator_level(args, rng)
+    asyncio.run(_http_level(args, rng))
+
+
+if __name__ == "__main__":
+    main()
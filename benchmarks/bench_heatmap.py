@@ -0,0 +1,116 @@
+"""
+Supply/demand heatmap update rate, refresh cost and memory at city-scale cell counts.
+
+    python -m benchmarks.bench_heatmap --cells 10000 50000 100000 --events 500000 --drivers 50000
+
+For each ``--cells`` count, a ``DemandHeatmap`` with 1 km cells (no database,
+no HTTP) over a square holding that many cells:
+
+* updates: ``--events`` ride created/accepted events per second, pickups
+  spread over every cell, while time moves through the sliding window
+* refresh: time to recount ``--drivers`` idle drivers per cell, recycle
+  empty cells and rebuild the serialized heatmap, plus its size
+* memory: array bytes per cell, and tracemalloc bytes per cell including
+  the cell -> slot dict
+* surge lookups per second, single and batched (as the fare estimator
+  makes them)
+"""
+import argparse
+import math
+import time
+import tracemalloc
+
+import numpy as np
+
+from app.services.demand import DemandHeatmap
+from app.services.driver_locations import DriverLocationStore
+from app.services.ride_events import RideEventBus
+
+
+class _Ride:
+    __slots__ = ("id", "pickup_lat", "pickup_lon")
+
+    def __init__(self, ride_id: int, lat: float, lon: float):
+        self.id = ride_id
+        self.pickup_lat = lat
+        self.pickup_lon = lon
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _points(count: int, side_deg: float, rng: np.random.Generator):
+    return 30.0 + rng.uniform(0, side_deg, count), -90.0 + rng.uniform(0, side_deg, count)
+
+
+def run(args, cells: int, rng: np.random.Generator):
+    side = 0.01 * math.ceil(math.sqrt(cells))
+    clock = _Clock()
+    store = DriverLocationStore(clock=clock)
+    store.update_many([f"driver-{i}" for i in range(args.drivers)], *_points(args.drivers, side, rng))
+
+    tracemalloc.start()
+    heatmap = DemandHeatmap(cell_size_deg=0.01, max_cells=2 * cells, locations=store, events=RideEventBus(), clock=clock)
+    lat, lon = _points(args.events, side, rng)
+    rides = [_Ride(i, y, x) for i, (y, x) in enumerate(zip(lat.tolist(), lon.tolist()))]
+    before, _ = tracemalloc.get_traced_memory()
+    # Withdrawn again, so only the cells (kept by their window counts) stay in memory
+    for ride in rides[:cells * 4]:
+        heatmap.ride_created(ride)
+        heatmap.ride_removed(ride.id, False)
+    heatmap.refresh()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    tracked = len(heatmap)
+
+    # One ride in ten stays pending, the rest are accepted; events span two windows
+    step = 2 * heatmap.window_seconds / len(rides)
+    start = time.perf_counter()
+    for ride in rides:
+        clock.now += step
+        heatmap.ride_created(ride)
+        if ride.id % 10:
+            heatmap.ride_removed(ride.id, True)
+    elapsed = time.perf_counter() - start
+    updates = len(rides) + len(rides) * 9 // 10
+
+    refreshes = []
+    for _ in range(5):
+        start = time.perf_counter()
+        heatmap.refresh()
+        refreshes.append(1000 * (time.perf_counter() - start))
+
+    start = time.perf_counter()
+    for y, x in zip(lat[:20000].tolist(), lon[:20000].tolist()):
+        heatmap.surge_at(y, x)
+    single = 20000 / (time.perf_counter() - start)
+    start = time.perf_counter()
+    for offset in range(0, 100000, 1000):
+        heatmap.surge_many(lat[offset % len(lat):][:1000], lon[offset % len(lon):][:1000])
+    batched = 100000 / (time.perf_counter() - start)
+
+    print(f"{tracked:,} cells: {updates / elapsed:,.0f} updates/s, "
+          f"refresh {min(refreshes):.1f} ms ({len(heatmap.body()) / 1e6:.1f} MB body), "
+          f"{heatmap.nbytes() / heatmap.stats()['capacity']:.0f} array bytes/slot, "
+          f"{(after - before) / tracked:.0f} bytes/cell in all, "
+          f"surge {single:,.0f}/s single {batched:,.0f}/s batched")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cells", type=int, nargs="+", default=[10000, 50000, 100000])
+    parser.add_argument("--events", type=int, default=500000)
+    parser.add_argument("--drivers", type=int, default=50000)
+    args = parser.parse_args()
+    rng = np.random.default_rng(24)
+    for cells in args.cells:
+        run(args, cells, rng)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Ride creation with Idempotency-Key: first requests, replayed retries and retry storms.
+
+    python -m benchmarks.bench_idempotency --rides 2000 --storm-keys 200 --duplicates 10
+
+In-process through httpx's ASGITransport against a scratch SQLite file, once
+with responses kept in memory only and once with ``persist`` on:
+
+* plain: ``--rides`` ``POST /rides/`` without a key (the baseline)
+* keyed: the same with a fresh key each, what a first attempt costs
+* replay: every keyed request sent again, served from the store
+* storm: ``--storm-keys`` keys, each sent ``--duplicates`` times at once
+  (a client retrying on timeouts); reports how many rides were created
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp(prefix="bench_idempotency_")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_tmp}/idempotency.db"
+
+import httpx  # noqa: E402
+
+RIDE = {"pickup_lat": 40.7, "pickup_lon": -74.0, "dropoff_lat": 40.8, "dropoff_lon": -73.9, "price": 20.0}
+
+
+async def _timed(client: httpx.AsyncClient, headers_list, concurrency: int = 50):
+    latencies = []
+    queue = iter(headers_list)
+
+    async def worker():
+        for headers in queue:
+            start = time.perf_counter()
+            response = await client.post("/api/v1/rides/", json=RIDE, headers=headers)
+            assert response.status_code == 201, response.text
+            latencies.append(1000 * (time.perf_counter() - start))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return len(latencies) / elapsed, statistics.median(latencies)
+
+
+async def _run(args, persist: bool):
+    from app.main import app
+    from app.services.geo_index import pending_ride_index
+    from app.services.idempotency import idempotency_store
+
+    idempotency_store.persist = persist
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+            user = {"email": f"rider-{persist}@bench.example.com", "password": "BenchPass123",
+                    "full_name": "Bench Rider", "user_type": "rider"}
+            await client.post("/api/v1/auth/register", json=user)
+            login = await client.post("/api/v1/auth/login", json={"email": user["email"], "password": user["password"]})
+            auth = {"Authorization": f"Bearer {login.json()['access_token']}"}
+            label = "persisted" if persist else "in memory"
+
+            plain = await _timed(client, [auth] * args.rides)
+            keyed_headers = [{**auth, "Idempotency-Key": f"{persist}-{i}"} for i in range(args.rides)]
+            keyed = await _timed(client, keyed_headers)
+            replay = await _timed(client, keyed_headers)
+            for name, (rate, p50) in (("plain", plain), ("keyed", keyed), ("replay", replay)):
+                print(f"{label} {name:>6}: {rate:,.0f} req/s, p50 {p50:.2f} ms")
+
+            before, coalesced = len(pending_ride_index), idempotency_store.coalesced
+            storm = [{**auth, "Idempotency-Key": f"storm-{persist}-{key}"}
+                     for key in range(args.storm_keys) for _ in range(args.duplicates)]
+            rate, p50 = await _timed(client, storm, concurrency=args.duplicates * 10)
+            created = len(pending_ride_index) - before
+            print(f"{label}  storm: {rate:,.0f} req/s, p50 {p50:.2f} ms, "
+                  f"{created} rides for {len(storm)} requests on {args.storm_keys} keys "
+                  f"({idempotency_store.coalesced - coalesced} waited for the first)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rides", type=int, default=2000)
+    parser.add_argument("--storm-keys", type=int, default=200)
+    parser.add_argument("--duplicates", type=int, default=10)
+    args = parser.parse_args()
+    for persist in (False, True):
+        asyncio.run(_run(args, persist))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Driver polling of /rides/available/ with and without the listing cache.
+
+    python -m benchmarks.bench_listing_cache --backlog 5000 --polls 2000 --writes-per-1k 5
+
+Drives the app in-process through httpx's ASGITransport. ``--concurrency``
+drivers poll the first page (``--limit`` rides) while a rider creates a ride
+every ``1000 / --writes-per-1k`` polls, so the pending set changes now and
+then like it does in production. Each mode runs the same schedule:
+
+* uncached: listing cache disabled (``max_entries`` 0), plain GETs: a query
+  and serialization per poll, as before the cache
+* cached: cache enabled, plain GETs: the body is reused between changes
+* conditional: cache enabled, drivers send back their last ETag in ``If-None-Match``
+
+Reports polls/s, response body bytes per poll, the share of 304 responses and
+the cache hit ratio (coalesced misses count as hits).
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp(prefix="bench_listing_cache_")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_tmp}/listing.db"
+
+import httpx  # noqa: E402
+
+from app.services.listing_cache import listing_cache  # noqa: E402
+
+RIDE = {"pickup_lat": 40.7, "pickup_lon": -74.0, "dropoff_lat": 40.8, "dropoff_lon": -73.9, "price": 20.0}
+
+
+async def _login(client: httpx.AsyncClient, user_type: str) -> dict:
+    user = {"email": f"{user_type}@bench.example.com", "password": "BenchPass123",
+            "full_name": f"Bench {user_type.title()}", "user_type": user_type}
+    await client.post("/api/v1/auth/register", json=user)
+    response = await client.post("/api/v1/auth/login", json={"email": user["email"], "password": user["password"]})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def _seed(backlog: int) -> None:
+    from app.db.session import SessionLocal, write_engine
+    from app.services.ride_batcher import insert_rides
+    from app.services.rides import RideService
+
+    rows = [dict(RIDE, rider_id=f"rider-{i}", status="pending") for i in range(backlog)]
+    async with write_engine.begin() as conn:
+        for start in range(0, backlog, 500):
+            await insert_rides(conn, rows[start:start + 500])
+    async with SessionLocal() as session:
+        await RideService(session).rebuild_pending_index()
+
+
+async def _mode(client, rider, driver, args, cached: bool, conditional: bool) -> dict:
+    listing_cache.max_entries = args.max_entries if cached else 0
+    listing_cache.clear()
+    listing_cache.hits = listing_cache.misses = listing_cache.coalesced = 0
+    write_every = max(1, int(1000 / args.writes_per_1k)) if args.writes_per_1k > 0 else 0
+    counter = iter(range(args.polls))
+    not_modified = 0
+    body_bytes = 0
+
+    async def driver_loop():
+        nonlocal not_modified, body_bytes
+        etag = None
+        for i in counter:
+            if write_every and i % write_every == 0:
+                await client.post("/api/v1/rides/", json=RIDE, headers=rider)
+            headers = {**driver, "If-None-Match": etag} if conditional and etag else driver
+            response = await client.get("/api/v1/rides/available/", params={"limit": args.limit}, headers=headers)
+            if response.status_code == 304:
+                not_modified += 1
+            body_bytes += len(response.content)
+            etag = response.headers.get("ETag")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(driver_loop() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "polls_per_s": args.polls / elapsed,
+        "kib_per_poll": body_bytes / args.polls / 1024,
+        "not_modified": not_modified / args.polls,
+        "hit_ratio": listing_cache.hit_ratio(),
+    }
+
+
+async def run(args):
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        await _seed(args.backlog)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            rider = await _login(client, "rider")
+            driver = await _login(client, "driver")
+            results = {}
+            for name, cached, conditional in (
+                ("uncached", False, False), ("cached", True, False), ("conditional", True, True)
+            ):
+                await _mode(client, rider, driver, args, cached, conditional)  # warm-up
+                results[name] = await _mode(client, rider, driver, args, cached, conditional)
+
+    print(f"{'mode':>12} {'polls/s':>9} {'KiB/poll':>9} {'304 share':>10} {'hit ratio':>10}")
+    for name, result in results.items():
+        print(
+            f"{name:>12} {result['polls_per_s']:>9.0f} {result['kib_per_poll']:>9.1f} {100 * result['not_modified']:>9.1f}% "
+            f"{100 * result['hit_ratio']:>9.1f}%"
+        )
+    print(f"conditional vs uncached: {results['conditional']['polls_per_s'] / results['uncached']['polls_per_s']:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backlog", type=int, default=5000)
+    parser.add_argument("--polls", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--writes-per-1k", type=float, default=5.0)
+    parser.add_argument("--max-entries", type=int, default=1024)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
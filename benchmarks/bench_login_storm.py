@@ -0,0 +1,126 @@
+"""
+/rides/available/ latency while a login storm is running, with bcrypt inline vs pooled.
+
+    python -m benchmarks.bench_login_storm --logins 200 --concurrency 50
+
+The app runs in-process (httpx ASGITransport) against a scratch database.
+Driver pollers hit /available/ continuously while ``--concurrency`` clients
+log in ``--logins`` times in total. The same scenario runs once with bcrypt on
+the event loop (0 workers) and once on the password worker pool.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp(prefix="bench_login_storm_")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_tmp}/bench.db"
+
+import httpx  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from app.db.models import User, UserType  # noqa: E402
+from app.db.session import SessionLocal  # noqa: E402
+from app.main import app  # noqa: E402
+from app.utils.auth import get_password_hash, password_pool  # noqa: E402
+
+PASSWORD = "StormPass123"
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def _seed(users: int):
+    hashed = get_password_hash(PASSWORD)
+    async with SessionLocal() as session:
+        await session.execute(insert(User), [
+            {
+                "id": f"user-{i}", "email": f"user{i}@storm.example.com", "hashed_password": hashed,
+                "full_name": "Storm User", "user_type": UserType.DRIVER if i == 0 else UserType.RIDER,
+                "is_active": True,
+            }
+            for i in range(users)
+        ])
+        await session.commit()
+
+
+async def run_mode(workers: int, args) -> dict:
+    password_pool.configure(max_workers=workers, max_pending=args.max_pending)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        login = await client.post("/api/v1/auth/login", json={"email": "user0@storm.example.com", "password": PASSWORD})
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+        await client.get("/api/v1/rides/available/", headers=headers)  # warm the user cache
+
+        latencies = []
+        statuses = {}
+        storm_done = asyncio.Event()
+
+        async def poller():
+            while not storm_done.is_set():
+                start = time.perf_counter()
+                await client.get("/api/v1/rides/available/", headers=headers)
+                latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(args.poll_interval)
+
+        remaining = iter(range(args.logins))
+
+        async def login_worker():
+            for i in remaining:
+                response = await client.post("/api/v1/auth/login", json={
+                    "email": f"user{1 + i % (args.users - 1)}@storm.example.com", "password": PASSWORD,
+                })
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        pollers = [asyncio.create_task(poller()) for _ in range(args.pollers)]
+        start = time.perf_counter()
+        await asyncio.gather(*(login_worker() for _ in range(args.concurrency)))
+        storm_s = time.perf_counter() - start
+        storm_done.set()
+        await asyncio.gather(*pollers)
+
+    return {
+        "workers": workers,
+        "polls": len(latencies),
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "max_ms": max(latencies) * 1000,
+        "logins_per_s": args.logins / storm_s,
+        "statuses": statuses,
+    }
+
+
+async def main_async(args):
+    async with app.router.lifespan_context(app):
+        await _seed(args.users)
+        results = [await run_mode(0, args), await run_mode(args.workers, args)]
+    password_pool.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--pollers", type=int, default=5)
+    parser.add_argument("--poll-interval", type=float, default=0.01)
+    parser.add_argument("--workers", type=int, default=4, help="Pool size for the 'after' run")
+    parser.add_argument("--max-pending", type=int, default=64)
+    args = parser.parse_args()
+
+    print(f"{'mode':>12} {'polls':>6} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'logins/s':>9}  statuses")
+    for r in asyncio.run(main_async(args)):
+        mode = "inline" if r["workers"] == 0 else f"pool x{r['workers']}"
+        print(
+            f"{mode:>12} {r['polls']:>6} {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['max_ms']:>8.1f} "
+            f"{r['logins_per_s']:>9.1f}  {r['statuses']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
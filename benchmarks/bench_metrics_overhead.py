@@ -0,0 +1,95 @@
+"""
+Request throughput with metrics recording on versus off.
+
+    python -m benchmarks.bench_metrics_overhead --requests 600 --rounds 20
+
+Drives the app in-process through httpx's ASGITransport with ``--concurrency``
+clients. Each round runs the same mix (``/api/v1/health``, an authenticated
+``/api/v1/rides/available/`` listing and a ride creation, so both HTTP and SQL
+instrumentation are exercised) once with ``registry.enabled`` off and once on,
+alternating the order between rounds to cancel drift. Reports the median
+throughput of each mode and the median per-round overhead; many short rounds
+give a steadier number than a few long ones.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp(prefix="bench_metrics_")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_tmp}/metrics.db"
+
+import httpx  # noqa: E402
+
+from app.core import metrics  # noqa: E402
+
+RIDE = {"pickup_lat": 40.7, "pickup_lon": -74.0, "dropoff_lat": 40.8, "dropoff_lon": -73.9, "price": 20.0}
+
+
+async def _login(client: httpx.AsyncClient, user_type: str) -> dict:
+    user = {"email": f"{user_type}@bench.example.com", "password": "BenchPass123",
+            "full_name": f"Bench {user_type.title()}", "user_type": user_type}
+    await client.post("/api/v1/auth/register", json=user)
+    response = await client.post("/api/v1/auth/login", json={"email": user["email"], "password": user["password"]})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def _round(client: httpx.AsyncClient, rider: dict, driver: dict, requests: int, concurrency: int) -> float:
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            kind = i % 3
+            if kind == 0:
+                await client.get("/api/v1/health")
+            elif kind == 1:
+                await client.get("/api/v1/rides/available/", params={"limit": 20}, headers=driver)
+            else:
+                await client.post("/api/v1/rides/", json=RIDE, headers=rider)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return requests / (time.perf_counter() - start)
+
+
+async def run(args):
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            rider = await _login(client, "rider")
+            driver = await _login(client, "driver")
+            await _round(client, rider, driver, args.requests // 5, args.concurrency)  # warm-up
+
+            results = {False: [], True: []}
+            for i in range(args.rounds):
+                for enabled in ((False, True) if i % 2 == 0 else (True, False)):
+                    metrics.registry.enabled = enabled
+                    results[enabled].append(await _round(client, rider, driver, args.requests, args.concurrency))
+            overheads = [(off - on) / off for off, on in zip(results[False], results[True])]
+            metrics.registry.enabled = True
+            scrape_start = time.perf_counter()
+            body = (await client.get("/metrics")).text
+            scrape_ms = 1000 * (time.perf_counter() - scrape_start)
+
+    print(f"{'metrics':>8} {'req/s (median)':>15} {'min':>8} {'max':>8}")
+    for enabled, label in ((False, "off"), (True, "on")):
+        rounds = results[enabled]
+        print(f"{label:>8} {statistics.median(rounds):>15.0f} {min(rounds):>8.0f} {max(rounds):>8.0f}")
+    print(f"overhead: {100 * statistics.median(overheads):.2f}% (median of {len(overheads)} paired rounds)")
+    print(f"/metrics scrape: {scrape_ms:.1f} ms, {len(body.splitlines())} lines")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=600)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=20)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Notification dispatcher throughput and latency against a stand-in HTTP push provider.
+
+    python -m benchmarks.bench_notifications --notifications 5000 --destinations 500 --provider-latency-ms 20
+
+A local threaded HTTP server plays the provider and sleeps ``--provider-latency-ms``
+per request. The same burst of notifications, spread over ``--destinations``
+riders, is sent through the HttpSink for each (workers, batch size) pair.
+"""
+import argparse
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.utils.notifications import HttpSink, Notification, NotificationDispatcher
+
+
+def _provider(latency: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            time.sleep(latency)
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def _run(url: str, workers: int, batch_size: int, notifications: int, destinations: int):
+    dispatcher = NotificationDispatcher(
+        HttpSink(url), workers=workers, max_queue=notifications, batch_size=batch_size, batch_wait_ms=10,
+    )
+    await dispatcher.start()
+    start = time.perf_counter()
+    for i in range(notifications):
+        dispatcher.enqueue(Notification(f"rider-{i % destinations}", f"ride {i} accepted"))
+    await dispatcher.stop()
+    elapsed = time.perf_counter() - start
+    return elapsed, dispatcher.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--notifications", type=int, default=5000)
+    parser.add_argument("--destinations", type=int, default=500)
+    parser.add_argument("--provider-latency-ms", type=float, default=20)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 50])
+    args = parser.parse_args()
+
+    server = _provider(args.provider_latency_ms / 1000)
+    url = f"http://127.0.0.1:{server.server_address[1]}/push"
+    print(f"{'workers':>7} {'batch':>5} {'sent/s':>8} {'requests':>8} {'p50_ms':>8} {'p99_ms':>8}")
+    try:
+        for batch_size in args.batch_sizes:
+            for workers in args.workers:
+                elapsed, stats = asyncio.run(
+                    _run(url, workers, batch_size, args.notifications, args.destinations)
+                )
+                print(
+                    f"{workers:>7} {batch_size:>5} {stats['delivered'] / elapsed:>8.0f} {stats['batches']:>8} "
+                    f"{stats['p50_latency_ms']:>8.0f} {stats['p99_latency_ms']:>8.0f}"
+                )
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
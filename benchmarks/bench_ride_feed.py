@@ -0,0 +1,156 @@
+"""
+Load test of the SSE ride feed: N concurrent driver connections on one uvicorn worker.
+
+    python -m benchmarks.bench_ride_feed --connections 10000 --events 20
+
+Starts ``uvicorn app.main:app`` (single worker) on a scratch database, opens
+``--connections`` feed streams with one driver token, then creates ``--events``
+rides as a rider. For each ride it reports how long the fan-out took to reach
+every connection (p50/p99/max), plus connect time and the server's RSS.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+RIDE = {"pickup_lat": 40.7, "pickup_lon": -74.0, "dropoff_lat": 40.8, "dropoff_lon": -73.9, "price": 18.0}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _token(base: str, user_type: str) -> str:
+    user = {"email": f"{user_type}@feed.example.com", "password": "FeedPass123", "full_name": "Feed", "user_type": user_type}
+    httpx.post(f"{base}/api/v1/auth/register", json=user).raise_for_status()
+    login = httpx.post(f"{base}/api/v1/auth/login", json={"email": user["email"], "password": user["password"]})
+    return login.json()["access_token"]
+
+
+class FeedClient:
+    def __init__(self):
+        self.received = []
+        self.evicted = False
+
+    async def run(self, port: int, token: str, connected: list):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port, limit=1 << 20)
+        writer.write(
+            f"GET /api/v1/rides/feed/ HTTP/1.1\r\nHost: bench\r\nAuthorization: Bearer {token}\r\n\r\n".encode()
+        )
+        await writer.drain()
+        await reader.readuntil(b"\r\n\r\n")  # response headers
+        await reader.readuntil(b"\n\n")  # snapshot
+        connected.append(time.perf_counter())
+        try:
+            while True:
+                frame = await reader.readuntil(b"\n\n")
+                if b"event: ride.created" in frame:
+                    self.received.append(time.perf_counter())
+                elif b"event: evicted" in frame:
+                    self.evicted = True
+                    return
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+
+async def _load(port: int, connections: int, events: int, interval: float, server_pid: int):
+    base = f"http://127.0.0.1:{port}"
+    driver, rider = _token(base, "driver"), _token(base, "rider")
+    clients = [FeedClient() for _ in range(connections)]
+    connected = []
+
+    start = time.perf_counter()
+    tasks = []
+    for client in clients:
+        tasks.append(asyncio.create_task(client.run(port, driver, connected)))
+        if len(tasks) % 256 == 0:
+            # Keep the number of half-open connects below the listen backlog
+            while len(connected) < len(tasks) - 128:
+                await asyncio.sleep(0.005)
+    while len(connected) < connections:
+        await asyncio.sleep(0.01)
+    connect_seconds = time.perf_counter() - start
+    rss = _rss_mb(server_pid)
+
+    fanout = []
+    async with httpx.AsyncClient(base_url=base, headers={"Authorization": f"Bearer {rider}"}) as http:
+        for n in range(events):
+            sent = time.perf_counter()
+            (await http.post("/api/v1/rides/", json=RIDE)).raise_for_status()
+            deadline = time.perf_counter() + 30
+            while sum(len(c.received) > n for c in clients) < connections and time.perf_counter() < deadline:
+                await asyncio.sleep(0.002)
+            fanout.extend(c.received[n] - sent for c in clients if len(c.received) > n)
+            await asyncio.sleep(interval)
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    fanout.sort()
+    return {
+        "connect_seconds": connect_seconds,
+        "server_rss_mb": rss,
+        "delivered": len(fanout),
+        "expected": connections * events,
+        "evicted": sum(c.evicted for c in clients),
+        "p50_ms": 1000 * statistics.median(fanout),
+        "p99_ms": 1000 * fanout[int(0.99 * (len(fanout) - 1))],
+        "max_ms": 1000 * fanout[-1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=10000)
+    parser.add_argument("--events", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.2, help="Seconds between ride creations")
+    args = parser.parse_args()
+
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}")
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+             "--log-level", "warning", "--backlog", "4096"],
+            env=env, stdout=subprocess.DEVNULL,
+        )
+        try:
+            for _ in range(100):
+                try:
+                    httpx.get(f"http://127.0.0.1:{port}/")
+                    break
+                except httpx.TransportError:
+                    time.sleep(0.1)
+            result = asyncio.run(_load(port, args.connections, args.events, args.interval, server.pid))
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(f"connections:       {args.connections}")
+    print(f"connect time:      {result['connect_seconds']:.1f} s")
+    print(f"server RSS:        {result['server_rss_mb']:.0f} MB")
+    print(f"delivered:         {result['delivered']}/{result['expected']} (evicted {result['evicted']})")
+    print(f"fan-out latency:   p50 {result['p50_ms']:.0f} ms, p99 {result['p99_ms']:.0f} ms, max {result['max_ms']:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Ride creation throughput (rides/sec) versus the insert coalescing window.
+
+    python -m benchmarks.bench_ride_inserts --windows 0 0.5 1 2 5 10 --concurrency 200
+
+``--concurrency`` riders create rides back to back against a scratch SQLite
+file, ``--rides`` attempts in total (lock errors are counted). Window ``0`` is the unbatched path (one
+INSERT … RETURNING and one commit per ride); every other window runs the
+RideInsertBatcher with that ``max_wait_ms`` and ``--max-batch``.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from sqlalchemy.exc import OperationalError
+
+from app.db.models import Base, RideStatus
+from app.db.session import create_engines, create_session_factory, run_write
+from app.services.ride_batcher import RideInsertBatcher, insert_rides
+
+
+def _values(i):
+    return dict(
+        rider_id=f"rider-{i}", pickup_lat=40.7, pickup_lon=-74.0,
+        dropoff_lat=40.8, dropoff_lon=-73.9, price=12.5, status=RideStatus.PENDING,
+    )
+
+
+async def _run(window_ms: float, rides: int, concurrency: int, max_batch: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        read, write = create_engines(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}", False)
+        factory = create_session_factory(read, write)
+        async with write.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        batcher = None
+        if window_ms > 0:
+            batcher = RideInsertBatcher(max_batch=max_batch, max_wait_ms=window_ms, session_factory=factory)
+            await batcher.start()
+
+        latencies = []
+        errors = 0
+        counter = iter(range(rides))
+
+        async def rider():
+            nonlocal errors
+            for i in counter:
+                start = time.perf_counter()
+                try:
+                    if batcher is not None:
+                        await batcher.submit(_values(i))
+                    else:
+                        async with factory() as session:
+                            await run_write(session, lambda conn: insert_rides(conn, [_values(i)]))
+                except OperationalError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(rider() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        avg_batch = 1.0
+        if batcher is not None:
+            await batcher.stop()
+            avg_batch = batcher.stats()["avg_batch"]
+        await write.dispose()
+
+    latencies.sort()
+    return len(latencies) / elapsed, errors, avg_batch, statistics.median(latencies), latencies[int(0.99 * (len(latencies) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--windows", type=float, nargs="+", default=[0, 0.5, 1, 2, 5, 10])
+    parser.add_argument("--rides", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--max-batch", type=int, default=256)
+    args = parser.parse_args()
+
+    print(f"{'window_ms':>9} {'rides/s':>9} {'errors':>7} {'avg_batch':>9} {'p50_ms':>8} {'p99_ms':>8}")
+    for window in args.windows:
+        rate, errors, avg_batch, p50, p99 = asyncio.run(_run(window, args.rides, args.concurrency, args.max_batch))
+        print(f"{window:>9g} {rate:>9.0f} {errors:>7} {avg_batch:>9.1f} {p50 * 1000:>8.2f} {p99 * 1000:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
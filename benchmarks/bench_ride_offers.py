@@ -0,0 +1,164 @@
+"""
+Time-to-match and offers per match of the push-based offer scheduler, simulated.
+
+    python -m benchmarks.bench_ride_offers --drivers 2000 --rides 5000 --rate 1.5 --k 1 3 5
+
+A discrete-event simulation on a virtual clock, driving the real
+``OfferScheduler`` and ``DriverLocationStore`` (no database, no HTTP):
+
+* ``--drivers`` drivers spread over a ~60 km square; rides arrive at
+  ``--rate`` per second with pickups spread the same way
+* an offered driver answers after 2-10 s: accepts with probability
+  ``--accept``, declines with ``--decline``, otherwise lets the offer time out
+* the first acceptance wins, as with the ``status == PENDING`` guard; later
+  ones count as conflicts. The winner is busy for a 10-30 min trip and then
+  reappears idle at the dropoff
+
+For each ``--k`` (drivers per round) it reports the share of rides matched,
+median and p90 time-to-match, offers per matched ride, accept conflicts and
+the scheduler's CPU time per ride.
+"""
+import argparse
+import heapq
+import statistics
+import time
+from datetime import datetime
+
+import numpy as np
+
+from app.services.driver_locations import DriverLocationStore
+from app.services.geo_index import IndexedRide
+from app.services.ride_events import RideEventBus
+from app.services.ride_offers import OfferScheduler
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class _SimBus(RideEventBus):
+    """Hands offers to the simulation instead of feed connections"""
+
+    def __init__(self, on_offer):
+        super().__init__()
+        self.on_offer = on_offer
+
+    def publish_offer(self, driver_id: str, ride_json: bytes, expires_in: float) -> bool:
+        self.on_offer(driver_id)
+        return True
+
+    def publish_offer_expired(self, driver_id: str, ride_id: int):
+        pass
+
+
+def _point(rng: np.random.Generator):
+    return 40.73 + rng.uniform(-0.27, 0.27), -73.95 + rng.uniform(-0.35, 0.35)
+
+
+def simulate(args, k: int) -> dict:
+    rng = np.random.default_rng(22)
+    clock = _Clock()
+    events = []  # (time, seq, kind, payload)
+    seq = 0
+
+    def later(delay: float, kind: str, payload):
+        nonlocal seq
+        seq += 1
+        heapq.heappush(events, (clock.now + delay, seq, kind, payload))
+
+    def on_offer(driver_id: str):
+        ride_id = scheduler.open_offer(driver_id)
+        roll = rng.random()
+        if roll < args.accept:
+            later(rng.uniform(2, 10), "accept", (driver_id, ride_id))
+        elif roll < args.accept + args.decline:
+            later(rng.uniform(2, 10), "decline", (driver_id, ride_id))
+
+    store = DriverLocationStore(fresh_seconds=float("inf"), clock=clock)
+    bus = _SimBus(on_offer)
+    scheduler = OfferScheduler(store, bus, k=k, clock=clock)
+    for i in range(args.drivers):
+        store.update(f"driver-{i}", *_point(rng))
+
+    # Poisson arrivals
+    arrival = 0.0
+    for ride_id in range(1, args.rides + 1):
+        arrival += rng.exponential(1 / args.rate)
+        seq += 1
+        heapq.heappush(events, (arrival, seq, "ride", ride_id))
+
+    rides = {}
+    created_at = {}
+    matched_seconds = []
+    conflicts = 0
+    cpu = 0.0
+    deadline = None
+    kind = None
+    while events or deadline is not None:
+        if events and (deadline is None or events[0][0] <= clock.now + deadline):
+            clock.now, _, kind, payload = heapq.heappop(events)
+        else:
+            clock.now += deadline
+
+        if kind == "ride":
+            lat, lon = _point(rng)
+            ride = IndexedRide(payload, "rider", lat, lon, *_point(rng), 20.0, datetime(2026, 1, 1))
+            rides[payload] = ride
+            created_at[payload] = clock.now
+            bus.publish_created(ride)
+        elif kind == "accept":
+            driver_id, ride_id = payload
+            if ride_id in rides:
+                ride = rides.pop(ride_id)
+                matched_seconds.append(clock.now - created_at[ride_id])
+                store.assign(driver_id, ride_id)
+                bus.publish_accepted(ride_id)
+                later(rng.uniform(600, 1800), "dropoff", (driver_id, ride_id, ride.dropoff_lat, ride.dropoff_lon))
+            else:
+                conflicts += 1
+        elif kind == "decline":
+            scheduler.decline(payload[1], payload[0])
+        elif kind == "dropoff":
+            driver_id, ride_id, lat, lon = payload
+            store.release(driver_id, ride_id)
+            store.update(driver_id, lat, lon)
+        kind = None
+
+        start = time.perf_counter()
+        deadline = scheduler.run_due()
+        cpu += time.perf_counter() - start
+
+    stats = scheduler.stats()
+    matched_seconds.sort()
+    return {
+        "matched": len(matched_seconds) / args.rides,
+        "median": statistics.median(matched_seconds) if matched_seconds else float("nan"),
+        "p90": matched_seconds[int(0.9 * (len(matched_seconds) - 1))] if matched_seconds else float("nan"),
+        "offers_per_match": stats["offers"] / max(len(matched_seconds), 1),
+        "conflicts": conflicts,
+        "cpu_ms_per_ride": 1000 * cpu / args.rides,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--drivers", type=int, default=2000)
+    parser.add_argument("--rides", type=int, default=5000)
+    parser.add_argument("--rate", type=float, default=1.5, help="Ride requests per second")
+    parser.add_argument("--accept", type=float, default=0.5)
+    parser.add_argument("--decline", type=float, default=0.3)
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5])
+    args = parser.parse_args()
+    for k in args.k:
+        r = simulate(args, k)
+        print(f"k={k}: matched {100 * r['matched']:.1f}%, time-to-match median {r['median']:.1f} s "
+              f"p90 {r['p90']:.1f} s, {r['offers_per_match']:.2f} offers/match, "
+              f"{r['conflicts']} accept conflicts, {r['cpu_ms_per_ride']:.3f} ms scheduler CPU/ride")
+
+
+if __name__ == "__main__":
+    main()
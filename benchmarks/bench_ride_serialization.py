@@ -0,0 +1,119 @@
+"""
+CPU cost of serializing the pending-ride listing: ORM + Pydantic versus Core rows + orjson.
+
+    python -m benchmarks.bench_ride_serialization --sizes 1000 10000 --repeat 20
+
+Fills a scratch SQLite database with pending rides, then measures process CPU
+time per listing for:
+
+* orm+pydantic: ``select(Ride)`` hydrated into ORM objects, then FastAPI's own
+  ``serialize_response`` for ``List[RideOut]`` and ``JSONResponse`` rendering
+  (the path /rides/available/ took before)
+* core+orjson: ``select(*RIDE_OUT_COLUMNS)`` rows passed to ``dumps_rides``
+
+Fetch (query + row/object construction) and serialize are reported
+separately, normalised to milliseconds of CPU per 1k rides.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.db.models import Base, Ride, RideStatus
+from app.schemas.rides import RideOut
+from app.utils.ride_json import RIDE_OUT_COLUMNS, dumps_rides
+
+response_field = create_model_field(name="Response_rides", type_=List[RideOut], mode="serialization")
+
+
+def _rows(count: int, rng: random.Random):
+    now = datetime.utcnow()
+    return [
+        {
+            "rider_id": f"rider-{i % 5000}",
+            "pickup_lat": 40.73 + rng.uniform(-0.3, 0.3),
+            "pickup_lon": -73.95 + rng.uniform(-0.3, 0.3),
+            "dropoff_lat": 40.73 + rng.uniform(-0.3, 0.3),
+            "dropoff_lon": -73.95 + rng.uniform(-0.3, 0.3),
+            "price": round(rng.uniform(5, 80), 2),
+            "status": RideStatus.PENDING,
+            "created_at": now - timedelta(microseconds=i),
+        }
+        for i in range(count)
+    ]
+
+
+async def _orm_pydantic(sessions):
+    start = time.process_time()
+    async with sessions() as session:
+        rides = (await session.scalars(select(Ride).where(Ride.status == RideStatus.PENDING))).all()
+    fetched = time.process_time()
+    content = await serialize_response(field=response_field, response_content=rides)
+    body = JSONResponse(content).body
+    return fetched - start, time.process_time() - fetched, body
+
+
+async def _core_orjson(sessions):
+    start = time.process_time()
+    async with sessions() as session:
+        rows = (await session.execute(select(*RIDE_OUT_COLUMNS).where(Ride.status == RideStatus.PENDING))).all()
+    fetched = time.process_time()
+    body = dumps_rides(rows)
+    return fetched - start, time.process_time() - fetched, body
+
+
+async def run_size(count: int, repeat: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}")
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(Ride), _rows(count, random.Random(count)))
+
+        results = {}
+        for name, path in (("orm+pydantic", _orm_pydantic), ("core+orjson", _core_orjson)):
+            await path(sessions)  # warm-up
+            fetch, serialize = [], []
+            for _ in range(repeat):
+                f, s, body = await path(sessions)
+                fetch.append(f)
+                serialize.append(s)
+            results[name] = (statistics.median(fetch), statistics.median(serialize), len(body))
+        await engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'rides':>7} {'path':>13} {'fetch ms/1k':>12} {'serialize ms/1k':>16} {'total ms/1k':>12} {'body KiB':>9}")
+    for size in args.sizes:
+        results = asyncio.run(run_size(size, args.repeat))
+        per_1k = 1000 * 1000 / size
+        totals = {}
+        for name, (fetch, serialize, body_len) in results.items():
+            totals[name] = (fetch + serialize) * per_1k
+            print(
+                f"{size:>7} {name:>13} {fetch * per_1k:>12.2f} {serialize * per_1k:>16.2f} "
+                f"{totals[name]:>12.2f} {body_len / 1024:>9.1f}"
+            )
+        saved = totals["orm+pydantic"] - totals["core+orjson"]
+        print(f"{'':>7} {'saved':>13} {saved:>42.2f} ms CPU per 1k rides ({totals['orm+pydantic'] / totals['core+orjson']:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Write-heavy throughput: default SQLite engine vs high-concurrency mode.
+
+    python -m benchmarks.bench_sqlite_writes --writers 50 --rides-per-writer 40
+
+Each mode runs in a fresh subprocess (the engines are configured at import)
+against its own scratch database file. ``--writers`` concurrent tasks each
+create rides and immediately accept them through RideService, so every
+request is a write. Failed calls (500s from lock errors) are counted.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+async def _child(writers: int, rides_per_writer: int) -> dict:
+    from fastapi import HTTPException
+
+    from app.db.session import SessionLocal, close_db, init_db
+    from app.schemas.rides import RideCreate
+    from app.services.rides import RideService
+
+    await init_db()
+    payload = RideCreate(pickup_lat=40.7, pickup_lon=-74.0, dropoff_lat=40.8, dropoff_lon=-73.9, price=12.5)
+    errors = 0
+
+    async def writer(n: int):
+        nonlocal errors
+        for _ in range(rides_per_writer):
+            try:
+                async with SessionLocal() as session:
+                    service = RideService(session)
+                    ride = await service.create_ride(payload, f"rider-{n}")
+                    await service.accept_ride(ride.id, f"driver-{n}")
+            except HTTPException:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(writer(n) for n in range(writers)))
+    elapsed = time.perf_counter() - start
+    await close_db()
+    writes = 2 * writers * rides_per_writer
+    return {"writes": writes, "errors": errors, "seconds": elapsed, "writes_per_s": (writes - errors) / elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=50)
+    parser.add_argument("--rides-per-writer", type=int, default=40)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(_child(args.writers, args.rides_per_writer))))
+        return
+
+    print(f"{'mode':>18} {'writes':>7} {'errors':>7} {'seconds':>8} {'writes/s':>9}")
+    for mode, high_concurrency in (("default", "false"), ("high-concurrency", "true")):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(
+                os.environ,
+                DATABASE_URL=f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}",
+                SQLITE_HIGH_CONCURRENCY=high_concurrency,
+            )
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_sqlite_writes", "--child",
+                 "--writers", str(args.writers), "--rides-per-writer", str(args.rides_per_writer)],
+                env=env, capture_output=True, text=True, check=True,
+            ).stdout.strip().splitlines()[-1]
+        r = json.loads(out)
+        print(f"{mode:>18} {r['writes']:>7} {r['errors']:>7} {r['seconds']:>8.2f} {r['writes_per_s']:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""
+End-to-end load test of the ride API with per-route latency percentiles.
+
+    python -m benchmarks.load_test --transport both --riders 20 --drivers 50 --backlog 5000 \\
+        --rides-per-rider 10 --polls-per-driver 20 --acceptors 5 --output results.json
+    python -m benchmarks.load_test --compare before.json after.json
+
+Synthetic riders and drivers run the full flow: register -> login -> create
+ride -> poll available -> contended accept. ``--acceptors`` drivers race to
+accept each created ride. ``--backlog`` pending rides are seeded straight
+into the database before the app starts. ``asgi`` drives the app in-process
+through httpx's ASGITransport. ``uvicorn`` runs one uvicorn worker and goes
+over a real socket. Each transport gets its own scratch database.
+
+Reports throughput and p50/p95/p99 per route. ``--output`` writes JSON, and
+``--compare`` prints the p50/p99 change per route between two result files.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+_tmp = tempfile.mkdtemp(prefix="bench_load_")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_tmp}/asgi.db"
+
+import httpx  # noqa: E402
+from sqlalchemy import create_engine, insert  # noqa: E402
+
+from app.db.models import Base, Ride, RideStatus  # noqa: E402
+
+PASSWORD = "LoadPass123"
+CENTER_LAT, CENTER_LON, SPREAD_DEG = 40.73, -73.95, 0.2
+
+
+def _percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Recorder:
+    """Latency samples and status counts per route template"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.phases = {}
+
+    async def call(self, client, method, url, route, **kwargs):
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.samples[route].append(time.perf_counter() - start)
+        self.statuses[route][response.status_code] += 1
+        return response
+
+    def summary(self):
+        routes = {}
+        for route, samples in self.samples.items():
+            ordered = sorted(samples)
+            routes[route] = {
+                "count": len(ordered),
+                "statuses": {str(k): v for k, v in sorted(self.statuses[route].items())},
+                "p50_ms": 1000 * _percentile(ordered, 50),
+                "p95_ms": 1000 * _percentile(ordered, 95),
+                "p99_ms": 1000 * _percentile(ordered, 99),
+                "max_ms": 1000 * ordered[-1],
+            }
+        return {"phases": self.phases, "routes": routes}
+
+
+def _seed_backlog(db_path: str, backlog: int):
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(engine)
+    if backlog:
+        rng = random.Random(0)
+        now = datetime.utcnow()
+        with engine.begin() as conn:
+            conn.execute(insert(Ride), [
+                {
+                    "rider_id": f"seed-rider-{i % 1000}",
+                    "pickup_lat": CENTER_LAT + rng.uniform(-SPREAD_DEG, SPREAD_DEG),
+                    "pickup_lon": CENTER_LON + rng.uniform(-SPREAD_DEG, SPREAD_DEG),
+                    "dropoff_lat": CENTER_LAT + rng.uniform(-SPREAD_DEG, SPREAD_DEG),
+                    "dropoff_lon": CENTER_LON + rng.uniform(-SPREAD_DEG, SPREAD_DEG),
+                    "price": round(rng.uniform(8, 60), 2),
+                    "status": RideStatus.PENDING,
+                    "created_at": now - timedelta(seconds=i),
+                }
+                for i in range(backlog)
+            ])
+    engine.dispose()
+
+
+async def _phase(recorder, name, jobs, concurrency):
+    """Run coroutine factories with at most ``concurrency`` in flight; returns their results"""
+    gate = asyncio.Semaphore(concurrency)
+
+    async def run(job):
+        async with gate:
+            return await job()
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(run(job) for job in jobs))
+    elapsed = time.perf_counter() - start
+    recorder.phases[name] = {"requests": len(jobs), "seconds": elapsed, "rps": len(jobs) / elapsed if elapsed else 0.0}
+    return results
+
+
+async def run_scenario(client: httpx.AsyncClient, args) -> dict:
+    recorder = Recorder()
+    run_id = f"{os.getpid()}-{int(time.time())}"
+    users = [("rider", i) for i in range(args.riders)] + [("driver", i) for i in range(args.drivers)]
+
+    def email(kind, i):
+        return f"{kind}{i}-{run_id}@load.example.com"
+
+    def register(kind, i):
+        return lambda: recorder.call(client, "POST", "/api/v1/auth/register", "POST /auth/register", json={
+            "email": email(kind, i), "password": PASSWORD, "full_name": f"Load {kind}", "user_type": kind,
+        })
+
+    def login(kind, i):
+        return lambda: recorder.call(client, "POST", "/api/v1/auth/login", "POST /auth/login", json={
+            "email": email(kind, i), "password": PASSWORD,
+        })
+
+    await _phase(recorder, "register", [register(k, i) for k, i in users], args.concurrency)
+    logins = await _phase(recorder, "login", [login(k, i) for k, i in users], args.concurrency)
+    tokens = [{"Authorization": f"Bearer {r.json()['access_token']}"} for r in logins]
+    riders, drivers = tokens[:args.riders], tokens[args.riders:]
+
+    rng = random.Random(1)
+
+    def create(headers):
+        payload = {
+            "pickup_lat": CENTER_LAT + rng.uniform(-SPREAD_DEG, SPREAD_DEG),
+            "pickup_lon": CENTER_LON + rng.uniform(-SPREAD_DEG, SPREAD_DEG),
+            "dropoff_lat": CENTER_LAT + rng.uniform(-SPREAD_DEG, SPREAD_DEG),
+            "dropoff_lon": CENTER_LON + rng.uniform(-SPREAD_DEG, SPREAD_DEG),
+            "price": round(rng.uniform(8, 60), 2),
+        }
+        return lambda: recorder.call(client, "POST", "/api/v1/rides/", "POST /rides/", json=payload, headers=headers)
+
+    created = await _phase(
+        recorder, "create_ride", [create(h) for h in riders for _ in range(args.rides_per_rider)], args.concurrency
+    )
+    ride_ids = [r.json()["id"] for r in created if r.status_code == 201]
+
+    def poll(headers, n):
+        if n % 2:
+            params = {"lat": CENTER_LAT + rng.uniform(-SPREAD_DEG, SPREAD_DEG),
+                      "lon": CENTER_LON + rng.uniform(-SPREAD_DEG, SPREAD_DEG), "k": 20}
+            route = "GET /rides/available/ (nearby)"
+        else:
+            params = {"limit": 100}
+            route = "GET /rides/available/ (page)"
+        return lambda: recorder.call(
+            client, "GET", "/api/v1/rides/available/", route, params=params, headers=headers
+        )
+
+    await _phase(
+        recorder, "poll_available",
+        [poll(h, n) for h in drivers for n in range(args.polls_per_driver)], args.concurrency,
+    )
+
+    def accept(ride_id, headers):
+        return lambda: recorder.call(
+            client, "POST", f"/api/v1/rides/{ride_id}/accept/", "POST /rides/{id}/accept/", headers=headers
+        )
+
+    jobs, owners = [], []
+    for ride_id in ride_ids:
+        for headers in rng.sample(drivers, min(args.acceptors, len(drivers))):
+            jobs.append(accept(ride_id, headers))
+            owners.append(ride_id)
+    accepts = await _phase(recorder, "contended_accept", jobs, args.concurrency)
+
+    winners = defaultdict(int)
+    for ride_id, response in zip(owners, accepts):
+        if response.status_code == 200:
+            winners[ride_id] += 1
+    result = recorder.summary()
+    result["accept_contention"] = {
+        "rides": len(ride_ids),
+        "attempts": len(jobs),
+        "rides_accepted": len(winners),
+        "double_accepts": sum(1 for n in winners.values() if n > 1),
+    }
+    return result
+
+
+async def run_asgi(args) -> dict:
+    from app.main import app
+
+    _seed_backlog(os.path.join(_tmp, "asgi.db"), args.backlog)
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            return await run_scenario(client, args)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def run_uvicorn(args) -> dict:
+    db_path = os.path.join(_tmp, "uvicorn.db")
+    _seed_backlog(db_path, args.backlog)
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=dict(os.environ, DATABASE_URL=f"sqlite+aiosqlite:///{db_path}"),
+        stdout=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(100):
+            try:
+                httpx.get(base_url)
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+            return await run_scenario(client, args)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_results(transport, result):
+    print(f"\n[{transport}]")
+    for name, phase in result["phases"].items():
+        print(f"  {name:<17} {phase['requests']:>6} req {phase['seconds']:>7.2f} s {phase['rps']:>8.1f} req/s")
+    print(f"  {'route':<32} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  statuses")
+    for route, r in result["routes"].items():
+        print(f"  {route:<32} {r['count']:>6} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f}  {r['statuses']}")
+    c = result["accept_contention"]
+    print(f"  accept contention: {c['rides_accepted']}/{c['rides']} rides accepted from {c['attempts']} attempts, "
+          f"{c['double_accepts']} double accepts")
+
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{before['meta'].get('commit')} -> {after['meta'].get('commit')}")
+    for transport, result in after["transports"].items():
+        old = before["transports"].get(transport)
+        if old is None:
+            continue
+        print(f"\n[{transport}]")
+        print(f"  {'route':<40} {'p50 ms':>18} {'p99 ms':>18}")
+        for route, r in result["routes"].items():
+            o = old["routes"].get(route)
+            if o is None:
+                continue
+            print(
+                f"  {route:<40} {o['p50_ms']:>7.1f} -> {r['p50_ms']:>7.1f} "
+                f"{o['p99_ms']:>7.1f} -> {r['p99_ms']:>7.1f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transport", choices=["asgi", "uvicorn", "both"], default="asgi")
+    parser.add_argument("--riders", type=int, default=20)
+    parser.add_argument("--drivers", type=int, default=50)
+    parser.add_argument("--backlog", type=int, default=5000, help="Pending rides seeded before the run")
+    parser.add_argument("--rides-per-rider", type=int, default=10)
+    parser.add_argument("--polls-per-driver", type=int, default=20)
+    parser.add_argument("--acceptors", type=int, default=5, help="Drivers racing to accept each ride")
+    parser.add_argument("--concurrency", type=int, default=50, help="Requests in flight")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Diff two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    transports = ["asgi", "uvicorn"] if args.transport == "both" else [args.transport]
+    results = {}
+    for transport in transports:
+        runner = run_asgi if transport == "asgi" else run_uvicorn
+        results[transport] = asyncio.run(runner(args))
+        _print_results(transport, results[transport])
+
+    if args.output:
+        scenario = {k: v for k, v in vars(args).items() if k not in ("output", "compare")}
+        with open(args.output, "w") as f:
+            json.dump({
+                "meta": {"commit": _git_commit(), "timestamp": datetime.utcnow().isoformat(), "scenario": scenario},
+                "transports": results,
+            }, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
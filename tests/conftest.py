@@ -0,0 +1,111 @@
+import asyncio
+import json
+import os
+import re
+import tempfile
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+# Point the app at a throwaway database before anything imports app settings
+_test_db_dir = tempfile.mkdtemp(prefix="ride_matcher_test_")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_test_db_dir}/test.db")
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.main import app
+from app.db.models import Base
+from app.db.session import engine, write_engine
+from app.services.driver_locations import driver_locations
+from app.services.geo_index import IndexedRide, pending_ride_index
+from app.services.ride_offers import ride_offers
+from app.services.demand import demand_heatmap
+from app.services.idempotency import idempotency_store
+from app.utils.user_cache import user_cache
+
+RIDE = {"pickup_lat": 40.7, "pickup_lon": -74.0, "dropoff_lat": 40.8, "dropoff_lon": -73.9, "price": 20.0}
+
+
+class Clock:
+    """Settable stand-in for ``time.time``-style clocks"""
+
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def indexed_ride(ride_id, lat=40.7, lon=-74.0):
+    """A pending ride as the in-memory index holds it"""
+    return IndexedRide(ride_id, f"rider-{ride_id}", lat, lon, 40.8, -73.9, 15.0, datetime(2026, 1, 1, 0, ride_id))
+
+
+def parse_frame(frame: bytes):
+    """(event, data) of one server-sent event frame"""
+    event, data = frame.decode().strip().split("\n")
+    return event.removeprefix("event: "), json.loads(data.removeprefix("data: "))
+
+
+@contextmanager
+def ride_statements():
+    """Collect every SQL statement touching the rides table"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if re.search(r"\brides\b", statement):
+            statements.append(statement)
+
+    event.listen(write_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(write_engine.sync_engine, "before_cursor_execute", record)
+
+
+async def _reset_database():
+    async with write_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    await write_engine.dispose()
+    await engine.dispose()
+
+
+@pytest.fixture
+def client():
+    """TestClient with lifespan running against a freshly reset database"""
+    asyncio.run(_reset_database())
+    pending_ride_index.clear()
+    driver_locations.clear()
+    ride_offers.clear()
+    demand_heatmap.clear()
+    idempotency_store.clear()
+    user_cache.clear()
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def make_user(client):
+    """Factory that registers a user, logs in and returns (user_id, auth headers)"""
+
+    def _make_user(user_type: str = "rider"):
+        user_data = {
+            "email": f"{user_type}-{uuid.uuid4().hex[:8]}@example.com",
+            "password": "TestPass123",
+            "full_name": f"Test {user_type.title()}",
+            "user_type": user_type,
+        }
+        response = client.post("/api/v1/auth/register", json=user_data)
+        assert response.status_code == 201, response.text
+        user_id = response.json()["id"]
+        login = client.post("/api/v1/auth/login", json={
+            "email": user_data["email"],
+            "password": user_data["password"],
+        })
+        assert login.status_code == 200, login.text
+        return user_id, {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    return _make_user
@@ -0,0 +1,126 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, insert, select, update
+
+from app.db.models import Ride, RideArchive
+from app.db.session import SessionLocal, _rebuild_with_autoincrement, run_write
+from app.services.archiver import RideArchiver
+from app.services.driver_locations import driver_locations
+from app.services.outbox import outbox_relay
+
+RIDE = {"pickup_lat": 40.7, "pickup_lon": -74.0, "dropoff_lat": 40.8, "dropoff_lon": -73.9, "price": 20.0}
+
+
+async def _ids(model):
+    async with SessionLocal() as session:
+        return set((await session.scalars(select(model.id))).all())
+
+
+async def _backdate(ride_id: int, hours: float):
+    async with SessionLocal() as session:
+        await run_write(session, lambda conn: conn.execute(
+            update(Ride.__table__)
+            .where(Ride.id == ride_id)
+            .values(created_at=datetime.utcnow() - timedelta(hours=hours))
+        ))
+
+
+def test_finished_rides_move_to_archive_and_stay_readable(client, make_user):
+    _, rider = make_user("rider")
+    _, other_rider = make_user("rider")
+    _, driver = make_user("driver")
+    ids = [client.post("/api/v1/rides/", json=RIDE, headers=rider).json()["id"] for _ in range(5)]
+    pending, completed, cancelled, accepted, stale = ids
+    for ride_id in (completed, accepted, stale):
+        assert client.post(f"/api/v1/rides/{ride_id}/accept/", headers=driver).status_code == 200
+    client.post(f"/api/v1/rides/{completed}/complete/", headers=driver)
+    client.post(f"/api/v1/rides/{cancelled}/cancel/", headers=rider)
+    client.portal.call(_backdate, stale, 48)
+
+    archiver = RideArchiver(batch_size=100, accepted_after_hours=24)
+    assert client.portal.call(archiver.archive_once) == 3
+    assert client.portal.call(_ids, Ride) == {pending, accepted}
+    assert client.portal.call(_ids, RideArchive) == {completed, cancelled, stale}
+    assert client.portal.call(archiver.archive_once) == 0
+
+    # Reads fall through to the archive transparently
+    archived = client.get(f"/api/v1/rides/{completed}/", headers=rider)
+    assert archived.status_code == 200
+    assert archived.json()["status"] == "completed"
+    assert client.get(f"/api/v1/rides/{stale}/", headers=driver).json()["status"] == "accepted"
+    assert client.get(f"/api/v1/rides/{cancelled}/", headers=rider).json()["status"] == "cancelled"
+    assert client.get(f"/api/v1/rides/{pending}/", headers=driver).json()["status"] == "pending"
+    assert client.get(f"/api/v1/rides/{completed}/", headers=other_rider).status_code == 404
+    assert client.get(f"/api/v1/rides/{accepted}/", headers=other_rider).status_code == 404
+    assert client.get("/api/v1/rides/999999/", headers=rider).status_code == 404
+    assert client.post(f"/api/v1/rides/{stale}/complete/", headers=driver).status_code == 409
+
+
+def test_archiver_moves_rides_in_batches(client, make_user):
+    _, rider = make_user("rider")
+    ids = [client.post("/api/v1/rides/", json=RIDE, headers=rider).json()["id"] for _ in range(5)]
+    for ride_id in ids:
+        client.post(f"/api/v1/rides/{ride_id}/cancel/", headers=rider)
+
+    archiver = RideArchiver(batch_size=2)
+    assert client.portal.call(archiver.archive_once) == 2
+    assert len(client.portal.call(_ids, RideArchive)) == 2
+    assert client.portal.call(archiver.archive_all) == 3
+    assert archiver.stats()["archived"] == 5 and archiver.stats()["batches"] == 3
+
+    async def live_count():
+        async with SessionLocal() as session:
+            return await session.scalar(select(func.count()).select_from(Ride))
+
+    assert client.portal.call(live_count) == 0
+
+
+def test_archiving_a_stale_accepted_ride_frees_its_driver(client, make_user):
+    _, rider = make_user("rider")
+    driver_id, driver = make_user("driver")
+    ride_id = client.post("/api/v1/rides/", json=RIDE, headers=rider).json()["id"]
+    assert client.post(f"/api/v1/rides/{ride_id}/accept/", headers=driver).status_code == 200
+    client.portal.call(outbox_relay.drain_once)
+    assert driver_locations.get(driver_id).active_rides == 1
+
+    client.portal.call(_backdate, ride_id, 48)
+    assert client.portal.call(RideArchiver(accepted_after_hours=24).archive_once) == 1
+    client.portal.call(outbox_relay.drain_once)
+    assert driver_locations.get(driver_id).active_rides == 0
+
+def test_archived_ride_ids_are_not_reused(client, make_user):
+    _, rider = make_user("rider")
+    ride_id = client.post("/api/v1/rides/", json=RIDE, headers=rider).json()["id"]
+    client.post(f"/api/v1/rides/{ride_id}/cancel/", headers=rider)
+    archiver = RideArchiver()
+    assert client.portal.call(archiver.archive_once) == 1
+
+    # The live table is empty again; a plain rowid would hand out the same id
+    next_id = client.post("/api/v1/rides/", json=RIDE, headers=rider).json()["id"]
+    assert next_id > ride_id
+    client.post(f"/api/v1/rides/{next_id}/cancel/", headers=rider)
+    assert client.portal.call(archiver.archive_once) == 1
+    assert client.get(f"/api/v1/rides/{ride_id}/", headers=rider).status_code == 200
+
+
+def test_startup_rebuilds_rides_table_without_autoincrement(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    row = {"rider_id": 1, "status": "cancelled", "pickup_lat": 40.7, "pickup_lon": -74.0,
+           "dropoff_lat": 40.8, "dropoff_lon": -73.9, "price": 20.0, "created_at": datetime(2024, 1, 1)}
+    with engine.begin() as conn:
+        # The table as created before sqlite_autoincrement was declared
+        Ride.__table__.kwargs["sqlite_autoincrement"] = False
+        try:
+            Ride.__table__.create(conn)
+        finally:
+            Ride.__table__.kwargs["sqlite_autoincrement"] = True
+        RideArchive.__table__.create(conn)
+        conn.execute(insert(Ride.__table__), [{**row, "id": 1}, {**row, "id": 2}])
+        conn.execute(insert(RideArchive.__table__), [{**row, "id": 7, "archived_at": datetime(2024, 1, 2)}])
+        assert _rebuild_with_autoincrement(conn, Ride.__table__, RideArchive.__table__)
+        assert not _rebuild_with_autoincrement(conn, Ride.__table__, RideArchive.__table__)
+
+        assert conn.execute(select(Ride.id).order_by(Ride.id)).scalars().all() == [1, 2]
+        new_id = conn.execute(insert(Ride.__table__).values(**row)).inserted_primary_key[0]
+        assert new_id == 8
+    engine.dispose()
@@ -0,0 +1,110 @@
+import random
+
+import orjson
+from pydantic import ValidationError
+
+from app.core.config import get_settings
+from app.schemas.rides import RideCreate
+from app.utils.bulk_rides import RIDE_CREATE_FIELDS, parse_ride_records, validate_ride_columns
+
+RIDE = {"pickup_lat": 40.7, "pickup_lon": -74.0, "dropoff_lat": 40.8, "dropoff_lon": -73.9, "price": 20.0}
+
+
+def _row_errors(record):
+    """Fields RideCreate rejects for one record, validating row by row"""
+    try:
+        RideCreate.model_validate(record)
+        return set()
+    except ValidationError as e:
+        return {error["loc"][0] if error["loc"] else None for error in e.errors()}
+
+
+def test_column_validation_agrees_with_ride_create():
+    rng = random.Random(19)
+    odd_values = [None, "40.5", "abc", True, -90, 90, 90.0001, -180.5, 0, -1, 1e-9, "nan", [1], {"a": 1}, 10**400]
+    records = []
+    for _ in range(3000):
+        record = dict(RIDE)
+        for field in RIDE_CREATE_FIELDS:
+            roll = rng.random()
+            if roll < 0.05:
+                record[field] = rng.choice(odd_values)
+            elif roll < 0.07:
+                del record[field]
+            else:
+                record[field] = rng.uniform(-200, 200)
+        records.append(record)
+    records += ["not an object", None, 7]
+
+    values, valid, errors = validate_ride_columns(records)
+    by_row = {}
+    for error in errors:
+        by_row.setdefault(error["index"], set()).add(error["field"])
+    for i, record in enumerate(records):
+        expected = _row_errors(record) if isinstance(record, dict) else {None}
+        assert by_row.get(i, set()) == expected, (i, record)
+        assert valid[i] == (not expected)
+    for i in valid.nonzero()[0][:50]:
+        assert list(values[i]) == [float(records[i][field]) for field in RIDE_CREATE_FIELDS]
+
+
+def test_ndjson_parse_errors_keep_row_indices():
+    body = b'{"price": 1}\n\nnot json\n' + orjson.dumps(RIDE) + b"\n"
+    records, errors = parse_ride_records(body, ndjson=True)
+    assert len(records) == 3
+    assert errors == [{"index": 1, "field": None, "message": "Invalid JSON"}]
+    _, valid, column_errors = validate_ride_columns(records)
+    assert valid.tolist() == [False, False, True]
+    assert {error["index"] for error in column_errors} == {0}
+
+
+def test_bulk_upload_inserts_valid_rows_and_reports_the_rest(client, make_user):
+    rider_id, rider = make_user("rider")
+    _, driver = make_user("driver")
+    rides = [dict(RIDE, price=10.0 + i) for i in range(5)]
+    rides[1]["pickup_lat"] = 91
+    rides[3] = {"pickup_lat": 40.7}
+
+    response = client.post("/api/v1/rides/bulk/", json=rides, headers=rider)
+    assert response.status_code == 200
+    result = response.json()
+    assert result["received"] == 5 and result["inserted"] == 3
+    assert [ride_id is None for ride_id in result["ids"]] == [False, True, False, True, False]
+    assert result["errors"][0] == {"index": 1, "field": "pickup_lat", "message": "Latitude must be between -90 and 90"}
+    assert {error["index"] for error in result["errors"]} == {1, 3}
+
+    listed = {ride["id"]: ride for ride in client.get("/api/v1/rides/available/", headers=driver).json()}
+    for i in (0, 2, 4):
+        ride = listed[result["ids"][i]]
+        assert ride["rider_id"] == rider_id and ride["price"] == 10.0 + i
+    nearby = client.get("/api/v1/rides/available/", params={"lat": 40.7, "lon": -74.0}, headers=driver).json()
+    assert len(nearby) == 3
+
+    ndjson = b"\n".join(orjson.dumps(ride) for ride in [RIDE, RIDE]) + b"\n"
+    response = client.post(
+        "/api/v1/rides/bulk/", content=ndjson, headers={**rider, "Content-Type": "application/x-ndjson"}
+    )
+    assert response.json()["inserted"] == 2
+
+    assert client.post("/api/v1/rides/bulk/", json={"rides": []}, headers=rider).status_code == 400
+    assert client.post("/api/v1/rides/bulk/", json=[RIDE], headers=driver).status_code == 403
+
+
+def test_oversized_uploads_are_refused_before_parsing(client, make_user, monkeypatch):
+    _, rider = make_user("rider")
+    body = orjson.dumps([RIDE] * 3)
+    monkeypatch.setattr(get_settings(), "bulk_rides_max_bytes", len(body) - 1)
+
+    response = client.post("/api/v1/rides/bulk/", content=body, headers={**rider, "Content-Type": "application/json"})
+    assert response.status_code == 413
+    # Without Content-Length the stream is cut off once it passes the cap
+    chunked = client.post("/api/v1/rides/bulk/", content=(body[i:i + 16] for i in range(0, len(body), 16)),
+                          headers={**rider, "Content-Type": "application/json"})
+    assert chunked.status_code == 413
+
+    monkeypatch.setattr(get_settings(), "bulk_rides_max_bytes", len(body))
+    keyed = {**rider, "Content-Type": "application/json", "Idempotency-Key": "bulk-1"}
+    first = client.post("/api/v1/rides/bulk/", content=body, headers=keyed)
+    assert first.status_code == 200 and first.json()["inserted"] == 3
+    retry = client.post("/api/v1/rides/bulk/", content=body, headers=keyed)
+    assert retry.content == first.content and retry.headers["Idempotent-Replayed"] == "true"
@@ -0,0 +1,67 @@
+import json
+
+from app.services.demand import DemandHeatmap, demand_heatmap
+from app.services.driver_locations import DriverLocationStore
+from app.services.ride_events import RideEventBus
+from tests.conftest import RIDE, Clock, indexed_ride
+
+
+def _cells(body: bytes):
+    """The columnar heatmap as {(lat, lon): {field: value}}"""
+    columns = json.loads(body)["cells"]
+    rows = [dict(zip(columns, values)) for values in zip(*columns.values())]
+    return {(row["lat"], row["lon"]): row for row in rows}
+
+
+def test_counters_windows_and_surge():
+    clock = Clock()
+    bus = RideEventBus()
+    store = DriverLocationStore(clock=clock)
+    heatmap = DemandHeatmap(cell_size_deg=0.01, window_seconds=60, buckets=6, max_cells=4,
+                            surge_min_pending=2, surge_sensitivity=0.5, surge_max=3.0, surge_step=0.1,
+                            locations=store, events=bus, clock=clock)
+    for ride_id in (1, 2, 3, 4):
+        bus.publish_created(indexed_ride(ride_id))
+    assert heatmap.surge_at(40.7, -74.0) == 2.5  # 4 pending rides, no driver: 1 + 0.5 * (4 - 1)
+    assert heatmap.surge_at(41.5, -74.0) == 1.0
+
+    bus.publish_accepted(1)
+    bus.publish_withdrawn(2)
+    store.update("d-1", 40.701, -73.999)
+    store.update("d-2", 40.702, -73.998)
+    store.update("elsewhere", 40.75, -74.0)
+    heatmap.refresh()
+    cell = _cells(heatmap.body())[(40.705, -73.995)]
+    assert (cell["pending"], cell["requested"], cell["accepted"], cell["idle_drivers"]) == (2, 4, 1, 2)
+    assert cell["surge"] == heatmap.surge_at(40.7, -74.0) == 1.0
+    assert len(heatmap) == 2
+
+    # Requests older than the window drop out; cells with nothing left are recycled
+    clock.now += 61
+    bus.publish_accepted(3)
+    bus.publish_accepted(4)
+    store.update("d-1", 40.701, -73.999)
+    heatmap.refresh()
+    cell = _cells(heatmap.body())[(40.705, -73.995)]
+    assert (cell["pending"], cell["requested"], cell["accepted"], cell["idle_drivers"]) == (0, 0, 2, 1)
+    assert len(heatmap) == 1
+
+    # Memory stays bounded: events in cells past max_cells are dropped
+    for ride_id, lat in enumerate((10.0, 20.0, 30.0, 40.0), start=10):
+        bus.publish_created(indexed_ride(ride_id, lat=lat))
+    assert len(heatmap) == 4 and heatmap.stats()["dropped"] == 1
+
+
+def test_heatmap_endpoint_and_surge_in_quotes(client, make_user):
+    _, rider = make_user("rider")
+    for _ in range(3):
+        client.post("/api/v1/rides/", json=RIDE, headers=rider)
+    client.portal.call(demand_heatmap.refresh)
+    [cell] = _cells(client.get("/api/v1/drivers/heatmap/", headers=rider).content).values()
+    assert (cell["pending"], cell["requested"], cell["idle_drivers"], cell["surge"]) == (3, 3, 0, 2.0)
+
+    trip = {key: RIDE[key] for key in ("pickup_lat", "pickup_lon", "dropoff_lat", "dropoff_lon")}
+    quote = client.get("/api/v1/rides/estimate/", params=trip, headers=rider).json()
+    assert quote["surge_multiplier"] == 2.0
+    batch = client.post("/api/v1/rides/estimate/batch/", json=[trip], headers=rider).json()
+    assert batch["estimates"][0]["fare"] == quote["fare"]
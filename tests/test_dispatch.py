@@ -0,0 +1,90 @@
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.services.dispatch import greedy_assignment, haversine_matrix, hungarian, solve_assignment
+from app.services.geo_index import haversine_km
+
+
+def test_haversine_matrix_matches_scalar():
+    """The vectorized cost matrix agrees with the scalar haversine"""
+    rng = np.random.default_rng(1)
+    a_lat, a_lon = rng.uniform(-60, 60, 4), rng.uniform(-170, 170, 4)
+    b_lat, b_lon = rng.uniform(-60, 60, 3), rng.uniform(-170, 170, 3)
+    matrix = haversine_matrix(a_lat, a_lon, b_lat, b_lon)
+    for i, j in itertools.product(range(4), range(3)):
+        assert np.isclose(matrix[i, j], haversine_km(a_lat[i], a_lon[i], b_lat[j], b_lon[j]))
+
+
+def test_hungarian_is_optimal():
+    """Hungarian matches the brute-force optimum on square and rectangular matrices"""
+    rng = np.random.default_rng(7)
+    for shape in [(5, 5), (4, 6), (6, 4)]:
+        cost = rng.uniform(0, 100, shape)
+        pairs = hungarian(cost)
+        assert len(pairs) == min(shape)
+        assert len({r for r, _ in pairs}) == len({c for _, c in pairs}) == len(pairs)
+        n, m = shape
+        if n <= m:
+            best = min(sum(cost[i, perm[i]] for i in range(n)) for perm in itertools.permutations(range(m), n))
+        else:
+            best = min(sum(cost[perm[j], j] for j in range(m)) for perm in itertools.permutations(range(n), m))
+        assert np.isclose(sum(cost[r, c] for r, c in pairs), best)
+
+
+def test_greedy_assignment_is_a_valid_matching():
+    """Greedy never reuses a driver or ride and respects the pickup limit"""
+    rng = np.random.default_rng(3)
+    d_lat, d_lon = 40.7 + rng.uniform(-0.2, 0.2, 300), -74.0 + rng.uniform(-0.2, 0.2, 300)
+    r_lat, r_lon = 40.7 + rng.uniform(-0.2, 0.2, 250), -74.0 + rng.uniform(-0.2, 0.2, 250)
+    pairs = greedy_assignment(d_lat, d_lon, r_lat, r_lon, max_km=5.0, candidates=4, chunk_rows=64)
+    assert len({d for d, _ in pairs}) == len({r for _, r in pairs}) == len(pairs)
+    assert len(pairs) > 200
+    for d, r in pairs:
+        assert haversine_km(d_lat[d], d_lon[d], r_lat[r], r_lon[r]) <= 5.0
+
+
+def test_solve_assignment_drops_unreachable_pairs():
+    """Rides beyond the pickup limit are left unmatched"""
+    pairs = solve_assignment(
+        np.array([40.7, 10.0]), np.array([-74.0, 10.0]),
+        np.array([40.701, 40.702]), np.array([-74.0, -74.0]),
+        max_km=5.0, optimal_max_size=10,
+    )
+    assert pairs == [(0, 0)]
+
+
+def test_dispatch_round_assigns_nearest_rides(client, make_user):
+    """Drivers waiting in the same window each get a distinct ride, committed as accepted"""
+    _, rider_headers = make_user("rider")
+    drivers = [make_user("driver") for _ in range(2)]
+    ride_ids = []
+    for lat in (40.70, 40.80):
+        response = client.post("/api/v1/rides/", headers=rider_headers, json={
+            "pickup_lat": lat, "pickup_lon": -74.0,
+            "dropoff_lat": 40.76, "dropoff_lon": -73.98, "price": 15.0,
+        })
+        ride_ids.append(response.json()["id"])
+
+    positions = [(40.801, -74.0), (40.701, -74.0)]
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        responses = list(pool.map(
+            lambda args: client.post(
+                "/api/v1/rides/dispatch/",
+                json={"lat": args[1][0], "lon": args[1][1]},
+                headers=args[0][1],
+            ),
+            zip(drivers, positions),
+        ))
+
+    assert [r.status_code for r in responses] == [200, 200]
+    assert responses[0].json()["id"] == ride_ids[1]
+    assert responses[1].json()["id"] == ride_ids[0]
+    for (driver_id, _), response in zip(drivers, responses):
+        assert response.json()["status"] == "accepted"
+        assert response.json()["driver_id"] == driver_id
+
+    # Nothing left to hand out
+    response = client.post("/api/v1/rides/dispatch/", json={"lat": 40.7, "lon": -74.0}, headers=drivers[0][1])
+    assert response.status_code == 204
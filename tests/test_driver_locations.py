@@ -0,0 +1,125 @@
+import numpy as np
+import pytest
+
+from app.core.config import get_settings
+from app.services.driver_locations import DriverLocationSnapshotter, DriverLocationStore, driver_locations
+from app.services.outbox import outbox_relay
+from app.utils.driver_pings import KEEP
+from tests.conftest import RIDE, Clock
+
+ADMIN = {"X-Admin-Token": "test-admin-token"}
+
+
+def test_store_keeps_newest_ping_and_finds_nearest_idle_drivers():
+    clock = Clock()
+    store = DriverLocationStore(capacity=2, fresh_seconds=30, clock=clock)
+    store.update("near", 40.7001, -74.0)
+    store.update("far", 40.75, -74.0)
+    store.update("off", 40.7002, -74.0, available=False)
+    assert len(store) == 3 and store.stats()["capacity"] == 4  # Grew past the initial capacity
+    assert not store.update("near", 41.0, -74.0, at=clock.now - 5)  # Older than what is stored
+
+    assert [driver for driver, _ in store.nearest_idle(40.7, -74.0, k=5)] == ["near", "far"]
+    assert [driver for driver, _ in store.nearest_idle(40.7, -74.0, radius_km=1.0)] == ["near"]
+    assert store.nearest_idle(40.7, -74.0, k=5, exclude=["near"])[0][0] == "far"
+    distance = store.nearest_idle(40.7, -74.0, k=1)[0][1]
+    assert distance == pytest.approx(0.0111, abs=1e-3)
+
+    # A driver holding a ride is busy until it completes; replayed events count once
+    store.assign("near", 1)
+    store.assign("near", 1)
+    assert store.get("near").active_rides == 1
+    assert [driver for driver, _ in store.nearest_idle(40.7, -74.0, k=5)] == ["far"]
+    store.release("near", 1)
+    assert store.idle_count() == 2
+
+    # Silent drivers stop being offered, then are forgotten and their slot reused
+    clock.now += 31
+    store.update("far", 40.75, -74.0)
+    assert [driver for driver, _ in store.nearest_idle(40.7, -74.0, k=5)] == ["far"]
+    assert store.expire(30) == 2
+    assert "near" not in store and len(store) == 1
+    store.update("new", 40.7, -74.0)
+    assert store.stats()["capacity"] == 4
+
+
+def test_batch_update_keeps_each_drivers_newest_ping():
+    clock = Clock()
+    store = DriverLocationStore(clock=clock)
+    store.update("a", 10.0, 10.0)
+    applied = store.update_many(
+        ["a", "b", "b", "c"],
+        np.array([11.0, 20.0, 21.0, 30.0]),
+        np.array([11.0, 20.0, 21.0, 30.0]),
+        np.array([KEEP, 1, 0, KEEP], dtype=np.int8),
+        np.array([clock.now - 10, clock.now - 1, clock.now - 2, np.nan]),
+    )
+    assert applied == 2  # a's ping is older than its stored one; b's first ping is newer than its second
+    assert store.get("a").lat == 10.0
+    b = store.get("b")
+    assert (b.lat, b.on_duty, b.updated_at) == (20.0, True, clock.now - 1)
+    assert store.get("c").updated_at == clock.now
+    assert {row[0] for row in store.take_dirty()} == {"a", "b", "c"}
+    assert store.take_dirty() == []
+
+
+def test_ping_endpoints_and_ride_events(client, make_user, monkeypatch):
+    driver_id, driver = make_user("driver")
+    _, rider = make_user("rider")
+    assert client.post("/api/v1/drivers/location/", json={"lat": 40.7, "lon": -74.0}, headers=driver).status_code == 204
+    assert client.post("/api/v1/drivers/location/", json={"lat": 40.7, "lon": -74.0}, headers=rider).status_code == 403
+    assert client.post("/api/v1/drivers/location/", json={"lat": 91, "lon": 0}, headers=driver).status_code == 422
+
+    nearby = client.get("/api/v1/drivers/nearby/", params={"lat": 40.7, "lon": -74.0}, headers=driver).json()
+    assert [d["driver_id"] for d in nearby] == [driver_id]
+    assert nearby[0]["distance_km"] == 0.0
+    # Riders see how far away drivers are, not who or where they are
+    nearby = client.get("/api/v1/drivers/nearby/", params={"lat": 40.7, "lon": -74.0}, headers=rider).json()
+    assert len(nearby) == 1 and set(nearby[0]) == {"distance_km", "age_seconds"}
+
+    # Accepting a ride takes the driver out of the nearby list until it is completed
+    ride_id = client.post("/api/v1/rides/", json=RIDE, headers=rider).json()["id"]
+    client.post(f"/api/v1/rides/{ride_id}/accept/", headers=driver)
+    client.portal.call(outbox_relay.drain_once)
+    assert client.get("/api/v1/drivers/nearby/", params={"lat": 40.7, "lon": -74.0}, headers=rider).json() == []
+    client.post(f"/api/v1/rides/{ride_id}/complete/", headers=driver)
+    client.portal.call(outbox_relay.drain_once)
+    assert len(client.get("/api/v1/drivers/nearby/", params={"lat": 40.7, "lon": -74.0}, headers=rider).json()) == 1
+
+    pings = [
+        {"driver_id": "gw-1", "lat": 40.71, "lon": -74.0},
+        {"driver_id": "gw-2", "lat": 95, "lon": -74.0},
+        {"driver_id": "gw-3", "lat": 40.72, "lon": -74.0, "available": False},
+        {"lat": 40.7, "lon": -74.0},
+    ]
+    assert client.post("/api/v1/drivers/locations/batch/", json=pings).status_code == 403
+    monkeypatch.setattr(get_settings(), "admin_token", ADMIN["X-Admin-Token"])
+    result = client.post("/api/v1/drivers/locations/batch/", json=pings, headers=ADMIN).json()
+    assert (result["received"], result["applied"], result["stale"]) == (4, 2, 0)
+    assert [(e["index"], e["field"]) for e in result["errors"]] == [(1, "lat"), (3, "driver_id")]
+    assert "gw-3" in driver_locations and not driver_locations.get("gw-3").on_duty
+    assert client.post("/api/v1/drivers/locations/batch/", content=b"{}", headers=ADMIN).status_code == 400
+
+
+def test_snapshot_and_restore(client, make_user):
+    driver_locations.update("d-1", 40.7, -74.0)
+    driver_locations.update("d-2", 40.8, -73.9, available=False)
+    snapshotter = DriverLocationSnapshotter(driver_locations)
+    assert client.portal.call(snapshotter.snapshot_once) == 2
+    assert client.portal.call(snapshotter.snapshot_once) == 0  # Nothing changed since
+    driver_locations.update("d-1", 40.71, -74.0)
+    assert client.portal.call(snapshotter.snapshot_once) == 1
+
+    _, rider = make_user("rider")
+    ride_id = client.post("/api/v1/rides/", json=RIDE, headers=rider).json()["id"]
+    driver_id, driver = make_user("driver")
+    client.post(f"/api/v1/rides/{ride_id}/accept/", headers=driver)
+
+    restored = DriverLocationStore()
+    assert client.portal.call(DriverLocationSnapshotter(restored).restore) == 2
+    d1, d2 = restored.get("d-1"), restored.get("d-2")
+    assert (d1.lat, d1.on_duty) == (40.71, True)
+    assert (d2.lat, d2.on_duty) == (40.8, False)
+    assert d1.updated_at == pytest.approx(driver_locations.get("d-1").updated_at, abs=1e-3)
+    assert restored.get(driver_id).active_rides == 1
+    assert restored.take_dirty() == []
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from app.services.driver_locations import DriverLocationStore, driver_locations
+from app.services.fares import FareEstimator
+from app.services.geo_index import haversine_km
+
+TRIP = {"pickup_lat": 40.7, "pickup_lon": -74.0, "dropoff_lat": 40.8, "dropoff_lon": -73.9}
+
+
+def test_quotes_are_cached_per_cell_pair():
+    fares = FareEstimator(cell_size_deg=0.01, cache_size=2, base_fare=2, per_km=1, per_minute=0.5,
+                          minimum_fare=5, detour_factor=1.25, average_speed_kmh=30,
+                          locations=DriverLocationStore(), surge=None)
+    quote = fares.estimate(40.701, -73.999, 40.801, -73.899)
+    km = 1.25 * haversine_km(40.705, -73.995, 40.805, -73.895)  # Between the cell centres
+    assert quote["distance_km"] == pytest.approx(km, abs=1e-3)
+    assert quote["duration_minutes"] == pytest.approx(km * 2, abs=0.1)
+    assert quote["fare"] == pytest.approx(2 + km + km, abs=0.01)
+    assert fares.estimate(40.709, -73.991, 40.809, -73.891) == quote  # Same cells
+    assert fares.stats()["hits"] == 1
+    assert fares.estimate(40.7, -74.0, 40.7, -74.0)["fare"] == 5  # Minimum fare
+
+    # Batches match single quotes and share the cache, which stays bounded
+    lat = np.array([40.701, 40.701, 40.751])
+    km_many, minutes, fare, _ = fares.estimate_many(lat, np.full(3, -73.999), lat + 0.1, np.full(3, -73.899))
+    assert (km_many[0], fare[0]) == (quote["distance_km"], quote["fare"])
+    assert km_many[0] == km_many[1] and km_many[2] != km_many[0]
+    assert len(fares) == 2 and fares.stats()["evictions"] == 1  # The least recently used pair went
+    hits = fares.stats()["hits"]
+    fares.estimate(40.701, -73.999, 40.801, -73.899)
+    assert fares.stats()["hits"] == hits + 1
+
+
+def test_estimate_endpoints(client, make_user):
+    _, rider = make_user("rider")
+    quote = client.get("/api/v1/rides/estimate/", params=TRIP, headers=rider).json()
+    assert quote["fare"] > 0 and quote["pickup_eta_minutes"] is None
+    driver_locations.update("nearby", 40.71, -74.0)
+    assert client.get("/api/v1/rides/estimate/", params=TRIP, headers=rider).json()["pickup_eta_minutes"] > 0
+    assert client.get("/api/v1/rides/estimate/", params={**TRIP, "pickup_lat": 91}, headers=rider).status_code == 422
+
+    trips = [TRIP, {**TRIP, "dropoff_lon": 200}, {"pickup_lat": 40.7}, TRIP]
+    result = client.post("/api/v1/rides/estimate/batch/", json=trips, headers=rider).json()
+    assert result["received"] == 4
+    assert [e is not None for e in result["estimates"]] == [True, False, False, True]
+    assert result["estimates"][0]["fare"] == quote["fare"]
+    assert [(e["index"], e["field"]) for e in result["errors"]] == [
+        (1, "dropoff_lon"), (2, "pickup_lon"), (2, "dropoff_lat"), (2, "dropoff_lon")
+    ]
+    assert client.post("/api/v1/rides/estimate/batch/", content=b"{}", headers=rider).status_code == 400
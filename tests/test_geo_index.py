@@ -0,0 +1,109 @@
+import random
+from datetime import datetime
+
+import pytest
+
+from app.services.geo_index import IndexedRide, PendingRideIndex, haversine_km
+
+
+def _ride(ride_id, lat, lon):
+    return IndexedRide(ride_id, "rider", lat, lon, lat + 0.01, lon + 0.01, 10.0, datetime.utcnow())
+
+
+@pytest.fixture
+def populated_index():
+    rng = random.Random(42)
+    index = PendingRideIndex(cell_size_deg=0.01)
+    for ride_id in range(2000):
+        index.add(_ride(ride_id, 40.7 + rng.uniform(-0.3, 0.3), -74.0 + rng.uniform(-0.3, 0.3)))
+    return index
+
+
+def _brute_force(index, lat, lon):
+    return sorted(
+        (haversine_km(lat, lon, entry.pickup_lat, entry.pickup_lon), entry.id)
+        for entry in index._rides.values()
+    )
+
+
+def test_knn_matches_brute_force(populated_index):
+    """k-nearest query returns the same rides as a full scan"""
+    for lat, lon in [(40.7, -74.0), (40.95, -73.75), (41.5, -74.0)]:
+        expected = [ride_id for _, ride_id in _brute_force(populated_index, lat, lon)[:25]]
+        result = [entry.id for _, entry in populated_index.query(lat, lon, k=25)]
+        assert result == expected
+
+
+def test_radius_matches_brute_force(populated_index):
+    """Radius query returns exactly the rides inside the circle, nearest first"""
+    expected = [ride_id for dist, ride_id in _brute_force(populated_index, 40.7, -74.0) if dist <= 3.0]
+    result = [entry.id for _, entry in populated_index.query(40.7, -74.0, radius_km=3.0)]
+    assert expected and result == expected
+
+
+def test_add_and_remove_are_incremental():
+    """Removed rides disappear from queries and empty cells are dropped"""
+    index = PendingRideIndex(cell_size_deg=0.01)
+    index.add(_ride(1, 10.0, 10.0))
+    index.add(_ride(2, 10.001, 10.001))
+    assert len(index) == 2
+    index.remove(1)
+    assert [entry.id for _, entry in index.query(10.0, 10.0, k=5)] == [2]
+    index.remove(2)
+    index.remove(99)
+    assert len(index) == 0 and not index._cells
+
+
+def test_antimeridian_neighbours_are_found():
+    """Cells wrap around longitude 180"""
+    index = PendingRideIndex(cell_size_deg=0.01)
+    index.add(_ride(1, 0.0, 179.999))
+    index.add(_ride(2, 0.0, 170.0))
+    result = index.query(0.0, -179.999, radius_km=5.0)
+    assert [entry.id for _, entry in result] == [1]
+
+
+def test_available_rides_near_driver(client, make_user):
+    """/available/ with lat/lon answers from the index, nearest pickup first"""
+    _, rider_headers = make_user("rider")
+    _, driver_headers = make_user("driver")
+
+    created = []
+    for lat in (40.80, 40.71, 40.75):
+        response = client.post("/api/v1/rides/", headers=rider_headers, json={
+            "pickup_lat": lat, "pickup_lon": -74.0,
+            "dropoff_lat": 40.76, "dropoff_lon": -73.98, "price": 20.0,
+        })
+        assert response.status_code == 201
+        created.append(response.json()["id"])
+
+    response = client.get(
+        "/api/v1/rides/available/",
+        params={"lat": 40.7, "lon": -74.0, "k": 2},
+        headers=driver_headers,
+    )
+    assert response.status_code == 200
+    assert [ride["id"] for ride in response.json()] == [created[1], created[2]]
+
+    response = client.get(
+        "/api/v1/rides/available/",
+        params={"lat": 40.7, "lon": -74.0, "radius_km": 2},
+        headers=driver_headers,
+    )
+    assert [ride["id"] for ride in response.json()] == [created[1]]
+
+    # Accepted rides leave the index
+    assert client.post(f"/api/v1/rides/{created[1]}/accept/", headers=driver_headers).status_code == 200
+    response = client.get(
+        "/api/v1/rides/available/",
+        params={"lat": 40.7, "lon": -74.0, "k": 1},
+        headers=driver_headers,
+    )
+    assert [ride["id"] for ride in response.json()] == [created[2]]
+
+
+def test_available_rides_requires_lat_and_lon(client, make_user):
+    """A lone lat or lon is rejected"""
+    _, driver_headers = make_user("driver")
+    response = client.get("/api/v1/rides/available/", params={"lat": 40.7}, headers=driver_headers)
+    assert response.status_code == 422
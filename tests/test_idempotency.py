@@ -0,0 +1,123 @@
+import asyncio
+
+from sqlalchemy import select
+
+from app.db.models import Ride
+from app.db.session import SessionLocal
+from app.schemas.rides import RideCreate
+from app.services.idempotency import IdempotencyStore
+from app.services.rides import get_ride_service
+from tests.conftest import RIDE, Clock, ride_statements
+
+
+def test_retries_replay_the_first_response(client, make_user):
+    _, rider = make_user("rider")
+    _, driver = make_user("driver")
+    keyed = {**rider, "Idempotency-Key": "create-1"}
+    first = client.post("/api/v1/rides/", json=RIDE, headers=keyed)
+    assert first.status_code == 201 and "Idempotent-Replayed" not in first.headers
+    with ride_statements() as statements:
+        retry = client.post("/api/v1/rides/", json=RIDE, headers=keyed)
+    assert retry.status_code == 201 and retry.content == first.content
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert statements == []
+    assert client.post("/api/v1/rides/", json={**RIDE, "price": 30.0}, headers=keyed).status_code == 422
+    assert client.post("/api/v1/rides/", json=RIDE, headers=rider).json()["id"] != first.json()["id"]
+
+    # Keys are per user, and errors below 500 are replayed too
+    ride_id = first.json()["id"]
+    accept = client.post(f"/api/v1/rides/{ride_id}/accept/", headers={**driver, "Idempotency-Key": "create-1"})
+    assert accept.status_code == 200 and accept.json()["status"] == "accepted"
+    retry = client.post(f"/api/v1/rides/{ride_id}/accept/", headers={**driver, "Idempotency-Key": "create-1"})
+    assert retry.status_code == 200 and retry.content == accept.content
+    missing = client.post("/api/v1/rides/999999/cancel/", headers={**rider, "Idempotency-Key": "cancel-1"})
+    assert missing.status_code == 409
+    retry = client.post("/api/v1/rides/999999/cancel/", headers={**rider, "Idempotency-Key": "cancel-1"})
+    assert (retry.status_code, retry.content) == (409, missing.content)
+    assert retry.headers["Idempotent-Replayed"] == "true"
+
+
+def test_concurrent_duplicates_run_once_and_persisted_keys_survive(client):
+    calls = []
+
+    async def slow_call(session):
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"id": len(calls)}
+
+    async def scenario():
+        clock = Clock()
+        store = IdempotencyStore(max_keys=1, ttl_seconds=60, persist=True, clock=clock)
+        results = await asyncio.gather(*(store.run("u:k", "f", slow_call, lambda r: str(r["id"]).encode())
+                                         for _ in range(5)))
+        assert len(calls) == 1
+        assert [replayed for _, replayed in results] == [False, True, True, True, True]
+        assert {stored.body for stored, _ in results} == {b"1"}
+        assert store.stats()["coalesced"] == 4
+
+        # A fresh store (as after a restart) replays from the table until the key expires
+        restarted = IdempotencyStore(max_keys=1, ttl_seconds=60, persist=True, clock=clock)
+        stored, replayed = await restarted.run("u:k", "f", slow_call, lambda r: str(r["id"]).encode())
+        assert (stored.body, replayed, len(calls)) == (b"1", True, 1)
+        clock.now += 61
+        stored, replayed = await IdempotencyStore(persist=True, clock=clock).run(
+            "u:k", "f", slow_call, lambda r: str(r["id"]).encode())
+        assert (stored.body, replayed) == (b"2", False)
+
+    client.portal.call(scenario)
+
+
+def test_cancelled_leader_keeps_running_for_its_duplicates(client):
+    calls = []
+    started = asyncio.Event()
+
+    async def slow_call(session):
+        calls.append(1)
+        started.set()
+        await asyncio.sleep(0.05)
+        return {"id": len(calls)}
+
+    async def scenario():
+        store = IdempotencyStore(ttl_seconds=60)
+        serialize = lambda r: str(r["id"]).encode()
+        leader = asyncio.create_task(store.run("u:k", "f", slow_call, serialize))
+        await started.wait()
+        waiter = asyncio.create_task(store.run("u:k", "f", slow_call, serialize))
+        await asyncio.sleep(0)
+        leader.cancel()
+        stored, replayed = await waiter
+        assert leader.cancelled()
+        assert (stored.body, replayed, len(calls)) == (b"1", True, 1)
+        # The first call's response is stored for later retries too
+        stored, replayed = await store.run("u:k", "f", slow_call, serialize)
+        assert (stored.body, replayed, len(calls)) == (b"1", True, 1)
+        assert store.stats()["in_flight"] == 0
+
+    client.portal.call(scenario)
+
+
+def test_cancelled_leader_still_commits_its_ride_on_its_own_session(client, make_user):
+    rider_id, _ = make_user("rider")
+    started = asyncio.Event()
+
+    async def create(session):
+        started.set()
+        await asyncio.sleep(0.05)  # The leader is cancelled here, before the ride is written
+        return await get_ride_service(session).create_ride(RideCreate(**RIDE), rider_id)
+
+    async def scenario():
+        store = IdempotencyStore(ttl_seconds=60)
+        serialize = lambda ride: str(ride.id).encode()
+        leader = asyncio.create_task(store.run("u:k", "f", create, serialize))
+        await started.wait()
+        follower = asyncio.create_task(store.run("u:k", "f", create, serialize))
+        await asyncio.sleep(0)
+        leader.cancel()
+        stored, replayed = await follower
+        async with SessionLocal() as session:
+            rides = await session.scalars(select(Ride.id).where(Ride.rider_id == rider_id))
+            return stored, replayed, rides.all(), leader.cancelled()
+
+    stored, replayed, rides, cancelled = client.portal.call(scenario)
+    assert cancelled and replayed
+    assert rides == [int(stored.body)]
@@ -0,0 +1,133 @@
+import asyncio
+
+from sqlalchemy import event
+
+from app.db.session import engine, write_engine
+from app.services.listing_cache import CachedListing, ListingCache, etag_matches
+
+RIDE = {"pickup_lat": 40.7, "pickup_lon": -74.0, "dropoff_lat": 40.8, "dropoff_lon": -73.9, "price": 20.0}
+
+
+class _StatementCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        for target in {engine.sync_engine, write_engine.sync_engine}:
+            event.listen(target, "before_cursor_execute", self)
+        return self
+
+    def __exit__(self, *exc):
+        for target in {engine.sync_engine, write_engine.sync_engine}:
+            event.remove(target, "before_cursor_execute", self)
+
+
+def test_lru_is_bounded_by_entries_and_bytes_and_flushed_by_version():
+    cache = ListingCache(max_entries=2, max_bytes=100)
+    cache.put(1, "a", CachedListing(b"a" * 10))
+    cache.put(1, "b", CachedListing(b"b" * 10))
+    assert cache.get(1, "a").body == b"a" * 10
+    cache.put(1, "c", CachedListing(b"c" * 10))  # Evicts "b", the least recently used
+    assert cache.get(1, "b") is None
+    cache.put(1, "d", CachedListing(b"d" * 90))  # Over the byte budget: evicts "a"
+    assert len(cache) == 2 and cache.bytes == 100
+    assert cache.get(1, "a") is None
+    cache.put(1, "huge", CachedListing(b"x" * 101))
+    assert cache.get(1, "huge") is None
+
+    # Stores computed against an older version are dropped
+    assert cache.get(2, "c") is None and len(cache) == 0
+    cache.put(1, "c", CachedListing(b"stale"))
+    assert cache.get(2, "c") is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["evictions"] == 2 and stats["invalidations"] == 2
+    assert stats["hit_ratio"] == cache.hits / (cache.hits + cache.misses)
+
+
+
+def test_entries_expire_after_ttl():
+    """Writes from outside this process never bump the version; the TTL bounds how stale a hit can be"""
+    now = [0.0]
+    cache = ListingCache(max_entries=8, max_bytes=1000, ttl_seconds=5, clock=lambda: now[0])
+    cache.put(1, "page", CachedListing(b"[]"))
+    now[0] = 4.9
+    assert cache.get(1, "page") is not None
+    now[0] = 5.0
+    assert cache.get(1, "page") is None
+    assert len(cache) == 0 and cache.bytes == 0 and cache.stats()["expirations"] == 1
+
+def test_concurrent_misses_share_one_build():
+    cache = ListingCache(max_entries=8, max_bytes=1000)
+    builds = 0
+
+    async def build():
+        nonlocal builds
+        builds += 1
+        await asyncio.sleep(0.01)
+        return CachedListing(b"[]")
+
+    async def main():
+        first = await asyncio.gather(*(cache.fetch(1, "page", build) for _ in range(20)))
+        again = await cache.fetch(1, "page", build)
+        changed = await cache.fetch(2, "page", build)
+        return first, again, changed
+
+    first, again, changed = asyncio.run(main())
+    assert len({id(listing) for listing in first}) == 1 and again is first[0]
+    assert changed is not first[0]
+    assert builds == 2
+    assert (cache.misses, cache.coalesced, cache.hits) == (2, 19, 1)
+
+
+def test_etag_matching():
+    etag = CachedListing(b"[]").etag
+    assert etag.startswith('"') and etag == CachedListing(b"[]").etag != CachedListing(b"[ ]").etag
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"other"', etag)
+
+
+def test_repeat_poll_is_304_without_touching_the_database(client, make_user):
+    _, rider = make_user("rider")
+    _, driver = make_user("driver")
+    first_id = client.post("/api/v1/rides/", json=RIDE, headers=rider).json()["id"]
+
+    first = client.get("/api/v1/rides/available/", headers=driver)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    with _StatementCounter() as statements:
+        repeat = client.get("/api/v1/rides/available/", headers={**driver, "If-None-Match": etag})
+        cached = client.get("/api/v1/rides/available/", headers=driver)
+    assert repeat.status_code == 304 and repeat.content == b""
+    assert repeat.headers["ETag"] == etag
+    assert cached.status_code == 200 and cached.content == first.content
+    assert statements.count == 0
+
+    # Creating a ride changes the pending set, so the old ETag no longer matches
+    second_id = client.post("/api/v1/rides/", json=RIDE, headers=rider).json()["id"]
+    changed = client.get("/api/v1/rides/available/", headers={**driver, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert [ride["id"] for ride in changed.json()] == [second_id, first_id]
+    assert changed.headers["ETag"] != etag
+
+    # So does accepting one, for the paginated and the nearby listing alike
+    nearby = {"lat": 40.7, "lon": -74.0}
+    page = client.get("/api/v1/rides/available/", params={"limit": 1}, headers=driver)
+    assert page.headers["X-Next-Cursor"]
+    near = client.get("/api/v1/rides/available/", params=nearby, headers=driver)
+    client.post(f"/api/v1/rides/{second_id}/accept/", headers=driver)
+    page_after = client.get(
+        "/api/v1/rides/available/", params={"limit": 1}, headers={**driver, "If-None-Match": page.headers["ETag"]}
+    )
+    near_after = client.get(
+        "/api/v1/rides/available/", params=nearby, headers={**driver, "If-None-Match": near.headers["ETag"]}
+    )
+    assert page_after.status_code == 200 and [ride["id"] for ride in page_after.json()] == [first_id]
+    assert "X-Next-Cursor" not in page_after.headers
+    assert near_after.status_code == 200 and [ride["id"] for ride in near_after.json()] == [first_id]
@@ -0,0 +1,60 @@
+import re
+
+from app.core.metrics import MetricsRegistry, db_statements, http_requests
+from app.db.session import engine, write_engine
+
+READ_ENGINE, WRITE_ENGINE = ("primary", "primary") if write_engine is engine else ("read", "write")
+
+RIDE = {"pickup_lat": 40.7, "pickup_lon": -74.0, "dropoff_lat": 40.8, "dropoff_lon": -73.9, "price": 20.0}
+
+
+def _sample(text: str, name: str, **labels) -> float:
+    """Value of the first sample of ``name`` carrying all of ``labels``"""
+    for line in text.splitlines():
+        if line.startswith("#") or not re.match(rf"{name}[{{ ]", line):
+            continue
+        if all(f'{k}="{v}"' in line for k, v in labels.items()):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"No sample {name} {labels}")
+
+
+def test_metrics_endpoint_reports_routes_sql_and_queues(client, make_user):
+    _, rider = make_user("rider")
+    created_before = http_requests.value("POST", "/api/v1/rides/", "201")
+    selects_before = db_statements.value(READ_ENGINE, "SELECT")
+    client.post("/api/v1/rides/", json=RIDE, headers=rider)
+    client.get("/api/v1/no-such-route")
+    assert http_requests.value("POST", "/api/v1/rides/", "201") == created_before + 1
+    assert db_statements.value(READ_ENGINE, "SELECT") > selects_before
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+
+    # Routes are labelled by template; unknown paths share one label
+    assert _sample(text, "http_request_duration_seconds_count", method="POST", route="/api/v1/rides/") >= 1
+    assert _sample(text, "http_requests_total", route="unmatched", status="404") >= 1
+    assert _sample(text, "http_request_duration_seconds_bucket", route="/api/v1/rides/", le="+Inf") >= 1
+    # The scrape itself is in flight while the registry renders
+    assert _sample(text, "http_requests_in_flight", method="GET") == 1
+    assert _sample(text, "db_statement_duration_seconds_count", engine=WRITE_ENGINE, operation="INSERT") >= 1
+    assert _sample(text, "db_pool_checkout_wait_seconds_count", engine=READ_ENGINE) >= 1
+    assert _sample(text, "db_pool_connections", engine=READ_ENGINE, state="checked_out") >= 0
+    assert _sample(text, "background_queue_depth", queue="ride_insert_batcher") == 0
+    assert _sample(text, "ride_feed_subscribers") == 0
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value, "/x")
+    text = registry.render()
+
+    assert "# TYPE latency_seconds histogram" in text
+    assert 'latency_seconds_bucket{route="/x",le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{route="/x",le="1"} 3' in text
+    assert 'latency_seconds_bucket{route="/x",le="+Inf"} 4' in text
+    assert 'latency_seconds_count{route="/x"} 4' in text
+    assert 'latency_seconds_sum{route="/x"} 3.65' in text
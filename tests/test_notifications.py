@@ -0,0 +1,167 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.services.driver_locations import driver_locations
+from app.services.outbox import outbox_relay
+from app.utils.notifications import HttpSink, Notification, NotificationDispatcher, notification_dispatcher
+
+
+class FakeProvider(ThreadingHTTPServer):
+    """Stand-in push provider: records batches, failing the first ``fail_first`` requests with 503"""
+
+    def __init__(self, fail_first=0, reject=False):
+        self.batches = []
+        self.fail_first = fail_first
+        self.reject = reject
+        self.requests = 0
+        self.lock = threading.Lock()
+        super().__init__(("127.0.0.1", 0), _Handler)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/push"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.server.lock:
+            self.server.requests += 1
+            failing = self.server.requests <= self.server.fail_first
+            if not failing and not self.server.reject:
+                self.server.batches.append(body)
+        self.send_response(400 if self.server.reject else 503 if failing else 204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def provider_factory():
+    servers = []
+
+    def _start(**kwargs):
+        server = FakeProvider(**kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield _start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _run(dispatcher, notifications):
+    async def main():
+        await dispatcher.start()
+        results = [dispatcher.enqueue(n) for n in notifications]
+        await dispatcher.stop()
+        return results
+
+    return asyncio.run(main())
+
+
+def test_batches_per_destination(provider_factory):
+    provider = provider_factory()
+    dispatcher = NotificationDispatcher(
+        HttpSink(provider.url), workers=2, batch_size=3, batch_wait_ms=20, max_retries=0
+    )
+    notifications = [Notification(f"rider-{i % 2}", f"message {i}") for i in range(8)]
+    _run(dispatcher, notifications)
+
+    by_destination = {}
+    for batch in provider.batches:
+        by_destination.setdefault(batch["destination"], []).extend(n["message"] for n in batch["notifications"])
+    assert by_destination == {
+        "rider-0": [f"message {i}" for i in range(0, 8, 2)],
+        "rider-1": [f"message {i}" for i in range(1, 8, 2)],
+    }
+    assert sorted(len(b["notifications"]) for b in provider.batches) == [1, 1, 3, 3]
+    assert dispatcher.stats()["delivered"] == 8
+    assert dispatcher.stats()["batches"] == 4
+
+
+def test_retries_transient_failures(provider_factory):
+    provider = provider_factory(fail_first=2)
+    dispatcher = NotificationDispatcher(
+        HttpSink(provider.url), workers=1, batch_wait_ms=5, max_retries=3, retry_base_ms=1, retry_max_ms=5
+    )
+    _run(dispatcher, [Notification("rider-1", "hello")])
+    assert provider.requests == 3
+    assert dispatcher.stats()["retries"] == 2
+    assert dispatcher.stats()["delivered"] == 1
+
+
+def test_gives_up_after_max_retries_and_on_rejection(provider_factory):
+    flaky = provider_factory(fail_first=100)
+    dispatcher = NotificationDispatcher(
+        HttpSink(flaky.url), workers=1, batch_wait_ms=5, max_retries=2, retry_base_ms=1, retry_max_ms=5
+    )
+    _run(dispatcher, [Notification("rider-1", "hello")])
+    assert flaky.requests == 3
+    assert dispatcher.stats()["failed"] == 1
+
+    rejecting = provider_factory(reject=True)
+    dispatcher = NotificationDispatcher(HttpSink(rejecting.url), workers=1, batch_wait_ms=5, max_retries=5)
+    _run(dispatcher, [Notification("rider-1", "hello")])
+    assert rejecting.requests == 1
+    assert dispatcher.stats()["failed"] == 1
+
+
+def test_full_queue_drops_instead_of_blocking(provider_factory):
+    provider = provider_factory()
+    dispatcher = NotificationDispatcher(HttpSink(provider.url), workers=1, max_queue=3, batch_wait_ms=5)
+    results = _run(dispatcher, [Notification("rider-1", f"m{i}") for i in range(5)])
+    assert results == [True, True, True, False, False]
+    assert dispatcher.stats()["dropped"] == 2
+    assert dispatcher.stats()["delivered"] == 3
+
+
+def test_accept_notifies_rider_through_outbox(client, make_user):
+    rider_id, rider = make_user("rider")
+    driver_id, driver = make_user("driver")
+    ride = {"pickup_lat": 40.7, "pickup_lon": -74.0, "dropoff_lat": 40.8, "dropoff_lon": -73.9, "price": 9.0}
+    ride_id = client.post("/api/v1/rides/", json=ride, headers=rider).json()["id"]
+    assert client.post(f"/api/v1/rides/{ride_id}/accept/", headers=driver).status_code == 200
+    client.portal.call(outbox_relay.drain_once)
+    assert notification_dispatcher.stats()["enqueued"] == 1
+
+
+def test_submit_holds_messages_back_while_the_queue_is_full(provider_factory):
+    provider = provider_factory()
+    dispatcher = NotificationDispatcher(HttpSink(provider.url), workers=1, max_queue=2, max_deferred=3, batch_wait_ms=5)
+
+    async def main():
+        await dispatcher.start()
+        results = [dispatcher.submit(Notification("rider-1", f"m{i}")) for i in range(6)]
+        await dispatcher.stop()
+        return results
+
+    assert asyncio.run(main()) == [True, True, True, True, True, False]
+    stats = dispatcher.stats()
+    assert (stats["deferred"], stats["dropped"], stats["delivered"], stats["held_back"]) == (3, 1, 5, 0)
+    delivered = [n["message"] for batch in provider.batches for n in batch["notifications"]]
+    assert delivered == [f"m{i}" for i in range(5)]
+
+
+def test_undeliverable_notification_does_not_hold_up_the_outbox(client, make_user, monkeypatch):
+    """A notification the dispatcher refuses must not stall later events, such as driver busy state"""
+    _, rider = make_user("rider")
+    driver_id, driver = make_user("driver")
+    client.post("/api/v1/drivers/location/", json={"lat": 40.7, "lon": -74.0}, headers=driver)
+    ride = {"pickup_lat": 40.7, "pickup_lon": -74.0, "dropoff_lat": 40.8, "dropoff_lon": -73.9, "price": 9.0}
+    ride_id = client.post("/api/v1/rides/", json=ride, headers=rider).json()["id"]
+    client.portal.call(outbox_relay.drain_once)
+    monkeypatch.setattr(notification_dispatcher, "max_deferred", 0)
+    monkeypatch.setattr(notification_dispatcher, "_put", lambda notification: False)
+    assert client.post(f"/api/v1/rides/{ride_id}/accept/", headers=driver).status_code == 200
+    client.portal.call(outbox_relay.drain_once)
+    assert client.portal.call(outbox_relay.backlog) == 0
+    assert driver_locations.get(driver_id).active_rides == 1
+    assert notification_dispatcher.stats()["dropped"] == 1
@@ -0,0 +1,83 @@
+import json
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from app.core.config import get_settings
+from app.utils.pagination import decode_cursor, encode_cursor
+
+
+def _create_rides(client, headers, count):
+    ids = []
+    for i in range(count):
+        response = client.post("/api/v1/rides/", headers=headers, json={
+            "pickup_lat": 40.7 + i * 0.001, "pickup_lon": -74.0,
+            "dropoff_lat": 40.76, "dropoff_lon": -73.98, "price": 10.0 + i,
+        })
+        assert response.status_code == 201
+        ids.append(response.json()["id"])
+    return ids
+
+
+def test_cursor_round_trip():
+    """Cursors are opaque but decode back to the keyset position"""
+    created_at = datetime(2024, 5, 1, 12, 30, 15, 123456)
+    cursor = encode_cursor(created_at, 42)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (created_at, 42)
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_available_rides_keyset_pages(client, make_user):
+    """Following X-Next-Cursor walks every pending ride exactly once, newest first"""
+    _, rider_headers = make_user("rider")
+    _, driver_headers = make_user("driver")
+    ids = _create_rides(client, rider_headers, 5)
+
+    # Force a created_at tie so ordering falls back to id
+    db_path = get_settings().database_url.split("///", 1)[1]
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE rides SET created_at = (SELECT created_at FROM rides WHERE id = ?)", (ids[0],))
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/v1/rides/available/", params=params, headers=driver_headers)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page) <= 2
+        seen.extend(ride["id"] for ride in page)
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert seen == sorted(ids, reverse=True)
+    assert pages == 3
+
+
+def test_available_rides_invalid_cursor(client, make_user):
+    """A tampered cursor is a client error"""
+    _, driver_headers = make_user("driver")
+    response = client.get(
+        "/api/v1/rides/available/", params={"cursor": "garbage"}, headers=driver_headers
+    )
+    assert response.status_code == 400
+
+
+def test_available_rides_ndjson_stream(client, make_user):
+    """The stream endpoint yields one RideOut JSON object per line"""
+    _, rider_headers = make_user("rider")
+    _, driver_headers = make_user("driver")
+    ids = _create_rides(client, rider_headers, 3)
+
+    response = client.get("/api/v1/rides/available/stream/", headers=driver_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == sorted(ids, reverse=True)
+    assert all(row["status"] == "pending" for row in rows)
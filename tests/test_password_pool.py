@@ -0,0 +1,59 @@
+import asyncio
+import threading
+import time
+
+from fastapi import HTTPException
+
+from app.utils.auth import get_password_hash, verify_password
+from app.utils.password_hashing import PasswordWorkerPool
+
+
+def _current_thread_name(delay: float = 0.0) -> str:
+    time.sleep(delay)
+    return threading.current_thread().name
+
+
+def test_pool_runs_work_off_the_event_loop():
+    """Hashing happens on pool threads and results round-trip"""
+    pool = PasswordWorkerPool(max_workers=2, max_pending=4)
+
+    async def main():
+        hashed = await pool.run(get_password_hash, "s3cret-pass")
+        assert await pool.run(verify_password, "s3cret-pass", hashed)
+        assert not await pool.run(verify_password, "wrong-pass", hashed)
+        return await pool.run(_current_thread_name)
+
+    try:
+        assert asyncio.run(main()).startswith("password-hash")
+    finally:
+        pool.shutdown()
+    assert pool.stats()["completed"] == 4
+    assert pool.stats()["in_flight"] == 0
+
+
+def test_pool_rejects_with_503_when_saturated():
+    """Work beyond max_pending fails fast instead of queueing"""
+    pool = PasswordWorkerPool(max_workers=1, max_pending=2)
+
+    async def main():
+        return await asyncio.gather(
+            *(pool.run(_current_thread_name, 0.05) for _ in range(4)),
+            return_exceptions=True,
+        )
+
+    try:
+        results = asyncio.run(main())
+    finally:
+        pool.shutdown()
+    rejected = [r for r in results if isinstance(r, HTTPException)]
+    assert len(rejected) == 2
+    assert rejected[0].status_code == 503
+    assert rejected[0].headers["Retry-After"] == "1"
+    assert pool.stats()["rejected"] == 2
+    assert pool.stats()["peak_in_flight"] == 2
+
+
+def test_zero_workers_runs_inline():
+    """max_workers=0 keeps the old inline behaviour"""
+    pool = PasswordWorkerPool(max_workers=0, max_pending=1)
+    assert asyncio.run(pool.run(_current_thread_name)) == threading.current_thread().name
@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.config import get_settings
+from app.core.profiling import Profile, StackSampler, profile_store
+
+RIDE = {"pickup_lat": 40.7, "pickup_lon": -74.0, "dropoff_lat": 40.8, "dropoff_lon": -73.9, "price": 20.0}
+ADMIN = {"X-Admin-Token": "test-admin-token"}
+
+
+@pytest.fixture
+def admin_token(monkeypatch):
+    monkeypatch.setattr(get_settings(), "admin_token", ADMIN["X-Admin-Token"])
+    profile_store.clear()
+    yield ADMIN
+    profile_store.clear()
+
+
+def test_admin_header_profiles_request_with_phase_breakdown(client, make_user, admin_token):
+    _, rider = make_user("rider")
+    _, driver = make_user("driver")
+    ride_id = client.post("/api/v1/rides/", json=RIDE, headers=rider).json()["id"]
+
+    # Without a valid admin token the header is ignored
+    response = client.post(f"/api/v1/rides/{ride_id}/accept/", headers={**driver, "X-Profile": "1"})
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+    assert client.get("/api/v1/admin/profiles/").status_code == 403
+
+    response = client.get("/api/v1/rides/available/", headers={**driver, **admin_token, "X-Profile": "1"})
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+
+    profiles = client.get("/api/v1/admin/profiles/", headers=admin_token).json()
+    assert [p["id"] for p in profiles] == [profile_id]
+    profile = client.get(f"/api/v1/admin/profiles/{profile_id}/", headers=admin_token).json()
+    assert profile["route"] == "/api/v1/rides/available/"
+    assert profile["status"] == 200
+    assert profile["trigger"] == "header"
+    assert {"auth", "handler", "serialize"} <= set(profile["phases_ms"])
+    # Phases are exclusive, so they account for the whole request
+    assert sum(profile["phases_ms"].values()) == pytest.approx(profile["duration_ms"], rel=0.05, abs=0.5)
+
+    download = client.get(f"/api/v1/admin/profiles/{profile_id}/collapsed/", headers=admin_token)
+    assert download.status_code == 200
+    assert download.headers["content-disposition"].endswith(f'profile-{profile_id}.folded"')
+    assert client.get("/api/v1/admin/profiles/missing/", headers=admin_token).status_code == 404
+
+
+def test_db_time_is_charged_to_db_phase(client, make_user, admin_token):
+    _, rider = make_user("rider")
+    _, driver = make_user("driver")
+    ride_id = client.post("/api/v1/rides/", json=RIDE, headers=rider).json()["id"]
+
+    response = client.post(f"/api/v1/rides/{ride_id}/accept/", headers={**driver, **admin_token, "X-Profile": "1"})
+    assert response.status_code == 200
+    phases = profile_store.get(response.headers["X-Profile-Id"]).phases
+    assert phases["db"] > 0
+    assert phases["handler"] > 0
+
+
+def _spin(seconds: float):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_sampler_records_stacks_of_the_profiled_task_only():
+    async def main():
+        sampler = StackSampler(interval_ms=1)
+        profile = Profile("p", "GET", "/", "test")
+        task = asyncio.current_task()
+        sampler.add(task, profile)
+        try:
+            _spin(0.1)
+        finally:
+            sampler.remove(task)
+
+        other = Profile("q", "GET", "/", "test")
+        sleeper = asyncio.create_task(asyncio.sleep(1))
+        sampler.add(sleeper, other)
+        try:
+            _spin(0.05)  # Runs in this task, not the registered one
+        finally:
+            sampler.remove(sleeper)
+            sleeper.cancel()
+        return profile, other
+
+    profile, other = asyncio.run(main())
+    assert profile.sample_count > 10
+    assert all("_spin (tests/test_profiling.py" in stack.split(";")[-1] for stack in profile.samples)
+    assert other.sample_count == 0
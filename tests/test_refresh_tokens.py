@@ -0,0 +1,111 @@
+import uuid
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from app.db.models import RefreshToken, User
+from app.db.session import SessionLocal
+from app.services import auth as auth_service
+from app.utils.auth import password_pool
+
+
+def _login(client, user_type="driver"):
+    email = f"{user_type}-{uuid.uuid4().hex[:8]}@example.com"
+    client.post("/api/v1/auth/register", json={
+        "email": email, "password": "TestPass123", "full_name": "Refresh User", "user_type": user_type,
+    })
+    response = client.post("/api/v1/auth/login", json={"email": email, "password": "TestPass123"})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_login_returns_refresh_token(client):
+    """Login issues an opaque refresh token alongside the access token"""
+    tokens = _login(client)
+    assert tokens["refresh_token"]
+    assert tokens["refresh_expires_in"] > tokens["expires_in"]
+
+
+def test_refresh_rotates_without_password_hashing(client):
+    """Refresh returns a working access token and a new refresh token, with no bcrypt work"""
+    tokens = _login(client)
+    completed = password_pool.stats()["completed"]
+
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 200
+    refreshed = response.json()
+    assert refreshed["refresh_token"] != tokens["refresh_token"]
+    assert password_pool.stats()["completed"] == completed
+
+    me = client.get("/api/v1/auth/me", headers={"Authorization": f"Bearer {refreshed['access_token']}"})
+    assert me.status_code == 200
+    assert me.json()["user_type"] == "driver"
+
+
+def test_replayed_refresh_token_revokes_family(client):
+    """Reusing a rotated token fails and kills every token from that login"""
+    tokens = _login(client)
+    rotated = client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).json()
+
+    replay = client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert replay.status_code == 401
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": rotated["refresh_token"]})
+    assert response.status_code == 401
+
+
+def test_logout_revokes_refresh_token(client):
+    """A logged-out refresh token can no longer be exchanged"""
+    tokens = _login(client)
+    assert client.post("/api/v1/auth/logout", json={"refresh_token": tokens["refresh_token"]}).status_code == 204
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 401
+
+
+def test_unknown_refresh_token_rejected(client):
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": "does-not-exist"})
+    assert response.status_code == 401
+
+
+def test_deactivated_user_cannot_refresh(client):
+    """Refreshing for a deactivated account fails, even with the principal cached before"""
+    tokens = _login(client)
+    me = client.get("/api/v1/auth/me", headers={"Authorization": f"Bearer {tokens['access_token']}"}).json()
+
+    async def deactivate():
+        async with SessionLocal() as session:
+            await session.execute(update(User).where(User.id == me["id"]).values(is_active=False))
+            await session.commit()
+
+    client.portal.call(deactivate)
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 401
+
+
+
+def test_expired_refresh_tokens_are_purged(client, monkeypatch):
+    """Every PURGE_EVERY issued tokens, rows past their expiry are deleted"""
+    expired = _login(client)
+    kept = _login(client)
+
+    async def expire(refresh_token):
+        async with SessionLocal() as session:
+            await session.execute(
+                update(RefreshToken)
+                .where(RefreshToken.token_hash == auth_service.hash_refresh_token(refresh_token))
+                .values(expires_at=datetime.utcnow() - timedelta(seconds=1))
+            )
+            await session.commit()
+
+    async def token_count():
+        async with SessionLocal() as session:
+            return len((await session.scalars(select(RefreshToken.id))).all())
+
+    client.portal.call(expire, expired["refresh_token"])
+    assert client.portal.call(token_count) == 2
+    monkeypatch.setattr(auth_service, "PURGE_EVERY", 1)
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": kept["refresh_token"]})
+    assert response.status_code == 200
+    # The expired login is gone; the rotated token stays for replay detection
+    assert client.portal.call(token_count) == 2
+    assert client.post("/api/v1/auth/refresh", json={"refresh_token": expired["refresh_token"]}).status_code == 401
@@ -0,0 +1,94 @@
+import csv
+import io
+
+import orjson
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.core.config import get_settings
+from app.db.session import engine, export_engine
+from app.services.archiver import RideArchiver
+from app.services.ride_export import ride_exporter
+
+RIDE = {"pickup_lat": 40.7, "pickup_lon": -74.0, "dropoff_lat": 40.8, "dropoff_lon": -73.9, "price": 20.0}
+ADMIN = {"X-Admin-Token": "test-admin-token"}
+
+
+@pytest.fixture
+def small_pages(monkeypatch):
+    monkeypatch.setattr(ride_exporter, "page_size", 2)
+
+
+def _ndjson(response):
+    return [orjson.loads(line) for line in response.content.splitlines()]
+
+
+def test_history_spans_live_and_archived_rides_across_pages(client, make_user, small_pages):
+    _, rider = make_user("rider")
+    _, other_rider = make_user("rider")
+    driver_id, driver = make_user("driver")
+    ids = [client.post("/api/v1/rides/", json=RIDE, headers=rider).json()["id"] for _ in range(5)]
+    client.post("/api/v1/rides/", json=RIDE, headers=other_rider)
+    client.post(f"/api/v1/rides/{ids[0]}/accept/", headers=driver)
+    client.post(f"/api/v1/rides/{ids[0]}/complete/", headers=driver)
+    client.post(f"/api/v1/rides/{ids[2]}/cancel/", headers=rider)
+    client.post(f"/api/v1/rides/{ids[3]}/accept/", headers=driver)
+    assert client.portal.call(RideArchiver().archive_once) == 2
+    ids.append(client.post("/api/v1/rides/", json=RIDE, headers=rider).json()["id"])
+
+    response = client.get("/api/v1/rides/history/", headers=rider)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert "attachment" in response.headers["content-disposition"]
+    rides = _ndjson(response)
+    assert [ride["id"] for ride in rides] == ids
+    assert [ride["status"] for ride in rides[:4]] == ["completed", "pending", "cancelled", "accepted"]
+    assert rides[0]["driver_id"] == driver_id
+    assert rides[0] == client.get(f"/api/v1/rides/{ids[0]}/", headers=rider).json()
+
+    # Drivers see the rides assigned to them; status filters apply to both tables
+    assert [ride["id"] for ride in _ndjson(client.get("/api/v1/rides/history/", headers=driver))] == [ids[0], ids[3]]
+    filtered = client.get("/api/v1/rides/history/", params={"status": "pending"}, headers=rider)
+    assert [ride["id"] for ride in _ndjson(filtered)] == [ids[1], ids[4], ids[5]]
+
+    # Half-open time range
+    created = [ride["created_at"] for ride in rides]
+    window = client.get(
+        "/api/v1/rides/history/", params={"created_from": created[1], "created_to": created[4]}, headers=rider
+    )
+    assert [ride["id"] for ride in _ndjson(window)] == ids[1:4]
+
+
+def test_csv_export_and_admin_filters(client, make_user, small_pages, monkeypatch):
+    rider_id, rider = make_user("rider")
+    _, other_rider = make_user("rider")
+    ids = [client.post("/api/v1/rides/", json=RIDE, headers=rider).json()["id"] for _ in range(3)]
+    other = client.post("/api/v1/rides/", json=RIDE, headers=other_rider).json()["id"]
+
+    response = client.get("/api/v1/rides/history/", params={"format": "csv"}, headers=rider)
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [int(row["id"]) for row in rows] == ids
+    assert rows[0]["status"] == "pending" and rows[0]["driver_id"] == "" and float(rows[0]["price"]) == 20.0
+    assert client.get("/api/v1/rides/history/", params={"format": "xml"}, headers=rider).status_code == 422
+
+    assert client.get("/api/v1/admin/rides/export/").status_code == 403
+    monkeypatch.setattr(get_settings(), "admin_token", ADMIN["X-Admin-Token"])
+    everything = client.get("/api/v1/admin/rides/export/", headers=ADMIN)
+    assert [ride["id"] for ride in _ndjson(everything)] == [*ids, other]
+    one_rider = client.get("/api/v1/admin/rides/export/", params={"rider_id": rider_id}, headers=ADMIN)
+    assert [ride["id"] for ride in _ndjson(one_rider)] == ids
+    assert client.get("/api/v1/admin/rides/export/", params={"status": "completed"}, headers=ADMIN).content == b""
+
+
+def test_export_engine_cannot_write(client):
+    if export_engine is engine:
+        pytest.skip("not a file-backed SQLite database")
+
+    async def write():
+        async with export_engine.begin() as conn:
+            await conn.execute(text("DELETE FROM rides"))
+
+    with pytest.raises(OperationalError):
+        client.portal.call(write)
@@ -0,0 +1,83 @@
+import asyncio
+
+from app.services.geo_index import PendingRideIndex
+from app.services.ride_events import RideEventBus, ride_event_bus
+from tests.conftest import indexed_ride, parse_frame
+
+
+def test_feed_sends_snapshot_then_deltas():
+    bus = RideEventBus(max_queue=16)
+    index = PendingRideIndex()
+    index.add(indexed_ride(1))
+    index.add(indexed_ride(2))
+
+    async def main():
+        feed = bus.feed(index=index, heartbeat_seconds=5)
+        snapshot = await feed.__anext__()
+        bus.publish_created(indexed_ride(3))
+        bus.publish_accepted(1)
+        bus.publish_withdrawn(2)
+        frames = [await feed.__anext__() for _ in range(3)]
+        await feed.aclose()
+        return snapshot, frames
+
+    snapshot, frames = asyncio.run(main())
+    event, rides = parse_frame(snapshot)
+    assert event == "snapshot"
+    assert [r["id"] for r in rides] == [2, 1]
+    assert [parse_frame(f)[0] for f in frames] == ["ride.created", "ride.accepted", "ride.withdrawn"]
+    assert parse_frame(frames[0])[1]["status"] == "pending"
+    assert parse_frame(frames[1])[1] == {"id": 1}
+    assert bus.stats()["subscribers"] == 0
+
+
+def test_slow_consumer_is_evicted():
+    """A subscriber that stops reading is dropped instead of buffering without bound"""
+    bus = RideEventBus(max_queue=2)
+
+    async def main():
+        feed = bus.feed(index=PendingRideIndex(), heartbeat_seconds=5)
+        await feed.__anext__()
+        fast = bus.subscribe()
+        for ride_id in range(1, 4):
+            bus.publish_created(indexed_ride(ride_id))
+            fast.queue.get_nowait()
+        frames = [frame async for frame in feed]
+        return frames, fast
+
+    frames, fast = asyncio.run(main())
+    assert [parse_frame(f)[0] for f in frames] == ["evicted"]
+    assert bus.stats() == {"subscribers": 1, "published": 3, "delivered": 5, "evicted": 1}
+    assert not fast.evicted
+
+
+def test_radius_filter_applies_to_created_events():
+    bus = RideEventBus()
+    near = bus.subscribe(lat=40.7, lon=-74.0, radius_km=5)
+    everywhere = bus.subscribe()
+    bus.publish_created(indexed_ride(1, lat=40.71, lon=-74.0))
+    bus.publish_created(indexed_ride(2, lat=41.5, lon=-74.0))
+    bus.publish_accepted(2)
+    assert near.queue.qsize() == 2
+    assert everywhere.queue.qsize() == 3
+
+
+def test_ride_service_publishes_changes(client, make_user):
+    _, rider = make_user("rider")
+    _, driver = make_user("driver")
+    ride = {"pickup_lat": 40.7, "pickup_lon": -74.0, "dropoff_lat": 40.8, "dropoff_lon": -73.9, "price": 9.0}
+    subscription = ride_event_bus.subscribe()
+    try:
+        first = client.post("/api/v1/rides/", json=ride, headers=rider).json()["id"]
+        second = client.post("/api/v1/rides/", json=ride, headers=rider).json()["id"]
+        client.post(f"/api/v1/rides/{first}/accept/", headers=driver)
+        client.post(f"/api/v1/rides/{second}/cancel/", headers=rider)
+    finally:
+        ride_event_bus.unsubscribe(subscription)
+
+    events = []
+    while not subscription.queue.empty():
+        events.append(parse_frame(subscription.queue.get_nowait()))
+    assert [(e, d["id"]) for e, d in events] == [
+        ("ride.created", first), ("ride.created", second), ("ride.accepted", first), ("ride.withdrawn", second),
+    ]
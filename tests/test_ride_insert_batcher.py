@@ -0,0 +1,94 @@
+import asyncio
+import os
+import tempfile
+
+import pytest
+from sqlalchemy import event, func, select
+
+from app.db.models import Base, Ride, RideStatus
+from app.db.session import create_engines, create_session_factory
+from app.services.ride_batcher import RideInsertBatcher
+
+
+def _ride_values(i):
+    return dict(
+        rider_id=f"rider-{i}", pickup_lat=40.7, pickup_lon=-74.0,
+        dropoff_lat=40.8, dropoff_lon=-73.9, price=10.0 + i, status=RideStatus.PENDING,
+    )
+
+
+@pytest.fixture
+def sessions():
+    with tempfile.TemporaryDirectory() as tmp:
+        read, write = create_engines(f"sqlite+aiosqlite:///{os.path.join(tmp, 'batch.db')}", False)
+        yield write, create_session_factory(read, write)
+
+
+def test_concurrent_inserts_share_one_statement(sessions):
+    """A burst inside the window becomes one INSERT, and each caller gets its own row"""
+    engine, factory = sessions
+    batcher = RideInsertBatcher(max_batch=100, max_wait_ms=50, session_factory=factory)
+    inserts = []
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def count_inserts(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO rides"):
+            inserts.append(statement)
+
+    async def main():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await batcher.start()
+        rides = await asyncio.gather(*(batcher.submit(_ride_values(i)) for i in range(30)))
+        await batcher.stop()
+        async with factory() as session:
+            count = (await session.execute(select(func.count()).select_from(Ride))).scalar()
+        await engine.dispose()
+        return rides, count
+
+    rides, count = asyncio.run(main())
+    assert count == 30
+    assert [r.rider_id for r in rides] == [f"rider-{i}" for i in range(30)]
+    assert [r.price for r in rides] == [10.0 + i for i in range(30)]
+    assert len({r.id for r in rides}) == 30
+    assert all(r.created_at is not None and r.status == RideStatus.PENDING for r in rides)
+    assert len(inserts) == 1
+    assert batcher.stats()["batches"] == 1
+
+
+def test_max_batch_splits_bursts(sessions):
+    """Bursts larger than max_batch are split across several batches"""
+    engine, factory = sessions
+    batcher = RideInsertBatcher(max_batch=8, max_wait_ms=20, session_factory=factory)
+
+    async def main():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await batcher.start()
+        rides = await asyncio.gather(*(batcher.submit(_ride_values(i)) for i in range(20)))
+        await batcher.stop()
+        await engine.dispose()
+        return rides
+
+    rides = asyncio.run(main())
+    assert [r.rider_id for r in rides] == [f"rider-{i}" for i in range(20)]
+    assert batcher.stats()["batches"] == 3
+    assert batcher.stats()["rows"] == 20
+
+
+def test_failed_batch_fails_every_caller(sessions):
+    engine, factory = sessions
+    batcher = RideInsertBatcher(max_batch=10, max_wait_ms=20, session_factory=factory)
+
+    async def main():
+        # No tables: the INSERT fails
+        await batcher.start()
+        results = await asyncio.gather(
+            *(batcher.submit(_ride_values(i)) for i in range(3)), return_exceptions=True
+        )
+        await batcher.stop()
+        await engine.dispose()
+        return results
+
+    assert all(isinstance(r, Exception) for r in asyncio.run(main()))
+    assert batcher.stats()["failed_batches"] == 1
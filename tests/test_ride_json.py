@@ -0,0 +1,63 @@
+import json
+import random
+from datetime import datetime, timedelta
+from typing import List
+
+from pydantic import TypeAdapter
+
+from app.db.models import RideStatus
+from app.schemas.rides import RideOut
+from app.services.geo_index import IndexedRide
+from app.services.outbox import RIDE_CREATED, outbox_values
+from app.utils.ride_json import RIDE_OUT_FIELDS, dumps_ride, dumps_rides, ride_row
+
+ride_list = TypeAdapter(List[RideOut])
+RIDE = {"pickup_lat": 40.7, "pickup_lon": -74.0, "dropoff_lat": 40.8, "dropoff_lon": -73.9, "price": 20.0}
+
+
+def _random_rows(count: int, rng: random.Random):
+    base = datetime(2024, 2, 29, 23, 59, 59)
+    floats = [0.0, -0.0, 1e-05, 0.1 + 0.2, 1e16, 5e-324, 123456789.123, -179.99999999]
+    for i in range(count):
+        created_at = base + timedelta(seconds=rng.randint(0, 10**8), microseconds=rng.choice([0, rng.randint(1, 999999)]))
+        coords = [rng.choice(floats + [rng.uniform(-180, 180)]) for _ in range(4)]
+        yield (
+            rng.randint(1, 2**62),
+            rng.choice(["rider-1", "rïder-ünïcode-🚗", 'quote"back\\slash', "tab\tnewline\n"]),
+            rng.choice([None, f"driver-{i}"]),
+            *coords,
+            rng.choice([0.01, 20.0, 99999.995, rng.uniform(1, 500)]),
+            rng.choice(list(RideStatus)),
+            created_at,
+        )
+
+
+def test_fast_path_is_byte_identical_to_ride_out():
+    rows = list(_random_rows(2000, random.Random(16)))
+    expected = ride_list.dump_json(ride_list.validate_python([dict(zip(RIDE_OUT_FIELDS, row)) for row in rows]))
+    assert dumps_rides(rows) == expected
+    for row in rows[:50]:
+        ride = RideOut(**dict(zip(RIDE_OUT_FIELDS, row)))
+        assert dumps_ride(row) == ride.model_dump_json().encode()
+        assert outbox_values(RIDE_CREATED, ride)["payload"] == ride.model_dump(mode="json")
+
+
+def test_index_entries_serialize_like_ride_out():
+    entry = IndexedRide(7, "rider-7", 40.7, -74.0, 40.8, -73.9, 12.5, datetime(2024, 1, 1, 8, 30))
+    expected = ride_list.dump_json([RideOut.model_validate(entry)])
+    assert dumps_rides([ride_row(entry)]) == expected
+
+
+def test_available_listing_matches_ride_out_schema(client, make_user):
+    _, rider = make_user("rider")
+    _, driver = make_user("driver")
+    created = [client.post("/api/v1/rides/", json=RIDE, headers=rider).json() for _ in range(3)]
+
+    listing = client.get("/api/v1/rides/available/", headers=driver)
+    assert listing.headers["content-type"] == "application/json"
+    assert listing.json() == json.loads(ride_list.dump_json(ride_list.validate_python(created[::-1])))
+
+    nearby = client.get("/api/v1/rides/available/", params={"lat": 40.7, "lon": -74.0, "k": 2}, headers=driver)
+    by_id = {ride["id"]: ride for ride in created}
+    assert len(nearby.json()) == 2
+    assert all(by_id[ride["id"]] == ride for ride in nearby.json())
@@ -0,0 +1,78 @@
+from app.services.driver_locations import DriverLocationStore, driver_locations
+from app.services.ride_events import RideEventBus
+from app.services.ride_offers import OfferScheduler, ride_offers
+from tests.conftest import RIDE, Clock, indexed_ride, parse_frame
+
+
+def _frames(subscription):
+    frames = []
+    while not subscription.queue.empty():
+        frames.append(parse_frame(subscription.queue.get_nowait()))
+    return frames
+
+
+def test_offers_escalate_and_resolve():
+    clock = Clock()
+    bus = RideEventBus(max_queue=16)
+    store = DriverLocationStore()
+    # About 0.5, 1, 3 and 6 km north of the pickup
+    for driver_id, lat in (("a", 40.7045), ("b", 40.709), ("c", 40.727), ("d", 40.754)):
+        store.update(driver_id, lat, -74.0)
+    scheduler = OfferScheduler(
+        store, bus, k=2, timeout_seconds=10, start_radius_km=2, radius_growth=2,
+        max_radius_km=8, max_rounds=3, clock=clock,
+    )
+    a, c = bus.subscribe(driver_id="a"), bus.subscribe(driver_id="c")
+
+    bus.publish_created(indexed_ride(1))
+    assert scheduler.run_due() == 10
+    assert (scheduler.open_offer("a"), scheduler.open_offer("b")) == (1, 1)
+    (_, created), (event, data) = _frames(a)
+    assert created["id"] == 1
+    assert (event, data["expires_in"], data["ride"]["id"]) == ("ride.offered", 10, 1)
+
+    # a and b hold ride 1's offers, so ride 2 goes straight to the next radius
+    bus.publish_created(indexed_ride(2))
+    scheduler.run_due()
+    assert scheduler.open_offer("c") == 2 and scheduler.open_offer("d") is None
+
+    # Once everyone declined ride 1, it moves on without waiting out the timeout
+    assert scheduler.decline(1, "a")
+    assert not scheduler.decline(1, "a")
+    assert scheduler.decline(1, "b")
+    scheduler.run_due()
+    assert scheduler.open_offer("d") == 1
+
+    bus.publish_accepted(2)
+    assert scheduler.open_offer("c") is None
+
+    # d lets ride 1's last round time out; it is left to the listing
+    clock.now += 10
+    assert scheduler.run_due() is None
+    assert len(scheduler) == 0 and scheduler.open_offer("d") is None
+    assert [event for event, _ in _frames(c)] == ["ride.created", "ride.created", "ride.offered", "ride.accepted"]
+    stats = scheduler.stats()
+    assert (stats["offers"], stats["declined"], stats["expired"], stats["matched"], stats["exhausted"]) == (4, 2, 1, 1, 1)
+    assert stats["offers_per_match"] == 1
+
+
+def test_offer_endpoints(client, make_user, monkeypatch):
+    _, rider = make_user("rider")
+    first_id, first = make_user("driver")
+    second_id, second = make_user("driver")
+    driver_locations.update(first_id, 40.7001, -74.0)
+    driver_locations.update(second_id, 40.7002, -74.0)
+    monkeypatch.setattr(ride_offers, "k", 1)
+    ride_id = client.post("/api/v1/rides/", json=RIDE, headers=rider).json()["id"]
+    client.portal.call(ride_offers.run_due)
+    assert ride_offers.open_offer(first_id) == ride_id
+
+    assert client.post(f"/api/v1/rides/{ride_id}/decline/", headers=second).status_code == 404
+    assert client.post(f"/api/v1/rides/{ride_id}/decline/", headers=first).status_code == 204
+    client.portal.call(ride_offers.run_due)
+    assert ride_offers.open_offer(second_id) == ride_id
+
+    # The offer resolves through the usual accept guard
+    assert client.post(f"/api/v1/rides/{ride_id}/accept/", headers=second).status_code == 200
+    assert ride_offers.open_offer(second_id) is None and len(ride_offers) == 0
+    assert ride_offers.stats()["matched"] >= 1
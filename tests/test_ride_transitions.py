@@ -0,0 +1,62 @@
+from tests.conftest import RIDE, ride_statements
+
+
+def test_create_is_one_insert_returning(client, make_user):
+    _, rider = make_user("rider")
+    with ride_statements() as statements:
+        response = client.post("/api/v1/rides/", json=RIDE, headers=rider)
+    assert response.status_code == 201
+    assert len(statements) == 1
+    assert statements[0].startswith("INSERT INTO rides") and "RETURNING" in statements[0]
+
+
+def test_accept_and_complete_are_one_update_each(client, make_user):
+    _, rider = make_user("rider")
+    driver_id, driver = make_user("driver")
+    ride_id = client.post("/api/v1/rides/", json=RIDE, headers=rider).json()["id"]
+
+    with ride_statements() as statements:
+        accepted = client.post(f"/api/v1/rides/{ride_id}/accept/", headers=driver)
+    assert accepted.status_code == 200
+    assert accepted.json()["status"] == "accepted"
+    assert accepted.json()["driver_id"] == driver_id
+    assert len(statements) == 1
+    assert statements[0].startswith("UPDATE rides") and "RETURNING" in statements[0]
+
+    with ride_statements() as statements:
+        completed = client.post(f"/api/v1/rides/{ride_id}/complete/", headers=driver)
+    assert completed.status_code == 200
+    assert completed.json()["status"] == "completed"
+    assert len(statements) == 1
+
+    assert client.post(f"/api/v1/rides/{ride_id}/accept/", headers=driver).status_code == 409
+    assert client.post(f"/api/v1/rides/{ride_id}/complete/", headers=driver).status_code == 409
+
+
+def test_only_assigned_driver_can_complete(client, make_user):
+    _, rider = make_user("rider")
+    _, driver = make_user("driver")
+    _, other_driver = make_user("driver")
+    ride_id = client.post("/api/v1/rides/", json=RIDE, headers=rider).json()["id"]
+    client.post(f"/api/v1/rides/{ride_id}/accept/", headers=driver)
+    assert client.post(f"/api/v1/rides/{ride_id}/complete/", headers=other_driver).status_code == 409
+    assert client.post(f"/api/v1/rides/{ride_id}/complete/", headers=rider).status_code == 403
+
+
+def test_cancel_pending_ride(client, make_user):
+    _, rider = make_user("rider")
+    _, other_rider = make_user("rider")
+    _, driver = make_user("driver")
+    ride_id = client.post("/api/v1/rides/", json=RIDE, headers=rider).json()["id"]
+
+    assert client.post(f"/api/v1/rides/{ride_id}/cancel/", headers=other_rider).status_code == 409
+    with ride_statements() as statements:
+        cancelled = client.post(f"/api/v1/rides/{ride_id}/cancel/", headers=rider)
+    assert cancelled.status_code == 200
+    assert cancelled.json()["status"] == "cancelled"
+    assert len(statements) == 1
+
+    nearby = client.get("/api/v1/rides/available/", params={"lat": 40.7, "lon": -74.0}, headers=driver)
+    assert ride_id not in [r["id"] for r in nearby.json()]
+    assert client.post(f"/api/v1/rides/{ride_id}/accept/", headers=driver).status_code == 409
+    assert client.post(f"/api/v1/rides/{ride_id}/cancel/", headers=rider).status_code == 409
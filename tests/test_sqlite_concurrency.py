@@ -0,0 +1,104 @@
+import asyncio
+import os
+import tempfile
+
+import pytest
+from sqlalchemy import func, insert, select, text
+
+from app.db.models import Base, Ride, RideStatus
+from app.db.session import create_engines, create_session_factory
+from app.db.write_queue import WriteQueue
+
+
+def _ride_values(i):
+    return dict(
+        rider_id=f"rider-{i}", pickup_lat=40.7, pickup_lon=-74.0,
+        dropoff_lat=40.8, dropoff_lon=-73.9, price=10.0, status=RideStatus.PENDING,
+    )
+
+
+@pytest.fixture
+def hc_engines():
+    with tempfile.TemporaryDirectory() as tmp:
+        read, write = create_engines(f"sqlite+aiosqlite:///{os.path.join(tmp, 'hc.db')}", True)
+        yield read, write
+
+
+def test_pragmas_applied(hc_engines):
+    """Writer runs WAL with tuned pragmas; readers are query-only"""
+    read, write = hc_engines
+
+    async def main():
+        async with write.connect() as conn:
+            assert (await conn.exec_driver_sql("PRAGMA journal_mode")).scalar() == "wal"
+            assert (await conn.exec_driver_sql("PRAGMA synchronous")).scalar() == 1  # NORMAL
+            assert (await conn.exec_driver_sql("PRAGMA busy_timeout")).scalar() > 0
+        async with read.connect() as conn:
+            assert (await conn.exec_driver_sql("PRAGMA query_only")).scalar() == 1
+        await read.dispose()
+        await write.dispose()
+
+    asyncio.run(main())
+
+
+def test_default_mode_shares_one_engine():
+    with tempfile.TemporaryDirectory() as tmp:
+        read, write = create_engines(f"sqlite+aiosqlite:///{os.path.join(tmp, 'plain.db')}", False)
+        assert read is write
+
+
+def test_write_queue_group_commits(hc_engines):
+    """Concurrent writes share commits, and a failing unit is rolled back alone"""
+    read, write = hc_engines
+    queue = WriteQueue(write, max_batch=32)
+
+    async def insert_ride(i):
+        async def work(conn):
+            return (await conn.execute(insert(Ride).values(**_ride_values(i)))).inserted_primary_key[0]
+        return await queue.submit(work)
+
+    async def failing(conn):
+        await conn.execute(insert(Ride).values(**_ride_values(-1)))
+        raise ValueError("boom")
+
+    async def main():
+        async with write.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await queue.start()
+        results = await asyncio.gather(
+            *(insert_ride(i) for i in range(40)), queue.submit(failing), return_exceptions=True
+        )
+        await queue.stop()
+        async with read.connect() as conn:
+            count = (await conn.execute(select(func.count()).select_from(Ride))).scalar()
+        await read.dispose()
+        await write.dispose()
+        return results, count
+
+    results, count = asyncio.run(main())
+    assert isinstance(results[-1], ValueError)
+    assert len(set(results[:-1])) == 40
+    assert count == 40
+    assert queue.stats()["units"] == 41
+    assert queue.stats()["batches"] < 41
+
+
+def test_routing_session_sends_writes_to_writer(hc_engines):
+    """ORM flushes reach the writer even though the session's default bind is query-only"""
+    read, write = hc_engines
+    sessions = create_session_factory(read, write)
+
+    async def main():
+        async with write.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with sessions() as session:
+            session.add(Ride(**_ride_values(1)))
+            await session.commit()
+            rides = (await session.execute(select(Ride))).scalars().all()
+            with pytest.raises(Exception):
+                await session.execute(text("INSERT INTO rides (rider_id) VALUES ('x')"))
+        await read.dispose()
+        await write.dispose()
+        return rides
+
+    assert len(asyncio.run(main())) == 1
@@ -0,0 +1,89 @@
+from sqlalchemy import select, update
+
+from app.db.models import User, UserType
+from app.db.session import SessionLocal, run_write
+from app.utils.user_cache import UserCache, UserPrincipal, user_cache
+
+
+def _principal(user_id):
+    return UserPrincipal(user_id, f"{user_id}@example.com", "Name", UserType.DRIVER, True)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_eviction_and_counters():
+    """The least recently used entry is evicted once the cache is full"""
+    cache = UserCache(max_size=2, ttl_seconds=60)
+    cache.set(_principal("a"))
+    cache.set(_principal("b"))
+    assert cache.get("a").id == "a"       # a is now most recent
+    cache.set(_principal("c"))            # evicts b
+    assert cache.get("b") is None
+    assert cache.get("c").id == "c"
+    assert cache.stats() == {
+        "size": 2, "hits": 2, "misses": 1, "evictions": 1, "expirations": 0, "invalidations": 0,
+    }
+
+
+def test_ttl_expiry():
+    """Entries older than the TTL are treated as misses"""
+    clock = FakeClock()
+    cache = UserCache(max_size=10, ttl_seconds=30, clock=clock)
+    cache.set(_principal("a"))
+    clock.now = 29
+    assert cache.get("a") is not None
+    clock.now = 31
+    assert cache.get("a") is None
+    assert cache.expirations == 1 and len(cache) == 0
+
+
+def test_authenticated_requests_hit_the_cache(client, make_user):
+    """After the first lookup the principal is served without touching the users table"""
+    user_cache.clear()
+    _, headers = make_user("driver")
+    misses, hits = user_cache.misses, user_cache.hits
+
+    assert client.get("/api/v1/auth/me", headers=headers).status_code == 200
+    assert client.get("/api/v1/rides/available/", headers=headers).status_code == 200
+    assert user_cache.misses == misses + 1
+    assert user_cache.hits == hits + 1
+
+
+def test_deactivating_user_invalidates_cache(client, make_user):
+    """An ORM update to the user drops the cached principal immediately"""
+    user_id, headers = make_user("rider")
+    assert client.get("/api/v1/auth/me", headers=headers).status_code == 200
+    assert user_cache.get(user_id) is not None
+
+    async def deactivate():
+        async with SessionLocal() as session:
+            user = (await session.execute(select(User).where(User.id == user_id))).scalar_one()
+            user.is_active = False
+            await session.commit()
+
+    client.portal.call(deactivate)
+    assert user_cache.get(user_id) is None
+    assert client.get("/api/v1/auth/me", headers=headers).status_code == 401
+
+
+def test_core_user_writes_invalidate_cache(client, make_user):
+    """UPDATEs that bypass the ORM unit of work still drop cached principals"""
+    user_id, headers = make_user("driver")
+    assert client.get("/api/v1/auth/me", headers=headers).status_code == 200
+    assert user_cache.get(user_id) is not None
+
+    async def deactivate():
+        async with SessionLocal() as session:
+            await run_write(session, lambda conn: conn.execute(
+                update(User.__table__).where(User.id == user_id).values(is_active=False)
+            ))
+
+    client.portal.call(deactivate)
+    assert user_cache.get(user_id) is None
+    assert client.get("/api/v1/auth/me", headers=headers).status_code == 401